@@ -13,12 +13,18 @@ Usage:
     python Tomasulo/run_tests.py               # run all tests
     python Tomasulo/run_tests.py loop_sum max  # run selected tests
     python Tomasulo/run_tests.py --list        # list available tests
+    python Tomasulo/run_tests.py --jobs 8      # run 8 tests at once in private workspaces
+    python Tomasulo/run_tests.py --cosim fib   # lockstep check of every commit against scripts/iss.py
+    python Tomasulo/run_tests.py --fast-forward 10000 vector_mul_100  # skip the first 10000 instructions
+    python Tomasulo/run_tests.py --issue-width 2   # only the 2-wide core (default: 1 and 2)
+    python Tomasulo/run_tests.py --rob-size 32     # larger instruction window (default: main.py's)
+    python Tomasulo/run_tests.py --dcache-latency 50   # slower backing memory behind the dcache model
+    python Tomasulo/run_tests.py --icache-sets 4 matrix_mul sort   # size the icache per workload (I$% column)
+    python Tomasulo/run_tests.py --prefetch-distance 0 array_sum   # stride prefetcher off (PF% column: coverage)
 """
 
 import argparse
 import json
-import re
-import shutil
 import subprocess
 import sys
 from pathlib import Path
@@ -29,20 +35,17 @@ REPO_ROOT = SCRIPT_DIR.parent
 TEST_SUITE_DIR = REPO_ROOT / "test" / "test_suite"
 WORKSPACE_DIR = SCRIPT_DIR / "src" / "workspace"
 SIM_ENTRY = SCRIPT_DIR / "src" / "main.py"
-
-WORKLOAD_FILE = WORKSPACE_DIR / "workload.exe"
-DATA_FILE = WORKSPACE_DIR / "data.mem"
-LOG_FILE = WORKSPACE_DIR / "log"
-
-# Patterns for extracting basic stats from simulator log
-CYCLE_PATTERN = re.compile(r"Cycle @(\d+(?:\.\d+)?)")
-FETCH_PATTERN = re.compile(r"fetcherimpl: fetch_pc=", re.IGNORECASE)
-# 统一统计提交：匹配 commit: retire rob=... rd=... is_store=... value=...
-COMMIT_PATTERN = re.compile(
-    r"commit: retire rob=\d+\s+pc=0x[0-9a-fA-F]+\s+rd=(\d+)\s+is_store=\d+\s+value=0x([0-9a-fA-F]+)",
-    re.IGNORECASE,
-)
-
+# Per-instruction fetch/execute lines are enough for the report table;
+# per-cycle RS/LSQ/CDB debug logs are dropped at elaboration.
+DEFAULT_LOG_LEVEL = "info"
+# Every test runs once per issue width so the report compares scalar and superscalar cycles
+DEFAULT_ISSUE_WIDTHS = (1, 2)
+
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+from scripts import checkpoint, cosim, iss
+from scripts.log_analyzer import load_summary
+from scripts.workspaces import LOG_NAME, private_workspace, run_pool, stage_images
 
 def discover_tests():
     """Return a sorted list of available test names."""
@@ -106,36 +109,57 @@ def read_expected(ans_file: Path):
     return None
 
 
-def extract_stats(log_text: str) -> dict:
-    """Extract simple stats from simulator log."""
-    cycles = [float(c) for c in CYCLE_PATTERN.findall(log_text)]
-    commits = COMMIT_PATTERN.findall(log_text)
-    fetches = FETCH_PATTERN.findall(log_text)
-    stats = {
-        "cycles": int(cycles[-1]) if cycles else 0,
-        "commits": len(commits),
-        "fetches": len(fetches),
+def extract_stats(summary: dict) -> dict:
+    """Pick the reported stats out of a log summary (see scripts/log_analyzer.py)."""
+    branches = summary.get("branches")
+    accuracy = None
+    if branches:
+        accuracy = 1 - summary["mispredicts"] / branches
+    return {
+        "cycles": summary["cycles"],
+        "commits": summary["commits"],
+        "fetches": summary["fetches"],
+        "branch_accuracy": accuracy,
+        "fetch_queue_occupancy": summary.get("fetch_queue_occupancy"),
+        "icache_hit_rate": cache_hit_rate(summary.get("icache")),
+        "dcache_hit_rate": cache_hit_rate(summary.get("dcache")),
+        "prefetch_coverage": (summary.get("prefetch") or {}).get("coverage"),
     }
-    return stats
 
 
-def extract_a0(log_text: str):
-    """Extract the last committed a0 (x10) value from log."""
-    a0_vals = []
-    for rd_str, val_str in COMMIT_PATTERN.findall(log_text):
-        try:
-            rd = int(rd_str, 0)
-            if rd == 10:
-                a0_vals.append(int(val_str, 16))
-        except ValueError:
-            continue
-    return a0_vals[-1] if a0_vals else None
-
-
-def run_test(name: str, sim_threshold: int = None, idle_threshold: int = None, verbose: bool = False):
-    """Run one test; returns (ok, message, stats)."""
+def cache_hit_rate(counters: dict):
+    """Hit rate of a cache model; merged misses count as misses."""
+    if not counters:
+        return None
+    accesses = counters["hits"] + counters["misses"] + counters["merged"]
+    return counters["hits"] / accesses if accesses else None
+
+
+def format_ipc(stats: dict) -> str:
+    if not stats["cycles"]:
+        return "-"
+    return f"{stats['commits'] / stats['cycles']:.2f}"
+
+
+def run_test(name: str, sim_threshold: int = None, idle_threshold: int = None, verbose: bool = False,
+             no_cache: bool = False, isolated: bool = False, log_level: str = DEFAULT_LOG_LEVEL,
+             reference: str = "ans", cosim_check: bool = False, fast_forward: int = 0,
+             issue_width: int = None, rob_size: int = None, dcache_latency: int = None,
+             icache_sets: int = None, prefetch_distance: int = None):
+    """Run one test; returns (ok, message, stats).
+
+    With `isolated`, the test runs in its own workspace under workspace/jobs/
+    so that several tests (or widths of one test) can run concurrently.
+    `issue_width` selects the superscalar width and `rob_size` the reorder
+    buffer depth, `dcache_latency` the dcache miss latency in cycles and
+    `icache_sets` the number of icache sets and `prefetch_distance` how far
+    ahead the dcache stride prefetcher runs (main.py's defaults if None). With `fast_forward`, the
+    golden model runs that many instructions first and the simulator starts
+    from the resulting checkpoint; cycles/commits then cover only the rest.
+    """
     files = get_test_files(name)
-    stats = {"cycles": 0, "commits": 0, "fetches": 0}
+    stats = {"cycles": 0, "commits": 0, "fetches": 0, "branch_accuracy": None, "fetch_queue_occupancy": None,
+             "icache_hit_rate": None, "dcache_hit_rate": None, "prefetch_coverage": None}
 
     if not files["exe"].exists():
         return False, f"missing {name}.exe", stats
@@ -149,31 +173,69 @@ def run_test(name: str, sim_threshold: int = None, idle_threshold: int = None, v
         idle_threshold = config.get("simulator", {}).get("idle_threshold", 5000)
     data_base = config.get("memory", {}).get("data_base", 0x2000)
 
-    expected = read_expected(files["ans"])
+    if reference == "iss":
+        try:
+            expected = iss.golden_a0(TEST_SUITE_DIR / name)
+        except iss.ISSError as e:
+            return False, f"golden model: {e}", stats
+    else:
+        expected = read_expected(files["ans"])
     if expected is None:
         return False, f"cannot parse expected value from {name}.ans", stats
 
-    # Stage memory files into Tomasulo workspace
-    shutil.copyfile(files["exe"], WORKLOAD_FILE)
-    if files["data"].exists() and files["data"].stat().st_size > 0:
-        shutil.copyfile(files["data"], DATA_FILE)
-    else:
-        DATA_FILE.write_text("")
-    if LOG_FILE.exists():
-        LOG_FILE.unlink()
-
+    # Stage memory files into the (shared or private) Tomasulo workspace
+    job_name = name if issue_width is None else f"{name}-w{issue_width}"
+    if rob_size is not None:
+        job_name += f"-rob{rob_size}"
+    if dcache_latency is not None:
+        job_name += f"-dlat{dcache_latency}"
+    if icache_sets is not None:
+        job_name += f"-isets{icache_sets}"
+    if prefetch_distance is not None:
+        job_name += f"-pf{prefetch_distance}"
+    workspace = private_workspace(WORKSPACE_DIR, job_name) if isolated else WORKSPACE_DIR
+    stage_images(workspace, files["exe"], files["data"])
+    log_file = workspace / LOG_NAME
+
+    # main.py reuses a cached elaborated simulator unless --no-cache is given
+    cmd = [
+        sys.executable,
+        str(SIM_ENTRY),
+        "--sim-threshold",
+        str(sim_threshold),
+        "--idle-threshold",
+        str(idle_threshold),
+        "--data-base",
+        hex(data_base),
+        "--workspace",
+        str(workspace),
+    ]
+    cmd += ["--log-level", log_level]
+    if issue_width is not None:
+        cmd += ["--issue-width", str(issue_width)]
+    if rob_size is not None:
+        cmd += ["--rob-size", str(rob_size)]
+    if dcache_latency is not None:
+        cmd += ["--dcache-latency", str(dcache_latency)]
+    if icache_sets is not None:
+        cmd += ["--icache-sets", str(icache_sets)]
+    if prefetch_distance is not None:
+        cmd += ["--prefetch-distance", str(prefetch_distance)]
+    if cosim_check:
+        cmd += ["--cosim", "--asm", str(files["asm"])]
+    if fast_forward:
+        try:
+            ckpt = checkpoint.take(TEST_SUITE_DIR / name, fast_forward)
+        except (checkpoint.CheckpointError, iss.ISSError) as e:
+            return False, f"fast-forward: {e}", stats
+        checkpoint_file = workspace / checkpoint.CHECKPOINT_NAME
+        checkpoint.save(ckpt, checkpoint_file)
+        cmd += ["--checkpoint", str(checkpoint_file)]
+    if no_cache:
+        cmd.append("--no-cache")
     try:
         proc = subprocess.run(
-            [
-                sys.executable,
-                str(SIM_ENTRY),
-                "--sim-threshold",
-                str(sim_threshold),
-                "--idle-threshold",
-                str(idle_threshold),
-                "--data-base",
-                hex(data_base),
-            ],
+            cmd,
             capture_output=True,
             text=True,
             timeout=120,
@@ -182,17 +244,24 @@ def run_test(name: str, sim_threshold: int = None, idle_threshold: int = None, v
     except subprocess.TimeoutExpired:
         return False, "timeout (120s)", stats
 
+    if proc.returncode == cosim.COSIM_DIVERGED:
+        report_file = workspace / cosim.COSIM_REPORT_NAME
+        report = json.loads(report_file.read_text()) if report_file.exists() else {"divergence": None}
+        return False, cosim.describe(report), stats
+
     if proc.returncode != 0:
         if verbose:
             print(f"[{name}] simulator stderr (truncated):\n{proc.stderr[-800:]}")
         return False, f"simulator error (exit {proc.returncode})", stats
 
-    log_text = LOG_FILE.read_text() if LOG_FILE.exists() else proc.stdout
-    stats = extract_stats(log_text)
-    a0_val = extract_a0(log_text)
+    summary = load_summary(log_file)
+    if summary is None:
+        return False, "simulator log not found", stats
+    stats = extract_stats(summary)
+    a0_val = summary["a0"]
     if a0_val is None:
         if verbose:
-            print(f"[{name}] log tail:\n{log_text[-800:]}")
+            print(f"[{name}] log tail:\n" + "\n".join(summary["tail"]))
         return False, "no a0 writeback found", stats
 
     if a0_val != expected:
@@ -210,6 +279,29 @@ def main():
     parser.add_argument("--idle-threshold", type=int, default=None, help="override idle threshold")
     parser.add_argument("-v", "--verbose", action="store_true", help="show log tail on failure")
     parser.add_argument("--no-report", action="store_true", help="skip writing report file")
+    parser.add_argument("--no-cache", action="store_true", help="re-elaborate the simulator instead of using the cache")
+    parser.add_argument("--reference", choices=["ans", "iss"], default="ans",
+                        help="expected a0 from the .ans file or from the RV32I golden model (scripts/iss.py)")
+    parser.add_argument("--cosim", action="store_true",
+                        help="check each commit against the golden model and stop at the first divergence")
+    parser.add_argument("--fast-forward", type=int, default=0, metavar="N",
+                        help="run the first N instructions on the golden model and simulate from that checkpoint")
+    parser.add_argument("--log-level", default=DEFAULT_LOG_LEVEL,
+                        choices=["silent", "commit", "info", "debug"],
+                        help=f"simulator log level (default: {DEFAULT_LOG_LEVEL}; silent only reports a0 and cycles)")
+    parser.add_argument("--issue-width", type=int, nargs="+", default=list(DEFAULT_ISSUE_WIDTHS), metavar="W",
+                        help="issue widths to run every test with (default: %(default)s)")
+    parser.add_argument("--rob-size", type=int, default=None, metavar="N",
+                        help="reorder buffer entries, a power of two (default: main.py's ROB_SIZE)")
+    parser.add_argument("--dcache-latency", type=int, default=None, metavar="N",
+                        help="dcache miss latency in cycles (default: main.py's DCACHE_MISS_LATENCY)")
+    parser.add_argument("--icache-sets", type=int, default=None, metavar="N",
+                        help="icache sets, a power of two (default: main.py's ICACHE_SETS)")
+    parser.add_argument("--prefetch-distance", type=int, default=None, metavar="N",
+                        help="strides ahead of a load the dcache prefetcher runs, 0 disables it "
+                             "(default: main.py's PREFETCH_DISTANCE)")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="run N tests concurrently, each in a private workspace")
     args = parser.parse_args()
 
     available = discover_tests()
@@ -225,36 +317,74 @@ def main():
         return
 
     print(f"Running {len(targets)} test(s) with Tomasulo simulator...\n")
-    header = f"{'Test Name':<20} {'Status':<6} {'Cycles':>8} {'Commits':>8} {'Fetches':>8} Message"
+    header = (f"{'Test Name':<20} {'Width':>5} {'Status':<6} {'Cycles':>8} {'Commits':>8} {'Fetches':>8} "
+              f"{'IPC':>5} {'Pred%':>6} {'FQ':>5} {'I$%':>6} {'D$%':>6} {'PF%':>6} Message")
     separator = "-" * len(header)
     print(header)
     print(separator)
 
     report_lines = [header, separator]
     passed = 0
-    for name in targets:
-        ok, msg, stats = run_test(
+
+    def job(item):
+        name, width = item
+        return name, width, run_test(
             name,
             sim_threshold=args.sim_threshold,
             idle_threshold=args.idle_threshold,
             verbose=args.verbose,
+            no_cache=args.no_cache,
+            isolated=args.jobs > 1,
+            log_level=args.log_level,
+            reference=args.reference,
+            cosim_check=args.cosim,
+            fast_forward=args.fast_forward,
+            issue_width=width,
+            rob_size=args.rob_size,
+            dcache_latency=args.dcache_latency,
+            icache_sets=args.icache_sets,
+            prefetch_distance=args.prefetch_distance,
         )
+
+    runs = [(name, width) for name in targets for width in args.issue_width]
+    cycles = {width: {} for width in args.issue_width}
+    for name, width, (ok, msg, stats) in run_pool(job, runs, jobs=args.jobs):
         status = "PASS" if ok else "FAIL"
-        line = f"{name:<20} {status:<6} {stats['cycles']:>8} {stats['commits']:>8} {stats['fetches']:>8} {msg}"
+        accuracy = stats["branch_accuracy"]
+        pred = "-" if accuracy is None else f"{accuracy * 100:.1f}"
+        occupancy = stats["fetch_queue_occupancy"]
+        fq = "-" if occupancy is None else f"{occupancy:.2f}"
+        ic, dc, pf = ("-" if rate is None else f"{rate * 100:.1f}"
+                      for rate in (stats["icache_hit_rate"], stats["dcache_hit_rate"], stats["prefetch_coverage"]))
+        line = (f"{name:<20} {width:>5} {status:<6} {stats['cycles']:>8} {stats['commits']:>8} {stats['fetches']:>8} "
+                f"{format_ipc(stats):>5} {pred:>6} {fq:>5} {ic:>6} {dc:>6} {pf:>6} {msg}")
         print(line)
         report_lines.append(line)
         passed += int(ok)
+        if ok:
+            cycles[width][name] = stats["cycles"]
 
-    summary = f"Summary: {passed}/{len(targets)} passed, {len(targets) - passed} failed"
+    summary = f"Summary: {passed}/{len(runs)} passed, {len(runs) - passed} failed"
     print("\n" + summary)
     report_lines.append(summary)
+    # Total cycles over the tests that pass at every width, relative to the first width
+    common = set(targets)
+    for width in args.issue_width:
+        common &= set(cycles[width])
+    if len(args.issue_width) > 1 and common:
+        base = sum(cycles[args.issue_width[0]][name] for name in common)
+        for width in args.issue_width:
+            total = sum(cycles[width][name] for name in common)
+            line = f"Width {width}: {total} cycles over {len(common)} tests (speedup {base / total:.2f}x)"
+            print(line)
+            report_lines.append(line)
 
     if not args.no_report:
         report_file = REPO_ROOT / "test" / "test_report_tomasulo"
         report_file.write_text("\n".join(report_lines) + "\n")
         print(f"Report saved to: {report_file}")
 
-    if passed != len(targets):
+    if passed != len(runs):
         sys.exit(1)
 
 
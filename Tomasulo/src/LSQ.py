@@ -1,102 +1,269 @@
 from assassyn.frontend import *
-from .alu import ALU_CBD_signal
+from .config import CPUConfig
+from .verbosity import log_info, log_debug
 from .lsu import *
 from .ROB import *
-from .arbitrator import CBD_signal as CDBSignal
+from .store_buffer import StoreBuffer
+from .cache import CacheModel
+from .rename_checkpoint import BranchCheckpoints
+from .prefetcher import StridePrefetcher
 
-# 简化版 LSQ：单槽，依赖 CDB 信号来填充地址/数据
+# 多项 LSQ：按程序顺序在 tail 分配、在 head 随 ROB 提交释放的环形队列，
+# 因此队列位置（相对 head 的距离）即为年龄。
+# - 地址/数据操作数由 CDB 唤醒；
+# - 每周期从就绪的表项里选最老的一条发给 LSU（只有一个 dcache 端口）；
+# - store 发射只是把地址/数据经 CDB 写入 ROB，真正写内存在 commit；store 留在队列里直到提交，
+#   供后面的 load 做地址比较；
+# - load 只要更老的 store 地址都已知，就可以越过不同字的 store 乱序发射；
+#   与之同字的最年轻的更老 store 数据已就绪时直接转发给 load，不访问 dcache；
+#   LSQ 里没有同字的 store 时，再查已提交但还没写进 dcache 的 store 缓冲；
+# - 读 dcache 的 load 先查 cache.py 的时序模型：缺失的 load 记为 missed，等行回填后再发射，
+#   期间更年轻的命中 load 和 store 照常发射；MSHR 全忙时新的缺失先不发射；
+# - 读 dcache 的 load 同时训练 prefetcher.py 的跨步预取器（按 load 的 pc 索引），
+#   预取在没有 load 访问 dcache 的周期发出。
 
+# 队列深度来自 CPUConfig.lsq_size（2 的幂，main.py --lsq-size 做 sweep）。
 
-class LSQEntry:
-    def __init__(self):
-        self.busy = RegArray(Bits(1), 1, initializer=[0])
-        self.is_load = RegArray(Bits(1), 1, initializer=[0])
-        self.is_store = RegArray(Bits(1), 1, initializer=[0])
-        self.rob_idx = RegArray(Bits(4), 1, initializer=[0])
-        self.rd = RegArray(Bits(5), 1, initializer=[0])          # load 写回目标
-        self.data = RegArray(UInt(32), 1, initializer=[0])       # store 数据
+
+class LSQ:
+    def __init__(self, config: CPUConfig):
+        self.size = config.lsq_size
+        self.idx_width = config.lsq_idx_width
+        self.mask = self.size - 1
+        self.tag_width = config.tag_width
+        # 环形队列指针
+        self.head = RegArray(UInt(self.idx_width), 1, initializer=[0])
+        self.tail = RegArray(UInt(self.idx_width), 1, initializer=[0])
+
+        self.busy = RegArray(Bits(1), self.size, initializer=[0] * self.size)
+        self.is_load = RegArray(Bits(1), self.size, initializer=[0] * self.size)
+        self.is_store = RegArray(Bits(1), self.size, initializer=[0] * self.size)
+        self.rob_idx = RegArray(Bits(self.tag_width), self.size, initializer=[0] * self.size)
+        self.rd = RegArray(Bits(5), self.size, initializer=[0] * self.size)          # load 写回目标
+        self.pc = RegArray(UInt(32), self.size, initializer=[0] * self.size)         # 指令 pc，用于训练预取器
         # 依赖/就绪标志
-        self.rd = RegArray(Bits(5), 1, initializer=[0])          # load 写回目标
-        self.qj_valid = RegArray(Bits(1), 1, initializer=[0])
-        self.qk_valid = RegArray(Bits(1), 1, initializer=[0])    # rs2 就绪标志
-        self.qj = RegArray(Bits(4), 1, initializer=[0])          # rs1 对应的 ROB 条目
-        self.qk = RegArray(Bits(4), 1, initializer=[0])          # rs2 对应的 ROB
+        self.qj_valid = RegArray(Bits(1), self.size, initializer=[0] * self.size)    # rs1（基址）就绪标志
+        self.qk_valid = RegArray(Bits(1), self.size, initializer=[0] * self.size)    # rs2（store 数据）就绪标志
+        self.qj = RegArray(Bits(self.tag_width), self.size, initializer=[0] * self.size)  # rs1 对应的 ROB 条目
+        self.qk = RegArray(Bits(self.tag_width), self.size, initializer=[0] * self.size)  # rs2 对应的 ROB 条目
         # 源值与立即数
-        self.vj = RegArray(UInt(32), 1, initializer=[0])
-        self.vk = RegArray(UInt(32), 1, initializer=[0])
-        self.rs2_id = RegArray(Bits(5), 1, initializer=[0])      # rs2 编号，用于回退从寄存器读
-        self.imm = RegArray(UInt(32), 1, initializer=[0])
-        # 是否发射给 LSU
-        self.fired = RegArray(Bits(1), 1, initializer=[0])
+        self.vj = RegArray(UInt(32), self.size, initializer=[0] * self.size)
+        self.vk = RegArray(UInt(32), self.size, initializer=[0] * self.size)
+        self.rs2_id = RegArray(Bits(5), self.size, initializer=[0] * self.size)      # rs2 编号，用于回退从寄存器读
+        self.imm = RegArray(UInt(32), self.size, initializer=[0] * self.size)
+        # 是否已发射给 LSU
+        self.fired = RegArray(Bits(1), self.size, initializer=[0] * self.size)
+        # load 的 dcache 缺失已登记，等行回填
+        self.missed = RegArray(Bits(1), self.size, initializer=[0] * self.size)
+
+    def is_full(self) -> Bits:
+        """按序释放，tail 处仍忙即队列已满。"""
+        return self.busy[self.tail[0]]
+
+    def age(self, i) -> Value:
+        """表项 i 相对 head 的距离，越小越老。"""
+        return ((UInt(self.idx_width)(i) - self.head[0]) & UInt(self.idx_width)(self.mask)).bitcast(UInt(self.idx_width))
+
+    def addr(self, i) -> Value:
+        return self.vj[i] + self.imm[i]
 
 
 class LSQ_downstream(Downstream):
     """
-    接收 CDB 信号更新 LSQ entry，并在 commit/flush 后清空。
+    接收 CDB 信号更新 LSQ 表项，选择最老的就绪访存发给 LSU，并随 ROB 提交释放 head。
     """
     def __init__(self):
         super().__init__()
 
     @downstream.combinational
     def build(self,
-              lsq: LSQEntry,
-              cbd_signal: Value,
+              lsq: LSQ,
+              cbd_signal: list,
               lsu : LSU,
               rob : ROB,
+              ckpt: BranchCheckpoints,
+              sb: StoreBuffer,
+              dc: CacheModel,
+              pf: StridePrefetcher,
               regs: RegArray,
               issue_stall: Value,
-              metadata: Value):
+              metadata: Value,
+              commit_store: Value,
+              retired: list,
+              flush: Value):
         issue_stall = issue_stall.optional(default=Bits(1)(0))
         metadata = metadata.optional(default=Bits(8)(0))
+        # 本周期 store 缓冲正在写 dcache，load 不能同时读（单端口）
+        commit_store = commit_store.optional(default=Bits(1)(0))
+        flush = flush.optional(default=Bits(1)(0))
+        # Commiter 本周期提交的 ROB 项 (valid, rob_idx)
+        retired = [(valid.optional(default=Bits(1)(0)), rob_idx.optional(default=UInt(rob.idx_width)(0)))
+                   for valid, rob_idx in retired]
         _ = metadata == metadata
-        log("LSQ downstream metadata={} busy={} qj_v={} qk_v={} rob_idx={}", metadata, lsq.busy[0], lsq.qj_valid[0], lsq.qk_valid[0], lsq.rob_idx[0])
-        with Condition(cbd_signal.valid & (lsq.busy[0] == Bits(1)(1))):
-            # 如果有新的广播信号，更新 lsq 中等待的操作数
-            with Condition((lsq.qj[0] == cbd_signal.ROB_idx) & ~lsq.qj_valid[0]):
-                lsq.vj[0] <= cbd_signal.rd_data
-                lsq.qj_valid[0] <= Bits(1)(1)  # 标记为就绪
-            with Condition((lsq.qk[0] == cbd_signal.ROB_idx) & ~lsq.qk_valid[0]):
-                lsq.vk[0] <= cbd_signal.rd_data
-                lsq.qk_valid[0] <= Bits(1)(1)  # 标记为就绪
-        # 注意加括号，避免 &/== 或 ^/== 的优先级问题
-        with Condition(cbd_signal.valid & (lsq.busy[0] == Bits(1)(1)) &
-                       (cbd_signal.ROB_idx == lsq.rob_idx[0])):
-            lsq.busy[0] <= Bits(1)(0)
-            lsq.qj_valid[0] <= Bits(1)(0)
-            lsq.qk_valid[0] <= Bits(1)(0)
-            lsq.fired[0] <= Bits(1)(0)
-        log("LSQ debug: busy={} is_load={} is_store={} qj_v={} qk_v={} has_no_store={}", lsq.busy[0], lsq.is_load[0], lsq.is_store[0], lsq.qj_valid[0], lsq.qk_valid[0], rob.has_no_store())
-        with Condition(lsq.busy[0] & ~(lsq.qj_valid[0] & lsq.qk_valid[0])):
-            log("LSQ waiting rob_idx={} qj_valid={} qk_valid={} qj={} qk={}", lsq.rob_idx[0], lsq.qj_valid[0], lsq.qk_valid[0], lsq.qj[0], lsq.qk[0])
-            # 如果依赖的生产者已提交（rob.busy=0），直接从寄存器补全
-            with Condition(~lsq.qk_valid[0] & (rob.busy[lsq.qk[0]] == Bits(1)(0))):
-                lsq.vk[0] <= regs[lsq.rs2_id[0]]
-                lsq.qk_valid[0] <= Bits(1)(1)
-        re = (lsq.busy[0] & (lsq.qj_valid[0] & lsq.qk_valid[0]) & (~lsq.fired[0]) & lsq.is_load[0] & rob.has_no_store())
-        with Condition(lsq.busy[0] & (lsq.qj_valid[0] & lsq.qk_valid[0]) & (~lsq.fired[0])):
-            with Condition(lsq.is_store[0]):
-                log("LSQ fire store: rob_idx={} addr=0x{:08x} data=0x{:08x}", lsq.rob_idx[0], lsq.vj[0] + lsq.imm[0], lsq.vk[0])
-                lsu.async_called(
-                    lsu_signal=LSU_signal.bundle(
-                        is_load=Bits(1)(0),
-                        is_store=Bits(1)(1),
-                        ROB_idx=lsq.rob_idx[0],
-                        address=lsq.vj[0] + lsq.imm[0],
-                        rs2_value=lsq.vk[0],
-                    )
-                )
-                lsq.fired[0] <= Bits(1)(1)
-            with Condition(lsq.is_load[0] & rob.has_no_store()):
-                log("LSQ fire load: rob_idx={} addr=0x{:08x}", lsq.rob_idx[0], lsq.vj[0] + lsq.imm[0])
-                lsu.async_called(
-                    lsu_signal=LSU_signal.bundle(
-                        is_load=Bits(1)(1),
-                        is_store=Bits(1)(0),
-                        ROB_idx=lsq.rob_idx[0],
-                        address=lsq.vj[0] + lsq.imm[0],
-                        rs2_value=Bits(32)(0),
-                    )
+        log_debug("LSQ downstream metadata={} head={} tail={} full={}", metadata, lsq.head[0], lsq.tail[0], lsq.is_full())
+        # 分支预测错误：LSQ 里的访存都比提交的分支年轻，全部清空（store 只在提交时写内存，不会泄漏）
+        with Condition(flush):
+            for i in range(lsq.size):
+                lsq.busy[i] <= Bits(1)(0)
+                lsq.qj_valid[i] <= Bits(1)(0)
+                lsq.qk_valid[i] <= Bits(1)(0)
+                lsq.fired[i] <= Bits(1)(0)
+                lsq.missed[i] <= Bits(1)(0)
+            lsq.head[0] <= UInt(lsq.idx_width)(0)
+            lsq.tail[0] <= UInt(lsq.idx_width)(0)
+        # 分支恢复：比分支年轻的访存正好是 tail 一侧连续的一段，清掉它们，tail 退回分支发射时的位置
+        kill = [ckpt.kill(rob, lsq.rob_idx[i], flush) for i in range(lsq.size)]
+        with Condition(ckpt.squashing(flush)):
+            for i in range(lsq.size):
+                with Condition(kill[i]):
+                    lsq.busy[i] <= Bits(1)(0)
+                    lsq.qj_valid[i] <= Bits(1)(0)
+                    lsq.qk_valid[i] <= Bits(1)(0)
+                    lsq.fired[i] <= Bits(1)(0)
+                    lsq.missed[i] <= Bits(1)(0)
+            lsq.tail[0] <= ckpt.lsq_tail[ckpt.recover_slot[0]]
+
+        for i in range(lsq.size):
+            # 每个 CDB 通道广播不同的 ROB 项，同一个操作数最多被一个通道命中
+            for cdb in cbd_signal:
+                with Condition(~kill[i] & cdb.valid & lsq.busy[i]):
+                    # 如果有新的广播信号，更新等待的操作数
+                    with Condition((lsq.qj[i] == cdb.ROB_idx) & ~lsq.qj_valid[i]):
+                        lsq.vj[i] <= cdb.rd_data
+                        lsq.qj_valid[i] <= Bits(1)(1)  # 标记为就绪
+                    with Condition((lsq.qk[i] == cdb.ROB_idx) & ~lsq.qk_valid[i]):
+                        lsq.vk[i] <= cdb.rd_data
+                        lsq.qk_valid[i] <= Bits(1)(1)  # 标记为就绪
+            with Condition(~kill[i] & lsq.busy[i] & ~(lsq.qj_valid[i] & lsq.qk_valid[i])):
+                log_debug("LSQ[{}] waiting rob_idx={} qj_valid={} qk_valid={} qj={} qk={}", UInt(lsq.idx_width)(i), lsq.rob_idx[i], lsq.qj_valid[i], lsq.qk_valid[i], lsq.qj[i], lsq.qk[i])
+                # 如果依赖的生产者已提交（rob.busy=0），直接从寄存器补全
+                with Condition(~lsq.qk_valid[i] & (rob.busy[lsq.qk[i]] == Bits(1)(0))):
+                    lsq.vk[i] <= regs[lsq.rs2_id[i]]
+                    lsq.qk_valid[i] <= Bits(1)(1)
+
+        # 每个表项能否在本周期发射
+        ready = []
+        blocked = []
+        forward = []
+        forward_data = []
+        for i in range(lsq.size):
+            operands = lsq.busy[i] & lsq.qj_valid[i] & lsq.qk_valid[i] & ~lsq.fired[i]
+            # 更老的 store：地址未知则保守等待；同字的 store 中取最年轻的一条转发
+            unknown = Bits(1)(0)
+            match = []
+            for j in range(lsq.size):
+                older_store = lsq.busy[j] & lsq.is_store[j] & (lsq.age(j) < lsq.age(i))
+                unknown = unknown | (older_store & ~lsq.qj_valid[j])
+                match.append(older_store & lsq.qj_valid[j] & (lsq.addr(j)[2:31] == lsq.addr(i)[2:31]))
+            hit = Bits(1)(0)
+            hit_ready = Bits(1)(0)
+            hit_data = UInt(32)(0)
+            for j in range(lsq.size):
+                younger_match = Bits(1)(0)
+                for k in range(lsq.size):
+                    if k != j:
+                        younger_match = younger_match | (match[k] & (lsq.age(j) < lsq.age(k)))
+                nearest = match[j] & ~younger_match
+                hit = hit | match[j]
+                hit_ready = nearest.select(lsq.qk_valid[j], hit_ready)
+                hit_data = nearest.select(lsq.vk[j], hit_data)
+            # LSQ 里的 store 都比缓冲里的年轻，优先转发
+            sb_hit, sb_data = sb.forward(lsq.addr(i))
+            # 读 dcache 的 load：已缺失的等行回填；还没访问过的若会缺失且 MSHR 全忙，先不发射
+            addr = lsq.addr(i)
+            cache_hit = dc.hit(addr)
+            cache_pending = dc.pending(addr)
+            mshr_blocked = ~lsq.missed[i] & ~cache_hit & ~cache_pending & ~dc.has_free_mshr()
+            cache_ok = lsq.missed[i].select(cache_hit, ~mshr_blocked)
+            # 已缺失的行在回填后、发射前又被替换出去：清掉 missed 重新访问
+            with Condition(~kill[i] & lsq.busy[i] & lsq.missed[i] & ~cache_hit & ~cache_pending):
+                lsq.missed[i] <= Bits(1)(0)
+            # 转发的 load 不读 dcache，不受缓冲写端口占用和 dcache 缺失的影响
+            load_ok = lsq.is_load[i] & ~unknown & hit.select(hit_ready, sb_hit | (~commit_store & cache_ok))
+            blocked.append(operands & lsq.is_load[i] & ~unknown & ~hit & ~sb_hit & mshr_blocked)
+            ready.append(operands & (lsq.is_store[i] | load_ok))
+            forward.append(lsq.is_load[i] & (hit | sb_hit))
+            forward_data.append(hit.select(hit_data, sb_data))
+        # 选最老的一条
+        pick = []
+        for i in range(lsq.size):
+            older_ready = Bits(1)(0)
+            for j in range(lsq.size):
+                if j != i:
+                    older_ready = older_ready | (ready[j] & (lsq.age(j) < lsq.age(i)))
+            pick.append(~kill[i] & ready[i] & ~older_ready)
+
+        fire = Bits(1)(0)
+        fire_load = Bits(1)(0)
+        fire_rob_idx = lsq.rob_idx[0]
+        fire_pc = lsq.pc[0]
+        fire_addr = lsq.addr(0)
+        fire_data = lsq.vk[0]
+        fire_forward = Bits(1)(0)
+        fire_missed = Bits(1)(0)
+        for i in range(lsq.size):
+            fire = fire | pick[i]
+            fire_load = pick[i].select(lsq.is_load[i], fire_load)
+            fire_rob_idx = pick[i].select(lsq.rob_idx[i], fire_rob_idx)
+            fire_pc = pick[i].select(lsq.pc[i], fire_pc)
+            fire_addr = pick[i].select(lsq.addr(i), fire_addr)
+            # store 发出自己的数据，转发的 load 带上 store 的数据
+            fire_data = pick[i].select(forward[i].select(forward_data[i], lsq.vk[i]), fire_data)
+            fire_forward = pick[i].select(forward[i], fire_forward)
+            fire_missed = pick[i].select(lsq.missed[i], fire_missed)
+        # 第一次读 dcache 的 load 查时序模型；已缺失过的 load 只有在行回填后才会被选中，不再计数
+        lookup = fire & fire_load & ~fire_forward & ~fire_missed
+        cache_hit, cache_missed = dc.access(lookup, fire_addr)
+        # 跨步预取（prefetch_distance=0 时没有预取器）：本周期的 load 训练，dcache 空闲时发出预取
+        if pf is not None:
+            pf.train(lookup, fire_pc, fire_addr, dc)
+            pf.issue(~lookup, dc)
+        go = fire & ~(lookup & ~cache_hit)
+        for i in range(lsq.size):
+            with Condition(pick[i] & go):
+                lsq.fired[i] <= Bits(1)(1)
+            with Condition(pick[i] & lookup & cache_missed):
+                lsq.missed[i] <= Bits(1)(1)
+        with Condition(lookup & cache_missed):
+            log_info("LSQ dcache miss: rob_idx={} addr=0x{:08x}", fire_rob_idx, fire_addr)
+        any_blocked = Bits(1)(0)
+        for b in blocked:
+            any_blocked = any_blocked | b
+        with Condition(~flush & any_blocked):
+            dc.mshr_full[0] <= dc.mshr_full[0] + UInt(32)(1)
+        dc.tick()
+        with Condition(go):
+            LSU_signal, _ = lsu_records(lsq.tag_width)
+            log_info("LSQ fire: is_load={} forward={} rob_idx={} addr=0x{:08x} data=0x{:08x}", fire_load, fire_forward, fire_rob_idx, fire_addr, fire_data)
+            lsu.async_called(
+                lsu_signal=LSU_signal.bundle(
+                    is_load=fire_load,
+                    is_store=~fire_load,
+                    forwarded=fire_forward,
+                    ROB_idx=fire_rob_idx,
+                    address=fire_addr,
+                    rs2_value=(fire_load & ~fire_forward).select(UInt(32)(0), fire_data),
                 )
-                lsq.fired[0] <= Bits(1)(1)
+            )
+
+        # ROB 提交访存指令时从 head 起按序释放，一个周期可能提交多条
+        head = lsq.head[0]
+        next_head = head
+        freeing = Bits(1)(1)
+        for m in range(len(retired)):
+            slot = ((head + UInt(lsq.idx_width)(m)) & UInt(lsq.idx_width)(lsq.mask)).bitcast(UInt(lsq.idx_width))
+            committed = Bits(1)(0)
+            for valid, rob_idx in retired:
+                committed = committed | (valid & (lsq.rob_idx[slot] == rob.tag(rob_idx)))
+            freeing = freeing & ~flush & lsq.busy[slot] & committed
+            with Condition(freeing):
+                lsq.busy[slot] <= Bits(1)(0)
+                lsq.qj_valid[slot] <= Bits(1)(0)
+                lsq.qk_valid[slot] <= Bits(1)(0)
+                lsq.fired[slot] <= Bits(1)(0)
+                lsq.missed[slot] <= Bits(1)(0)
+            next_head = freeing.select(((slot + UInt(lsq.idx_width)(1)) & UInt(lsq.idx_width)(lsq.mask)).bitcast(UInt(lsq.idx_width)), next_head)
+        with Condition(~flush):
+            lsq.head[0] <= next_head
         # re address
-        return re, lsq.vj[0] + lsq.imm[0]
+        return go & fire_load & ~fire_forward, fire_addr
@@ -1,42 +1,60 @@
 from assassyn.frontend import *
-
-# 环形 ROB 队列深度
-FIFO_SIZE = 8
-ROB_IDX_WIDTH = (FIFO_SIZE - 1).bit_length()
-# reg_pending 需要一个额外的 sentinel，因此使用更宽的位宽
-REG_PENDING_WIDTH = ROB_IDX_WIDTH + 1
+from .config import CPUConfig
 
 
 # ROB: 按字段分布式存储为寄存器队列，同时维护头尾指针
+# 深度和位宽来自 CPUConfig：size 项、下标 idx_width 位，RS/LSQ/CDB 的标签与 reg_pending 同为 tag_width 位
 class ROB:
-    def __init__(self):
+    def __init__(self, config: CPUConfig):
+        self.size = config.rob_size
+        self.idx_width = config.rob_idx_width
+        self.tag_width = config.tag_width
         # 环形队列指针
-        self.head = RegArray(UInt(ROB_IDX_WIDTH), 1, initializer=[0])
-        self.tail = RegArray(UInt(ROB_IDX_WIDTH), 1, initializer=[0])
+        self.head = RegArray(UInt(self.idx_width), 1, initializer=[0])
+        self.tail = RegArray(UInt(self.idx_width), 1, initializer=[0])
 
         # 各字段的寄存器队列
-        self.busy = RegArray(Bits(1), FIFO_SIZE, initializer=[0] * FIFO_SIZE)
-        self.ready = RegArray(Bits(1), FIFO_SIZE, initializer=[0] * FIFO_SIZE)
-        self.dest = RegArray(Bits(5), FIFO_SIZE, initializer=[0] * FIFO_SIZE)
-        self.value = RegArray(UInt(32), FIFO_SIZE, initializer=[0] * FIFO_SIZE)
-        self.is_branch = RegArray(Bits(1), FIFO_SIZE, initializer=[0] * FIFO_SIZE)
-        self.pc = RegArray(UInt(32), FIFO_SIZE, initializer=[0] * FIFO_SIZE)
-        self.is_syscall = RegArray(Bits(1), FIFO_SIZE, initializer=[0] * FIFO_SIZE)
-        self.is_store = RegArray(Bits(1), FIFO_SIZE, initializer=[0] * FIFO_SIZE)
+        self.busy = RegArray(Bits(1), self.size, initializer=[0] * self.size)
+        self.ready = RegArray(Bits(1), self.size, initializer=[0] * self.size)
+        self.dest = RegArray(Bits(5), self.size, initializer=[0] * self.size)
+        self.value = RegArray(UInt(32), self.size, initializer=[0] * self.size)
+        self.is_branch = RegArray(Bits(1), self.size, initializer=[0] * self.size)
+        self.pc = RegArray(UInt(32), self.size, initializer=[0] * self.size)
+        self.is_syscall = RegArray(Bits(1), self.size, initializer=[0] * self.size)
+        self.is_store = RegArray(Bits(1), self.size, initializer=[0] * self.size)
         # store 专用字段：地址与数据
-        self.store_addr = RegArray(UInt(32), FIFO_SIZE, initializer=[0] * FIFO_SIZE)
-        self.store_data = RegArray(UInt(32), FIFO_SIZE, initializer=[0] * FIFO_SIZE)
+        self.store_addr = RegArray(UInt(32), self.size, initializer=[0] * self.size)
+        self.store_data = RegArray(UInt(32), self.size, initializer=[0] * self.size)
+        # 分支预测：取指时预测的下一条 pc，以及实际的下一条 pc（issue 时为 pc+4，分支由 CDB 改写）
+        # 提交时二者不一致即为预测错误，需要冲刷
+        self.pred_pc = RegArray(UInt(32), self.size, initializer=[0] * self.size)
+        self.next_pc = RegArray(UInt(32), self.size, initializer=[0] * self.size)
+        # call（jal/jalr 且 rd=ra）与 return（jalr x0, ra），提交时训练 BTB 并更新提交侧 RAS
+        self.is_call = RegArray(Bits(1), self.size, initializer=[0] * self.size)
+        self.is_ret = RegArray(Bits(1), self.size, initializer=[0] * self.size)
+    def index(self, base, k) -> Value:
+        """
+        环形队列中 base 之后第 k 项的下标。
+        """
+        return ((base + UInt(self.idx_width)(k)) & UInt(self.idx_width)(self.size - 1)).bitcast(UInt(self.idx_width))
+    def has_room(self, k) -> Bits:
+        """
+        能否在 tail 之后第 k 项再分配一条：已占用的项从 head 连续到 tail，
+        保留一项空位区分空/满，所以要求 tail+k+1 处仍空闲。
+        """
+        return ~self.busy[self.index(self.tail[0], k + 1)]
     def is_full(self) -> Bits:
         """
         判断 ROB 是否已满：next_tail 与 head 重合且 head 位置忙。
         """
-        next_tail = (self.tail[0] + UInt(ROB_IDX_WIDTH)(1)).bitcast(UInt(ROB_IDX_WIDTH))
-        return (next_tail == self.head[0]) & self.busy[self.head[0]]
-    def has_no_store(self) -> Bits:
+        return ~self.has_room(0)
+    def tag(self, idx) -> Value:
+        """
+        ROB 下标 idx 对应的 RS/LSQ/CDB 标签（零扩展到 tag_width）。
+        """
+        return idx.zext(Bits(self.tag_width))
+    def pending(self, idx) -> Value:
         """
-        ROB 内没有待提交的 store：枚举所有 entry 的 is_store 取反求与。
+        reg_pending 里记录 idx 的值：rob_idx+1，0 表示无依赖。
         """
-        no_store = Bits(1)(1)
-        for i in range(FIFO_SIZE):
-            no_store = no_store & ~self.is_store[i]
-        return no_store
+        return (idx + UInt(self.idx_width)(1)).bitcast(Bits(self.tag_width))
@@ -1,45 +1,73 @@
 from assassyn.frontend import *
 # 直接复用 ALU 模块里定义的 ALU_signal 记录类型
-from .alu import ALU, ALU_signal
+from .alu import ALU, alu_records
+from .ROB import ROB
+from .config import CPUConfig
+from .rename_checkpoint import BranchCheckpoints
+from .verbosity import log_info, log_debug
 try:
     from .instruction import RV32I_ALU
 except ImportError:
     from Tomasulo.src.instruction import RV32I_ALU
 
-# Tomasulo Reservation Station (简化版) 的基础数据结构
-# 每个 RS entry 持有操作数就绪标志、操作数值或标签、目标 rd、ROB 索引等。
+# Tomasulo 统一保留站：所有 ALU 共用一个 rs_entries 项的表，表项数与 ALU 个数无关。
+# 每个表项持有操作数就绪标志、操作数值或标签、目标 rd、ROB 索引等；
+# 每周期按 ROB 年龄从就绪表项里选最老的几条，依次分给空闲的 ALU。
+# 表项发射后保留到自己的结果上 CDB 才释放，在此之前它占用的 ALU 不再接收新指令，
+# 保证 CDB 仲裁器里每个 ALU 至多有一个待广播的结果。
 
-RS_ENTRY_NUM = 4  # RS 条目数量
-RS_NUM_WIDTH = 4  # RS 索引位宽
-RS_MAX = (2 ** RS_NUM_WIDTH) - 1
 
-class RSEntry:
-    def __init__(self):
+class RSPool:
+    def __init__(self, config: CPUConfig):
+        n = config.rs_entries
+        self.size = n
+        # 表项下标位宽，多留出一个不存在的下标 none 作为“没有空闲表项”
+        self.idx_width = n.bit_length()
+        self.none = (1 << self.idx_width) - 1
+        # 发射到的 ALU 编号
+        self.alu_width = max(1, (config.alu_count - 1).bit_length())
+        tag_width = config.tag_width
+        self.tag_width = tag_width
         # busy/ready 标志
-        self.busy = RegArray(Bits(1), 1, initializer=[0])
-        self.op = RegArray(Bits(RV32I_ALU.CNT), 1, initializer=[0])  # ALU one-hot 类型
+        self.busy = RegArray(Bits(1), n, initializer=[0] * n)
+        self.op = RegArray(Bits(RV32I_ALU.CNT), n, initializer=[0] * n)  # ALU one-hot 类型
         # 操作数值与来源
-        self.vj = RegArray(UInt(32), 1, initializer=[0])
-        self.vk = RegArray(UInt(32), 1, initializer=[0])
-        self.qj = RegArray(Bits(4), 1, initializer=[0])           # 源操作数的标签（ROB idx），0 表示就绪
-        self.qk = RegArray(Bits(4), 1, initializer=[0])
-        self.qj_valid = RegArray(Bits(1), 1, initializer=[0])     # 标记 vj/vk 是否有效
-        self.qk_valid = RegArray(Bits(1), 1, initializer=[0])
+        self.vj = RegArray(UInt(32), n, initializer=[0] * n)
+        self.vk = RegArray(UInt(32), n, initializer=[0] * n)
+        self.qj = RegArray(Bits(tag_width), n, initializer=[0] * n)   # 源操作数的标签（ROB idx），0 表示就绪
+        self.qk = RegArray(Bits(tag_width), n, initializer=[0] * n)
+        self.qj_valid = RegArray(Bits(1), n, initializer=[0] * n)     # 标记 vj/vk 是否有效
+        self.qk_valid = RegArray(Bits(1), n, initializer=[0] * n)
         # 目标寄存器 / ROB
-        self.rd = RegArray(Bits(5), 1, initializer=[0])
-        self.rob_idx = RegArray(Bits(4), 1, initializer=[0])
+        self.rd = RegArray(Bits(5), n, initializer=[0] * n)
+        self.rob_idx = RegArray(Bits(tag_width), n, initializer=[0] * n)
         # 立即数等额外字段
-        self.imm = RegArray(UInt(32), 1, initializer=[0])
+        self.imm = RegArray(UInt(32), n, initializer=[0] * n)
         # 分支/JAL/JALR 控制
-        self.is_branch = RegArray(Bits(1), 1, initializer=[0])
-        self.is_jal = RegArray(Bits(1), 1, initializer=[0])
-        self.is_jalr = RegArray(Bits(1), 1, initializer=[0])
-        self.is_lui = RegArray(Bits(1), 1, initializer=[0])
-        self.is_auipc = RegArray(Bits(1), 1, initializer=[0])
-        self.pc_addr = RegArray(UInt(32), 1, initializer=[0])
-        self.is_syscall = RegArray(Bits(1), 1, initializer=[0])
-        # 是否发射给 ALU
-        self.fired = RegArray(Bits(1), 1, initializer=[0])
+        self.is_branch = RegArray(Bits(1), n, initializer=[0] * n)
+        self.is_jal = RegArray(Bits(1), n, initializer=[0] * n)
+        self.is_jalr = RegArray(Bits(1), n, initializer=[0] * n)
+        self.is_lui = RegArray(Bits(1), n, initializer=[0] * n)
+        self.is_auipc = RegArray(Bits(1), n, initializer=[0] * n)
+        self.pc_addr = RegArray(UInt(32), n, initializer=[0] * n)
+        self.is_syscall = RegArray(Bits(1), n, initializer=[0] * n)
+        # 是否已发射给 ALU，以及发给了哪一个
+        self.fired = RegArray(Bits(1), n, initializer=[0] * n)
+        self.alu = RegArray(UInt(self.alu_width), n, initializer=[0] * n)
+
+    def age(self, rob: ROB, e) -> Value:
+        """表项 e 的指令相对 ROB head 的距离，越小越老。"""
+        idx = self.rob_idx[e][0:rob.idx_width - 1].bitcast(UInt(rob.idx_width))
+        return ((idx - rob.head[0]) & UInt(rob.idx_width)(rob.size - 1)).bitcast(UInt(rob.idx_width))
+
+    def select_free(self, n) -> Value:
+        """第 n 个空闲表项的下标，没有时为 none。"""
+        select = Bits(self.idx_width)(self.none)
+        seen = UInt(self.idx_width)(0)
+        for e in range(self.size):
+            select = (~self.busy[e] & (seen == n)).select(Bits(self.idx_width)(e), select)
+            seen = (~self.busy[e]).select((seen + UInt(self.idx_width)(1)).bitcast(UInt(self.idx_width)), seen)
+        return select
 
 
 class RS_downstream(Downstream):
@@ -48,50 +76,117 @@ class RS_downstream(Downstream):
 
     @downstream.combinational
     def build(self,
-              rs: RSEntry,
-              alu : ALU,
-              cbd_signal: Value,
+              rs: RSPool,
+              alu : list[ALU],
+              rob: ROB,
+              ckpt: BranchCheckpoints,
+              cbd_signal: list,
               issue_stall: Value,
-              metadata: Value):
+              metadata: Value,
+              flush: Value):
         # 依赖 Issuer 的输出，保证在有发射动作时也会调度 RS_downstream
         issue_stall = issue_stall.optional(default=Bits(1)(0))
         metadata = metadata.optional(default=Bits(8)(0))
+        flush = flush.optional(default=Bits(1)(0))
         # 人为依赖 metadata，确保每周期都触发一次（即使上游无事件）
         _ = metadata == metadata
-        log("RS downstream metadata={} busy={} qj_v={} qk_v={} rob_idx={} op={:014b}", metadata, rs.busy[0], rs.qj_valid[0], rs.qk_valid[0], rs.rob_idx[0], rs.op[0])
-        log("cbd_signal valid={} ROB_idx={} rd_data=0x{:08x}", cbd_signal.valid, cbd_signal.ROB_idx, cbd_signal.rd_data)
-        with Condition(cbd_signal.valid & (rs.busy[0] == Bits(1)(1))):
-            # 如果有新的广播信号，更新 RS 中等待的操作数
-            with Condition((rs.qj[0] == cbd_signal.ROB_idx) & ~rs.qj_valid[0]):
-                rs.vj[0] <= cbd_signal.rd_data
-                rs.qj_valid[0] <= Bits(1)(1)  # 标记为就绪
-            with Condition((rs.qk[0] == cbd_signal.ROB_idx) & ~rs.qk_valid[0]):
-                rs.vk[0] <= cbd_signal.rd_data
-                rs.qk_valid[0] <= Bits(1)(1)  # 标记为就绪
-        busy_flag = rs.busy[0]  # 直接用 busy 位，避免被不必要的比较折叠成常量
-        # 需要显式括号，否则 Python 运算符优先级会把 & 和 == 搅在一起
-        with Condition(cbd_signal.valid & (busy_flag == Bits(1)(1)) &
-                       (cbd_signal.ROB_idx == rs.rob_idx[0])):
-            # 如果 ROB 提交了该指令，清空 RS entry
-            rs.busy[0] <= Bits(1)(0)
-            rs.qj_valid[0] <= Bits(1)(0)
-            rs.qk_valid[0] <= Bits(1)(0)
-            rs.fired[0] <= Bits(1)(0)
-        with Condition((busy_flag == Bits(1)(1)) & ~(rs.qj_valid[0] & rs.qk_valid[0])):
-            log("RS waiting rob_idx={} qj_valid={} qk_valid={} qj={} qk={}", rs.rob_idx[0], rs.qj_valid[0], rs.qk_valid[0], rs.qj[0], rs.qk[0])
-        with Condition((busy_flag == Bits(1)(1)) & (rs.qj_valid[0] & rs.qk_valid[0]) & (rs.fired[0] == Bits(1)(0))):
-            log("RS fire ALU: rob_idx={} op1=0x{:08x} op2=0x{:08x} op={:014b}", rs.rob_idx[0], rs.vj[0], rs.vk[0], rs.op[0])
-            alu.async_called(
-                alu_signals=ALU_signal.bundle(
-                    op1_val = rs.vj[0],
-                    op2_val = rs.vk[0],
-                    alu_type = rs.op[0],
-                    is_B = rs.is_branch[0],
-                    is_jal = rs.is_jal[0],
-                    is_jalr = rs.is_jalr[0],
-                    pc_addr = rs.pc_addr[0],
-                    imm_val = rs.imm[0],
-                    ROB_idx = rs.rob_idx[0],
+        ALU_signal, _ = alu_records(rs.tag_width)
+        log_debug("RS downstream metadata={}", metadata)
+        # 分支预测错误：提交冲刷时 RS 里的指令都在错误路径上（比提交的分支年轻），直接清空；
+        # 分支恢复时只清掉比分支年轻的表项
+        kill = [ckpt.kill(rob, rs.rob_idx[e], flush) for e in range(rs.size)]
+        for e in range(rs.size):
+            with Condition(kill[e]):
+                rs.busy[e] <= Bits(1)(0)
+                rs.qj_valid[e] <= Bits(1)(0)
+                rs.qk_valid[e] <= Bits(1)(0)
+                rs.fired[e] <= Bits(1)(0)
+
+        broadcast = []
+        for e in range(rs.size):
+            # 每个 CDB 通道广播不同的 ROB 项，同一个操作数最多被一个通道命中
+            for cdb in cbd_signal:
+                with Condition(~kill[e] & cdb.valid & rs.busy[e]):
+                    # 如果有新的广播信号，更新 RS 中等待的操作数
+                    with Condition((rs.qj[e] == cdb.ROB_idx) & ~rs.qj_valid[e]):
+                        rs.vj[e] <= cdb.rd_data
+                        rs.qj_valid[e] <= Bits(1)(1)  # 标记为就绪
+                    with Condition((rs.qk[e] == cdb.ROB_idx) & ~rs.qk_valid[e]):
+                        rs.vk[e] <= cdb.rd_data
+                        rs.qk_valid[e] <= Bits(1)(1)  # 标记为就绪
+            # 需要显式括号，否则 Python 运算符优先级会把 & 和 == 搅在一起
+            done = Bits(1)(0)
+            for cdb in cbd_signal:
+                done = done | (cdb.valid & (cdb.ROB_idx == rs.rob_idx[e]))
+            broadcast.append(rs.busy[e] & done)
+            with Condition(~kill[e] & broadcast[e]):
+                # 结果已经广播，释放 RS entry（它占用的 ALU 本周期起空闲）
+                rs.busy[e] <= Bits(1)(0)
+                rs.qj_valid[e] <= Bits(1)(0)
+                rs.qk_valid[e] <= Bits(1)(0)
+                rs.fired[e] <= Bits(1)(0)
+            with Condition(rs.busy[e] & ~(rs.qj_valid[e] & rs.qk_valid[e])):
+                log_debug("RS[{}] waiting rob_idx={} qj_valid={} qk_valid={} qj={} qk={}", UInt(rs.idx_width)(e), rs.rob_idx[e], rs.qj_valid[e], rs.qk_valid[e], rs.qj[e], rs.qk[e])
+
+        # ALU 空闲：没有已发射、结果还没广播的表项占着它
+        alu_free = []
+        for a in range(len(alu)):
+            occupied = Bits(1)(0)
+            for e in range(rs.size):
+                occupied = occupied | (rs.busy[e] & rs.fired[e] & ~broadcast[e] & (rs.alu[e] == UInt(rs.alu_width)(a)))
+            alu_free.append(~occupied)
+
+        # 就绪表项按年龄排序：rank[e] 为比它老的就绪表项数，第 r 老的就绪表项发给第 r 个空闲 ALU
+        ready = [~kill[e] & rs.busy[e] & rs.qj_valid[e] & rs.qk_valid[e] & ~rs.fired[e] for e in range(rs.size)]
+        rank_width = max(rs.size, len(alu)).bit_length()
+        rank = []
+        for e in range(rs.size):
+            r = UInt(rank_width)(0)
+            for f in range(rs.size):
+                if f != e:
+                    older = ready[f] & (rs.age(rob, f) < rs.age(rob, e))
+                    r = older.select((r + UInt(rank_width)(1)).bitcast(UInt(rank_width)), r)
+            rank.append(r)
+        free_rank = UInt(rank_width)(0)
+        for a in range(len(alu)):
+            go = [ready[e] & alu_free[a] & (rank[e] == free_rank) for e in range(rs.size)]
+            fire = Bits(1)(0)
+            op1 = rs.vj[0]
+            op2 = rs.vk[0]
+            op = rs.op[0]
+            is_B = rs.is_branch[0]
+            is_jal = rs.is_jal[0]
+            is_jalr = rs.is_jalr[0]
+            pc_addr = rs.pc_addr[0]
+            imm = rs.imm[0]
+            rob_idx = rs.rob_idx[0]
+            for e in range(rs.size):
+                fire = fire | go[e]
+                op1 = go[e].select(rs.vj[e], op1)
+                op2 = go[e].select(rs.vk[e], op2)
+                op = go[e].select(rs.op[e], op)
+                is_B = go[e].select(rs.is_branch[e], is_B)
+                is_jal = go[e].select(rs.is_jal[e], is_jal)
+                is_jalr = go[e].select(rs.is_jalr[e], is_jalr)
+                pc_addr = go[e].select(rs.pc_addr[e], pc_addr)
+                imm = go[e].select(rs.imm[e], imm)
+                rob_idx = go[e].select(rs.rob_idx[e], rob_idx)
+                with Condition(go[e]):
+                    rs.fired[e] <= Bits(1)(1)
+                    rs.alu[e] <= UInt(rs.alu_width)(a)
+            with Condition(fire):
+                log_info("RS fire ALU{}: rob_idx={} op1=0x{:08x} op2=0x{:08x} op={:014b}", UInt(rs.alu_width)(a), rob_idx, op1, op2, op)
+                alu[a].async_called(
+                    alu_signals=ALU_signal.bundle(
+                        op1_val = op1,
+                        op2_val = op2,
+                        alu_type = op,
+                        is_B = is_B,
+                        is_jal = is_jal,
+                        is_jalr = is_jalr,
+                        pc_addr = pc_addr,
+                        imm_val = imm,
+                        ROB_idx = rob_idx,
+                    )
                 )
-            )
-            rs.fired[0] <= Bits(1)(1)
+            free_rank = alu_free[a].select((free_rank + UInt(rank_width)(1)).bitcast(UInt(rank_width)), free_rank)
@@ -1,4 +1,9 @@
+from functools import lru_cache
 from assassyn.frontend import *
+try:
+    from .verbosity import log_debug
+except ImportError:
+    from Tomasulo.src.verbosity import log_debug
 try:
     from .instruction import *
 except ImportError:
@@ -8,35 +13,43 @@ except ImportError:
 # 可通过 executor.DATA_BASE_OFFSET = xxx 在外部设置
 DATA_BASE_OFFSET = 0x2000
 
-ALU_signal = Record(
-    op1_val = UInt(32),    # op1
-    op2_val = UInt(32),    # op2
-    alu_type = Bits(RV32I_ALU.CNT),  # ALU 操
-    is_B = Bits(1),   # 是否 B 指令
-    is_jal = Bits(1), # 是否 JAL 指令
-    is_jalr = Bits(1),# 是否 JALR 指令
-    pc_addr = UInt(32),   # 当前指令 PC 地址
-    imm_val = UInt(32),   # 立即数
-    ROB_idx = UInt(4),    # 指令在 ROB 中的索引
-)
+@lru_cache(maxsize=None)
+def alu_records(tag_width: int):
+    """
+    按 ROB 标签位宽生成 (ALU_signal, ALU_CBD_signal)；同一位宽返回同一组 Record。
+    """
+    ALU_signal = Record(
+        op1_val = UInt(32),    # op1
+        op2_val = UInt(32),    # op2
+        alu_type = Bits(RV32I_ALU.CNT),  # ALU 操
+        is_B = Bits(1),   # 是否 B 指令
+        is_jal = Bits(1), # 是否 JAL 指令
+        is_jalr = Bits(1),# 是否 JALR 指令
+        pc_addr = UInt(32),   # 当前指令 PC 地址
+        imm_val = UInt(32),   # 立即数
+        ROB_idx = UInt(tag_width),    # 指令在 ROB 中的索引
+    )
 
-ALU_CBD_signal = Record(
-    ROB_idx = UInt(4),    # 指令在 ROB 中的索引
-    rd_data = UInt(32),   # 写回数据
-    valid = Bits(1),     # 数据有效标志
-    is_branch = Bits(1),  # 是否分支指令
-    next_pc = UInt(32),   # 分支指令的下一个 PC（如果不是分支指令则无效）
-)
+    ALU_CBD_signal = Record(
+        ROB_idx = UInt(tag_width),    # 指令在 ROB 中的索引
+        rd_data = UInt(32),   # 写回数据
+        valid = Bits(1),     # 数据有效标志
+        is_branch = Bits(1),  # 是否分支指令
+        next_pc = UInt(32),   # 分支指令的下一个 PC（如果不是分支指令则无效）
+    )
+    return ALU_signal, ALU_CBD_signal
 
 # jal ：op1 = pc, op2 = imm
 # jalr：op1 = rs1, op2 = imm
 # 这两个的 rd 的结果都要写成 pc + 4
 
 class ALU(Module):
-    def __init__(self):
+    def __init__(self, tag_width: int):
+        ALU_signal, _ = alu_records(tag_width)
         super().__init__(ports = {
             "alu_signals": Port(ALU_signal),
         })
+        self.tag_width = tag_width
     
     @module.combinational
     def build(self):
@@ -88,8 +101,9 @@ class ALU(Module):
             )
         )
 
-        log("alu_res_basic = {:08x}, alu_res = {:08x}, next_pc = {:08x}, is_branch = {}", alu_res_basic, alu_res, next_pc, is_branch)
+        log_debug("alu_res_basic = {:08x}, alu_res = {:08x}, next_pc = {:08x}, is_branch = {}", alu_res_basic, alu_res, next_pc, is_branch)
 
+        _, ALU_CBD_signal = alu_records(self.tag_width)
         cbd_signal = ALU_CBD_signal.bundle(
             ROB_idx = signal.ROB_idx,
             rd_data = alu_res,
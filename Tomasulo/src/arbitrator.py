@@ -1,29 +1,65 @@
+from functools import lru_cache
 from assassyn.frontend import *
+from .verbosity import log_debug
 from .lsu import *
 from .alu import *
 from .ROB import *
-from .RS import RS_ENTRY_NUM, RS_NUM_WIDTH, RS_MAX
+from .mdu import MulUnit, Divider
+from .rename_checkpoint import BranchCheckpoints
+from .config import CDB_LANES
 
-CBD_signal = Record(
-    ROB_idx = UInt(4),    # 指令在 ROB 中的索引
-    rd_data = UInt(32),   # 写回数据
-    valid = Bits(1),     # 数据有效标志
-)
+@lru_cache(maxsize=None)
+def cdb_record(tag_width: int):
+    """
+    按 ROB 标签位宽生成 CDB 广播的 Record；同一位宽返回同一个 Record。
+    """
+    return Record(
+        ROB_idx = UInt(tag_width),    # 指令在 ROB 中的索引
+        rd_data = UInt(32),   # 写回数据
+        valid = Bits(1),     # 数据有效标志
+    )
+
+# CDB 广播通道数来自 CPUConfig.cdb_lanes：每周期最多广播这么多个结果，其余请求者下周期再试：
+# LSU/ALU 的结果进保持寄存器，除法结果留在除法器里，乘法器按 mul_stall 停住流水线、结果留在最后一级
+
+# 请求者编号即优先级：LSU、乘法器、各 ALU、除法器。
+REQ_LSU = 0
+REQ_MUL = 1
+REQ_ALU0 = 2
+
+
+def cdb_requesters(alu_count: int) -> int:
+    """请求者：LSU + 乘法器 + 每个 ALU + 除法器。"""
+    return REQ_ALU0 + alu_count + 1
+
+
+def cdb_requester_names(alu_count: int) -> list:
+    """按编号排列的请求者名字，用于 ebreak 时打印 `cdb: deferred ..`。"""
+    return ["lsu", "mul"] + [f"alu{i}" for i in range(alu_count)] + ["div"]
 
 class CDB_Arbitrator(Downstream):
-    def __init__(self):
+    def __init__(self, lanes=CDB_LANES):
         super().__init__()
+        self.lanes = lanes
     @downstream.combinational
-    def build(self, LSU_CBD_req: Value, ALU_CBD_req: list[Value], rob : ROB, metadata : Value):
+    def build(self, LSU_CBD_req: Value, ALU_CBD_req: list[Value], mul: MulUnit, div: Divider, rob : ROB, ckpt: BranchCheckpoints, metadata : Value, flush : Value, deferred : RegArray):
+        _, LSU_CBD_signal = lsu_records(rob.tag_width)
+        _, ALU_CBD_signal = alu_records(rob.tag_width)
+        CBD_signal = cdb_record(rob.tag_width)
+        n_alu = len(ALU_CBD_req)
+        n_req = cdb_requesters(n_alu)
+        # 通道分配计数的位宽
+        count_width = max(n_req, self.lanes).bit_length()
         lsu_cbd_reg = RegArray(Bits(LSU_CBD_signal.bits), 1, initializer=[0])
-        alu_cbd_reg = [RegArray(Bits(ALU_CBD_signal.bits), 1, initializer=[0]) for _ in range(RS_ENTRY_NUM)]
+        alu_cbd_reg = [RegArray(Bits(ALU_CBD_signal.bits), 1, initializer=[0]) for _ in range(n_alu)]
         # metadata 仅用于驱动 downstream，每周期都会访问一次
         metadata = metadata.optional(default=Bits(8)(0))
-        log("CDB arb metadata={}", metadata)
+        flush = flush.optional(default=Bits(1)(0))
+        log_debug("CDB arb metadata={}", metadata)
         # 为输入 request 增加默认值，避免第一次未产生请求时访问无效字段
         # 给上下游提供安全的默认值（当 LSU/ALU 尚未产生输出时不会访问无效 Option）
         lsu_payload = LSU_CBD_req.value().optional(default=LSU_CBD_signal.bundle(
-            ROB_idx = UInt(4)(0),
+            ROB_idx = UInt(rob.tag_width)(0),
             rd_data = UInt(32)(0),
             valid = Bits(1)(0),
             is_load = Bits(1)(0),
@@ -34,9 +70,9 @@ class CDB_Arbitrator(Downstream):
         lsu_req = LSU_CBD_signal.view(lsu_payload)
 
         alu_req = []
-        for i in range(RS_ENTRY_NUM):
+        for i in range(n_alu):
             alu_payload = ALU_CBD_req[i].value().optional(default=ALU_CBD_signal.bundle(
-                ROB_idx = UInt(4)(0),
+                ROB_idx = UInt(rob.tag_width)(0),
                 rd_data = UInt(32)(0),
                 valid = Bits(1)(0),
                 is_branch = Bits(1)(0),
@@ -72,57 +108,82 @@ class CDB_Arbitrator(Downstream):
             valid = alu_req[i].valid.select(alu_req[i].valid, alu_cbd_reg_view[i].valid),
             is_branch = alu_req[i].valid.select(alu_req[i].is_branch, alu_cbd_reg_view[i].is_branch),
             next_pc = alu_req[i].valid.select(alu_req[i].next_pc, alu_cbd_reg_view[i].next_pc),
-        ) for i in range(RS_ENTRY_NUM)]
+        ) for i in range(n_alu)]
         # 直接使用包好的默认值，不再逐字段 optional
-        lsu_valid = lsu_cbd.valid
-        lsu_rob_idx = lsu_cbd.ROB_idx
-        lsu_rd_data = lsu_cbd.rd_data
-        lsu_is_store = lsu_cbd.is_store
-        lsu_store_addr = lsu_cbd.store_addr
-        lsu_store_data = lsu_cbd.store_data
+        # 冲刷之后还在路上的结果属于已作废的 ROB 项（busy=0），直接丢弃；冲刷当周期也不广播，
+        # 分支恢复的周期不广播比分支年轻的结果
+        # 乘法器流水线最后一级、除法器的完成结果直接从它们的寄存器里读
+        mul_valid, mul_rob_idx, mul_rd_data = mul.request()
+        div_valid, div_rob_idx, div_rd_data = div.request()
+        req_rob_idx = [lsu_cbd.ROB_idx, mul_rob_idx] + [alu_cbd[i].ROB_idx for i in range(n_alu)] + [div_rob_idx]
+        req_valid = [lsu_cbd.valid, mul_valid] + [alu_cbd[i].valid for i in range(n_alu)] + [div_valid]
+        req_valid = [req_valid[r] & rob.busy[req_rob_idx[r]] & ~ckpt.kill(rob, req_rob_idx[r], flush) for r in range(n_req)]
+        req_rd_data = [lsu_cbd.rd_data, mul_rd_data] + [alu_cbd[i].rd_data for i in range(n_alu)] + [div_rd_data]
+
+        # 按优先级依次分配 self.lanes 条广播通道，lane[r] 为请求者 r 分到的通道号
+        granted = []
+        lane = []
+        used = UInt(count_width)(0)
+        for r in range(n_req):
+            lane.append(used)
+            granted.append(req_valid[r] & (used < UInt(count_width)(self.lanes)))
+            used = req_valid[r].select((used + UInt(count_width)(1)).bitcast(UInt(count_width)), used)
 
-        alu_valid = [alu_cbd[i].valid for i in range(RS_ENTRY_NUM)]
-        alu_rob_idx = [alu_cbd[i].ROB_idx for i in range(RS_ENTRY_NUM)]
-        alu_rd_data = [alu_cbd[i].rd_data for i in range(RS_ENTRY_NUM)]
-        alu_is_branch = [alu_cbd[i].is_branch for i in range(RS_ENTRY_NUM)]
-        alu_next_pc = [alu_cbd[i].next_pc for i in range(RS_ENTRY_NUM)]
+        lanes = []
+        for l in range(self.lanes):
+            on_lane = [granted[r] & (lane[r] == UInt(count_width)(l)) for r in range(n_req)]
+            valid = Bits(1)(0)
+            ROB_idx = UInt(rob.tag_width)(0)
+            rd_data = UInt(32)(0)
+            for r in range(n_req):
+                valid = valid | on_lane[r]
+                ROB_idx = on_lane[r].select(req_rob_idx[r], ROB_idx)
+                rd_data = on_lane[r].select(req_rd_data[r], rd_data)
+            log_debug("CDB arb: lane={} valid={} sel_rob_idx={} rd_data=0x{:08x}", UInt(count_width)(l), valid, ROB_idx, rd_data)
+            lanes.append(CBD_signal.bundle(
+                ROB_idx = ROB_idx,
+                rd_data = rd_data,
+                valid = valid,
+            ))
 
-        valid = lsu_valid
-        for i in range(RS_ENTRY_NUM):
-            valid = valid | alu_valid[i]
-        # 优先级：LSU > ALU0 > ALU1 > ...
-        select_CDB = Bits(RS_NUM_WIDTH)(RS_MAX) # 无效值
-        select_CDB = lsu_valid.select(Bits(RS_NUM_WIDTH)(0), select_CDB)
-        for i in range(RS_ENTRY_NUM):
-            # 如果还没有被选择，则选择当前的 ALU
-            select_CDB = (alu_valid[i] & (select_CDB == Bits(RS_NUM_WIDTH)(RS_MAX))).select(Bits(RS_NUM_WIDTH)(i+1), select_CDB)
+        # 将广播的结果修改进 ROB，每个请求者写自己的 ROB 项（同周期的 ROB_idx 互不相同）
+        for r in range(n_req):
+            with Condition(granted[r]):
+                rob.ready[req_rob_idx[r]] <= Bits(1)(1)
+                rob.value[req_rob_idx[r]] <= req_rd_data[r]
+        # 若为 store，记录地址与数据（is_store 在 issue 时写入）
+        with Condition(granted[REQ_LSU] & lsu_cbd.is_store):
+            rob.store_addr[lsu_cbd.ROB_idx] <= lsu_cbd.store_addr
+            rob.store_data[lsu_cbd.ROB_idx] <= lsu_cbd.store_data
+        # 分支的实际去向；与预测比较，预测错误的分支下一周期按检查点恢复
+        for i in range(n_alu):
+            with Condition(granted[REQ_ALU0 + i] & alu_cbd[i].is_branch):
+                rob.next_pc[alu_cbd[i].ROB_idx] <= alu_cbd[i].next_pc
+        ckpt.resolve(rob, [(granted[REQ_ALU0 + i] & alu_cbd[i].is_branch, alu_cbd[i].ROB_idx, alu_cbd[i].next_pc)
+                           for i in range(n_alu)], flush)
+
+        # 没抢到通道的请求者计数，ebreak 时由 Commiter 打印
+        for r in range(n_req):
+            with Condition(req_valid[r] & ~granted[r]):
+                deferred[r] <= deferred[r] + UInt(32)(1)
+        # 除法结果一直保持到被广播，广播后除法器空闲
+        with Condition(granted[-1]):
+            div.release()
+        # 乘法器最后一级的有效结果没抢到通道：MDU_downstream 本周期停住乘法流水线
+        mul_stall = req_valid[REQ_MUL] & ~granted[REQ_MUL]
 
-        ROB_idx = lsu_valid.select(lsu_rob_idx, UInt(4)(0))
-        for i in range(RS_ENTRY_NUM):
-            ROB_idx = (alu_valid[i] & (select_CDB == Bits(RS_NUM_WIDTH)(i+1))).select(alu_rob_idx[i], ROB_idx)
-        rd_data = lsu_valid.select(lsu_rd_data, UInt(32)(0))
-        for i in range(RS_ENTRY_NUM):
-            rd_data = (alu_valid[i] & (select_CDB == Bits(RS_NUM_WIDTH)(i+1))).select(alu_rd_data[i], rd_data)
-        log("CDB arb: LSU_valid={} select_CDB={} sel_rob_idx={} rd_data=0x{:08x}", lsu_valid, select_CDB, ROB_idx, rd_data)
-        # 将选择的结果修改进 ROB
-        with Condition(valid):
-            rob.ready[ROB_idx] <= Bits(1)(1)
-            rob.value[ROB_idx] <= rd_data
-            # 若为 store，记录地址与数据（is_store 在 issue 时写入）
-            with Condition(lsu_valid & lsu_is_store):
-                rob.store_addr[ROB_idx] <= lsu_store_addr
-                rob.store_data[ROB_idx] <= lsu_store_data
-        
         # 如果这个周期有 req 但是没有被广播出去，则存入寄存器，等待下周期广播
-        with Condition(lsu_req.valid & (select_CDB != Bits(RS_NUM_WIDTH)(0))):
+        with Condition(lsu_req.valid & rob.busy[lsu_req.ROB_idx] & ~ckpt.kill(rob, lsu_req.ROB_idx, flush) & ~granted[REQ_LSU]):
             lsu_cbd_reg[0] <= lsu_req.value()
-        for i in range(RS_ENTRY_NUM):
-            with Condition(alu_req[i].valid & (select_CDB != Bits(RS_NUM_WIDTH)(i + 1))):
+        for i in range(n_alu):
+            with Condition(alu_req[i].valid & rob.busy[alu_req[i].ROB_idx] & ~ckpt.kill(rob, alu_req[i].ROB_idx, flush)
+                           & ~granted[REQ_ALU0 + i]):
                 alu_cbd_reg[i][0] <= alu_req[i].value()
-        # 如果这个周期是广播的寄存器的 cbd，那么清空寄存器
-        with Condition(lsu_valid & (~lsu_req.valid) & (select_CDB == Bits(RS_NUM_WIDTH)(0))):
+        # 如果这个周期是广播的寄存器的 cbd，或者寄存器里的结果被冲刷/分支恢复作废，那么清空寄存器
+        killed = lsu_cbd_reg_view.valid & ckpt.kill(rob, lsu_cbd_reg_view.ROB_idx, flush)
+        with Condition(flush | killed | (granted[REQ_LSU] & (~lsu_req.valid))):
             lsu_cbd_reg[0] <= LSU_CBD_signal.bundle(
-                ROB_idx = UInt(4)(0),
+                ROB_idx = UInt(rob.tag_width)(0),
                 rd_data = UInt(32)(0),
                 valid = Bits(1)(0),
                 is_load = Bits(1)(0),
@@ -130,26 +191,17 @@ class CDB_Arbitrator(Downstream):
                 store_addr = UInt(32)(0),
                 store_data = UInt(32)(0),
             ).value()
-        for i in range(RS_ENTRY_NUM):
-            with Condition(alu_valid[i] & (~alu_req[i].valid) & (select_CDB == Bits(RS_NUM_WIDTH)(i + 1))):
+        for i in range(n_alu):
+            killed = alu_cbd_reg_view[i].valid & ckpt.kill(rob, alu_cbd_reg_view[i].ROB_idx, flush)
+            with Condition(flush | killed | (granted[REQ_ALU0 + i] & (~alu_req[i].valid))):
                 alu_cbd_reg[i][0] <= ALU_CBD_signal.bundle(
-                    ROB_idx = UInt(4)(0),
+                    ROB_idx = UInt(rob.tag_width)(0),
                     rd_data = UInt(32)(0),
                     valid = Bits(1)(0),
                     is_branch = Bits(1)(0),
                     next_pc = UInt(32)(0),
                 ).value()
-        
-        # 返回：CBD_signal, is_branch, next_PC
-        start_signal = Bits(1)(0)
-        target_pc = UInt(32)(0)
-        for i in range(RS_ENTRY_NUM):
-            start_signal = (alu_valid[i] & (select_CDB == Bits(RS_NUM_WIDTH)(i+1))).select(alu_is_branch[i], start_signal)
-            target_pc = (alu_valid[i] & (select_CDB == Bits(RS_NUM_WIDTH)(i+1))).select(alu_next_pc[i], target_pc)
-        # start_signal = lsu_valid.select(Bits(1)(0), alu_valid & alu_is_branch)
-        # target_pc = alu_valid.select(alu_next_pc, UInt(32)(0))
-        return CBD_signal.bundle(
-            ROB_idx = ROB_idx,
-            rd_data = rd_data,
-            valid = valid,
-        ), start_signal, target_pc
+
+        # 分支结果已写入 rob.next_pc，取指的纠正由下一周期的检查点恢复完成，
+        # 这里返回各通道的 CDB 广播和乘法器的反压
+        return lanes, mul_stall
@@ -0,0 +1,177 @@
+from assassyn.frontend import *
+try:
+    from .config import CacheConfig
+except ImportError:
+    from Tomasulo.src.config import CacheConfig
+
+# cache 时序模型：组相联 tag 阵列 + MSHR（miss status holding register），icache 和 dcache 各一份。
+# 数据仍然放在 SRAM 里（同时充当后备存储），这里只决定一次访问是命中
+# （照常读 SRAM）还是缺失（等后备存储 miss_latency 个周期把行回填之后再读）。
+# - 缺失时分配一个 MSHR 记下行地址和剩余周期；同一行上的后续缺失合并到已有的 MSHR；
+# - 每周期至多回填一行（单回填端口），替换按每组的轮转指针选路；
+# - 每周期至多一次访问。
+# dcache：store 经 store 缓冲直接写 SRAM，不分配行、不改 tag（写直达、写不分配）。
+# Tomasulo 的 LSQ 让缺失的 load 等到行回填再发射，命中的 load 可以越过它（非阻塞）；
+# 5 级流水线的 MEM 阶段没有反压，只用它统计命中/缺失。
+# icache：两个设计的 FetcherImpl 在缺失时停止取指，保持 pc 直到行回填。
+# 预取（Tomasulo 的 dcache，见 prefetcher.py）：prefetch() 在本周期没有访问时为一行分配 MSHR，
+# 由预取回填的行带 prefetched 标记。demand 访问第一次命中带标记的行记为有用的预取（useful），
+# 合并到预取 MSHR 的缺失记为来得太晚的预取（late）。
+
+
+class CacheModel:
+    def __init__(self, config: CacheConfig):
+        self.config = config
+        # 日志里的名字（icache/dcache）
+        self.name = config.name
+        sets, ways, n = config.sets, config.ways, config.mshrs
+        self.way_width = max(1, (ways - 1).bit_length())
+        self.mshr_width = max(1, (n - 1).bit_length())
+        self.timer_width = max(1, (config.miss_latency - 1).bit_length())
+        # 每一路的有效位与 tag，tag 存完整的行地址（字节地址 >> (2 + line_bits)）
+        self.valid = [RegArray(Bits(1), sets, initializer=[0] * sets) for _ in range(ways)]
+        self.tag = [RegArray(UInt(32), sets, initializer=[0] * sets) for _ in range(ways)]
+        # 每组下一次替换的路
+        self.victim = RegArray(UInt(self.way_width), sets, initializer=[0] * sets)
+        # 由预取回填、还没有被 demand 访问命中过的行
+        self.prefetched = [RegArray(Bits(1), sets, initializer=[0] * sets) for _ in range(ways)]
+        # MSHR：正在从后备存储取的行，timer 为剩余周期，到 0 后等待回填
+        self.mshr_valid = RegArray(Bits(1), n, initializer=[0] * n)
+        self.mshr_line = RegArray(UInt(32), n, initializer=[0] * n)
+        self.mshr_timer = RegArray(UInt(self.timer_width), n, initializer=[0] * n)
+        self.mshr_prefetch = RegArray(Bits(1), n, initializer=[0] * n)
+        # 统计：命中、分配新 MSHR 的缺失、合并到已有 MSHR 的缺失、因 MSHR 全忙被推迟的次数
+        self.hits = RegArray(UInt(32), 1, initializer=[0])
+        self.misses = RegArray(UInt(32), 1, initializer=[0])
+        self.merged = RegArray(UInt(32), 1, initializer=[0])
+        self.mshr_full = RegArray(UInt(32), 1, initializer=[0])
+        # 预取统计：分配了 MSHR 的预取、被 demand 命中的预取行、demand 缺失时还在路上的预取
+        self.pf_issued = RegArray(UInt(32), 1, initializer=[0])
+        self.pf_useful = RegArray(UInt(32), 1, initializer=[0])
+        self.pf_late = RegArray(UInt(32), 1, initializer=[0])
+
+    def line(self, addr) -> Value:
+        return (addr >> UInt(32)(2 + self.config.line_bits)).bitcast(UInt(32))
+
+    def set_index(self, line) -> Value:
+        return line[0:self.config.set_bits - 1].bitcast(UInt(self.config.set_bits))
+
+    def hit(self, addr) -> Bits:
+        line = self.line(addr)
+        s = self.set_index(line)
+        hit = Bits(1)(0)
+        for w in range(self.config.ways):
+            hit = hit | (self.valid[w][s] & (self.tag[w][s] == line))
+        return hit
+
+    def pending(self, addr) -> Bits:
+        """addr 所在的行是否已有 MSHR 在取。"""
+        line = self.line(addr)
+        pending = Bits(1)(0)
+        for m in range(self.config.mshrs):
+            pending = pending | (self.mshr_valid[m] & (self.mshr_line[m] == line))
+        return pending
+
+    def has_free_mshr(self) -> Bits:
+        free = Bits(1)(0)
+        for m in range(self.config.mshrs):
+            free = free | ~self.mshr_valid[m]
+        return free
+
+    def free_mshr(self) -> Value:
+        """编号最小的空闲 MSHR。"""
+        slot = UInt(self.mshr_width)(0)
+        for m in reversed(range(self.config.mshrs)):
+            slot = (~self.mshr_valid[m]).select(UInt(self.mshr_width)(m), slot)
+        return slot
+
+    def access(self, req, addr) -> tuple:
+        """
+        req 为真时做一次读访问，返回 (hit, missed)：
+        hit 时照常读 SRAM；missed 表示缺失已登记（新分配或合并到 MSHR），行回填后 hit 变为真；
+        两者都为假说明 MSHR 全忙，调用方下周期重试。
+        """
+        hit = self.hit(addr)
+        pending = self.pending(addr)
+        slot = self.free_mshr()
+        allocate = req & ~hit & ~pending & self.has_free_mshr()
+        line = self.line(addr)
+        s = self.set_index(line)
+        with Condition(req & hit):
+            self.hits[0] <= self.hits[0] + UInt(32)(1)
+        # 第一次命中预取回填的行
+        for w in range(self.config.ways):
+            with Condition(req & self.valid[w][s] & (self.tag[w][s] == line) & self.prefetched[w][s]):
+                self.pf_useful[0] <= self.pf_useful[0] + UInt(32)(1)
+                self.prefetched[w][s] <= Bits(1)(0)
+        with Condition(req & ~hit & pending):
+            self.merged[0] <= self.merged[0] + UInt(32)(1)
+        # 合并到预取的 MSHR：预取发得太晚，回填的行按 demand 缺失处理
+        for m in range(self.config.mshrs):
+            with Condition(req & ~hit & self.mshr_valid[m] & (self.mshr_line[m] == line) & self.mshr_prefetch[m]):
+                self.pf_late[0] <= self.pf_late[0] + UInt(32)(1)
+                self.mshr_prefetch[m] <= Bits(1)(0)
+        with Condition(allocate):
+            self.misses[0] <= self.misses[0] + UInt(32)(1)
+            self.mshr_valid[slot] <= Bits(1)(1)
+            self.mshr_line[slot] <= line
+            self.mshr_timer[slot] <= UInt(self.timer_width)(self.config.miss_latency - 1)
+            self.mshr_prefetch[slot] <= Bits(1)(0)
+        with Condition(req & ~hit & ~pending & ~self.has_free_mshr()):
+            self.mshr_full[0] <= self.mshr_full[0] + UInt(32)(1)
+        return hit, ~hit & (pending | allocate)
+
+    def prefetch(self, req, addr) -> Bits:
+        """
+        req 为真时预取 addr 所在的行（调用方保证本周期没有 demand 访问），返回请求是否已处理：
+        行已在 cache 里或已有 MSHR 在取时直接丢弃，否则分配一个 MSHR；MSHR 全忙时返回假，调用方稍后重试。
+        """
+        hit = self.hit(addr)
+        pending = self.pending(addr)
+        slot = self.free_mshr()
+        allocate = req & ~hit & ~pending & self.has_free_mshr()
+        with Condition(allocate):
+            self.pf_issued[0] <= self.pf_issued[0] + UInt(32)(1)
+            self.mshr_valid[slot] <= Bits(1)(1)
+            self.mshr_line[slot] <= self.line(addr)
+            self.mshr_timer[slot] <= UInt(self.timer_width)(self.config.miss_latency - 1)
+            self.mshr_prefetch[slot] <= Bits(1)(1)
+        return hit | pending | allocate
+
+    def tick(self):
+        """
+        每周期调用一次：MSHR 倒计时，数据已到的 MSHR 中编号最小的一个把行填进 cache 并释放。
+        分配后第 miss_latency 个周期回填，下一周期起命中。
+        """
+        fill = Bits(1)(0)
+        fill_line = self.mshr_line[0]
+        fill_prefetch = self.mshr_prefetch[0]
+        for m in range(self.config.mshrs):
+            arrived = self.mshr_valid[m] & (self.mshr_timer[m] == UInt(self.timer_width)(0))
+            with Condition(self.mshr_valid[m] & ~arrived):
+                self.mshr_timer[m] <= (self.mshr_timer[m] - UInt(self.timer_width)(1)).bitcast(UInt(self.timer_width))
+            first = arrived & ~fill
+            with Condition(first):
+                self.mshr_valid[m] <= Bits(1)(0)
+            fill_line = first.select(self.mshr_line[m], fill_line)
+            fill_prefetch = first.select(self.mshr_prefetch[m], fill_prefetch)
+            fill = fill | arrived
+        with Condition(fill):
+            s = self.set_index(fill_line)
+            way = self.victim[s]
+            for w in range(self.config.ways):
+                with Condition(way == UInt(self.way_width)(w)):
+                    self.valid[w][s] <= Bits(1)(1)
+                    self.tag[w][s] <= fill_line
+                    self.prefetched[w][s] <= fill_prefetch
+            last = way == UInt(self.way_width)(self.config.ways - 1)
+            self.victim[s] <= last.select(UInt(self.way_width)(0), (way + UInt(self.way_width)(1)).bitcast(UInt(self.way_width)))
+
+    def report(self, log_fn):
+        """ebreak 时打印统计，格式见 scripts/log_analyzer.py。"""
+        log_fn(f"{self.name}: " + "hits={} misses={} merged={} mshr_full={}",
+               self.hits[0], self.misses[0], self.merged[0], self.mshr_full[0])
+
+    def report_prefetch(self, log_fn):
+        """ebreak 时打印预取统计，格式见 scripts/log_analyzer.py。"""
+        log_fn("prefetch: issued={} useful={} late={}", self.pf_issued[0], self.pf_useful[0], self.pf_late[0])
@@ -1,7 +1,23 @@
 from assassyn.frontend import *
+from .verbosity import log_commit, log_info, log_debug, log_final_state
 from .ROB import *
+from .predictor import BranchPredictor
+from .arbitrator import cdb_requester_names
+from .store_buffer import StoreBuffer
+from .fetch_queue import FetchQueue
+from .cache import CacheModel
+from .rename_checkpoint import BranchCheckpoints
 
-# 简单的提交器：每个周期尝试提交 head 处的一条指令
+# 提交器：每个周期从 head 起按序提交最多 width 条已就绪的指令。
+# 提交时检查取指阶段的预测（rob.pred_pc）是否等于实际的下一条 pc（rob.next_pc），
+# 不一致时冲刷：该指令之后的 ROB 项都是错误路径上的指令，全部作废，
+# flush/redirect_pc 输出给 RS/LSQ/CDB/Issuer/Fetcher 清掉各自的状态并重新取指。
+# 预测错误一般在分支广播时就按检查点恢复了（rename_checkpoint.py），恢复时改写了 pred_pc，
+# 提交时的冲刷只在分支恢复的那个周期恰好提交该分支时发生。
+# 提交的 store 按序放进 store 缓冲（一个周期可放多条，缓冲满时停止提交），
+# 由缓冲每周期把最老的一条写入 dcache（单写口）；同一周期最多提交一条分支（预测器单更新口），
+# syscall/ebreak 只在第 0 个位置提交，保证 finish 时 regs 已包含之前的全部结果；
+# 还要等 store 缓冲排空，保证之前提交的 store 都已写进 dcache。
 
 
 class Commiter(Module):
@@ -9,45 +25,152 @@ class Commiter(Module):
         super().__init__(ports={})
 
     @module.combinational
-    def build(self, rob: ROB, regs: RegArray, reg_pending: RegArray):
+    def build(self, rob: ROB, regs: RegArray, reg_pending: RegArray, predictor: BranchPredictor,
+              ckpt: BranchCheckpoints, cdb_deferred: RegArray,
+              sb: StoreBuffer, fq: FetchQueue, dc: CacheModel, ic: CacheModel, width: int = 1, alu_count: int = 1):
         head = rob.head[0]
-        can_commit = rob.busy[head] & rob.ready[head]
-
-        mem_we = can_commit & rob.is_store[head]
-        mem_addr = mem_we.select(rob.store_addr[head], UInt(32)(0))
-        mem_data = mem_we.select(rob.store_data[head], UInt(32)(0))
-        log("commit: can_commit={} head={} is_store={} rd={} value={}", can_commit, head, rob.is_store[head], rob.dest[head], rob.value[head])
-
-        # 仅当 reg_pending 仍指向 head 时清零映射
-        head_tag = (head + UInt(ROB_IDX_WIDTH)(1)).bitcast(Bits(REG_PENDING_WIDTH))
-        clear_pending = (reg_pending[rob.dest[head]] == head_tag)
-
-        with Condition(can_commit):
-            # 统一的提交日志，便于统计提交数量（含 store 和 syscall）
-            log("commit: retire rob={} pc=0x{:08x} rd={} is_store={} value=0x{:08x}", head, rob.pc[head], rob.dest[head], rob.is_store[head], rob.value[head])
-            with Condition(rob.is_syscall[head]):
-                log("commit: hit syscall/ebreak at pc=0x{:08x}", rob.pc[head])
-                finish()
-            # 普通写回（非 store），rd != 0
-            with Condition(~rob.is_store[head] & (rob.dest[head] != Bits(5)(0))):
-                regs[rob.dest[head]] <= rob.value[head]
-                with Condition(clear_pending):
-                    reg_pending[rob.dest[head]] <= Bits(REG_PENDING_WIDTH)(0)
-                log("commit: writeback rd={} value={}", rob.dest[head], rob.value[head])
-            # 清空 entry 状态
-            rob.busy[head] <= Bits(1)(0)
-            rob.ready[head] <= Bits(1)(0)
-            rob.is_branch[head] <= Bits(1)(0)
-            rob.is_syscall[head] <= Bits(1)(0)
-            rob.is_store[head] <= Bits(1)(0)
-            rob.dest[head] <= Bits(5)(0)
-            rob.value[head] <= UInt(32)(0)
-            rob.pc[head] <= UInt(32)(0)
-            rob.store_addr[head] <= UInt(32)(0)
-            rob.store_data[head] <= UInt(32)(0)
-
-            # head++（环形）
-            next_head = ((head + UInt(ROB_IDX_WIDTH)(1)) & UInt(ROB_IDX_WIDTH)((1 << ROB_IDX_WIDTH) - 1)).bitcast(UInt(ROB_IDX_WIDTH))
+        idx = [rob.index(head, k) for k in range(width)]
+
+        # 逐个位置决定本周期是否提交：前一个提交了、自己就绪，且不违反上面的限制
+        retire = []
+        mispredict = []
+        # 第 k 条之前本周期已放进 store 缓冲的条数，即第 k 条 store 在缓冲 tail 之后的位置
+        sb_count = []
+        n_store = UInt(sb.count_width)(0)
+        branch_seen = Bits(1)(0)
+        stop = Bits(1)(0)
+        for k in range(width):
+            i = idx[k]
+            ok = rob.busy[i] & rob.ready[i] & ~stop & (~rob.is_store[i] | sb.has_room(n_store))
+            if k > 0:
+                ok = ok & retire[k - 1] & ~rob.is_syscall[i] & ~(rob.is_branch[i] & branch_seen)
+            else:
+                ok = ok & (~rob.is_syscall[i] | sb.is_empty())
+            retire.append(ok)
+            mispredict.append(ok & ~rob.is_syscall[i] & (rob.next_pc[i] != rob.pred_pc[i]))
+            sb_count.append(n_store)
+            n_store = (ok & rob.is_store[i]).select((n_store + UInt(sb.count_width)(1)).bitcast(UInt(sb.count_width)), n_store)
+            branch_seen = branch_seen | (ok & rob.is_branch[i])
+            # 预测错误或 syscall 之后的指令本周期都不提交
+            stop = stop | mispredict[k] | (ok & rob.is_syscall[i])
+
+        flush = Bits(1)(0)
+        redirect_pc = UInt(32)(0)
+        next_head = head
+        # 本周期提交的那条分支（最多一条），用于训练预测器/更新提交侧 RAS
+        branch = Bits(1)(0)
+        branch_pc = UInt(32)(0)
+        branch_next_pc = UInt(32)(0)
+        branch_call = Bits(1)(0)
+        branch_ret = Bits(1)(0)
+        for k in range(width):
+            i = idx[k]
+            flush = flush | mispredict[k]
+            redirect_pc = mispredict[k].select(rob.next_pc[i], redirect_pc)
+            next_head = retire[k].select(rob.index(head, k + 1), next_head)
+            is_branch = retire[k] & rob.is_branch[i]
+            branch = branch | is_branch
+            branch_pc = is_branch.select(rob.pc[i], branch_pc)
+            branch_next_pc = is_branch.select(rob.next_pc[i], branch_next_pc)
+            branch_call = is_branch.select(rob.is_call[i], branch_call)
+            branch_ret = is_branch.select(rob.is_ret[i], branch_ret)
+        ras_repair = predictor.retire(branch, branch_call, branch_ret, branch_pc)
+        # 本周期在做分支恢复：reg_pending 由恢复逻辑整体改写
+        squash = ckpt.squashing(flush)
+        log_debug("commit: head={} retire0={} is_store={} rd={} value={}", head, retire[0], rob.is_store[head], rob.dest[head], rob.value[head])
+
+        for k in range(width):
+            i = idx[k]
+            # 同周期更晚提交的指令写同一个 rd 时，只保留最后一次写
+            overwritten = Bits(1)(0)
+            for j in range(k + 1, width):
+                overwritten = overwritten | (retire[j] & ~rob.is_store[idx[j]] & (rob.dest[idx[j]] == rob.dest[i]))
+            # 仅当 reg_pending 仍指向该项时清零映射（更年轻的同 rd 指令会让比较失败）
+            clear_pending = (reg_pending[rob.dest[i]] == rob.pending(i))
+
+            with Condition(retire[k]):
+                # 统一的提交日志，便于统计提交数量（含 store 和 syscall）
+                log_commit("commit: retire rob={} pc=0x{:08x} rd={} is_store={} value=0x{:08x}", i, rob.pc[i], rob.dest[i], rob.is_store[i], rob.value[i])
+                if k == 0:
+                    with Condition(rob.is_syscall[i]):
+                        log_commit("commit: hit syscall/ebreak at pc=0x{:08x}", rob.pc[i])
+                        log_commit("predictor: branches={} mispredicts={}", predictor.branches[0], predictor.mispredicts[0])
+                        # 按请求者编号打印：lsu mul alu0.. div
+                        names = cdb_requester_names(alu_count)
+                        cdb_fmt = "cdb: deferred" + "".join(f" {name}={{}}" for name in names)
+                        log_commit(cdb_fmt, *[cdb_deferred[r] for r in range(len(names))])
+                        log_commit("fetchq: occupancy_sum={} cycles={} full={}", fq.occupancy_sum[0], fq.cycles[0], fq.full_cycles[0])
+                        ckpt.report(log_commit)
+                        ic.report(log_commit)
+                        dc.report(log_commit)
+                        dc.report_prefetch(log_commit)
+                        # 之前的指令都已提交，regs 即为最终的体系结构状态
+                        log_final_state(regs)
+                        finish()
+                # 普通写回（非 store），rd != 0
+                with Condition(~rob.is_store[i] & (rob.dest[i] != Bits(5)(0))):
+                    with Condition(~overwritten):
+                        regs[rob.dest[i]] <= rob.value[i]
+                    with Condition(clear_pending & ~flush & ~squash):
+                        reg_pending[rob.dest[i]] <= Bits(rob.tag_width)(0)
+                    log_commit("commit: writeback rd={} value={}", rob.dest[i], rob.value[i])
+                # 清空 entry 状态
+                rob.busy[i] <= Bits(1)(0)
+                rob.ready[i] <= Bits(1)(0)
+                rob.is_branch[i] <= Bits(1)(0)
+                rob.is_syscall[i] <= Bits(1)(0)
+                rob.is_store[i] <= Bits(1)(0)
+                rob.dest[i] <= Bits(5)(0)
+                rob.value[i] <= UInt(32)(0)
+                rob.pc[i] <= UInt(32)(0)
+                rob.store_addr[i] <= UInt(32)(0)
+                rob.store_data[i] <= UInt(32)(0)
+                # 提交的 store 按程序顺序放进缓冲
+                with Condition(rob.is_store[i]):
+                    slot = sb.slot(sb_count[k])
+                    sb.busy[slot] <= Bits(1)(1)
+                    sb.addr[slot] <= rob.store_addr[i]
+                    sb.data[slot] <= rob.store_data[i]
+                with Condition(mispredict[k]):
+                    log_info("commit: mispredict pc=0x{:08x} predicted=0x{:08x} actual=0x{:08x}", rob.pc[i], rob.pred_pc[i], rob.next_pc[i])
+
+        # 用真实结果训练预测器
+        with Condition(branch):
+            predictor.update(branch_pc, branch_next_pc, branch_call, branch_ret)
+        # 预测错误在分支恢复或提交冲刷时计数，同一条分支只会发生其中一个
+        predictor.count(branch, flush | squash)
+
+        with Condition(retire[0]):
             rob.head[0] <= next_head
-        return mem_we, mem_addr, mem_data
-        
+        with Condition(n_store != UInt(sb.count_width)(0)):
+            sb.tail[0] <= sb.slot(n_store)
+
+        # store 缓冲每周期把最老的一条写入 dcache；本周期新放入的从下周期起才可写出
+        sb_head = sb.head[0]
+        mem_we = sb.busy[sb_head]
+        mem_addr = sb.addr[sb_head]
+        mem_data = sb.data[sb_head]
+        with Condition(mem_we):
+            log_info("commit: drain store addr=0x{:08x} data=0x{:08x}", mem_addr, mem_data)
+            sb.busy[sb_head] <= Bits(1)(0)
+            sb.head[0] <= ((sb_head + UInt(sb.idx_width)(1)) & UInt(sb.idx_width)(sb.mask)).bitcast(UInt(sb.idx_width))
+
+        with Condition(flush):
+            # 作废提交指令之后的全部 ROB 项；本周期 Issuer 不会再分配新项，由这里改写 tail
+            for e in range(rob.size):
+                retiring = Bits(1)(0)
+                for k in range(width):
+                    retiring = retiring | (retire[k] & (idx[k] == UInt(rob.idx_width)(e)))
+                with Condition(~retiring):
+                    rob.busy[e] <= Bits(1)(0)
+                    rob.ready[e] <= Bits(1)(0)
+                    rob.is_branch[e] <= Bits(1)(0)
+                    rob.is_syscall[e] <= Bits(1)(0)
+                    rob.is_store[e] <= Bits(1)(0)
+            rob.tail[0] <= next_head
+            # 错误路径上的重命名全部撤销，已提交的值都在 regs 里
+            for r in range(32):
+                reg_pending[r] <= Bits(rob.tag_width)(0)
+        # 本周期提交的 ROB 项，LSQ 据此按序释放
+        retired = [(retire[k], idx[k]) for k in range(width)]
+        return mem_we, mem_addr, mem_data, flush, redirect_pc, ras_repair, retired
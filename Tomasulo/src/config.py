@@ -0,0 +1,203 @@
+# CPU 结构参数：build_CPU 只接收一个 CPUConfig，ROB 深度以及由它决定的
+# 各处 ROB 标签位宽（RS/LSQ 的 qj/qk/rob_idx、ALU/LSU/CDB 的 ROB_idx、reg_pending）
+# 都从这里推出，改 ROB 深度不需要再逐个修改 Record。
+# 本文件不依赖 assassyn，脚本可以直接 import 做参数检查。
+
+# 环形 ROB 队列默认深度（需为 2 的幂）
+ROB_SIZE = 8
+# 每周期取指/发射/提交的指令数（超标量宽度）
+ISSUE_WIDTH = 2
+# FetcherImpl 与 Issuer 之间的取指队列深度（需为 2 的幂，至少容纳两个取指组）
+FETCH_QUEUE_SIZE = 8
+# 环形 LSQ 的表项数（需为 2 的幂，至少容纳一个发射组的访存）
+LSQ_SIZE = 4
+# 提交后 store 缓冲的表项数（store_buffer.py，需为 2 的幂）
+STORE_BUFFER_SIZE = 4
+# 统一保留站的表项数，与 ALU 个数无关
+RS_ENTRIES = 8
+# ALU 个数：保留站每周期选最老的就绪表项发给空闲的 ALU，CDB 仲裁每个 ALU 一个输入
+ALU_COUNT = 2
+# CDB 广播通道数（arbitrator.py）：每周期最多广播这么多个结果，没抢到通道的请求者下周期再试
+CDB_LANES = 2
+# RV32M 乘除法单元（mdu.py）：流水乘法器的级数（即乘法延迟），乘法器与除法器各自保留站的表项数
+MUL_LATENCY = 3
+MDU_RS_ENTRIES = 2
+# 分支检查点个数（rename_checkpoint.py）：同时在路上的分支最多这么多条，每条保存一份重命名表快照，
+# 预测错误时一个周期恢复
+BRANCH_CHECKPOINTS = 4
+# dcache 跨步预取（prefetcher.py）：确认步长后预取 load 地址之后第 prefetch_distance 步所在的行，
+# 需为 2 的幂，0 关闭预取
+PREFETCH_DISTANCE = 8
+
+# cache 时序模型（cache.py）：组数、路数、每行字数（均需为 2 的幂）、
+# 缺失时后备存储的延迟（周期）以及 MSHR 个数
+DCACHE_SETS = 16
+DCACHE_WAYS = 2
+DCACHE_LINE_WORDS = 4
+DCACHE_MISS_LATENCY = 20
+DCACHE_MSHRS = 4
+# icache 缺失时停止取指，一般只有一个缺失在路上；冲刷后新路径的缺失要等旧的回填完才能分配
+ICACHE_SETS = 16
+ICACHE_WAYS = 2
+ICACHE_LINE_WORDS = 8
+ICACHE_MISS_LATENCY = 20
+ICACHE_MSHRS = 1
+
+CACHE_DEFAULTS = {
+    "dcache": {"sets": DCACHE_SETS, "ways": DCACHE_WAYS, "line_words": DCACHE_LINE_WORDS,
+               "miss_latency": DCACHE_MISS_LATENCY, "mshrs": DCACHE_MSHRS},
+    "icache": {"sets": ICACHE_SETS, "ways": ICACHE_WAYS, "line_words": ICACHE_LINE_WORDS,
+               "miss_latency": ICACHE_MISS_LATENCY, "mshrs": ICACHE_MSHRS},
+}
+
+
+def _is_pow2(n):
+    return n >= 1 and n & (n - 1) == 0
+
+
+class CacheConfig:
+    def __init__(self, name="dcache", sets=None, ways=None, line_words=None, miss_latency=None, mshrs=None):
+        defaults = CACHE_DEFAULTS[name]
+        sets = defaults["sets"] if sets is None else sets
+        ways = defaults["ways"] if ways is None else ways
+        line_words = defaults["line_words"] if line_words is None else line_words
+        miss_latency = defaults["miss_latency"] if miss_latency is None else miss_latency
+        mshrs = defaults["mshrs"] if mshrs is None else mshrs
+        # 组号至少占一位
+        if sets < 2 or not _is_pow2(sets):
+            raise ValueError(f"{name} sets must be a power of two >= 2, got {sets}")
+        if not _is_pow2(line_words):
+            raise ValueError(f"{name} line_words must be a power of two, got {line_words}")
+        if ways < 1 or miss_latency < 1 or mshrs < 1:
+            raise ValueError(f"{name} ways, miss_latency and mshrs must be >= 1, "
+                             f"got {ways}, {miss_latency} and {mshrs}")
+        self.name = name
+        self.sets = sets
+        self.ways = ways
+        self.line_words = line_words
+        self.miss_latency = miss_latency
+        self.mshrs = mshrs
+
+    @classmethod
+    def add_arguments(cls, parser, name="dcache"):
+        """两个设计的 main.py 共用的 --icache-*/--dcache-* 命令行参数。"""
+        defaults = CACHE_DEFAULTS[name]
+        parser.add_argument(f"--{name}-sets", type=int, default=defaults["sets"],
+                            help=f"{name} sets, a power of two (default: {defaults['sets']})")
+        parser.add_argument(f"--{name}-ways", type=int, default=defaults["ways"],
+                            help=f"{name} associativity (default: {defaults['ways']})")
+        parser.add_argument(f"--{name}-line-words", type=int, default=defaults["line_words"],
+                            help=f"32-bit words per {name} line, a power of two (default: {defaults['line_words']})")
+        parser.add_argument(f"--{name}-latency", type=int, default=defaults["miss_latency"],
+                            help=f"backing memory latency of a {name} miss in cycles (default: {defaults['miss_latency']})")
+        parser.add_argument(f"--{name}-mshrs", type=int, default=defaults["mshrs"],
+                            help=f"outstanding {name} misses (default: {defaults['mshrs']})")
+
+    @classmethod
+    def from_args(cls, args, name="dcache"):
+        def arg(field):
+            return getattr(args, f"{name}_{field}")
+        return cls(name, sets=arg("sets"), ways=arg("ways"), line_words=arg("line_words"),
+                   miss_latency=arg("latency"), mshrs=arg("mshrs"))
+
+    @property
+    def line_bits(self):
+        """行内字偏移位数。"""
+        return (self.line_words - 1).bit_length()
+
+    @property
+    def set_bits(self):
+        return (self.sets - 1).bit_length()
+
+    def params(self):
+        return {
+            f"{self.name}_sets": self.sets,
+            f"{self.name}_ways": self.ways,
+            f"{self.name}_line_words": self.line_words,
+            f"{self.name}_miss_latency": self.miss_latency,
+            f"{self.name}_mshrs": self.mshrs,
+        }
+
+
+class CPUConfig:
+    def __init__(self, rob_size=ROB_SIZE, issue_width=ISSUE_WIDTH, fetch_queue_size=FETCH_QUEUE_SIZE,
+                 lsq_size=LSQ_SIZE, store_buffer_size=STORE_BUFFER_SIZE, rs_entries=RS_ENTRIES,
+                 alu_count=ALU_COUNT, cdb_lanes=CDB_LANES, mul_latency=MUL_LATENCY,
+                 mdu_rs_entries=MDU_RS_ENTRIES, branch_checkpoints=BRANCH_CHECKPOINTS,
+                 prefetch_distance=PREFETCH_DISTANCE, dcache=None, icache=None):
+        if rob_size < 2 or rob_size & (rob_size - 1):
+            raise ValueError(f"rob_size must be a power of two >= 2, got {rob_size}")
+        if issue_width < 1 or issue_width >= rob_size:
+            raise ValueError(f"issue_width must be in [1, rob_size), got {issue_width}")
+        # 取指时还要给上一周期在路上的那一组留位置
+        if fetch_queue_size & (fetch_queue_size - 1) or fetch_queue_size < 2 * issue_width:
+            raise ValueError(f"fetch_queue_size must be a power of two >= 2 * issue_width, got {fetch_queue_size}")
+        # 同一周期发射的访存在 tail 之后依次分配，不能绕回本周期已分配的表项
+        if lsq_size < 2 or not _is_pow2(lsq_size) or lsq_size < issue_width:
+            raise ValueError(f"lsq_size must be a power of two >= max(2, issue_width), got {lsq_size}")
+        if store_buffer_size < 2 or not _is_pow2(store_buffer_size):
+            raise ValueError(f"store_buffer_size must be a power of two >= 2, got {store_buffer_size}")
+        if rs_entries < 1 or alu_count < 1:
+            raise ValueError(f"rs_entries and alu_count must be >= 1, got {rs_entries} and {alu_count}")
+        if cdb_lanes < 1:
+            raise ValueError(f"cdb_lanes must be >= 1, got {cdb_lanes}")
+        if mul_latency < 1 or mdu_rs_entries < 1:
+            raise ValueError(f"mul_latency and mdu_rs_entries must be >= 1, got {mul_latency} and {mdu_rs_entries}")
+        if branch_checkpoints < 1:
+            raise ValueError(f"branch_checkpoints must be >= 1, got {branch_checkpoints}")
+        if prefetch_distance and not _is_pow2(prefetch_distance):
+            raise ValueError(f"prefetch_distance must be 0 or a power of two, got {prefetch_distance}")
+        self.rob_size = rob_size
+        self.issue_width = issue_width
+        self.fetch_queue_size = fetch_queue_size
+        self.lsq_size = lsq_size
+        self.store_buffer_size = store_buffer_size
+        self.rs_entries = rs_entries
+        self.alu_count = alu_count
+        self.cdb_lanes = cdb_lanes
+        self.mul_latency = mul_latency
+        self.mdu_rs_entries = mdu_rs_entries
+        self.branch_checkpoints = branch_checkpoints
+        self.prefetch_distance = prefetch_distance
+        self.dcache = dcache if dcache is not None else CacheConfig("dcache")
+        self.icache = icache if icache is not None else CacheConfig("icache")
+        # 一个取指组最多跨两行，FetcherImpl 只查首尾两行
+        if self.icache.line_words < issue_width:
+            raise ValueError(f"icache line_words must be >= issue_width, got {self.icache.line_words}")
+
+    @property
+    def rob_idx_width(self):
+        """ROB 下标位宽。"""
+        return (self.rob_size - 1).bit_length()
+
+    @property
+    def tag_width(self):
+        """
+        ROB 标签位宽：reg_pending 存 rob_idx+1，0 作为 sentinel，需要多一位；
+        RS/LSQ/CDB 里的标签与 reg_pending 同宽，比较时不必再做位宽转换。
+        """
+        return self.rob_idx_width + 1
+
+    @property
+    def lsq_idx_width(self):
+        """LSQ 下标位宽，分支检查点保存的 LSQ tail 与之同宽。"""
+        return (self.lsq_size - 1).bit_length()
+
+    def params(self):
+        """影响 elaborate 结果的结构参数，并入仿真器缓存的 key。"""
+        return {
+            "rob_size": self.rob_size,
+            "issue_width": self.issue_width,
+            "fetch_queue_size": self.fetch_queue_size,
+            "lsq_size": self.lsq_size,
+            "store_buffer_size": self.store_buffer_size,
+            "rs_entries": self.rs_entries,
+            "alu_count": self.alu_count,
+            "cdb_lanes": self.cdb_lanes,
+            "mul_latency": self.mul_latency,
+            "mdu_rs_entries": self.mdu_rs_entries,
+            "branch_checkpoints": self.branch_checkpoints,
+            "prefetch_distance": self.prefetch_distance,
+            **self.dcache.params(),
+            **self.icache.params(),
+        }
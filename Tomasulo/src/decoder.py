@@ -1,4 +1,8 @@
 from assassyn.frontend import *
+try:
+    from .verbosity import log_debug
+except ImportError:
+    from Tomasulo.src.verbosity import log_debug
 try:
     from .instruction import *
     from .main import *
@@ -10,7 +14,7 @@ except ImportError:
 
 @rewrite_assign
 def decoder_logic(inst, reg_pending : RegArray, regs: RegArray
-                  , rob : ROB, cbd : Value):
+                  , rob : ROB, cbd : list):
     is_eq = {}
     [is_R, R_rs1, R_rs2, R_rd, R_alu] = decoder_R_type(inst=inst, is_eq=is_eq)
     [is_I, I_rs1, I_imm, I_rd, I_alu] = decoder_I_type(inst=inst, is_eq=is_eq)
@@ -19,30 +23,34 @@ def decoder_logic(inst, reg_pending : RegArray, regs: RegArray
     [is_B, B_rs1, B_rs2, B_imm, B_alu] = decoder_B_type(inst=inst, is_eq=is_eq)
     [is_U, U_imm, U_rd] = decoder_U_type(inst=inst, is_eq=is_eq)
     [is_J, J_imm, J_rd] = decoder_J_type(inst=inst, is_eq=is_eq)
+    [is_M, is_div, M_rs1, M_rs2, M_rd, mdu_type] = decoder_M_type(inst=inst, is_eq=is_eq)
 
     # 接下来信息整合
     ecall = is_eq.get("ecall", Bits(1)(0))
     ebreak = is_eq.get("ebreak", Bits(1)(0))
 
-    rs1_used = is_R | is_I | is_I_star | is_S | is_B
+    rs1_used = is_R | is_I | is_I_star | is_S | is_B | is_M
     rs1 = is_R.select(R_rs1,
             is_I.select(I_rs1,
             is_I_star.select(I_star_rs1,
             is_S.select(S_rs1,
-            is_B.select(B_rs1, Bits(5)(0))))))
+            is_B.select(B_rs1,
+            is_M.select(M_rs1, Bits(5)(0)))))))
 
-    rs2_used = is_R | is_S | is_B
+    rs2_used = is_R | is_S | is_B | is_M
     rs2 = is_R.select(R_rs2,
             is_S.select(S_rs2,
-            is_B.select(B_rs2, Bits(5)(0))))
+            is_B.select(B_rs2,
+            is_M.select(M_rs2, Bits(5)(0)))))
 
     is_I_writes = is_I & ~(ecall | ebreak)
-    rd_used = is_R | is_I_writes | is_I_star | is_U | is_J
+    rd_used = is_R | is_I_writes | is_I_star | is_U | is_J | is_M
     rd = is_R.select(R_rd,
          is_I_writes.select(I_rd,
          is_I_star.select(I_star_rd,
          is_U.select(U_rd,
-         is_J.select(J_rd, Bits(5)(0))))))
+         is_J.select(J_rd,
+         is_M.select(M_rd, Bits(5)(0)))))))
 
     imm_used = is_I | is_I_star | is_S | is_B | is_U | is_J
     imm_zero = Bits(32)(0)
@@ -105,20 +113,33 @@ def decoder_logic(inst, reg_pending : RegArray, regs: RegArray
     # reg_pending 存储 rob_idx+1，0 表示无依赖；避免 0-1 下溢为 0xff 造成数组越界
     rs1_pending = reg_pending[rs1]
     rs2_pending = reg_pending[rs2]
-    rs1_rob_tag_used = (rs1_pending != UInt(REG_PENDING_WIDTH)(0))
-    rs2_rob_tag_used = (rs2_pending != UInt(REG_PENDING_WIDTH)(0))
+    rs1_rob_tag_used = (rs1_pending != UInt(rob.tag_width)(0))
+    rs2_rob_tag_used = (rs2_pending != UInt(rob.tag_width)(0))
     rs1_rob_tag = rs1_rob_tag_used.select(
-        (rs1_pending - UInt(REG_PENDING_WIDTH)(1)).bitcast(UInt(ROB_IDX_WIDTH)),
-        UInt(ROB_IDX_WIDTH)(0)
+        (rs1_pending - UInt(rob.tag_width)(1)).bitcast(UInt(rob.idx_width)),
+        UInt(rob.idx_width)(0)
     )
     rs2_rob_tag = rs2_rob_tag_used.select(
-        (rs2_pending - UInt(REG_PENDING_WIDTH)(1)).bitcast(UInt(ROB_IDX_WIDTH)),
-        UInt(ROB_IDX_WIDTH)(0)
+        (rs2_pending - UInt(rob.tag_width)(1)).bitcast(UInt(rob.idx_width)),
+        UInt(rob.idx_width)(0)
     )
     
+    # 同周期 CDB 各通道上的广播旁路
+    rs1_cdb_hit = Bits(1)(0)
+    rs2_cdb_hit = Bits(1)(0)
+    rs1_cdb_data = UInt(32)(0)
+    rs2_cdb_data = UInt(32)(0)
+    for lane in cbd:
+        rs1_lane_hit = lane.valid & (rs1_rob_tag == lane.ROB_idx)
+        rs2_lane_hit = lane.valid & (rs2_rob_tag == lane.ROB_idx)
+        rs1_cdb_hit = rs1_cdb_hit | rs1_lane_hit
+        rs2_cdb_hit = rs2_cdb_hit | rs2_lane_hit
+        rs1_cdb_data = rs1_lane_hit.select(lane.rd_data, rs1_cdb_data)
+        rs2_cdb_data = rs2_lane_hit.select(lane.rd_data, rs2_cdb_data)
+
     rs1_valid = (rs1_used | (rs1 != Bits(5)(0))).select(
         rs1_rob_tag_used.select(
-            (cbd.valid & (rs1_rob_tag == cbd.ROB_idx)).select(
+            rs1_cdb_hit.select(
                 Bits(1)(1),
                 rob.ready[rs1_rob_tag]
             ),
@@ -126,7 +147,7 @@ def decoder_logic(inst, reg_pending : RegArray, regs: RegArray
         ), Bits(1)(1))
     rs2_valid = (rs2_used | (rs2 != Bits(5)(0))).select(
         rs2_rob_tag_used.select(
-            (cbd.valid & (rs2_rob_tag == cbd.ROB_idx)).select(
+            rs2_cdb_hit.select(
                 Bits(1)(1),
                 rob.ready[rs2_rob_tag]
             ),
@@ -135,8 +156,8 @@ def decoder_logic(inst, reg_pending : RegArray, regs: RegArray
 
     rs1_value = (rs1_used | (rs1 != Bits(5)(0))).select(
         rs1_rob_tag_used.select(
-            (cbd.valid & (rs1_rob_tag == cbd.ROB_idx)).select(
-                cbd.rd_data,
+            rs1_cdb_hit.select(
+                rs1_cdb_data,
                 rob.value[rs1_rob_tag]
             ),
             regs[rs1]
@@ -145,8 +166,8 @@ def decoder_logic(inst, reg_pending : RegArray, regs: RegArray
     )
     rs2_value = (rs2_used | (rs2 != Bits(5)(0))).select(
         rs2_rob_tag_used.select(
-            (cbd.valid & (rs2_rob_tag == cbd.ROB_idx)).select(
-                cbd.rd_data,
+            rs2_cdb_hit.select(
+                rs2_cdb_data,
                 rob.value[rs2_rob_tag]
             ),
             regs[rs2]
@@ -163,7 +184,7 @@ def decoder_logic(inst, reg_pending : RegArray, regs: RegArray
     # log("decoder: rd_used = {} , rd = {}", rd_used, rd)
     # log("decoder: imm_used = {} , imm = {}", imm_used, imm)
     # log("decoder: mem_read = {} , mem_write = {} , is_branch = {} , branch_type = {}", mem_read, mem_write, is_branch, branch_type)
-    log("decoder: alu_type(onehot)={:014b}", alu_type)
+    log_debug("decoder: alu_type(onehot)={:014b}", alu_type)
 
     return deocder_signals.bundle(
         rs1=rs1,
@@ -179,6 +200,9 @@ def decoder_logic(inst, reg_pending : RegArray, regs: RegArray
         imm=imm,
         imm_used=imm_used,
         alu_type=alu_type,
+        is_mul=is_M & ~is_div,
+        is_div=is_div,
+        mdu_type=mdu_type,
         mem_read=mem_read,
         mem_write=mem_write,
         is_branch=is_branch,
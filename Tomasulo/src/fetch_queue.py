@@ -0,0 +1,48 @@
+from assassyn.frontend import *
+from .config import CPUConfig
+from .predictor import RAS_IDX_WIDTH
+
+# 取指队列：把取指和发射解耦。FetcherImpl 只要队列放得下就继续按预测路径取指，
+# 到达的指令组（只保留预测路径上的指令）在 IsserImpl 里按序入队；IsserImpl 每周期
+# 从队首起（队列为空时直接取本周期到达的指令）按程序顺序发射最多 W 条，
+# 后端阻塞时指令留在队列里，不再回送 stall_pc 重新取指。
+# 提交发现预测错误时整个队列清空。
+
+
+class FetchQueue:
+    def __init__(self, config: CPUConfig):
+        self.size = config.fetch_queue_size
+        self.idx_width = (self.size - 1).bit_length()
+        # 队列占用数需要能表示 size 本身
+        self.count_width = self.idx_width + 1
+        # 环形队列指针与占用数
+        self.head = RegArray(UInt(self.idx_width), 1, initializer=[0])
+        self.tail = RegArray(UInt(self.idx_width), 1, initializer=[0])
+        self.count = RegArray(UInt(self.count_width), 1, initializer=[0])
+
+        self.instr = RegArray(Bits(32), self.size, initializer=[0] * self.size)
+        self.pc = RegArray(UInt(32), self.size, initializer=[0] * self.size)
+        # 取指时预测的下一条 pc，发射时写入 ROB
+        self.pred_pc = RegArray(UInt(32), self.size, initializer=[0] * self.size)
+        # 取指之后的 RAS 栈顶指针和栈顶项，分支发射时存进检查点
+        self.ras_top = RegArray(UInt(RAS_IDX_WIDTH), self.size, initializer=[0] * self.size)
+        self.ras_value = RegArray(UInt(32), self.size, initializer=[0] * self.size)
+
+        # 统计：每周期占用数之和、统计的周期数、队列放不下而暂停取指的周期数，ebreak 时打印
+        self.occupancy_sum = RegArray(UInt(32), 1, initializer=[0])
+        self.cycles = RegArray(UInt(32), 1, initializer=[0])
+        self.full_cycles = RegArray(UInt(32), 1, initializer=[0])
+
+    def index(self, base, k) -> Value:
+        """环形队列中 base 之后第 k 项的下标（k 为整数或 count_width 位的 Value）。"""
+        if isinstance(k, int):
+            k = UInt(self.count_width)(k)
+        offset = k[0:self.idx_width - 1].bitcast(UInt(self.idx_width))
+        return ((base + offset) & UInt(self.idx_width)(self.size - 1)).bitcast(UInt(self.idx_width))
+
+    def can_fetch(self, width) -> Bits:
+        """
+        本周期能否再取一组：上一周期取的那组还在路上（本周期才入队），
+        所以要给两组留位置。
+        """
+        return self.count[0] <= UInt(self.count_width)(self.size - 2 * width)
@@ -14,11 +14,24 @@ from assassyn.utils import run_simulator, run_verilator
 from .decoder import decoder_logic
 from .ROB import *
 from .RS import *
+from .mdu import MDUStation, MulUnit, Divider, MDU_downstream
 from .LSQ import *
+from .rename_checkpoint import BranchCheckpoints
+from .prefetcher import StridePrefetcher, PREFETCH_TABLE_SIZE
 from .commit import *
 from .arbitrator import *
-
-ROB_MASK = (1 << ROB_IDX_WIDTH) - 1
+from .predictor import BranchPredictor, BHT_SIZE, BTB_SIZE, RAS_SIZE, RAS_IDX_WIDTH
+from .config import CPUConfig, CacheConfig, ROB_SIZE, ISSUE_WIDTH, FETCH_QUEUE_SIZE, RS_ENTRIES, ALU_COUNT, \
+    MUL_LATENCY, MDU_RS_ENTRIES, BRANCH_CHECKPOINTS, PREFETCH_DISTANCE, LSQ_SIZE, CDB_LANES, \
+    STORE_BUFFER_SIZE
+from .store_buffer import StoreBuffer
+from .fetch_queue import FetchQueue
+from .cache import CacheModel
+from . import verbosity
+from .verbosity import log_commit, log_info, log_debug
+from scripts import checkpoint as checkpoints
+from scripts import cosim, iss, sim_cache
+from scripts.log_analyzer import LogAnalyzer, SUMMARY_NAME
 
 class MemeoryAccess(Downstream):
     def __init__(self):
@@ -45,7 +58,7 @@ class MemeoryAccess(Downstream):
         word_addr = ((addr - data_base) >> UInt(32)(2)).bitcast(UInt(32))
         conflict = mem_read & mem_write
         with Condition(conflict):
-            log("MEM conflict: mem_read & mem_write both asserted, read_addr=0x{:08x} write_addr=0x{:08x}", read_addr, write_addr)
+            log_commit("MEM conflict: mem_read & mem_write both asserted, read_addr=0x{:08x} write_addr=0x{:08x}", read_addr, write_addr)
             finish()
         dcache.build(
             we = mem_write,
@@ -55,163 +68,349 @@ class MemeoryAccess(Downstream):
         )
 
 class Issuer(Module):
-    def __init__(self):
-        super().__init__(
-            ports={
-                "pc_addr": Port(UInt(32))
-            }
-        )
+    def __init__(self, width=1):
+        # 每个取指组：起始 pc，加上每条指令是否在预测路径上、预测的下一条 pc、取指之后的 RAS 栈顶
+        ports = {"pc_addr": Port(UInt(32))}
+        for k in range(width):
+            ports[f"valid{k}"] = Port(Bits(1))
+            # 取指时预测的下一条 pc，随指令一起进入 ROB
+            ports[f"pred_pc{k}"] = Port(UInt(32))
+            # 分支 issue 时存进检查点，恢复时修复推测 RAS
+            ports[f"ras_top{k}"] = Port(UInt(RAS_IDX_WIDTH))
+            ports[f"ras_value{k}"] = Port(UInt(32))
+        super().__init__(ports=ports)
+        self.width = width
     @module.combinational
     def build(self,
-              icache: SRAM,
+              icache: list[SRAM],
               ):
-        pc_addr = self.pop_all_ports(True)
-        instr = icache.dout[0]
+        pc_addr, *slots = self.pop_all_ports(True)
+        valid = slots[0::4]
+        pred_pc = slots[1::4]
+        ras = list(zip(slots[2::4], slots[3::4]))
+        instr = [icache[k].dout[0] for k in range(self.width)]
         re = (pc_addr != UInt(32)(0)).select(Bits(1)(1), Bits(1)(1))
-        return pc_addr, instr, re
+        return pc_addr, valid, pred_pc, ras, instr, re
 class IsserImpl(Downstream):
     def __init__(self):
         super().__init__()
     @downstream.combinational
     def build(self,
               pc_addr: Value,
-              instr: Value,
+              valid: list,
+              pred_pc: list,
+              ras: list,
+              instr: list,
               re: Value,
+              fq: FetchQueue,
               rob: ROB,
-              rs: list[RSEntry],
-              lsq: LSQEntry,
+              rs: RSPool,
+              mul_rs: MDUStation,
+              div_rs: MDUStation,
+              lsq: LSQ,
+              ckpt: BranchCheckpoints,
               reg_pending: RegArray,
               regs: RegArray,
-              cbd_signal: Value):
+              cbd_signal: list,
+              metadata: Value,
+              retired: list,
+              flush: Value):
+        width = len(instr)
+        # 取指队列里可能还有指令，没有新指令到达的周期也要发射：依赖 metadata 保证每周期触发
+        metadata = metadata.optional(default=Bits(8)(0))
+        _ = metadata == metadata
         re = re.optional(default=Bits(1)(0))
         pc_addr = pc_addr.optional(default=UInt(32)(0))
-        instr = instr.optional(default=Bits(32)(0))
-        # 默认保持不阻塞，只有在 re 有效且分析出冲突时才更新
+        valid = [v.optional(default=Bits(1)(0)) for v in valid]
+        pred_pc = [p.optional(default=UInt(32)(0)) for p in pred_pc]
+        ras = [(top.optional(default=UInt(RAS_IDX_WIDTH)(0)), value.optional(default=UInt(32)(0))) for top, value in ras]
+        instr = [i.optional(default=Bits(32)(0)) for i in instr]
+        # 提交阶段发现预测错误或分支恢复时，队列里和本周期到达的指令都来自错误路径，不发射
+        flush = flush.optional(default=Bits(1)(0))
+        squash = ckpt.squashing(flush)
+        redirect = flush | squash
+        # Commiter 本周期提交的 ROB 项，恢复重命名表时它们的标签不再有效
+        retired = [(valid.optional(default=Bits(1)(0)), rob_idx.optional(default=UInt(rob.idx_width)(0)))
+                   for valid, rob_idx in retired]
+        ckpt.restore(rob, reg_pending, retired, flush)
+        CBD_signal = cdb_record(rob.tag_width)
+        cbd = []
+        for lane in cbd_signal:
+            cbd_payload = lane.value().optional(default=CBD_signal.bundle(
+                ROB_idx=UInt(rob.tag_width)(0),
+                rd_data=UInt(32)(0),
+                valid=Bits(1)(0),
+            ).value())
+            cbd.append(CBD_signal.view(cbd_payload))
+
+        # 本周期到达的取指组：预测路径上的指令是组内的一个前缀
+        arrive = [re & ~redirect & valid[a] for a in range(width)]
+        n_arrive = UInt(fq.count_width)(0)
+        for a in range(width):
+            n_arrive = arrive[a].select((n_arrive + UInt(fq.count_width)(1)).bitcast(UInt(fq.count_width)), n_arrive)
+
+        # 发射候选：先是队首起的 count 条，之后接本周期到达的指令（不必先入队再发射）
+        count = fq.count[0]
+        cand_valid = []
+        cand_pc = []
+        cand_pred_pc = []
+        cand_ras = []
+        cand_instr = []
+        for k in range(width):
+            c_valid = Bits(1)(0)
+            c_pc = UInt(32)(0)
+            c_pred_pc = UInt(32)(0)
+            c_ras_top = UInt(RAS_IDX_WIDTH)(0)
+            c_ras_value = UInt(32)(0)
+            c_instr = Bits(32)(0)
+            for a in range(k + 1):
+                from_arrival = count == UInt(fq.count_width)(k - a)
+                c_valid = from_arrival.select(arrive[a], c_valid)
+                c_pc = from_arrival.select(pc_addr + UInt(32)(4 * a), c_pc)
+                c_pred_pc = from_arrival.select(pred_pc[a], c_pred_pc)
+                c_ras_top = from_arrival.select(ras[a][0], c_ras_top)
+                c_ras_value = from_arrival.select(ras[a][1], c_ras_value)
+                c_instr = from_arrival.select(instr[a], c_instr)
+            queued = count > UInt(fq.count_width)(k)
+            q = fq.index(fq.head[0], k)
+            cand_valid.append(queued.select(~redirect, c_valid))
+            cand_pc.append(queued.select(fq.pc[q], c_pc))
+            cand_pred_pc.append(queued.select(fq.pred_pc[q], c_pred_pc))
+            cand_ras.append((queued.select(fq.ras_top[q], c_ras_top), queued.select(fq.ras_value[q], c_ras_value)))
+            cand_instr.append(queued.select(fq.instr[q], c_instr))
+
+        # 候选按程序顺序发射：第 k 条只有在前 k 条都发射时才发射，
+        # 第 k 条分到 ROB 的 tail+k，RS/LSQ/检查点则跳过组内前面指令占用的表项
+        decoded = []
+        rob_idx = []
+        rs_select = []
+        mul_select = []
+        div_select = []
+        ckpt_select = []
+        lsq_idx = []
+        issue = []
+        # 第 k 条之后的重命名表：reg_pending 加上组内第 0..k 条的 rd，分支的检查点存它
+        rename = [reg_pending[r] for r in range(32)]
+        renamed = []
         stall = Bits(1)(0)
-        stall_pc = UInt(32)(0)
-        stop_signal = Bits(1)(0)
-        cbd_payload = cbd_signal.value().optional(default=CBD_signal.bundle(
-            ROB_idx=UInt(4)(0),
-            rd_data=UInt(32)(0),
-            valid=Bits(1)(0),
-        ).value())
-        cbd = CBD_signal.view(cbd_payload)
-        
-        decoder_result = decoder_logic(
-            instr,
-            reg_pending = reg_pending,
-            regs=regs,
-            rob = rob,
-            cbd = cbd,
-        )
+        ckpt_full = Bits(1)(0)
+        prev_issue = ~redirect
+        n_rs = UInt(rs.idx_width)(0)
+        n_mul = UInt(mul_rs.idx_width)(0)
+        n_div = UInt(div_rs.idx_width)(0)
+        n_br = UInt(ckpt.idx_width)(0)
+        n_lsq = UInt(lsq.idx_width)(0)
+        n_issue = UInt(fq.count_width)(0)
+        for k in range(width):
+            decoder_result = decoder_logic(
+                cand_instr[k],
+                reg_pending = reg_pending,
+                regs=regs,
+                rob = rob,
+                cbd = cbd,
+            )
+            is_mem = decoder_result.mem_read | decoder_result.mem_write
+            is_mul = decoder_result.is_mul
+            is_div = decoder_result.is_div
+            is_alu = ~is_mem & ~is_mul & ~is_div
+            # 各保留站里第 n 个空闲表项（n 为组内前面指令已占用的个数）
+            RS_select = rs.select_free(n_rs)
+            MUL_select = mul_rs.select_free(n_mul)
+            DIV_select = div_rs.select_free(n_div)
+            # 分支还要占一个检查点
+            is_branch = decoder_result.is_branch
+            CKPT_select = ckpt.select_free(n_br)
+            ckpt_room = ~is_branch | (CKPT_select != Bits(ckpt.idx_width)(ckpt.none))
+            slot = ((lsq.tail[0] + n_lsq) & UInt(lsq.idx_width)(lsq.mask)).bitcast(UInt(lsq.idx_width))
+            room = rob.has_room(k) & ckpt_room & is_mem.select(~lsq.busy[slot],
+                                   is_mul.select(MUL_select != Bits(mul_rs.idx_width)(mul_rs.none),
+                                   is_div.select(DIV_select != Bits(div_rs.idx_width)(div_rs.none),
+                                                 RS_select != Bits(rs.idx_width)(rs.none))))
+            issue_k = prev_issue & cand_valid[k] & room
+            # 资源不足的指令及其后的指令留在取指队列里，下周期再试
+            blocked = prev_issue & cand_valid[k] & ~room
+            stall = stall | blocked
+            ckpt_full = ckpt_full | (prev_issue & cand_valid[k] & ~ckpt_room)
+            writes_rd = decoder_result.rd_used & (decoder_result.rd != Bits(5)(0))
+            for r in range(32):
+                rename[r] = (writes_rd & (decoder_result.rd == Bits(5)(r))).select(
+                    rob.pending(rob.index(rob.tail[0], k)), rename[r])
+            renamed.append(list(rename))
+            with Condition(cand_valid[k]):
+                log_info("issuer: pc=0x{:08x} instr=0x{:08x} is_mem={} stall={}", cand_pc[k], cand_instr[k], is_mem, blocked)
+            decoded.append(decoder_result)
+            rob_idx.append(rob.index(rob.tail[0], k))
+            rs_select.append(RS_select)
+            mul_select.append(MUL_select)
+            div_select.append(DIV_select)
+            ckpt_select.append(CKPT_select)
+            lsq_idx.append(slot)
+            issue.append(issue_k)
+            n_rs = (issue_k & is_alu).select((n_rs + UInt(rs.idx_width)(1)).bitcast(UInt(rs.idx_width)), n_rs)
+            n_mul = (issue_k & is_mul).select((n_mul + UInt(mul_rs.idx_width)(1)).bitcast(UInt(mul_rs.idx_width)), n_mul)
+            n_div = (issue_k & is_div).select((n_div + UInt(div_rs.idx_width)(1)).bitcast(UInt(div_rs.idx_width)), n_div)
+            n_br = (issue_k & is_branch).select((n_br + UInt(ckpt.idx_width)(1)).bitcast(UInt(ckpt.idx_width)), n_br)
+            n_lsq = (issue_k & is_mem).select((n_lsq + UInt(lsq.idx_width)(1)).bitcast(UInt(lsq.idx_width)), n_lsq)
+            n_issue = issue_k.select((n_issue + UInt(fq.count_width)(1)).bitcast(UInt(fq.count_width)), n_issue)
+            prev_issue = issue_k
+
+        next_tail = rob.tail[0]
+        for k in range(width):
+            next_tail = issue[k].select(rob.index(rob.tail[0], k + 1), next_tail)
+        with Condition(issue[0]):
+            rob.tail[0] <= next_tail
+            lsq.tail[0] <= ((lsq.tail[0] + n_lsq) & UInt(lsq.idx_width)(lsq.mask)).bitcast(UInt(lsq.idx_width))
+
+        with Condition(ckpt_full):
+            ckpt.full_cycles[0] <= ckpt.full_cycles[0] + UInt(32)(1)
+
+        for k in range(width):
+            self.issue_one(k, cand_pc, cand_pred_pc[k], decoded, rob_idx, issue, rs_select[k], mul_select[k],
+                           div_select[k], lsq_idx[k], rob, rs, mul_rs, div_rs, lsq, reg_pending)
+            with Condition(issue[k] & decoded[k].is_branch):
+                # 分支之后的 LSQ tail：组内更早的访存已占用 lsq_idx[k] 之前的表项
+                ckpt.allocate(ckpt_select[k].bitcast(UInt(ckpt.idx_width)), rob_idx[k], lsq_idx[k], renamed[k],
+                              cand_ras[k])
+
+        # 取指队列：到达的指令占 tail 之后的位置，其中已经直接发射掉的不再写入；队首前进 n_issue
+        with Condition(redirect):
+            fq.head[0] <= UInt(fq.idx_width)(0)
+            fq.tail[0] <= UInt(fq.idx_width)(0)
+            fq.count[0] <= UInt(fq.count_width)(0)
+        with Condition(~redirect):
+            for a in range(width):
+                consumed = Bits(1)(0)
+                for k in range(a, width):
+                    consumed = consumed | (issue[k] & (count == UInt(fq.count_width)(k - a)))
+                with Condition(arrive[a] & ~consumed):
+                    e = fq.index(fq.tail[0], a)
+                    fq.instr[e] <= instr[a]
+                    fq.pc[e] <= pc_addr + UInt(32)(4 * a)
+                    fq.pred_pc[e] <= pred_pc[a]
+                    fq.ras_top[e] <= ras[a][0]
+                    fq.ras_value[e] <= ras[a][1]
+            fq.head[0] <= fq.index(fq.head[0], n_issue)
+            fq.tail[0] <= fq.index(fq.tail[0], n_arrive)
+            fq.count[0] <= (count + n_arrive - n_issue).bitcast(UInt(fq.count_width))
+        fq.occupancy_sum[0] <= fq.occupancy_sum[0] + count.zext(UInt(32))
+        fq.cycles[0] <= fq.cycles[0] + UInt(32)(1)
+        # 输出给 RS/LSQ downstream 作为调度依赖
+        return stall
+
+    def issue_one(self, k, pcs, pred_pc, decoded, rob_idx, issue, RS_select, MUL_select, DIV_select, lsq_idx,
+                  rob, rs, mul_rs, div_rs, lsq, reg_pending):
+        """把组内第 k 条指令写入 ROB/RS/乘除法保留站/LSQ 并更新 reg_pending。"""
+        decoder_result = decoded[k]
+        pc_addr = pcs[k]
         is_mem = decoder_result.mem_read | decoder_result.mem_write
-        rs_busy = rs[0].busy[0]
-        for i in range(1, RS_ENTRY_NUM):
-            rs_busy = rs_busy & rs[i].busy[0]
-        stall = (rob.is_full() | is_mem.select(lsq.busy[0], rs_busy)) & re
-        stop_signal = (~stall & decoder_result.is_branch) & re
-        with Condition(re == Bits(1)(1)):
-            log("issuer: pc=0x{:08x} instr=0x{:08x} is_mem={} stall={}", pc_addr, instr, is_mem, stall)
-
-            with Condition(~stall):
-                rob_idx = rob.tail[0]
-                next_tail = ((rob.tail[0] + UInt(ROB_IDX_WIDTH)(1)) & UInt(ROB_IDX_WIDTH)(ROB_MASK)).bitcast(UInt(ROB_IDX_WIDTH))
-                rob.tail[0] <= next_tail
-                rob.busy[rob_idx] <= Bits(1)(1)
-                rob.ready[rob_idx] <= Bits(1)(0)
-                rob.pc[rob_idx] <= pc_addr
-                rob.dest[rob_idx] <= decoder_result.rd
-                rob.value[rob_idx] <= UInt(32)(0)
-                rob.is_branch[rob_idx] <= decoder_result.is_branch
-                rob.is_syscall[rob_idx] <= decoder_result.is_ecall | decoder_result.is_ebreak
-                rob.is_store[rob_idx] <= decoder_result.mem_write
-
-                # 生成源操作数的依赖信息，reg_pending 用 0 表示无依赖，其余存 rob_idx+1
-                # decoder 已经旁路 CDB/ROB/寄存器，这里只做 tag/valid 封装
-                qj_raw = decoder_result.rs1_used.select(reg_pending[decoder_result.rs1], Bits(REG_PENDING_WIDTH)(0))
-                qk_raw = decoder_result.rs2_used.select(reg_pending[decoder_result.rs2], Bits(REG_PENDING_WIDTH)(0))
-                # 只有 reg_pending 非 0 时才减 1，避免 0-1 下溢变成 0xff 传给 LSQ/RS
-                qj = (qj_raw != Bits(REG_PENDING_WIDTH)(0)).select(
-                    (qj_raw - Bits(REG_PENDING_WIDTH)(1)).bitcast(Bits(REG_PENDING_WIDTH)),
-                    Bits(REG_PENDING_WIDTH)(0)
-                )
-                qk = (qk_raw != Bits(REG_PENDING_WIDTH)(0)).select(
-                    (qk_raw - Bits(REG_PENDING_WIDTH)(1)).bitcast(Bits(REG_PENDING_WIDTH)),
-                    Bits(REG_PENDING_WIDTH)(0)
+        is_mdu = decoder_result.is_mul | decoder_result.is_div
+        writes_rd = [d.rd_used & (d.rd != Bits(5)(0)) for d in decoded]
+        with Condition(issue[k]):
+            idx = rob_idx[k]
+            rob.busy[idx] <= Bits(1)(1)
+            rob.ready[idx] <= Bits(1)(0)
+            rob.pc[idx] <= pc_addr
+            rob.dest[idx] <= decoder_result.rd
+            rob.value[idx] <= UInt(32)(0)
+            rob.is_branch[idx] <= decoder_result.is_branch
+            rob.is_syscall[idx] <= decoder_result.is_ecall | decoder_result.is_ebreak
+            rob.is_store[idx] <= decoder_result.mem_write
+            rob.pred_pc[idx] <= pred_pc
+            rob.is_call[idx] <= (decoder_result.is_jal | decoder_result.is_jalr) & (decoder_result.rd == Bits(5)(1))
+            rob.is_ret[idx] <= decoder_result.is_jalr & (decoder_result.rd == Bits(5)(0)) & (decoder_result.rs1 == Bits(5)(1))
+            # 非分支指令的下一条就是 pc+4；分支的实际去向由 CDB 改写
+            rob.next_pc[idx] <= pc_addr + UInt(32)(4)
+
+            # 生成源操作数的依赖信息，reg_pending 用 0 表示无依赖，其余存 rob_idx+1
+            # decoder 已经旁路 CDB/ROB/寄存器，这里只做 tag/valid 封装
+            qj_raw = decoder_result.rs1_used.select(reg_pending[decoder_result.rs1], Bits(rob.tag_width)(0))
+            qk_raw = decoder_result.rs2_used.select(reg_pending[decoder_result.rs2], Bits(rob.tag_width)(0))
+            # 只有 reg_pending 非 0 时才减 1，避免 0-1 下溢变成 0xff 传给 LSQ/RS
+            qj = (qj_raw != Bits(rob.tag_width)(0)).select(
+                (qj_raw - Bits(rob.tag_width)(1)).bitcast(Bits(rob.tag_width)),
+                Bits(rob.tag_width)(0)
+            )
+            qk = (qk_raw != Bits(rob.tag_width)(0)).select(
+                (qk_raw - Bits(rob.tag_width)(1)).bitcast(Bits(rob.tag_width)),
+                Bits(rob.tag_width)(0)
+            )
+            rs1_val = decoder_result.rs1_value
+            rs2_val = decoder_result.rs2_value
+            qj_valid = decoder_result.rs1_valid
+            qk_valid = decoder_result.rs2_valid
+            # 同组里更早的指令本周期才写 rd，reg_pending 还看不到：改为依赖它的 ROB 项（取最近的一条）
+            for j in range(k):
+                rs1_dep = writes_rd[j] & decoder_result.rs1_used & (decoder_result.rs1 == decoded[j].rd)
+                rs2_dep = writes_rd[j] & decoder_result.rs2_used & (decoder_result.rs2 == decoded[j].rd)
+                tag_j = rob.tag(rob_idx[j])
+                qj = rs1_dep.select(tag_j, qj)
+                qk = rs2_dep.select(tag_j, qk)
+                qj_valid = rs1_dep.select(Bits(1)(0), qj_valid)
+                qk_valid = rs2_dep.select(Bits(1)(0), qk_valid)
+
+            # 重命名表写入 rd（存 rob_idx+1，0 作为 sentinel）；同组更晚的指令写同一个 rd 时以它为准
+            renamed_later = Bits(1)(0)
+            for j in range(k + 1, len(decoded)):
+                renamed_later = renamed_later | (issue[j] & writes_rd[j] & (decoded[j].rd == decoder_result.rd))
+            with Condition(writes_rd[k] & ~renamed_later):
+                reg_pending[decoder_result.rd] <= rob.pending(idx)
+
+            with Condition(is_mem):
+                # LSQ 入口：按程序顺序在 tail 之后分配
+                log_info("issuer -> LSQ: lsq_idx={} rob_idx={} rd={} rs1_dep={} rs2_dep={}", lsq_idx, idx, decoder_result.rd, qj, qk)
+                lsq.busy[lsq_idx] <= Bits(1)(1)
+                lsq.fired[lsq_idx] <= Bits(1)(0)
+                lsq.is_load[lsq_idx] <= decoder_result.mem_read
+                lsq.is_store[lsq_idx] <= decoder_result.mem_write
+                lsq.rob_idx[lsq_idx] <= rob.tag(idx)
+                lsq.rd[lsq_idx] <= decoder_result.rd
+                lsq.pc[lsq_idx] <= pc_addr
+                lsq.qj[lsq_idx] <= qj
+                lsq.qk[lsq_idx] <= qk
+                lsq.qj_valid[lsq_idx] <= qj_valid
+                lsq.qk_valid[lsq_idx] <= qk_valid
+                lsq.vj[lsq_idx] <= rs1_val
+                lsq.vk[lsq_idx] <= rs2_val
+                lsq.rs2_id[lsq_idx] <= decoder_result.rs2
+                lsq.imm[lsq_idx] <= decoder_result.imm.bitcast(UInt(32))
+            for mdu_rs, select, is_unit in ((mul_rs, MUL_select, decoder_result.is_mul),
+                                            (div_rs, DIV_select, decoder_result.is_div)):
+                with Condition(is_unit):
+                    # 乘法器/除法器各自的保留站，操作数就是 rs1/rs2
+                    log_info("issuer -> MDU: rob_idx={} rd={} rs1_dep={} rs2_dep={}", idx, decoder_result.rd, qj, qk)
+                    mdu_rs.allocate(select.bitcast(UInt(mdu_rs.idx_width)), decoder_result.mdu_type,
+                                    rs1_val, rs2_val, qj, qk, qj_valid, qk_valid, rob.tag(idx))
+            with Condition(~is_mem & ~is_mdu):
+                # RS 入口
+                log_debug("select RS idx = {}", RS_select)
+                log_info("issuer -> RS: rob_idx={} rd={} rs1_dep={} rs2_dep={}", idx, decoder_result.rd, qj, qk)
+                e = RS_select.bitcast(UInt(rs.idx_width))
+                rs.busy[e] <= Bits(1)(1)
+                rs.op[e] <= decoder_result.alu_type
+                # op1/op2 特殊处理：LUI 用 0+imm，AUIPC 用 pc+imm，其余保持 rs1/rs2 或 imm
+                op1_val = rs1_val
+                op1_val = decoder_result.is_lui.select(UInt(32)(0),
+                            decoder_result.is_auipc.select(pc_addr, op1_val))
+                rs.vj[e] <= op1_val
+                op2_val = decoder_result.rs2_used.select(
+                    rs2_val,
+                    decoder_result.imm.bitcast(UInt(32))
                 )
-                rs1_val = decoder_result.rs1_value
-                rs2_val = decoder_result.rs2_value
-                qj_valid = decoder_result.rs1_valid
-                qk_valid = decoder_result.rs2_valid
-
-                # 重命名表写入 rd（存 rob_idx+1，0 作为 sentinel）
-                with Condition(decoder_result.rd_used & (decoder_result.rd != Bits(5)(0))):
-                    reg_pending[decoder_result.rd] <= (rob_idx + UInt(ROB_IDX_WIDTH)(1)).bitcast(Bits(REG_PENDING_WIDTH))
-
-                with Condition(is_mem):
-                    # LSQ 入口
-                    log("issuer -> LSQ: rob_idx={} rd={} rs1_dep={} rs2_dep={}", rob_idx, decoder_result.rd, qj, qk)
-                    lsq.busy[0] <= Bits(1)(1)
-                    lsq.is_load[0] <= decoder_result.mem_read
-                    lsq.is_store[0] <= decoder_result.mem_write
-                    lsq.rob_idx[0] <= rob_idx.zext(Bits(4))
-                    lsq.rd[0] <= decoder_result.rd
-                    lsq.qj[0] <= qj
-                    lsq.qk[0] <= qk
-                    lsq.qj_valid[0] <= qj_valid
-                    lsq.qk_valid[0] <= qk_valid
-                    lsq.vj[0] <= rs1_val
-                    lsq.vk[0] <= rs2_val
-                    lsq.rs2_id[0] <= decoder_result.rs2
-                    lsq.imm[0] <= decoder_result.imm.bitcast(UInt(32))
-                with Condition(~is_mem):
-                    RS_select = Bits(RS_NUM_WIDTH)(RS_MAX) # 不存在的初始值
-                    for i in range(RS_ENTRY_NUM):
-                        RS_select = (rs[i].busy[0]).select(RS_select, Bits(RS_NUM_WIDTH)(i))
-                    with Condition(RS_select == Bits(RS_NUM_WIDTH)(RS_MAX)):
-                        log("issuer error: no free RS found")
-                        finish()
-                    # RS 入口
-                    log("select RS idx = {}", RS_select)
-                    log("issuer -> RS: rob_idx={} rd={} rs1_dep={} rs2_dep={}", rob_idx, decoder_result.rd, qj, qk)
-                    for i in range(RS_ENTRY_NUM):
-                        with Condition(RS_select == Bits(RS_NUM_WIDTH)(i)):
-                            rs[i].busy[0] <= Bits(1)(1)
-                            rs[i].op[0] <= decoder_result.alu_type
-                            # op1/op2 特殊处理：LUI 用 0+imm，AUIPC 用 pc+imm，其余保持 rs1/rs2 或 imm
-                            op1_val = rs1_val
-                            op2_val = decoder_result.rs2_used.select(
-                                rs2_val,
-                                decoder_result.imm.bitcast(UInt(32))
-                            )
-                            op1_val = decoder_result.is_lui.select(UInt(32)(0),
-                                        decoder_result.is_auipc.select(pc_addr, op1_val))
-                            rs[i].vj[0] <= op1_val
-                            op2_val = decoder_result.rs2_used.select(
-                                rs2_val,
-                                decoder_result.imm.bitcast(UInt(32))
-                            )
-                            rs[i].vk[0] <= op2_val
-                            rs[i].qj[0] <= qj
-                            rs[i].qk[0] <= qk
-                            rs[i].qj_valid[0] <= qj_valid
-                            rs[i].qk_valid[0] <= qk_valid
-                            rs[i].rd[0] <= decoder_result.rd
-                            rs[i].rob_idx[0] <= rob_idx.zext(Bits(4))
-                            rs[i].imm[0] <= decoder_result.imm.bitcast(UInt(32))
-                            rs[i].is_branch[0] <= decoder_result.is_branch
-                            rs[i].is_jal[0] <= decoder_result.is_jal
-                            rs[i].is_jalr[0] <= decoder_result.is_jalr
-                            rs[i].is_lui[0] <= decoder_result.is_lui
-                            rs[i].is_auipc[0] <= decoder_result.is_auipc
-                            rs[i].pc_addr[0] <= pc_addr
-                            rs[i].is_syscall[0] <= decoder_result.is_ecall | decoder_result.is_ebreak
-
-            # 输出给 fetcherimpl 的握手/停顿信号
-            stall_pc = pc_addr
-            # 分支指令发射后暂停取指，等待 ALU 计算出跳转目标再由 start_signal 重新启动
-        # re 为 0 时直接保持默认值 0；只有 re 为 1 时上面的 Condition 会覆盖
-        return stall, stall_pc, stop_signal
+                rs.vk[e] <= op2_val
+                rs.qj[e] <= qj
+                rs.qk[e] <= qk
+                rs.qj_valid[e] <= qj_valid
+                rs.qk_valid[e] <= qk_valid
+                rs.rd[e] <= decoder_result.rd
+                rs.rob_idx[e] <= rob.tag(idx)
+                rs.imm[e] <= decoder_result.imm.bitcast(UInt(32))
+                rs.is_branch[e] <= decoder_result.is_branch
+                rs.is_jal[e] <= decoder_result.is_jal
+                rs.is_jalr[e] <= decoder_result.is_jalr
+                rs.is_lui[e] <= decoder_result.is_lui
+                rs.is_auipc[e] <= decoder_result.is_auipc
+                rs.pc_addr[e] <= pc_addr
+                rs.is_syscall[e] <= decoder_result.is_ecall | decoder_result.is_ebreak
 
 class Fetcher(Module):
     def __init__(self):
@@ -219,8 +418,8 @@ class Fetcher(Module):
             ports={}
         )
     @module.combinational
-    def build(self):
-        pc_reg = RegArray(UInt(32), 1, initializer=[0])
+    def build(self, init_pc=0):
+        pc_reg = RegArray(UInt(32), 1, initializer=[init_pc])
         pc_addr = pc_reg[0]
         return pc_reg, pc_addr
 
@@ -229,43 +428,69 @@ class FetcherImpl(Downstream):
         super().__init__()
     @downstream.combinational
     def build(self,
-            icache: SRAM,
+            icache: list[SRAM],
             pc_reg: RegArray,
             pc_addr: Value,
-            stall: Value,
-            stall_pc: Value,
-            stop_signal: Value,
-            start_signal: Value,
-            target_pc: Value,
+            fq: FetchQueue,
+            ic: CacheModel,
+            ckpt: BranchCheckpoints,
+            flush: Value,
+            redirect_pc: Value,
+            ras_repair: tuple,
+            predictor: BranchPredictor,
             issuer: Issuer):
-        stall = stall.optional(default=Bits(1)(0))
-        stall_pc = stall_pc.optional(default=UInt(32)(0))
-        stop_signal = stop_signal.optional(default=Bits(1)(0))
+        # 上一周期取指队列放不下或 icache 缺失、没有取指：本周期重取同一组，预测器据此撤销上次的 RAS 推测更新
+        held = RegArray(Bits(1), 1, initializer=[0])
         pc_addr = pc_addr.optional(default=UInt(32)(0))
-        start_signal = start_signal.optional(default=Bits(1)(0))
-        target_pc = target_pc.optional(default=UInt(32)(0))
-        re_reg = RegArray(Bits(1), 1, initializer=[1])
-        start_effective = start_signal & (~re_reg[0])  # 只在 re_reg 处于停住状态时响应 start
-        fetch_pc = stall.select(stall_pc,
-                                   start_effective.select(target_pc, pc_addr))
-        re = stall.select(
-            Bits(1)(1),
-            start_effective.select(Bits(1)(1),
-            stop_signal.select(
-                Bits(1)(0), re_reg[0]
-            )
-        ))
-        re_reg[0] <= re
+        flush = flush.optional(default=Bits(1)(0))
+        redirect_pc = redirect_pc.optional(default=UInt(32)(0))
+        ras_top, ras_push, ras_push_value = ras_repair
+        ras_repair = (ras_top.optional(default=UInt(RAS_IDX_WIDTH)(0)),
+                      ras_push.optional(default=Bits(1)(0)),
+                      ras_push_value.optional(default=UInt(32)(0)))
+        width = len(icache)
+        # 分支恢复：从 CDB 仲裁器登记的正确 pc 重新取指
+        squash = ckpt.squashing(flush)
+        # 优先级：提交时的预测错误重定向 > 分支恢复 > 预测的下一组起始 pc
+        fetch_pc = flush.select(redirect_pc, squash.select(ckpt.recover_pc[0], pc_addr))
+        # 冲刷/恢复会清空取指队列，总能取指；否则要等队列放得下
+        room = flush | squash | fq.can_fetch(width)
+        # icache 时序模型：本组最多跨两行，首尾两行都命中才取指；
+        # 缺失时分配 MSHR，行回填之前保持 pc 不动（已有 MSHR 在取的行不再重复访问、不计数）
+        last_pc = fetch_pc + UInt(32)(4 * (width - 1))
+        lookup_pc = ic.hit(fetch_pc).select(last_pc, fetch_pc)
+        waiting = ic.pending(lookup_pc)
+        icache_hit, _ = ic.access(room & ~waiting, lookup_pc)
+        ic.tick()
+        fetch = room & ~waiting & icache_hit
+        # 每周期取一组连续的 width 条，遇到预测跳转的指令结束本组；下一组 pc 由 BHT/BTB/RAS 预测
+        # 提交冲刷时推测 RAS 退回提交侧状态，分支恢复时换回分支检查点里的栈顶
+        valid, pred_pc, next_pc, ras = predictor.predict(fetch_pc, width, flush, squash, held[0], ras_repair,
+                                                         ckpt.recover_ras())
         word_addr = (fetch_pc >> UInt(32)(2)).bitcast(UInt(32))
-        icache.build(we = Bits(1)(0),
-                     re = re,
-                     addr = word_addr.bitcast(Bits(icache.addr_width)),
-                     wdata = Bits(32)(0))
-        log("fetcherimpl: fetch_pc=0x{:08x} stall={} start={} target=0x{:08x} re={}", fetch_pc, stall, start_signal, target_pc, re)
-        with Condition(re == Bits(1)(1)):
-            pc_reg[0] <= fetch_pc + UInt(32)(4)
-            # 将当前 PC 传递给 issuer
-            issuer.async_called(pc_addr=fetch_pc)
+        # icache 按 width 份复制（同一镜像），第 k 份读组内第 k 条
+        for k in range(width):
+            icache[k].build(we = Bits(1)(0),
+                            re = Bits(1)(1),
+                            addr = (word_addr + UInt(32)(k)).bitcast(Bits(icache[k].addr_width)),
+                            wdata = Bits(32)(0))
+        held[0] <= ~fetch
+        pc_reg[0] <= fetch.select(next_pc, fetch_pc)
+        with Condition(fetch):
+            log_info("fetcherimpl: fetch_pc=0x{:08x} flush={} redirect=0x{:08x} next_pc=0x{:08x}", fetch_pc, flush, redirect_pc, next_pc)
+            # 将本组起始 PC 以及每条的有效位、预测的下一条 PC 传递给 issuer
+            slots = {}
+            for k in range(width):
+                slots[f"valid{k}"] = valid[k]
+                slots[f"pred_pc{k}"] = pred_pc[k]
+                slots[f"ras_top{k}"] = ras[k][0]
+                slots[f"ras_value{k}"] = ras[k][1]
+            issuer.async_called(pc_addr=fetch_pc, **slots)
+        with Condition(~room):
+            log_debug("fetcherimpl: fetch queue full, hold pc=0x{:08x} count={}", fetch_pc, fq.count[0])
+            fq.full_cycles[0] <= fq.full_cycles[0] + UInt(32)(1)
+        with Condition(room & ~fetch):
+            log_debug("fetcherimpl: icache miss, hold pc=0x{:08x} lookup=0x{:08x} waiting={}", fetch_pc, lookup_pc, waiting)
 
 
 class Driver(Module):
@@ -281,7 +506,7 @@ class Driver(Module):
             is_init[0] <= UInt(1)(0)
             fecher.async_called()
             committer.async_called()
-            log("CPU Simulation Started")
+            log_commit("CPU Simulation Started")
         with Condition(is_init[0] == UInt(1)(0)):
             fecher.async_called()
         committer.async_called()
@@ -292,93 +517,173 @@ class Driver(Module):
 
 current_path = os.path.dirname(os.path.abspath(__file__))
 workspace = f'{current_path}/workspace/'
+# 内存镜像用相对路径：仿真器启动时在其工作目录（workspace）下读取，
+# 因此换 workload 不需要重新 elaborate，编译好的仿真器可以缓存复用
+WORKLOAD_IMAGE = "workload.exe"
+DATA_IMAGE = "data.mem"
 
-def build_CPU(depth_log=18, data_base=0x2000):
+def build_CPU(depth_log=18, data_base=0x2000, log_level="debug", checkpoint=None, config=None):
+    # 结构参数（ROB 深度、发射宽度）统一由 CPUConfig 给出，ROB 标签位宽随 ROB 深度推出
+    config = config if config is not None else CPUConfig()
+    issue_width = config.issue_width
+    # 日志等级在 elaborate 时生效，低于该等级的 log 不会生成到仿真器里
+    verbosity.set_log_level(log_level)
+    # checkpoint（scripts/checkpoint.py）：pc/寄存器作为初值固化进设计，
+    # dcache 改为从 workspace 里的 checkpoint.mem 读取，仿真直接从第 instret 条指令开始
+    init_pc, init_regs, data_image = 0, [0] * 32, DATA_IMAGE
+    if checkpoint is not None:
+        state = checkpoints.initial_state(checkpoint)
+        init_pc, init_regs, data_image = state["pc"], state["regs"], checkpoints.CHECKPOINT_IMAGE
     sys = SysBuilder("CPU")
     with sys:
-        icache = SRAM(width= 32,
-                      depth= 1 << depth_log,
-                      init_file= f"{workspace}/workload.exe")
-        icache.name = "icache"
+        # 每个发射宽度一份 icache，组内各条指令同周期并行读取
+        icache = []
+        for k in range(issue_width):
+            bank = SRAM(width= 32,
+                        depth= 1 << depth_log,
+                        init_file= WORKLOAD_IMAGE)
+            bank.name = "icache" if k == 0 else f"icache{k}"
+            icache.append(bank)
         dcache = SRAM(width= 32,
                       depth= 1 << depth_log,
-                      init_file= f"{workspace}/data.mem")
+                      init_file= data_image)
         dcache.name = "dcache"
         
-        regs = RegArray(UInt(32), 32, initializer=[0]*32)
-        reg_pending = RegArray(Bits(REG_PENDING_WIDTH), 32, initializer=[0]*32)
+        regs = RegArray(UInt(32), 32, initializer=init_regs)
+        reg_pending = RegArray(Bits(config.tag_width), 32, initializer=[0]*32)
+        predictor = BranchPredictor()
+        # 各 CDB 请求者（LSU、乘法器、ALU0..、除法器）没抢到广播通道的周期数
+        n_cdb_req = cdb_requesters(config.alu_count)
+        cdb_deferred = RegArray(UInt(32), n_cdb_req, initializer=[0] * n_cdb_req)
 
         
         fetcher = Fetcher()
-        issuer = Issuer()
+        issuer = Issuer(width=issue_width)
         issueimpl = IsserImpl()
         driver = Driver()
-        rs = [RSEntry() for _ in range(RS_ENTRY_NUM)]
-        rs_downstream = [RS_downstream() for _ in range(RS_ENTRY_NUM)]
-        alu = [ALU() for _ in range(RS_ENTRY_NUM)]
-        rob = ROB()
-        lsq = LSQEntry()
+        rs = RSPool(config)
+        rs_downstream = RS_downstream()
+        alu = [ALU(config.tag_width) for _ in range(config.alu_count)]
+        mul_rs = MDUStation(config.mdu_rs_entries, config.tag_width)
+        div_rs = MDUStation(config.mdu_rs_entries, config.tag_width)
+        mul = MulUnit(config)
+        div = Divider(config)
+        mdu_downstream = MDU_downstream()
+        rob = ROB(config)
+        lsq = LSQ(config)
+        ckpt = BranchCheckpoints(config)
+        sb = StoreBuffer(config)
+        fq = FetchQueue(config)
+        dc = CacheModel(config.dcache)
+        ic = CacheModel(config.icache)
+        pf = StridePrefetcher(config) if config.prefetch_distance else None
         lsq_downstream = LSQ_downstream()
-        lsu = LSU()
+        lsu = LSU(config.tag_width)
         mem_access = MemeoryAccess()
-        cdb_arbitrator = CDB_Arbitrator()
+        cdb_arbitrator = CDB_Arbitrator(lanes=config.cdb_lanes)
         committer = Commiter()
 
         fetcherimpl = FetcherImpl()
 
 
-        pc_reg, pc_addr = fetcher.build()
-        mem_we, mem_addr, mem_data = committer.build(
+        pc_reg, pc_addr = fetcher.build(init_pc=init_pc)
+        mem_we, mem_addr, mem_data, flush, redirect_pc, ras_repair, retired = committer.build(
             rob = rob,
             regs = regs,
             reg_pending = reg_pending,
+            predictor = predictor,
+            ckpt = ckpt,
+            cdb_deferred = cdb_deferred,
+            sb = sb,
+            fq = fq,
+            dc = dc,
+            ic = ic,
+            width = issue_width,
+            alu_count = config.alu_count,
         )
 
         lsu_cbd_signal = lsu.build(dcache=dcache)
         alu_cbd_signal_list = []
-        for i in range(RS_ENTRY_NUM):
-            alu_cbd_signal_list.append(alu[i].build())
+        for a in alu:
+            alu_cbd_signal_list.append(a.build())
         
         metadata = driver.build(
             fecher=fetcher,
             committer=committer,
         )
         
-        cbd_signal, start_signal, target_pc = cdb_arbitrator.build(
+        cbd_signal, mul_stall = cdb_arbitrator.build(
             LSU_CBD_req=lsu_cbd_signal,
             ALU_CBD_req=alu_cbd_signal_list,
+            mul=mul,
+            div=div,
             rob=rob,
+            ckpt=ckpt,
             metadata=metadata,
+            flush=flush,
+            deferred=cdb_deferred,
         )
-        issue_pc_addr, instr, re = issuer.build(icache=icache)
-        stall, stall_pc, stop_signal = issueimpl.build(
+        issue_pc_addr, issue_valid, issue_pred_pc, issue_ras, instr, re = issuer.build(icache=icache)
+        stall = issueimpl.build(
             pc_addr=issue_pc_addr,
+            valid=issue_valid,
+            pred_pc=issue_pred_pc,
+            ras=issue_ras,
             instr=instr,
             re=re,
+            fq=fq,
             rob=rob,
             rs=rs,
+            mul_rs=mul_rs,
+            div_rs=div_rs,
             lsq=lsq,
+            ckpt=ckpt,
             reg_pending=reg_pending,
             regs=regs,
             cbd_signal=cbd_signal,
+            metadata=metadata,
+            retired=retired,
+            flush=flush,
         )
         re, read_addr = lsq_downstream.build(
             lsq=lsq,
             cbd_signal=cbd_signal,
             lsu=lsu,
             rob=rob,
+            ckpt=ckpt,
+            sb=sb,
+            dc=dc,
+            pf=pf,
             regs=regs,
             issue_stall=stall,
             metadata=metadata,
+            commit_store=mem_we,
+            retired=retired,
+            flush=flush,
+        )
+        rs_downstream.build(
+            rs=rs,
+            alu=alu,
+            rob=rob,
+            ckpt=ckpt,
+            cbd_signal=cbd_signal,
+            issue_stall=stall,
+            metadata=metadata,
+            flush=flush,
+        )
+        mdu_downstream.build(
+            mul_rs=mul_rs,
+            div_rs=div_rs,
+            mul=mul,
+            div=div,
+            rob=rob,
+            ckpt=ckpt,
+            cbd_signal=cbd_signal,
+            mul_stall=mul_stall,
+            issue_stall=stall,
+            metadata=metadata,
+            flush=flush,
         )
-        for i in range(RS_ENTRY_NUM):
-            rs_downstream[i].build(
-                rs=rs[i],
-                alu=alu[i],
-                cbd_signal=cbd_signal,
-                issue_stall=stall,
-                metadata=metadata,
-            )
         mem_access.build(
             dcache=dcache,
             data=mem_data,
@@ -393,15 +698,40 @@ def build_CPU(depth_log=18, data_base=0x2000):
             icache=icache,
             pc_reg=pc_reg,
             pc_addr=pc_addr,
-            stall=stall,
-            stall_pc=stall_pc,
-            stop_signal=stop_signal,
-            start_signal=start_signal,
-            target_pc=target_pc,
+            fq=fq,
+            ic=ic,
+            ckpt=ckpt,
+            flush=flush,
+            redirect_pc=redirect_pc,
+            ras_repair=ras_repair,
+            predictor=predictor,
             issuer=issuer
         )
     return sys
 
+def build_params(depth_log, data_base, sim_threshold, idle_threshold, log_level="debug", checkpoint=None,
+                 config=None):
+    """影响 elaborate 结果的全部参数，用作仿真器缓存的 key。"""
+    config = config if config is not None else CPUConfig()
+    params = {
+        "design": "tomasulo",
+        "depth_log": depth_log,
+        "data_base": data_base,
+        "sim_threshold": sim_threshold,
+        "idle_threshold": idle_threshold,
+        "log_level": log_level,
+        "verilog": True,
+        "bht_size": BHT_SIZE,
+        "btb_size": BTB_SIZE,
+        "ras_size": RAS_SIZE,
+        "prefetch_table_size": PREFETCH_TABLE_SIZE,
+        **config.params(),
+    }
+    if checkpoint is not None:
+        # 内存在运行时读入，只有 pc/寄存器初值影响 elaborate 结果
+        params["checkpoint"] = checkpoints.initial_state(checkpoint)
+    return params
+
 def main():
     import argparse
 
@@ -411,23 +741,125 @@ def main():
     parser.add_argument("--idle-threshold", type=int, default=100, help="idle cycles before stop")
     parser.add_argument("--data-base", type=lambda x: int(x, 0), default=0x2000, 
                         help="data segment base address (default: 0x2000)")
+    parser.add_argument("--log-level", choices=list(verbosity.LOG_LEVELS), default="debug",
+                        help="drop logs below this level at elaboration; silent only dumps final registers")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="re-elaborate even if a cached simulator exists")
+    parser.add_argument("--workspace", default=workspace,
+                        help="directory holding workload.exe/data.mem, receives the log (default: src/workspace)")
+    parser.add_argument("--cosim", action="store_true",
+                        help="check every retired instruction against the golden model, stop at the first mismatch")
+    parser.add_argument("--asm", default=None, help="objdump .asm of the workload, used in cosim reports")
+    parser.add_argument("--checkpoint", default=None,
+                        help="start from an architectural checkpoint (scripts/checkpoint.py) instead of pc=0")
+    parser.add_argument("--issue-width", type=int, default=ISSUE_WIDTH,
+                        help=f"instructions fetched/issued/committed per cycle (default: {ISSUE_WIDTH})")
+    parser.add_argument("--rob-size", type=int, default=ROB_SIZE,
+                        help=f"reorder buffer entries, a power of two; sets the ROB tag width (default: {ROB_SIZE})")
+    parser.add_argument("--fetch-queue-size", type=int, default=FETCH_QUEUE_SIZE,
+                        help=f"fetch queue entries between fetch and issue (default: {FETCH_QUEUE_SIZE})")
+    parser.add_argument("--lsq-size", type=int, default=LSQ_SIZE,
+                        help=f"load/store queue entries, a power of two (default: {LSQ_SIZE})")
+    parser.add_argument("--store-buffer-size", type=int, default=STORE_BUFFER_SIZE,
+                        help=f"committed stores waiting to be written to the dcache, a power of two "
+                             f"(default: {STORE_BUFFER_SIZE})")
+    parser.add_argument("--rs-entries", type=int, default=RS_ENTRIES,
+                        help=f"entries in the unified reservation station (default: {RS_ENTRIES})")
+    parser.add_argument("--alu-count", type=int, default=ALU_COUNT,
+                        help=f"ALUs fed by the reservation station, one CDB requester each (default: {ALU_COUNT})")
+    parser.add_argument("--cdb-lanes", type=int, default=CDB_LANES,
+                        help=f"results broadcast on the CDB per cycle (default: {CDB_LANES})")
+    parser.add_argument("--mul-latency", type=int, default=MUL_LATENCY,
+                        help=f"pipeline stages of the RV32M multiplier (default: {MUL_LATENCY})")
+    parser.add_argument("--mdu-rs-entries", type=int, default=MDU_RS_ENTRIES,
+                        help=f"reservation station entries of the multiplier and of the divider (default: {MDU_RS_ENTRIES})")
+    parser.add_argument("--branch-checkpoints", type=int, default=BRANCH_CHECKPOINTS,
+                        help=f"in-flight branches, each with a rename map snapshot for one-cycle recovery "
+                             f"(default: {BRANCH_CHECKPOINTS})")
+    parser.add_argument("--prefetch-distance", type=int, default=PREFETCH_DISTANCE,
+                        help=f"strides ahead of a load the dcache stride prefetcher fetches, a power of two; "
+                             f"0 disables it (default: {PREFETCH_DISTANCE})")
+    CacheConfig.add_arguments(parser, "icache")
+    CacheConfig.add_arguments(parser, "dcache")
+    parser.add_argument("--max-commits", type=int, default=0,
+                        help="stop the simulator after this many retired instructions (0: run to ebreak)")
     args = parser.parse_args()
+    run_dir = os.path.abspath(args.workspace)
+    checkpoint = None
+    if args.checkpoint:
+        checkpoint = checkpoints.load(args.checkpoint)
+        if checkpoint["data_base"] != args.data_base:
+            parser.error(f"checkpoint was taken with data_base=0x{checkpoint['data_base']:x}, "
+                         f"got --data-base 0x{args.data_base:x}")
+    try:
+        config = CPUConfig(rob_size=args.rob_size, issue_width=args.issue_width,
+                           fetch_queue_size=args.fetch_queue_size, lsq_size=args.lsq_size,
+                           store_buffer_size=args.store_buffer_size, rs_entries=args.rs_entries,
+                           alu_count=args.alu_count, cdb_lanes=args.cdb_lanes, mul_latency=args.mul_latency,
+                           mdu_rs_entries=args.mdu_rs_entries, branch_checkpoints=args.branch_checkpoints,
+                           prefetch_distance=args.prefetch_distance,
+                           dcache=CacheConfig.from_args(args, "dcache"), icache=CacheConfig.from_args(args, "icache"))
+    except ValueError as e:
+        parser.error(str(e))
+    if (args.cosim or args.max_commits) and args.log_level == "silent":
+        parser.error("--cosim/--max-commits need the commit: retire lines, use --log-level commit or higher")
 
     print(f"Config: data_base=0x{args.data_base:x}, sim_threshold={args.sim_threshold}, idle_threshold={args.idle_threshold}")
 
-    sys = build_CPU(depth_log = 18, data_base=args.data_base)
-    cfg = backend.config(
-        resource_base='.',
-        verilog=True,
-        verbose=True,
-        sim_threshold=args.sim_threshold,
-        idle_threshold=args.idle_threshold,
-    )
-    sim,vcd = elaborate(sys=sys, **cfg)
-    output = run_simulator(sim)
-    print("simulate output is written in /workspace/log")
-    with open(f"{workspace}/log", "w") as f:
-        print(output, file = f)
+    depth_log = 18
+    def build(path):
+        sys = build_CPU(depth_log = depth_log, data_base=args.data_base, log_level=args.log_level,
+                        checkpoint=checkpoint, config=config)
+        cfg = backend.config(
+            path=path,
+            resource_base='.',
+            verilog=True,
+            verbose=True,
+            sim_threshold=args.sim_threshold,
+            idle_threshold=args.idle_threshold,
+        )
+        return elaborate(sys=sys, **cfg)
+
+    params = build_params(depth_log, args.data_base, args.sim_threshold, args.idle_threshold, args.log_level,
+                          checkpoint, config)
+    os.makedirs(run_dir, exist_ok=True)
+    if checkpoint is not None:
+        checkpoints.write_data_image(checkpoint, f"{run_dir}/{checkpoints.CHECKPOINT_IMAGE}", depth_log)
+        print(f"fast-forwarded: starting at instret={checkpoint['instret']} pc=0x{checkpoint['pc']:08x}")
+    # elaborate 时也切到 workspace，保证相对路径的镜像文件可见
+    with sim_cache.working_directory(run_dir):
+        entry = sim_cache.get_or_build(current_path, params, build, rebuild=args.no_cache)
+    print(f"simulator cache {'hit' if entry['hit'] else 'miss'}: {entry['key']}")
+    # cosim：每条 retire 到达时就和功能模型对比，第一次不一致立即停止仿真
+    checker = None
+    if args.cosim:
+        if checkpoint is not None:
+            machine = checkpoints.restore(checkpoint, iss.read_hex_words(f"{run_dir}/{WORKLOAD_IMAGE}"), depth_log)
+        else:
+            machine = iss.load_images(f"{run_dir}/{WORKLOAD_IMAGE}", f"{run_dir}/{DATA_IMAGE}",
+                                      data_base=args.data_base, depth_log=depth_log)
+        checker = cosim.CommitChecker(machine, cosim.read_disassembly(args.asm))
+    # 边运行边写 log，同时单遍统计周期/提交/寄存器，结果存到 summary.json
+    analyzer = LogAnalyzer()
+
+    def keep_running(line):
+        if checker is not None and not checker.feed(line):
+            return False
+        # --max-commits：采样仿真只需要一段区间，提交够了就停
+        return not args.max_commits or analyzer.commits < args.max_commits
+
+    lines = sim_cache.stream_simulator_in(entry["simulator"], run_dir)
+    with open(f"{run_dir}/log", "w") as f:
+        analyzer.tee(lines, f, check=keep_running)
+    lines.close()
+    analyzer.write_summary(f"{run_dir}/{SUMMARY_NAME}")
+    print(f"simulate output is written in {run_dir}/log")
+    if checker is not None:
+        report = checker.finish()
+        cosim.write_report(report, f"{run_dir}/{cosim.COSIM_REPORT_NAME}")
+        print(cosim.describe(report))
+        if report["divergence"] is not None:
+            sys.exit(cosim.COSIM_DIVERGED)
     # ver_output = run_verilator(vcd)
     # print("verilator output is written in /workspace/verilator_log")
     # with open(f"{workspace}/verilator_log", "w") as f:
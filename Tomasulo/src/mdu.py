@@ -0,0 +1,303 @@
+from assassyn.frontend import *
+try:
+    from .instruction import RV32M
+    from .config import CPUConfig
+    from .verbosity import log_info, log_debug
+except ImportError:
+    from Tomasulo.src.instruction import RV32M
+    from Tomasulo.src.config import CPUConfig
+    from Tomasulo.src.verbosity import log_info, log_debug
+
+# RV32M 乘除法单元（MDU）：乘法器和除法器是与 ALU 并列的两个功能单元，各有自己的保留站和 CDB 请求。
+# - 乘法器：mul_latency 级流水，每周期可以接收一条新的乘法；乘积在发射当拍算出，之后逐级传递，
+#   时序上等价于 mul_latency 级的流水乘法器。最后一级没抢到 CDB 通道时 CDB 仲裁器给出 mul_stall，
+#   整条流水线停一拍（各级保持、保留站不发射），结果留在最后一级下周期再试；
+# - 除法器：逐位试商（restoring）的迭代除法器，每周期求一位商，32 个周期出结果，
+#   同时只做一条除法，结果保持到上 CDB 为止。
+# 下面的组合逻辑函数也被 5 级流水线（src/executor.py）直接用在 EX 阶段（单周期完成）。
+
+DIV_STEPS = 32
+
+
+def _is(mdu_type, op) -> Bits:
+    return mdu_type == Bits(RV32M.CNT)(1 << op)
+
+
+def _neg(x) -> Value:
+    return (UInt(32)(0) - x).bitcast(UInt(32))
+
+
+def mul_result(op1, op2, mdu_type) -> Value:
+    """
+    32x32 乘法，按 mdu_type 取积的低 32 位或高 32 位。
+    只做一次无符号乘法，有符号的高位再减去负操作数带来的修正项：
+    hi(a*b) = hi(a*b 无符号) - (a<0 ? b : 0) - (b<0 ? a : 0)（mulhsu 只修正 a）。
+    """
+    product = op1.zext(UInt(64)) * op2.zext(UInt(64))
+    lo = product[0:31].bitcast(UInt(32))
+    hi = product[32:63].bitcast(UInt(32))
+    fix1 = op1[31:31].select(op2, UInt(32)(0))
+    fix2 = op2[31:31].select(op1, UInt(32)(0))
+    mulhsu = (hi - fix1).bitcast(UInt(32))
+    mulh = (mulhsu - fix2).bitcast(UInt(32))
+    res = lo
+    res = _is(mdu_type, RV32M.MULH).select(mulh, res)
+    res = _is(mdu_type, RV32M.MULHSU).select(mulhsu, res)
+    res = _is(mdu_type, RV32M.MULHU).select(hi, res)
+    return res
+
+
+def div_operands(op1, op2, mdu_type) -> tuple:
+    """
+    有符号除法先对绝对值做无符号除法，返回 (被除数, 除数, 商取反, 余数取反, 是否取余数)。
+    除数为 0 时无符号除法自然得到商全 1、余数为被除数，此时商不取反（RISC-V 规定 div 得 -1）；
+    -2^31 / -1 的绝对值相除得 2^31，不取反，正好是规定的溢出结果。
+    """
+    signed = _is(mdu_type, RV32M.DIV) | _is(mdu_type, RV32M.REM)
+    op1_neg = signed & op1[31:31]
+    op2_neg = signed & op2[31:31]
+    dividend = op1_neg.select(_neg(op1), op1)
+    divisor = op2_neg.select(_neg(op2), op2)
+    neg_q = (op1_neg ^ op2_neg) & (op2 != UInt(32)(0))
+    neg_r = op1_neg
+    is_rem = _is(mdu_type, RV32M.REM) | _is(mdu_type, RV32M.REMU)
+    return dividend, divisor, neg_q, neg_r, is_rem
+
+
+def div_step(rem, quo, divisor) -> tuple:
+    """
+    试商一步：{rem, quo} 左移一位，够减则减去除数并在商的最低位记 1。
+    quo 初始为被除数，32 步后 quo 为商、rem 为余数。
+    """
+    shifted = concat(rem, quo[31:31]).bitcast(UInt(33))
+    fits = shifted >= divisor.zext(UInt(33))
+    diff = (shifted - divisor.zext(UInt(33))).bitcast(UInt(33))
+    new_rem = fits.select(diff, shifted)[0:31].bitcast(UInt(32))
+    new_quo = concat(quo[0:30], fits).bitcast(UInt(32))
+    return new_rem, new_quo
+
+
+def div_result(rem, quo, neg_q, neg_r, is_rem) -> Value:
+    q = neg_q.select(_neg(quo), quo)
+    r = neg_r.select(_neg(rem), rem)
+    return is_rem.select(r, q)
+
+
+def divide(op1, op2, mdu_type) -> Value:
+    """组合逻辑除法（32 步展开），供没有多周期执行单元的 5 级流水线使用。"""
+    dividend, divisor, neg_q, neg_r, is_rem = div_operands(op1, op2, mdu_type)
+    rem = UInt(32)(0)
+    quo = dividend
+    for _ in range(DIV_STEPS):
+        rem, quo = div_step(rem, quo, divisor)
+    return div_result(rem, quo, neg_q, neg_r, is_rem)
+
+
+class MDUStation:
+    """乘法器或除法器自己的保留站，结构与 RSPool 相同，只保存 MDU 需要的字段。"""
+
+    def __init__(self, entries: int, tag_width: int):
+        n = entries
+        self.size = n
+        # 表项下标位宽，多留出一个不存在的下标 none 作为“没有空闲表项”
+        self.idx_width = n.bit_length()
+        self.none = (1 << self.idx_width) - 1
+        self.tag_width = tag_width
+        self.busy = RegArray(Bits(1), n, initializer=[0] * n)
+        self.op = RegArray(Bits(RV32M.CNT), n, initializer=[0] * n)  # MDU one-hot 类型
+        self.vj = RegArray(UInt(32), n, initializer=[0] * n)
+        self.vk = RegArray(UInt(32), n, initializer=[0] * n)
+        self.qj = RegArray(Bits(tag_width), n, initializer=[0] * n)
+        self.qk = RegArray(Bits(tag_width), n, initializer=[0] * n)
+        self.qj_valid = RegArray(Bits(1), n, initializer=[0] * n)
+        self.qk_valid = RegArray(Bits(1), n, initializer=[0] * n)
+        self.rob_idx = RegArray(Bits(tag_width), n, initializer=[0] * n)
+
+    def age(self, rob, e) -> Value:
+        """表项 e 的指令相对 ROB head 的距离，越小越老。"""
+        idx = self.rob_idx[e][0:rob.idx_width - 1].bitcast(UInt(rob.idx_width))
+        return ((idx - rob.head[0]) & UInt(rob.idx_width)(rob.size - 1)).bitcast(UInt(rob.idx_width))
+
+    def select_free(self, n) -> Value:
+        """第 n 个空闲表项的下标，没有时为 none。"""
+        select = Bits(self.idx_width)(self.none)
+        seen = UInt(self.idx_width)(0)
+        for e in range(self.size):
+            select = (~self.busy[e] & (seen == n)).select(Bits(self.idx_width)(e), select)
+            seen = (~self.busy[e]).select((seen + UInt(self.idx_width)(1)).bitcast(UInt(self.idx_width)), seen)
+        return select
+
+    def allocate(self, e, op, vj, vk, qj, qk, qj_valid, qk_valid, rob_tag):
+        """Issuer 写入一条新的乘除法指令。"""
+        self.busy[e] <= Bits(1)(1)
+        self.op[e] <= op
+        self.vj[e] <= vj
+        self.vk[e] <= vk
+        self.qj[e] <= qj
+        self.qk[e] <= qk
+        self.qj_valid[e] <= qj_valid
+        self.qk_valid[e] <= qk_valid
+        self.rob_idx[e] <= rob_tag
+
+    def wake(self, cbd_signal: list, rob, ckpt, flush):
+        """按 CDB 各通道的广播唤醒等待中的操作数；冲刷时清空，分支恢复时清掉比分支年轻的表项。"""
+        for e in range(self.size):
+            kill = ckpt.kill(rob, self.rob_idx[e], flush)
+            with Condition(kill):
+                self.busy[e] <= Bits(1)(0)
+                self.qj_valid[e] <= Bits(1)(0)
+                self.qk_valid[e] <= Bits(1)(0)
+            for cdb in cbd_signal:
+                with Condition(~kill & cdb.valid & self.busy[e]):
+                    with Condition((self.qj[e] == cdb.ROB_idx) & ~self.qj_valid[e]):
+                        self.vj[e] <= cdb.rd_data
+                        self.qj_valid[e] <= Bits(1)(1)
+                    with Condition((self.qk[e] == cdb.ROB_idx) & ~self.qk_valid[e]):
+                        self.vk[e] <= cdb.rd_data
+                        self.qk_valid[e] <= Bits(1)(1)
+
+    def issue_oldest(self, rob, enable) -> tuple:
+        """
+        enable 时发射操作数就绪的表项中最老的一条并释放它，
+        返回 (fire, op1, op2, op, rob_idx)。
+        """
+        ready = [enable & self.busy[e] & self.qj_valid[e] & self.qk_valid[e] for e in range(self.size)]
+        fire = Bits(1)(0)
+        op1 = self.vj[0]
+        op2 = self.vk[0]
+        op = self.op[0]
+        rob_idx = self.rob_idx[0]
+        for e in range(self.size):
+            older = Bits(1)(0)
+            for f in range(self.size):
+                if f != e:
+                    older = older | (ready[f] & (self.age(rob, f) < self.age(rob, e)))
+            go = ready[e] & ~older
+            fire = fire | go
+            op1 = go.select(self.vj[e], op1)
+            op2 = go.select(self.vk[e], op2)
+            op = go.select(self.op[e], op)
+            rob_idx = go.select(self.rob_idx[e], rob_idx)
+            with Condition(go):
+                self.busy[e] <= Bits(1)(0)
+                self.qj_valid[e] <= Bits(1)(0)
+                self.qk_valid[e] <= Bits(1)(0)
+        return fire, op1, op2, op, rob_idx.bitcast(UInt(self.tag_width))
+
+
+class MulUnit:
+    """流水乘法器的各级寄存器，最后一级即本周期的 CDB 请求，没被广播时保持到下周期。"""
+
+    def __init__(self, config: CPUConfig):
+        n = config.mul_latency
+        self.latency = n
+        self.tag_width = config.tag_width
+        self.valid = RegArray(Bits(1), n, initializer=[0] * n)
+        self.rob_idx = RegArray(UInt(config.tag_width), n, initializer=[0] * n)
+        self.result = RegArray(UInt(32), n, initializer=[0] * n)
+
+    def request(self) -> tuple:
+        """(valid, ROB_idx, rd_data)"""
+        last = self.latency - 1
+        return self.valid[last], self.rob_idx[last], self.result[last]
+
+
+class Divider:
+    """迭代除法器的状态；done 之后结果保持到 CDB 仲裁器广播它为止（由仲裁器调用 release）。"""
+
+    def __init__(self, config: CPUConfig):
+        self.tag_width = config.tag_width
+        self.count_width = DIV_STEPS.bit_length()
+        self.busy = RegArray(Bits(1), 1, initializer=[0])
+        self.done = RegArray(Bits(1), 1, initializer=[0])
+        self.count = RegArray(UInt(self.count_width), 1, initializer=[0])
+        self.rem = RegArray(UInt(32), 1, initializer=[0])
+        self.quo = RegArray(UInt(32), 1, initializer=[0])
+        self.divisor = RegArray(UInt(32), 1, initializer=[0])
+        self.neg_q = RegArray(Bits(1), 1, initializer=[0])
+        self.neg_r = RegArray(Bits(1), 1, initializer=[0])
+        self.is_rem = RegArray(Bits(1), 1, initializer=[0])
+        self.rob_idx = RegArray(UInt(config.tag_width), 1, initializer=[0])
+
+    def request(self) -> tuple:
+        """(valid, ROB_idx, rd_data)"""
+        result = div_result(self.rem[0], self.quo[0], self.neg_q[0], self.neg_r[0], self.is_rem[0])
+        return self.done[0], self.rob_idx[0], result
+
+    def release(self):
+        self.busy[0] <= Bits(1)(0)
+        self.done[0] <= Bits(1)(0)
+
+
+class MDU_downstream(Downstream):
+    def __init__(self):
+        super().__init__()
+
+    @downstream.combinational
+    def build(self,
+              mul_rs: MDUStation,
+              div_rs: MDUStation,
+              mul: MulUnit,
+              div: Divider,
+              rob,
+              ckpt,
+              cbd_signal: list,
+              mul_stall: Value,
+              issue_stall: Value,
+              metadata: Value,
+              flush: Value):
+        # 和 RS_downstream 一样依赖 Issuer 输出和 heartbeat，保证每周期触发
+        issue_stall = issue_stall.optional(default=Bits(1)(0))
+        metadata = metadata.optional(default=Bits(8)(0))
+        flush = flush.optional(default=Bits(1)(0))
+        # 乘法器最后一级的结果本周期没有被广播（由 CDB 仲裁器给出）
+        mul_stall = mul_stall.optional(default=Bits(1)(0))
+        _ = metadata == metadata
+        log_debug("MDU downstream metadata={}", metadata)
+        mul_rs.wake(cbd_signal, rob, ckpt, flush)
+        div_rs.wake(cbd_signal, rob, ckpt, flush)
+        # 冲刷或分支恢复的周期不发射新的乘除法
+        enable = ~flush & ~ckpt.squashing(flush)
+
+        # 乘法器每周期接收一条，结果逐级后移；冲刷时流水线里的结果全部作废，分支恢复时作废比分支年轻的。
+        # 最后一级没抢到 CDB 通道时各级原地保持（仍按冲刷/恢复作废），本周期也不接收新的乘法
+        fire, op1, op2, op, rob_idx = mul_rs.issue_oldest(rob, enable & ~mul_stall)
+        with Condition(fire):
+            log_info("MDU fire MUL: rob_idx={} op1=0x{:08x} op2=0x{:08x} op={:08b}", rob_idx, op1, op2, op)
+        with Condition(mul_stall):
+            log_debug("MDU MUL stall: rob_idx={}", mul.rob_idx[mul.latency - 1])
+            for s in range(mul.latency):
+                mul.valid[s] <= mul.valid[s] & ~ckpt.kill(rob, mul.rob_idx[s], flush)
+        with Condition(~mul_stall):
+            mul.valid[0] <= fire
+            mul.rob_idx[0] <= rob_idx
+            mul.result[0] <= mul_result(op1, op2, op)
+            for s in range(1, mul.latency):
+                mul.valid[s] <= mul.valid[s - 1] & ~ckpt.kill(rob, mul.rob_idx[s - 1], flush)
+                mul.rob_idx[s] <= mul.rob_idx[s - 1]
+                mul.result[s] <= mul.result[s - 1]
+
+        # 除法器空闲时接收一条，之后每周期求一位商
+        fire, op1, op2, op, rob_idx = div_rs.issue_oldest(rob, enable & ~div.busy[0])
+        with Condition(fire):
+            log_info("MDU fire DIV: rob_idx={} op1=0x{:08x} op2=0x{:08x} op={:08b}", rob_idx, op1, op2, op)
+            dividend, divisor, neg_q, neg_r, is_rem = div_operands(op1, op2, op)
+            div.busy[0] <= Bits(1)(1)
+            div.count[0] <= UInt(div.count_width)(DIV_STEPS)
+            div.rem[0] <= UInt(32)(0)
+            div.quo[0] <= dividend
+            div.divisor[0] <= divisor
+            div.neg_q[0] <= neg_q
+            div.neg_r[0] <= neg_r
+            div.is_rem[0] <= is_rem
+            div.rob_idx[0] <= rob_idx
+        div_kill = div.busy[0] & ckpt.kill(rob, div.rob_idx[0], flush)
+        with Condition(~div_kill & div.busy[0] & ~div.done[0]):
+            rem, quo = div_step(div.rem[0], div.quo[0], div.divisor[0])
+            div.rem[0] <= rem
+            div.quo[0] <= quo
+            div.count[0] <= (div.count[0] - UInt(div.count_width)(1)).bitcast(UInt(div.count_width))
+            with Condition(div.count[0] == UInt(div.count_width)(1)):
+                div.done[0] <= Bits(1)(1)
+        with Condition(flush | div_kill):
+            div.release()
@@ -0,0 +1,166 @@
+from assassyn.frontend import *
+
+# 动态分支预测：2-bit 饱和计数器 BHT + 直接映射 BTB + 返回地址栈 RAS。
+# FetcherImpl 取指时用 pc 查表给出预测的下一条 pc，沿预测路径继续取指；
+# Commiter 提交分支时用真实的 next_pc 更新；预测错误在分支广播时按检查点恢复（rename_checkpoint.py），
+# 个别情况下由 Commiter 冲刷流水线。
+#
+# 取指时还拿不到指令本身，所以 call/return 的类型记在 BTB 里（提交时学习）：
+# BTB 命中 call（jal/jalr 且 rd=ra）时把 pc+4 压栈，命中 return（jalr x0, ra）时
+# 直接用栈顶作为预测目标，不必等 ALU 算出 jalr 的地址。
+# 取指侧的 RAS 是推测状态。每条指令取指后的栈顶指针和栈顶项随指令进入取指队列，
+# 分支 issue 时存进它的检查点（rename_checkpoint.py），分支恢复时用它修复推测 RAS；
+# 提交侧另维护一份只按已提交指令更新的 RAS，提交时冲刷用它恢复。
+
+BHT_SIZE = 64
+BHT_IDX_WIDTH = (BHT_SIZE - 1).bit_length()
+BTB_SIZE = 16
+BTB_IDX_WIDTH = (BTB_SIZE - 1).bit_length()
+RAS_SIZE = 8
+RAS_IDX_WIDTH = (RAS_SIZE - 1).bit_length()
+
+
+class BranchPredictor:
+    def __init__(self):
+        # 计数器初始为 weakly not-taken (01)，最高位为 1 时预测跳转
+        self.bht = RegArray(Bits(2), BHT_SIZE, initializer=[1] * BHT_SIZE)
+        # BTB 存完整 pc 作为 tag，只有真正跳转过的分支/跳转指令才会写入
+        self.btb_valid = RegArray(Bits(1), BTB_SIZE, initializer=[0] * BTB_SIZE)
+        self.btb_pc = RegArray(UInt(32), BTB_SIZE, initializer=[0] * BTB_SIZE)
+        self.btb_target = RegArray(UInt(32), BTB_SIZE, initializer=[0] * BTB_SIZE)
+        self.btb_call = RegArray(Bits(1), BTB_SIZE, initializer=[0] * BTB_SIZE)
+        self.btb_ret = RegArray(Bits(1), BTB_SIZE, initializer=[0] * BTB_SIZE)
+        # 环形 RAS，top 指向栈顶项；溢出时覆盖最老的返回地址
+        self.ras = RegArray(UInt(32), RAS_SIZE, initializer=[0] * RAS_SIZE)
+        self.ras_top = RegArray(UInt(RAS_IDX_WIDTH), 1, initializer=[0])
+        # 上一次取指之前的栈顶，issue 阻塞重取同一条指令时用它撤销重复的压栈/弹栈
+        self.ras_top_prev = RegArray(UInt(RAS_IDX_WIDTH), 1, initializer=[0])
+        # 提交侧 RAS（检查点）
+        self.ras_commit = RegArray(UInt(32), RAS_SIZE, initializer=[0] * RAS_SIZE)
+        self.ras_commit_top = RegArray(UInt(RAS_IDX_WIDTH), 1, initializer=[0])
+        # 预测准确率统计：提交的分支数 / 预测错误（需要冲刷）的次数
+        self.branches = RegArray(UInt(32), 1, initializer=[0])
+        self.mispredicts = RegArray(UInt(32), 1, initializer=[0])
+
+    def bht_index(self, pc):
+        return pc[2:2 + BHT_IDX_WIDTH - 1]
+
+    def btb_index(self, pc):
+        return pc[2:2 + BTB_IDX_WIDTH - 1]
+
+    def lookup(self, pc):
+        """
+        查 BHT/BTB（不含 RAS），返回 (taken, target, is_call, is_ret)。
+        """
+        btb_idx = self.btb_index(pc)
+        hit = self.btb_valid[btb_idx] & (self.btb_pc[btb_idx] == pc)
+        counter = self.bht[self.bht_index(pc)]
+        is_call = hit & self.btb_call[btb_idx]
+        is_ret = hit & self.btb_ret[btb_idx]
+        # call/return 是无条件跳转，不看计数器
+        taken = hit & (counter[1:1] | is_call | is_ret)
+        return taken, self.btb_target[btb_idx], is_call, is_ret
+
+    def predict(self, fetch_pc, width, flush, squash, stall, ras_repair, ras_checkpoint):
+        """
+        为一个取指组（fetch_pc 起连续 width 条）做预测，返回 (valid, pred_pc, next_pc, ras)：
+        valid[k]/pred_pc[k] 为第 k 条是否在预测路径上及其预测的下一条 pc，
+        第一条预测跳转的指令结束本组，next_pc 为下一组的起始 pc，
+        ras[k] 为第 k 条取指之后的 (栈顶指针, 栈顶项)，分支 issue 时存进检查点。
+        BTB 命中 return 时取 RAS 栈顶，同时按结束本组的那条指令推测更新 RAS；
+        ras_repair 为 Commiter 给出的提交侧栈状态，ras_checkpoint 为正在恢复的分支检查点里的 (栈顶指针, 栈顶项)。
+        """
+        repair_top, repair_push, repair_value = ras_repair
+        ckpt_top, ckpt_value = ras_checkpoint
+        # 本次取指基于的栈：冲刷时恢复为提交侧状态，分支恢复时恢复为分支取指之后的栈顶指针和栈顶项
+        # （更深的项只可能被错误路径上先 return 再 call 的指令改写，只影响预测准确率），
+        # 阻塞重取时退回上一次取指之前
+        top = flush.select(repair_top, squash.select(ckpt_top, stall.select(self.ras_top_prev[0], self.ras_top[0])))
+        entries = []
+        for i in range(RAS_SIZE):
+            committed = (repair_push & (repair_top == UInt(RAS_IDX_WIDTH)(i))).select(repair_value, self.ras_commit[i])
+            restored = (ckpt_top == UInt(RAS_IDX_WIDTH)(i)).select(ckpt_value, self.ras[i])
+            entries.append(flush.select(committed, squash.select(restored, self.ras[i])))
+        ret_addr = entries[0]
+        for i in range(1, RAS_SIZE):
+            ret_addr = (top == UInt(RAS_IDX_WIDTH)(i)).select(entries[i], ret_addr)
+
+        valid = []
+        pred_pc = []
+        # 组内只有结束本组的那条指令可能是 call/return
+        push = Bits(1)(0)
+        pop = Bits(1)(0)
+        push_value = UInt(32)(0)
+        ended = Bits(1)(0)
+        ends = []
+        next_pc = fetch_pc + UInt(32)(4 * width)
+        for k in range(width):
+            pc = fetch_pc + UInt(32)(4 * k)
+            taken, target, is_call, is_ret = self.lookup(pc)
+            valid.append(~ended)
+            pred = is_ret.select(ret_addr, taken.select(target, pc + UInt(32)(4)))
+            pred_pc.append(pred)
+            ends_here = ~ended & taken
+            push = ends_here.select(is_call, push)
+            pop = ends_here.select(is_ret, pop)
+            push_value = ends_here.select(pc + UInt(32)(4), push_value)
+            next_pc = ends_here.select(pred, next_pc)
+            ended = ended | taken
+            ends.append(ends_here)
+
+        new_top = push.select((top + UInt(RAS_IDX_WIDTH)(1)).bitcast(UInt(RAS_IDX_WIDTH)),
+                  pop.select((top - UInt(RAS_IDX_WIDTH)(1)).bitcast(UInt(RAS_IDX_WIDTH)), top))
+        self.ras_top[0] <= new_top
+        self.ras_top_prev[0] <= top
+        new_value = entries[0]
+        for i in range(1, RAS_SIZE):
+            new_value = (new_top == UInt(RAS_IDX_WIDTH)(i)).select(entries[i], new_value)
+        new_value = push.select(push_value, new_value)
+        for i in range(RAS_SIZE):
+            push_here = push & (new_top == UInt(RAS_IDX_WIDTH)(i))
+            with Condition(push_here):
+                self.ras[i] <= push_value
+            with Condition(~push_here & (flush | squash)):
+                self.ras[i] <= entries[i]
+        # 结束本组的指令之后是更新后的栈，之前的指令之后还是取指前的栈
+        ras = [(ends[k].select(new_top, top), ends[k].select(new_value, ret_addr)) for k in range(width)]
+        return valid, pred_pc, next_pc, ras
+
+    def retire(self, commit, is_call, is_ret, pc):
+        """
+        Commiter 每周期调用：按提交的 call/return 更新提交侧 RAS，
+        返回本周期提交之后的栈状态 (top, push, push_value) 供冲刷时恢复。
+        """
+        top = self.ras_commit_top[0]
+        push = commit & is_call
+        pop = commit & is_ret
+        new_top = push.select((top + UInt(RAS_IDX_WIDTH)(1)).bitcast(UInt(RAS_IDX_WIDTH)),
+                  pop.select((top - UInt(RAS_IDX_WIDTH)(1)).bitcast(UInt(RAS_IDX_WIDTH)), top))
+        push_value = pc + UInt(32)(4)
+        self.ras_commit_top[0] <= new_top
+        with Condition(push):
+            self.ras_commit[new_top] <= push_value
+        return new_top, push, push_value
+
+    def update(self, pc, next_pc, is_call, is_ret):
+        """提交一条分支/跳转时调用（在调用方的 Condition 内）。"""
+        taken = next_pc != (pc + UInt(32)(4))
+        bht_idx = self.bht_index(pc)
+        counter = self.bht[bht_idx]
+        inc = (counter == Bits(2)(3)).select(counter, (counter + Bits(2)(1)).bitcast(Bits(2)))
+        dec = (counter == Bits(2)(0)).select(counter, (counter - Bits(2)(1)).bitcast(Bits(2)))
+        self.bht[bht_idx] <= taken.select(inc, dec)
+        with Condition(taken):
+            btb_idx = self.btb_index(pc)
+            self.btb_valid[btb_idx] <= Bits(1)(1)
+            self.btb_pc[btb_idx] <= pc
+            self.btb_target[btb_idx] <= next_pc
+            self.btb_call[btb_idx] <= is_call
+            self.btb_ret[btb_idx] <= is_ret
+
+    def count(self, is_branch, mispredict):
+        """累加准确率计数器（在提交的 Condition 内调用）。"""
+        with Condition(is_branch):
+            self.branches[0] <= self.branches[0] + UInt(32)(1)
+        with Condition(mispredict):
+            self.mispredicts[0] <= self.mispredicts[0] + UInt(32)(1)
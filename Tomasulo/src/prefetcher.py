@@ -0,0 +1,65 @@
+from assassyn.frontend import *
+from .config import CPUConfig
+from .cache import CacheModel
+from .verbosity import log_info
+
+# dcache 跨步预取器：按 load 的 pc 索引的参考预测表（RPT），每项记录上一次访问的地址、步长和置信度。
+# - LSQ 里的 load 第一次访问 dcache 时训练：步长与上次相同则置信度加一，否则换成新步长、置信度清零；
+# - 本次步长与上次相同且置信度不为 0，即同一步长连续出现三次（第 4 次访问起）时，
+#   预取 addr + stride * prefetch_distance 所在的行，与本次访问同一行的不预取。待发的预取放在一项的队列里，新的覆盖旧的；
+# - dcache 每周期只有一次访问，预取只在本周期没有 load 访问 dcache 时发出，MSHR 全忙时留着下次再发。
+# 数组按固定步长遍历的用例（vector_add_100、array_sum、matrix_mul 等）大部分缺失可以提前取回。
+
+# RPT 项数（2 的幂），直接映射
+PREFETCH_TABLE_SIZE = 16
+PREFETCH_IDX_WIDTH = (PREFETCH_TABLE_SIZE - 1).bit_length()
+
+
+class StridePrefetcher:
+    def __init__(self, config: CPUConfig):
+        n = PREFETCH_TABLE_SIZE
+        # 预取距离为 2 的幂，步长左移即可
+        self.shift = config.prefetch_distance.bit_length() - 1
+        self.valid = RegArray(Bits(1), n, initializer=[0] * n)
+        # 完整 pc 作为 tag
+        self.pc = RegArray(UInt(32), n, initializer=[0] * n)
+        self.last_addr = RegArray(UInt(32), n, initializer=[0] * n)
+        # 步长按补码存
+        self.stride = RegArray(UInt(32), n, initializer=[0] * n)
+        # 2 位饱和置信度
+        self.conf = RegArray(UInt(2), n, initializer=[0] * n)
+        # 待发的预取
+        self.pending = RegArray(Bits(1), 1, initializer=[0])
+        self.pending_addr = RegArray(UInt(32), 1, initializer=[0])
+
+    def index(self, pc):
+        return pc[2:2 + PREFETCH_IDX_WIDTH - 1]
+
+    def train(self, req, pc, addr, dc: CacheModel):
+        """req 为真时用 load 的 (pc, addr) 训练 RPT，必要时登记一个预取。"""
+        e = self.index(pc)
+        hit = self.valid[e] & (self.pc[e] == pc)
+        stride = (addr - self.last_addr[e]).bitcast(UInt(32))
+        same = hit & (stride == self.stride[e])
+        conf = self.conf[e]
+        with Condition(req):
+            self.valid[e] <= Bits(1)(1)
+            self.pc[e] <= pc
+            self.last_addr[e] <= addr
+            # 新分配的项步长未知，下一次访问再学
+            self.stride[e] <= hit.select(stride, UInt(32)(0))
+            inc = (conf == UInt(2)(3)).select(conf, (conf + UInt(2)(1)).bitcast(UInt(2)))
+            self.conf[e] <= same.select(inc, UInt(2)(0))
+        # 置信度是本次训练之前的值：不为 0 说明前两个步长已相同，加上本次 same 共三次
+        target = (addr + (stride << UInt(32)(self.shift)).bitcast(UInt(32))).bitcast(UInt(32))
+        trigger = req & same & (conf != UInt(2)(0)) & (stride != UInt(32)(0)) & (dc.line(target) != dc.line(addr))
+        with Condition(trigger):
+            log_info("prefetch: pc=0x{:08x} addr=0x{:08x} stride=0x{:08x} target=0x{:08x}", pc, addr, stride, target)
+            self.pending[0] <= Bits(1)(1)
+            self.pending_addr[0] <= target
+
+    def issue(self, idle, dc: CacheModel):
+        """dcache 本周期空闲（idle）时发出待发的预取。"""
+        done = dc.prefetch(idle & self.pending[0], self.pending_addr[0])
+        with Condition(idle & self.pending[0] & done):
+            self.pending[0] <= Bits(1)(0)
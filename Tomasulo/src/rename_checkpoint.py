@@ -0,0 +1,171 @@
+from assassyn.frontend import *
+from .config import CPUConfig
+from .ROB import ROB
+from .predictor import RAS_IDX_WIDTH
+from .verbosity import log_info
+
+# 分支检查点：每条在路上的分支（B/JAL/JALR）在 issue 时占一个检查点，保存它之后的
+# 重命名表（reg_pending）快照、LSQ tail 以及它取指之后的 RAS 栈顶指针和栈顶项，
+# 最多 branch_checkpoints 条，没有空闲检查点时分支停在取指队列里。
+# - 分支结果在 CDB 仲裁器里广播时即可判断预测对错：预测正确就释放检查点；
+#   预测错误则登记到 recover 寄存器（同周期多条时取最老的一条）；
+# - 下一周期各处按 recover 恢复：reg_pending 整体换成快照，ROB/RS/乘除法保留站/LSQ/CDB 保持寄存器/
+#   乘法流水线/除法器里比分支年轻的项按年龄（相对 ROB head 的距离）一次作废，ROB/LSQ tail 退回分支之后，
+#   取指队列清空，推测 RAS 换回检查点里的栈顶，从正确的 pc 重新取指。恢复只需一个周期，代价与 ROB 深度无关，
+#   不必等分支走到 ROB head 再冲刷；
+# - 快照里的标签可能已经提交（ROB 项不再忙或本周期提交）或被更年轻的指令重新分配，恢复时清零；
+# - 提交时的冲刷保留为兜底：分支恢复的那个周期自己恰好提交时，由提交冲刷处理，恢复作废。
+
+
+class BranchCheckpoints:
+    def __init__(self, config: CPUConfig):
+        n = config.branch_checkpoints
+        self.size = n
+        # 检查点下标位宽，多留出一个不存在的下标 none 作为“没有空闲检查点”
+        self.idx_width = n.bit_length()
+        self.none = (1 << self.idx_width) - 1
+        self.rob_idx_width = config.rob_idx_width
+        self.tag_width = config.tag_width
+        self.valid = RegArray(Bits(1), n, initializer=[0] * n)
+        # 占用检查点的分支在 ROB 中的下标
+        self.rob_idx = RegArray(UInt(self.rob_idx_width), n, initializer=[0] * n)
+        # 分支之后的 LSQ tail，恢复时退回这里
+        self.lsq_tail = RegArray(UInt(config.lsq_idx_width), n, initializer=[0] * n)
+        # 分支取指之后的 RAS 栈顶指针和栈顶项，恢复时 FetcherImpl 据此修复推测 RAS
+        self.ras_top = RegArray(UInt(RAS_IDX_WIDTH), n, initializer=[0] * n)
+        self.ras_value = RegArray(UInt(32), n, initializer=[0] * n)
+        # 分支之后的 reg_pending 快照
+        self.map = [RegArray(Bits(self.tag_width), 32, initializer=[0] * 32) for _ in range(n)]
+        # 待恢复的预测错误：仲裁器在分支广播的周期登记，下一周期各处按它恢复
+        self.recover = RegArray(Bits(1), 1, initializer=[0])
+        self.recover_slot = RegArray(UInt(self.idx_width), 1, initializer=[0])
+        self.recover_rob = RegArray(UInt(self.rob_idx_width), 1, initializer=[0])
+        self.recover_pc = RegArray(UInt(32), 1, initializer=[0])
+        # 统计：分支广播时完成的恢复次数、分支因没有空闲检查点而不能发射的周期数，ebreak 时打印
+        self.recoveries = RegArray(UInt(32), 1, initializer=[0])
+        self.full_cycles = RegArray(UInt(32), 1, initializer=[0])
+
+    def select_free(self, n) -> Value:
+        """第 n 个空闲检查点的下标，没有时为 none。"""
+        select = Bits(self.idx_width)(self.none)
+        seen = UInt(self.idx_width)(0)
+        for s in range(self.size):
+            select = (~self.valid[s] & (seen == n)).select(Bits(self.idx_width)(s), select)
+            seen = (~self.valid[s]).select((seen + UInt(self.idx_width)(1)).bitcast(UInt(self.idx_width)), seen)
+        return select
+
+    def allocate(self, slot, rob_idx, lsq_tail, rename: list, ras: tuple):
+        """
+        Issuer 为一条分支写入检查点，rename 为分支之后 32 个寄存器的 reg_pending，
+        ras 为分支取指之后的 (RAS 栈顶指针, 栈顶项)。
+        """
+        ras_top, ras_value = ras
+        self.valid[slot] <= Bits(1)(1)
+        self.rob_idx[slot] <= rob_idx
+        self.lsq_tail[slot] <= lsq_tail
+        self.ras_top[slot] <= ras_top
+        self.ras_value[slot] <= ras_value
+        for s in range(self.size):
+            with Condition(slot == UInt(self.idx_width)(s)):
+                for r in range(32):
+                    self.map[s][r] <= rename[r]
+
+    def squashing(self, flush) -> Value:
+        """本周期是否在做分支恢复；提交冲刷同周期发生时以冲刷为准。"""
+        return self.recover[0] & ~flush
+
+    def recover_ras(self) -> tuple:
+        """正在恢复的分支检查点里的 (RAS 栈顶指针, 栈顶项)。"""
+        slot = self.recover_slot[0]
+        return self.ras_top[slot], self.ras_value[slot]
+
+    def younger(self, rob: ROB, idx) -> Value:
+        """ROB 下标 idx 的指令是否比正在恢复的分支年轻。"""
+        mask = UInt(rob.idx_width)(rob.size - 1)
+        age = ((idx - rob.head[0]) & mask).bitcast(UInt(rob.idx_width))
+        branch_age = ((self.recover_rob[0] - rob.head[0]) & mask).bitcast(UInt(rob.idx_width))
+        return age > branch_age
+
+    def kill(self, rob: ROB, tag, flush) -> Value:
+        """RS/LSQ/CDB 标签为 tag 的指令本周期是否作废：提交冲刷，或比正在恢复的分支年轻。"""
+        idx = tag[0:rob.idx_width - 1].bitcast(UInt(rob.idx_width))
+        return flush | (self.squashing(flush) & self.younger(rob, idx))
+
+    def resolve(self, rob: ROB, branches: list, flush):
+        """
+        CDB 仲裁器每周期调用，branches 为本周期广播的分支结果 (valid, ROB_idx, next_pc)：
+        预测正确的释放检查点，预测错误的取最老的一条登记到 recover。
+        """
+        mask = UInt(rob.idx_width)(rob.size - 1)
+        wrong = []
+        ages = []
+        for valid, tag, next_pc in branches:
+            idx = tag[0:rob.idx_width - 1].bitcast(UInt(rob.idx_width))
+            wrong.append(valid & (next_pc != rob.pred_pc[idx]))
+            ages.append(((idx - rob.head[0]) & mask).bitcast(UInt(rob.idx_width)))
+            for s in range(self.size):
+                with Condition(valid & (next_pc == rob.pred_pc[idx]) & self.valid[s] & (self.rob_idx[s] == idx)):
+                    self.valid[s] <= Bits(1)(0)
+        any_wrong = Bits(1)(0)
+        slot = UInt(self.idx_width)(0)
+        rob_idx = UInt(rob.idx_width)(0)
+        pc = UInt(32)(0)
+        for b, (_, tag, next_pc) in enumerate(branches):
+            older = Bits(1)(0)
+            for c in range(len(branches)):
+                if c != b:
+                    older = older | (wrong[c] & (ages[c] < ages[b]))
+            oldest = wrong[b] & ~older
+            idx = tag[0:rob.idx_width - 1].bitcast(UInt(rob.idx_width))
+            any_wrong = any_wrong | wrong[b]
+            rob_idx = oldest.select(idx, rob_idx)
+            pc = oldest.select(next_pc, pc)
+            for s in range(self.size):
+                slot = (oldest & self.valid[s] & (self.rob_idx[s] == idx)).select(UInt(self.idx_width)(s), slot)
+        self.recover[0] <= ~flush & any_wrong
+        self.recover_slot[0] <= slot
+        self.recover_rob[0] <= rob_idx
+        self.recover_pc[0] <= pc
+
+    def restore(self, rob: ROB, reg_pending: RegArray, retired: list, flush):
+        """
+        IsserImpl 每周期调用：提交冲刷时释放全部检查点；分支恢复时换回 reg_pending 快照，
+        作废比分支年轻的 ROB 项，释放分支自己和更年轻分支的检查点。
+        """
+        squash = self.squashing(flush)
+        with Condition(flush):
+            for s in range(self.size):
+                self.valid[s] <= Bits(1)(0)
+        with Condition(squash):
+            slot = self.recover_slot[0]
+            branch = self.recover_rob[0]
+            log_info("checkpoint: recover rob={} slot={} redirect=0x{:08x}", branch, slot, self.recover_pc[0])
+            self.recoveries[0] <= self.recoveries[0] + UInt(32)(1)
+            for s in range(self.size):
+                with Condition(self.valid[s] & ((slot == UInt(self.idx_width)(s)) | self.younger(rob, self.rob_idx[s]))):
+                    self.valid[s] <= Bits(1)(0)
+            for r in range(32):
+                tag = self.map[0][r]
+                for s in range(1, self.size):
+                    tag = (slot == UInt(self.idx_width)(s)).select(self.map[s][r], tag)
+                # reg_pending 存 rob_idx+1
+                idx = (tag.bitcast(UInt(self.tag_width)) - UInt(self.tag_width)(1))[0:rob.idx_width - 1].bitcast(UInt(rob.idx_width))
+                retiring = Bits(1)(0)
+                for valid, rob_idx in retired:
+                    retiring = retiring | (valid & (rob_idx == idx))
+                live = (tag != Bits(self.tag_width)(0)) & rob.busy[idx] & ~retiring & ~self.younger(rob, idx)
+                reg_pending[r] <= live.select(tag, Bits(self.tag_width)(0))
+            for e in range(rob.size):
+                with Condition(self.younger(rob, UInt(rob.idx_width)(e))):
+                    rob.busy[e] <= Bits(1)(0)
+                    rob.ready[e] <= Bits(1)(0)
+                    rob.is_branch[e] <= Bits(1)(0)
+                    rob.is_syscall[e] <= Bits(1)(0)
+                    rob.is_store[e] <= Bits(1)(0)
+            rob.tail[0] <= rob.index(branch, 1)
+            # 分支提交时不再按预测错误冲刷
+            rob.pred_pc[branch] <= self.recover_pc[0]
+
+    def report(self, log_fn):
+        """ebreak 时打印统计，格式见 scripts/log_analyzer.py。"""
+        log_fn("ckpt: recoveries={} full={}", self.recoveries[0], self.full_cycles[0])
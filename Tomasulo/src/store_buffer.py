@@ -0,0 +1,58 @@
+from assassyn.frontend import *
+from .config import CPUConfig
+
+# 提交后的 store 缓冲：Commiter 一个周期可以把多条提交的 store 按序放进缓冲，
+# 缓冲每周期把最老的一条写入 dcache（单写口）。
+# 缓冲里的 store 已经提交、不会被冲刷；还没写进 dcache 之前，LSQ 的 load 从这里转发数据。
+# 深度来自 CPUConfig.store_buffer_size（2 的幂）；ebreak 要等缓冲排空才提交，结束时内存已是最终状态。
+
+
+class StoreBuffer:
+    def __init__(self, config: CPUConfig):
+        self.size = config.store_buffer_size
+        self.idx_width = (self.size - 1).bit_length()
+        self.mask = self.size - 1
+        # 同周期放入条数的计数位宽，最多放满 size 条
+        self.count_width = self.idx_width + 1
+        # 环形队列指针
+        self.head = RegArray(UInt(self.idx_width), 1, initializer=[0])
+        self.tail = RegArray(UInt(self.idx_width), 1, initializer=[0])
+
+        self.busy = RegArray(Bits(1), self.size, initializer=[0] * self.size)
+        self.addr = RegArray(UInt(32), self.size, initializer=[0] * self.size)
+        self.data = RegArray(UInt(32), self.size, initializer=[0] * self.size)
+
+    def slot(self, n) -> Value:
+        """tail 之后第 n 项的下标（n 为 count_width 位的计数）。"""
+        offset = n[0:self.idx_width - 1].bitcast(UInt(self.idx_width))
+        return ((self.tail[0] + offset) & UInt(self.idx_width)(self.mask)).bitcast(UInt(self.idx_width))
+
+    def has_room(self, n) -> Bits:
+        """
+        本周期已放入 n 条之后能否再放一条：表项从 head 起连续占用，tail 之后第 n 项空闲即可。
+        """
+        return (n < UInt(self.count_width)(self.size)) & ~self.busy[self.slot(n)]
+
+    def is_empty(self) -> Bits:
+        """从 head 起连续占用，head 处空闲即缓冲为空。"""
+        return ~self.busy[self.head[0]]
+
+    def age(self, i) -> Value:
+        """表项 i 相对 head 的距离，越小越老。"""
+        return ((UInt(self.idx_width)(i) - self.head[0]) & UInt(self.idx_width)(self.mask)).bitcast(UInt(self.idx_width))
+
+    def forward(self, addr) -> tuple:
+        """
+        查找与 addr 同字的最年轻一条缓冲 store，返回 (hit, data)。
+        """
+        match = [self.busy[e] & (self.addr[e][2:31] == addr[2:31]) for e in range(self.size)]
+        hit = Bits(1)(0)
+        data = UInt(32)(0)
+        for e in range(self.size):
+            younger_match = Bits(1)(0)
+            for f in range(self.size):
+                if f != e:
+                    younger_match = younger_match | (match[f] & (self.age(e) < self.age(f)))
+            hit = hit | match[e]
+            data = (match[e] & ~younger_match).select(self.data[e], data)
+        return hit, data
@@ -0,0 +1,52 @@
+from assassyn.frontend import *
+
+# 日志等级：在 elaboration 阶段决定哪些 log 会被生成进仿真器。
+# 被过滤掉的 log 根本不会出现在生成的代码里，仿真时没有格式化和 I/O 开销。
+SILENT = 0  # 只在结束时输出最终的寄存器堆（吞吐量测试用）
+COMMIT = 1  # 只保留提交/写回行和错误信息（测试脚本判定结果需要）
+INFO = 2    # 再加上每条指令一次的取指/发射/执行事件（统计 fetches 等）
+DEBUG = 3   # 全部日志，包括每个周期的 RS/LSQ/CDB 状态（默认）
+
+LOG_LEVELS = {"silent": SILENT, "commit": COMMIT, "info": INFO, "debug": DEBUG}
+
+LOG_LEVEL = DEBUG
+
+
+def set_log_level(level):
+    """设置日志等级，可以是 LOG_LEVELS 里的名字或数字；必须在 build_CPU 之前调用。"""
+    global LOG_LEVEL
+    if isinstance(level, str):
+        level = LOG_LEVELS[level.lower()]
+    LOG_LEVEL = level
+    return LOG_LEVEL
+
+
+def log_at(level, fmt, *args):
+    if LOG_LEVEL >= level:
+        log(fmt, *args)
+
+
+def log_commit(fmt, *args):
+    log_at(COMMIT, fmt, *args)
+
+
+def log_info(fmt, *args):
+    log_at(INFO, fmt, *args)
+
+
+def log_debug(fmt, *args):
+    log_at(DEBUG, fmt, *args)
+
+
+def log_final_state(regs, overrides=()):
+    """
+    silent 模式下在 finish() 之前输出最终的体系结构寄存器。
+    overrides 是按从旧到新排列的 (rd, value)，用于补上本周期还没写进 regs 的结果。
+    """
+    if LOG_LEVEL != SILENT:
+        return
+    for i in range(1, 32):
+        value = regs[i]
+        for rd, data in overrides:
+            value = (rd == Bits(5)(i)).select(data, value)
+        log(f"final: x{i}=" + "0x{:08x}", value)
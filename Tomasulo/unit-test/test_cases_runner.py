@@ -16,19 +16,25 @@ from unit_tests.test_cases import (
     case_hazard_war,
     case_loop_sum,
     case_alu_ops,
+    case_mul_div,
     case_mem_rw,
     case_branches_and_jumps,
+    case_branch_recovery,
 )
 from unit_tests.asm_utils import ASM
+from scripts.log_analyzer import LogAnalyzer
 
 
-def _run_case(case_fn, name: str, sim_threshold: int = 300, idle_threshold: int = 150):
+def _run_case(case_fn, name: str, sim_threshold: int = 300, idle_threshold: int = 150, extra_args=()):
     instrs, expected = case_fn()
     # 为每个用例追加 ebreak 收尾
     instrs = list(instrs) + [ASM.ebreak()]
-    log_text = run_sim_and_collect_log(instrs, sim_threshold=sim_threshold, idle_threshold=idle_threshold)
+    log_text = run_sim_and_collect_log(instrs, sim_threshold=sim_threshold, idle_threshold=idle_threshold,
+                                       extra_args=extra_args)
     assert "commit: hit syscall/ebreak" in log_text, f"{name}: 未看到 ebreak 提交"
     for rd, val in expected.items():
+        # 提交日志按无符号十进制打印，负数期望值按 32 位补码比较
+        val &= 0xFFFFFFFF
         assert f"commit: writeback rd={rd} value={val}" in log_text, f"{name}: rd={rd} 写回非 {val}"
     return log_text
 
@@ -39,9 +45,62 @@ def _run_case(case_fn, name: str, sim_threshold: int = 300, idle_threshold: int
         (case_hazard_war, "hazard_war", 200, 120),
         (case_loop_sum, "loop_sum", 400, 200),
         (case_alu_ops, "alu_ops", 250, 150),
+        (case_mul_div, "mul_div", 400, 200),
         (case_mem_rw, "mem_rw", 250, 150),
         (case_branches_and_jumps, "branches_and_jumps", 400, 200),
+        (case_branch_recovery, "branch_recovery", 400, 200),
     ],
 )
 def test_cases_suite(case_fn, name, sim, idle):
     _run_case(case_fn, name, sim_threshold=sim, idle_threshold=idle)
+
+
+@pytest.mark.parametrize(
+    "case_fn,name,sim,idle",
+    [
+        (case_loop_sum, "loop_sum", 600, 300),
+        (case_mul_div, "mul_div", 600, 300),
+        (case_mem_rw, "mem_rw", 400, 200),
+        (case_branch_recovery, "branch_recovery", 600, 300),
+    ],
+)
+def test_cases_one_cdb_lane(case_fn, name, sim, idle):
+    # 只有一条 CDB 时 ALU/LSU/乘除法器都要排队广播，乘法流水线靠仲裁器的反压停住
+    _run_case(case_fn, name, sim_threshold=sim, idle_threshold=idle, extra_args=["--cdb-lanes", "1"])
+
+
+def test_branch_recovery_squashes_wrong_path():
+    log_text = _run_case(case_branch_recovery, "branch_recovery", sim_threshold=400, idle_threshold=200)
+    # 分支比 div 年轻，提交前就已广播，恢复走检查点而不是提交冲刷
+    assert "checkpoint: recover" in log_text, "分支预测错误未按检查点恢复"
+    for rd, val in {2: 99, 4: 99, 5: 198, 6: 1}.items():
+        assert f"commit: writeback rd={rd} value={val}" not in log_text, f"错误路径上的 rd={rd} 被提交"
+
+
+def test_stride_prefetch_counters():
+    """按 4 字一行、每次跨一行遍历数组，跨步预取器确认步长后提前取回后面的行"""
+    count = 32
+    instrs = [
+        ASM.lui(1, 0x2000),    # x1 = DATA_BASE_OFFSET (0x2000)
+        ASM.addi(2, 0, count), # x2 = 32
+        ASM.addi(4, 0, 0),     # i = 0
+        ASM.addi(5, 0, 0),     # sum = 0
+        # Loop: (offset -16)
+        ASM.lw(6, 1, 0),       # x6 = [x1]
+        ASM.add(5, 5, 6),      # sum += x6
+        ASM.addi(1, 1, 16),    # 下一行
+        ASM.addi(4, 4, 1),     # i++
+        ASM.bne(4, 2, -16),    # if i != 32 goto Loop
+        ASM.ebreak(),
+    ]
+    data = [0] * (4 * count)
+    data[0::4] = range(1, count + 1)
+    log_text = run_sim_and_collect_log(instrs, sim_threshold=3000, idle_threshold=300, data_words=data)
+    assert f"commit: writeback rd=5 value={count * (count + 1) // 2}" in log_text, "数组求和结果错误"
+    analyzer = LogAnalyzer()
+    for line in log_text.splitlines():
+        analyzer.feed(line)
+    assert analyzer.prefetch is not None, "ebreak 时未打印 prefetch 统计"
+    # 同一步长连续三次后（第 4 次访问起）每次预取后面第 prefetch_distance 行，后面的 load 应命中预取回填的行
+    assert analyzer.prefetch["issued"] > 0, "跨步预取器未发出预取"
+    assert 0 < analyzer.prefetch["useful"] <= analyzer.prefetch["issued"], "预取的行没有被 load 用到"
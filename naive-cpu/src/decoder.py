@@ -1,4 +1,5 @@
 from assassyn.frontend import *
+from Tomasulo.src.verbosity import log_debug
 from instruction import *
 
 
@@ -93,15 +94,15 @@ def decoder_logic(inst):
                is_I.select(I_alu,
                is_I_star.select(I_star_alu, Bits(RV32I_ALU.CNT)(1 << RV32I_ALU.ALU_NONE))))
 
-    log("decoder type flags: R={} I={} I*={} S={} B={} U={} J={} ecall={} ebreak={}",
+    log_debug("decoder type flags: R={} I={} I*={} S={} B={} U={} J={} ecall={} ebreak={}",
         is_R, is_I, is_I_star, is_S, is_B, is_U, is_J, ecall, ebreak)
-    log("decoder: imm(raw)={} imm(signed)={}", imm, imm.bitcast(Int(32)))
-    log("decoder: rs1_used = {} , rs1 = {}", rs1_used, rs1)
-    log("decoder: rs2_used = {} , rs2 = {}", rs2_used, rs2)
-    log("decoder: rd_used = {} , rd = {}", rd_used, rd)
-    log("decoder: imm_used = {} , imm = {}", imm_used, imm)
-    log("decoder: mem_read = {} , mem_write = {} , is_branch = {} , branch_type = {}", mem_read, mem_write, is_branch, branch_type)
-    log("decoder: alu_type(onehot)={:014b}", alu_type)
+    log_debug("decoder: imm(raw)={} imm(signed)={}", imm, imm.bitcast(Int(32)))
+    log_debug("decoder: rs1_used = {} , rs1 = {}", rs1_used, rs1)
+    log_debug("decoder: rs2_used = {} , rs2 = {}", rs2_used, rs2)
+    log_debug("decoder: rd_used = {} , rd = {}", rd_used, rd)
+    log_debug("decoder: imm_used = {} , imm = {}", imm_used, imm)
+    log_debug("decoder: mem_read = {} , mem_write = {} , is_branch = {} , branch_type = {}", mem_read, mem_write, is_branch, branch_type)
+    log_debug("decoder: alu_type(onehot)={:014b}", alu_type)
 
     return deocder_signals.bundle(
         rs1=rs1,
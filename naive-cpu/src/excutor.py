@@ -1,4 +1,5 @@
 from assassyn.frontend import *
+from Tomasulo.src.verbosity import log_commit, log_info, log_debug, log_final_state
 from instruction import *
 
 
@@ -11,7 +12,7 @@ def executor_logic(signals, regs: RegArray, pc_reg: RegArray, dcache: SRAM):
     rs2_val = signals.rs2_used.select(regs[signals.rs2], UInt(32)(0))
     imm_val = signals.imm.bitcast(UInt(32))
 
-    log("executor input: pc={} rs1_used={} rs2_used={} rd_used={} alu_type={:014b} imm={} branch_type={} jal={} jalr={} ecall={} ebreak={}",
+    log_info("executor input: pc={} rs1_used={} rs2_used={} rd_used={} alu_type={:014b} imm={} branch_type={} jal={} jalr={} ecall={} ebreak={}",
         pc_addr, signals.rs1_used, signals.rs2_used, signals.rd_used, signals.alu_type, imm_val,
         signals.branch_type, signals.is_jal, signals.is_jalr, signals.is_ecall, signals.is_ebreak)
 
@@ -38,7 +39,7 @@ def executor_logic(signals, regs: RegArray, pc_reg: RegArray, dcache: SRAM):
     alu_candidates[RV32I_ALU.ALU_CMP_GEU] = (rs1_val >= op2).zext(UInt(32))
     # 其余保持 0（ALU_NONE 等）
 
-    log("executor operands: rs1_val={} rs2_val={} op2={} shamt={}", rs1_val, rs2_val, op2, shamt)
+    log_debug("executor operands: rs1_val={} rs2_val={} op2={} shamt={}", rs1_val, rs2_val, op2, shamt)
 
     # one-hot 选择 ALU 结果
     alu_res_basic = signals.alu_type.select1hot(*alu_candidates)
@@ -50,12 +51,14 @@ def executor_logic(signals, regs: RegArray, pc_reg: RegArray, dcache: SRAM):
     alu_res = signals.is_lui.select(lui_res,
               signals.is_auipc.select(auipc_res, alu_res_basic))
 
-    log("executor mem flags: mem_read={}, mem_write={}, branch={}", signals.mem_read, signals.mem_write, signals.is_branch)
+    log_debug("executor mem flags: mem_read={}, mem_write={}, branch={}", signals.mem_read, signals.mem_write, signals.is_branch)
 
     # ecall/ebreak：直接结束仿真
     sys_trap = signals.is_ecall | signals.is_ebreak
     with Condition(sys_trap):
-        log("executor: system trap ecall={} ebreak={} at pc={}", signals.is_ecall, signals.is_ebreak, pc_addr)
+        log_commit("executor: system trap ecall={} ebreak={} at pc={}", signals.is_ecall, signals.is_ebreak, pc_addr)
+        # 非流水线：前一条指令已经写回，regs 即为最终状态
+        log_final_state(regs)
         finish()
 
     # 访存地址与对齐
@@ -73,7 +76,7 @@ def executor_logic(signals, regs: RegArray, pc_reg: RegArray, dcache: SRAM):
         wdata=rs2_val.bitcast(Bits(32)),
     )
     with Condition(signals.mem_read | signals.mem_write):
-        log("executor mem access: addr={} re={} we={} misaligned={}", eff_addr, mem_re, mem_we, misaligned)
+        log_debug("executor mem access: addr={} re={} we={} misaligned={}", eff_addr, mem_re, mem_we, misaligned)
 
     # 分支/跳转逻辑
     link_addr = pc_addr + UInt(32)(4)
@@ -108,11 +111,11 @@ def executor_logic(signals, regs: RegArray, pc_reg: RegArray, dcache: SRAM):
     pc_misaligned = ((pc_target_raw & UInt(32)(0b11)).bitcast(UInt(32))) != UInt(32)(0)
     pc_target_aligned = signals.is_jalr.select(jalr_target, pc_target_masked)
     with Condition(signals.is_branch & branch_taken & pc_misaligned):
-        log("branch target misaligned: target={}", pc_target_raw)
+        log_commit("branch target misaligned: target={}", pc_target_raw)
 
     pc_default = link_addr  # 默认下一条
     pc_next = branch_taken.select(pc_target_aligned, pc_default)
-    log("executor pc flow: default_next={} target={} taken={} jal_like={}", pc_default, pc_target_aligned, branch_taken, is_jal_like)
+    log_debug("executor pc flow: default_next={} target={} taken={} jal_like={}", pc_default, pc_target_aligned, branch_taken, is_jal_like)
     pc_reg[0] <= pc_next
 
     # EX 仅产生写回数据意图，实际写回在 MA/WB
@@ -120,5 +123,5 @@ def executor_logic(signals, regs: RegArray, pc_reg: RegArray, dcache: SRAM):
     # 若系统调用，忽略写回内容
     rd_data = sys_trap.select(UInt(32)(0), rd_data)
 
-    log("executor: rs1={} rs2={} op2={} alu_res={} pc_next={}", rs1_val, rs2_val, op2, alu_res, pc_next)
+    log_debug("executor: rs1={} rs2={} op2={} alu_res={} pc_next={}", rs1_val, rs2_val, op2, alu_res, pc_next)
     return rd_data.bitcast(Bits(32))
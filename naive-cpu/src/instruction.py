@@ -1,4 +1,5 @@
 from assassyn.frontend import *
+from Tomasulo.src.verbosity import log_info, log_debug
 
 @rewrite_assign
 def decoder_R_type(inst, is_eq):
@@ -33,8 +34,8 @@ def decoder_R_type(inst, is_eq):
         alu_onehot = Bits(RV32I_ALU.CNT)(1 << alu)
         alu_type = eq.select(alu_onehot, alu_type)
         with Condition(eq):
-            log(f"Decoded R-type instruction: {name}")
-    log("Is R-type instruction: {}", is_R)
+            log_info(f"Decoded R-type instruction: {name}")
+    log_debug("Is R-type instruction: {}", is_R)
     return is_R, rs1, rs2, rd, alu_type
 
 @rewrite_assign
@@ -77,7 +78,7 @@ def decoder_I_type(inst, is_eq):
         alu_onehot = Bits(RV32I_ALU.CNT)(1 << alu)
         alu_type = eq.select(alu_onehot, alu_type)
         with Condition(eq):
-            log(f"Decoded I-type instruction: {name}")
+            log_info(f"Decoded I-type instruction: {name}")
     return is_I, rs1, imm, rd, alu_type
 
 @rewrite_assign
@@ -108,7 +109,7 @@ def decoder_I_star(inst, is_eq):
         alu_onehot = Bits(RV32I_ALU.CNT)(1 << alu)
         alu_type = eq.select(alu_onehot, alu_type)
         with Condition(eq):
-            log(f"Decoded I*-type instruction: {name}")
+            log_info(f"Decoded I*-type instruction: {name}")
 
     return is_I_star, rs1, imm, rd, alu_type
 
@@ -133,7 +134,7 @@ def decoder_S_type(inst, is_eq):
         is_eq[name] = eq
         is_S = is_S | eq
         with Condition(eq):
-            log(f"Decoded S-type instruction: {name}")
+            log_info(f"Decoded S-type instruction: {name}")
     return is_S, rs1, rs2, imm
 
 @rewrite_assign
@@ -162,7 +163,7 @@ def decoder_B_type(inst, is_eq):
         is_eq[name] = eq
         is_B = is_B | eq
         with Condition(eq):
-            log(f"Decoded B-type instruction: {name}")
+            log_info(f"Decoded B-type instruction: {name}")
     return is_B, rs1, rs2, imm
 
 @rewrite_assign
@@ -181,7 +182,7 @@ def decoder_U_type(inst, is_eq):
         is_eq[name] = eq
         is_U = is_U | eq
         with Condition(eq):
-            log(f"Decoded U-type instruction: {name}")
+            log_info(f"Decoded U-type instruction: {name}")
     return is_U, imm, rd
 
 @rewrite_assign
@@ -203,7 +204,7 @@ def decoder_J_type(inst, is_eq):
         is_eq[name] = eq
         is_J = is_J | eq
         with Condition(eq):
-            log(f"Decoded J-type instruction: {name}")
+            log_info(f"Decoded J-type instruction: {name}")
     return is_J, imm, rd
 
 class RV32I_ALU:
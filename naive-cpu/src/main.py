@@ -1,9 +1,19 @@
+import os
+import sys
+
+# 仿真器缓存工具在仓库根目录的 scripts/ 下
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
 from assassyn.frontend import *
 from assassyn.backend import *
 from assassyn import utils, backend
 from assassyn.utils import run_simulator, run_verilator
 from decoder import *
 from excutor import executor_logic
+from Tomasulo.src import verbosity
+from Tomasulo.src.verbosity import log_commit, log_info, log_debug
+from scripts import sim_cache
+from scripts.log_analyzer import LogAnalyzer, SUMMARY_NAME
 
 class WriteBack(Module):
     def __init__(self):
@@ -18,7 +28,7 @@ class WriteBack(Module):
         rd, data = self.pop_all_ports(True)
         with Condition(rd != Bits(5)(0)):
             regs[rd] <= data.bitcast(UInt(32))
-            log("writeback stage: rd = {} data = {}", rd, data)
+            log_commit("writeback stage: rd = {} data = {}", rd, data)
         fetcher.async_called()
 
 class MemoryAccess(Module):
@@ -47,16 +57,16 @@ class MemoryAccess(Module):
         mem_rdata = dcache.dout[0]
 
         with Condition(signals.mem_read | signals.mem_write):
-            log("memory stage: read={} write={} addr={} rs1_val={} imm={} rs2_val={} misaligned={}",
+            log_debug("memory stage: read={} write={} addr={} rs1_val={} imm={} rs2_val={} misaligned={}",
                 mem_re, mem_we, eff_addr, rs1_val, signals.imm, rs2_val, misaligned)
 
         # store 访存已在 EX 阶段触发，这里仅记录
         with Condition(mem_we):
-            log("memory store: addr={} data={}", eff_addr, rs2_val)
+            log_info("memory store: addr={} data={}", eff_addr, rs2_val)
 
         # load写回
         with Condition(mem_re & signals.rd_used & (signals.rd != Bits(5)(0))):
-            log("memory load writeback: rd={} data={}", signals.rd, mem_rdata)
+            log_info("memory load writeback: rd={} data={}", signals.rd, mem_rdata)
         
         wb_data = mem_re.select(
             mem_rdata,
@@ -92,7 +102,7 @@ class Decoder(Module):
         opcode = instr[0:6]
         funct3 = instr[12:14]
         funct7 = instr[25:31]
-        log("decoder fetch pc={} instr=0x{:08x} opcode={:07b} funct3={:03b} funct7={:07b}",
+        log_debug("decoder fetch pc={} instr=0x{:08x} opcode={:07b} funct3={:03b} funct7={:07b}",
             pc_addr, instr, opcode, funct3, funct7)
 
         decoder_result = decoder_logic(inst=instr)
@@ -110,7 +120,7 @@ class Fetcher(Module):
               pc_reg: RegArray):
         pc_addr = pc_reg[0]
 
-        log("fetch stage pc addr: {}", pc_addr)
+        log_info("fetch stage pc addr: {}", pc_addr)
 
         # 由于是 naive CPU，所以要取的肯定就是 pc_addr 对应的指令
         # PC 是字节地址，SRAM 按字（word）索引，需要右移2位
@@ -135,24 +145,30 @@ class Driver(Module):
         with Condition(is_init[0] == UInt(1)(1)):
             is_init[0] <= UInt(1)(0)
             fecher.async_called()
-            log("Naive CPU Simulation Started")
+            log_commit("Naive CPU Simulation Started")
         # with Condition(is_init[0] == UInt(1)(0)):
             # log("Naive CPU Simulation Running")
 
 
 current_path = os.path.dirname(os.path.abspath(__file__))
 workspace = f'{current_path}/workspace/'
-
-def build_naive_CPU(depth_log=18):
+# 内存镜像用相对路径：仿真器启动时在其工作目录（workspace）下读取，
+# 这样编译好的仿真器可以缓存，并且每个测试可以用独立的 workspace
+WORKLOAD_IMAGE = "workload.exe"
+DATA_IMAGE = "data.mem"
+
+def build_naive_CPU(depth_log=18, log_level="debug"):
+    # 日志等级在 elaborate 时生效，低于该等级的 log 不会生成到仿真器里
+    verbosity.set_log_level(log_level)
     sys = SysBuilder("Naive-CPU")
     with sys:
         icache = SRAM(width= 32,
                       depth= 1 << depth_log,
-                      init_file= f"{workspace}/workload.exe")
+                      init_file= WORKLOAD_IMAGE)
         icache.name = "icache"
         dcache = SRAM(width= 32,
                       depth= 1 << depth_log,
-                      init_file= f"{workspace}/data.mem")
+                      init_file= DATA_IMAGE)
         dcache.name = "dcache"
         regs = RegArray(UInt(32), 32, initializer=[0]*32)
         pc_reg = RegArray(UInt(32), 1, initializer=[0])
@@ -178,21 +194,47 @@ def main():
     parser = argparse.ArgumentParser(description="Run Naive CPU simulator")
     parser.add_argument("--sim-threshold", type=int, default=100, help="max simulation steps")
     parser.add_argument("--idle-threshold", type=int, default=100, help="idle cycles before stop")
+    parser.add_argument("--log-level", choices=list(verbosity.LOG_LEVELS), default="debug",
+                        help="drop logs below this level at elaboration; silent only dumps final registers")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="re-elaborate even if a cached simulator exists")
+    parser.add_argument("--workspace", default=workspace,
+                        help="directory holding workload.exe/data.mem, receives the log")
     args = parser.parse_args()
-
-    sys = build_naive_CPU(depth_log = 18)
-    cfg = backend.config(
-        resource_base='.',
-        verilog=True,
-        verbose=True,
-        sim_threshold=args.sim_threshold,
-        idle_threshold=args.idle_threshold,
-    )
-    sim,vcd = elaborate(sys=sys, **cfg)
-    output = run_simulator(sim)
-    print("simulate output is written in /workspace/log")
-    with open(f"{workspace}/log", "w") as f:
-        print(output, file = f)
+    run_dir = os.path.abspath(args.workspace)
+
+    depth_log = 18
+    def build(path):
+        sys = build_naive_CPU(depth_log = depth_log, log_level=args.log_level)
+        cfg = backend.config(
+            path=path,
+            resource_base='.',
+            verilog=True,
+            verbose=True,
+            sim_threshold=args.sim_threshold,
+            idle_threshold=args.idle_threshold,
+        )
+        return elaborate(sys=sys, **cfg)
+
+    params = {
+        "design": "naive",
+        "depth_log": depth_log,
+        "sim_threshold": args.sim_threshold,
+        "idle_threshold": args.idle_threshold,
+        "log_level": args.log_level,
+        "verilog": True,
+        # 日志等级模块在 Tomasulo/src 下，不在本设计目录的源码哈希里
+        "tomasulo_modules": sim_cache.imported_digest("Tomasulo.src"),
+    }
+    os.makedirs(run_dir, exist_ok=True)
+    with sim_cache.working_directory(run_dir):
+        entry = sim_cache.get_or_build(current_path, params, build, rebuild=args.no_cache)
+    # 边运行边写 log，同时单遍统计周期/提交/寄存器，结果存到 summary.json
+    analyzer = LogAnalyzer()
+    with open(f"{run_dir}/log", "w") as f:
+        analyzer.tee(sim_cache.stream_simulator_in(entry["simulator"], run_dir), f)
+    analyzer.write_summary(f"{run_dir}/{SUMMARY_NAME}")
+    print(f"simulate output is written in {run_dir}/log")
 
 if __name__ == "__main__":
     main()
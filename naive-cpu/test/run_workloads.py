@@ -5,10 +5,10 @@ Batch-run prebuilt workloads against the naive CPU simulator and check a0.
 Usage:
     python naive-cpu/test/run_workloads.py            # run all known cases
     python naive-cpu/test/run_workloads.py fib sum    # run selected cases
+    python naive-cpu/test/run_workloads.py --jobs 8   # run 8 cases at once in private workspaces
 """
 
-import re
-import shutil
+import argparse
 import subprocess
 import sys
 from pathlib import Path
@@ -17,6 +17,14 @@ REPO_ROOT = Path(__file__).resolve().parents[2]
 WORKLOAD_DIR = REPO_ROOT / "test" / "my_tests" / "workloads"
 WORKSPACE_DIR = REPO_ROOT / "naive-cpu" / "src" / "workspace"
 SIM_ENTRY = REPO_ROOT / "naive-cpu" / "src" / "main.py"
+# The naive executor indexes dcache with addr >> 2 directly (no data_base offset)
+NAIVE_DATA_BASE = 0
+
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+from scripts import iss
+from scripts.log_analyzer import load_summary
+from scripts.workspaces import LOG_NAME, private_workspace, run_pool, stage_images
 
 # Expected a0 values for each workload
 EXPECTED = {
@@ -33,8 +41,6 @@ EXPECTED = {
     "shift_test": 4,
 }
 
-LOG_PATTERN = re.compile(r"writeback stage: rd = ([0-9a-fA-Fx]+) data = ([0-9a-fA-Fx]+)")
-
 
 def locate_workload(name: str):
     # Prefer per-test subfolder, fallback to flat layout for compatibility
@@ -48,13 +54,13 @@ def locate_workload(name: str):
     return None, None
 
 
-def run_one(name: str, sim_threshold: int = 500000, idle_threshold: int = 500000):
+def run_one(name: str, sim_threshold: int = 500000, idle_threshold: int = 500000, isolated: bool = False):
     exe, data = locate_workload(name)
     if exe is None or data is None:
         return False, f"missing workload files for {name}"
 
-    shutil.copyfile(exe, WORKSPACE_DIR / "workload.exe")
-    shutil.copyfile(data, WORKSPACE_DIR / "data.mem")
+    workspace = private_workspace(WORKSPACE_DIR, name) if isolated else WORKSPACE_DIR
+    stage_images(workspace, exe, data)
 
     proc = subprocess.run(
         [
@@ -64,6 +70,8 @@ def run_one(name: str, sim_threshold: int = 500000, idle_threshold: int = 500000
             str(sim_threshold),
             "--idle-threshold",
             str(idle_threshold),
+            "--workspace",
+            str(workspace),
         ],
         capture_output=True,
         text=True,
@@ -72,28 +80,21 @@ def run_one(name: str, sim_threshold: int = 500000, idle_threshold: int = 500000
     if proc.returncode != 0:
         return False, f"simulator exited with {proc.returncode}\n{proc.stderr}"
 
-    log_file = WORKSPACE_DIR / "log"
-    if log_file.exists():
-        log_text = log_file.read_text()
-    else:
-        log_text = proc.stdout
-
-    matches = []
-    for rd_str, data_str in LOG_PATTERN.findall(log_text):
-        try:
-            rd_val = int(rd_str, 0)
-        except ValueError:
-            continue
-        if rd_val == 10:
-            matches.append(int(data_str, 0))
-
-    if not matches:
+    summary = load_summary(workspace / LOG_NAME)
+    if summary is None or summary["a0"] is None:
         return False, "no a0 writeback found in log"
 
-    last_val = matches[-1]
+    last_val = summary["a0"]
     expected = EXPECTED.get(name)
     if expected is None:
-        return False, f"no expected value set for {name}"
+        # Fall back to the RV32I golden model; the naive CPU maps data at address 0
+        machine = iss.load_images(exe, data, data_base=NAIVE_DATA_BASE)
+        try:
+            if not machine.run():
+                return False, f"golden model did not halt for {name}"
+        except iss.ISSError as e:
+            return False, f"golden model: {e}"
+        expected = machine.a0
 
     if last_val != expected:
         return False, f"a0 mismatch: got {last_val}, expected {expected}"
@@ -102,10 +103,19 @@ def run_one(name: str, sim_threshold: int = 500000, idle_threshold: int = 500000
 
 
 def main():
-    targets = sys.argv[1:] or sorted(EXPECTED.keys())
+    parser = argparse.ArgumentParser(description="Run prebuilt workloads on the naive CPU")
+    parser.add_argument("tests", nargs="*", help="cases to run (default: all known cases)")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="run N cases concurrently, each in a private workspace")
+    args = parser.parse_args()
+
+    targets = args.tests or sorted(EXPECTED.keys())
     passed = 0
-    for name in targets:
-        ok, msg = run_one(name)
+
+    def job(name):
+        return name, run_one(name, isolated=args.jobs > 1)
+
+    for name, (ok, msg) in run_pool(job, targets, jobs=args.jobs):
         status = "PASS" if ok else "FAIL"
         print(f"[{status}] {name}: {msg}")
         passed += int(ok)
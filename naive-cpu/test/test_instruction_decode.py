@@ -14,6 +14,8 @@ from assassyn.ir.dtype import RecordValue  # noqa: E402
 from assassyn.ir.expr.arith import BinaryOp, UnaryOp  # noqa: E402
 from assassyn.ir.expr.expr import Cast, Concat, Operand, Select, Select1Hot  # noqa: E402
 sys.path.append(os.path.join(ROOT_DIR, "src"))
+# 日志等级模块 verbosity 在仓库根目录的 Tomasulo/src 下
+sys.path.append(os.path.dirname(ROOT_DIR))
 from decoder import decoder_logic  # noqa: E402,E402
 from instruction import RV32I_ALU  # noqa: E402,E402
 
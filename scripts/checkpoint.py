@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Architectural checkpoints: fast-forward a workload on the golden model and
+start detailed simulation from there.
+
+A checkpoint is a small JSON document holding the architectural state after
+`instret` retired instructions:
+
+    {
+      "version": 1,
+      "instret": 10000,
+      "pc": 4660,
+      "regs": [0, 80, ...],                  # x0..x31
+      "data_base": 8192,
+      "memory": [[start_word, [w0, w1, ...]], ...]
+    }
+
+`memory` is sparse: only runs of non-zero data words are stored, indexed the
+way the dcache is (`(addr - data_base) >> 2`). The instruction image is not
+part of the checkpoint; it is the workload's `.exe` as before.
+
+`Tomasulo/src/main.py --checkpoint <file>` bakes `pc`/`regs` into the
+initial values of `pc_reg`/`regs` and loads the dcache from the checkpoint's
+memory, so the simulated run begins at instruction `instret`.
+
+Usage:
+    python scripts/checkpoint.py vector_mul_100 -n 10000 -o vm.ckpt.json
+    python scripts/checkpoint.py --info vm.ckpt.json
+"""
+
+import json
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+from scripts import iss
+
+CHECKPOINT_VERSION = 1
+CHECKPOINT_NAME = "checkpoint.json"
+# name of the dcache image main.py writes into the workspace for a checkpoint run
+CHECKPOINT_IMAGE = "checkpoint.mem"
+
+
+class CheckpointError(Exception):
+    pass
+
+
+def _memory_runs(mem) -> list:
+    """Runs of consecutive non-zero words as [start, [words...]]."""
+    runs = []
+    start = None
+    for i, word in enumerate(mem):
+        if word:
+            if start is None:
+                start = i
+        elif start is not None:
+            runs.append([start, list(mem[start:i])])
+            start = None
+    if start is not None:
+        runs.append([start, list(mem[start:])])
+    return runs
+
+
+def capture(machine: "iss.Machine") -> dict:
+    """Snapshot the architectural state of a golden-model machine."""
+    return {
+        "version": CHECKPOINT_VERSION,
+        "instret": machine.instret,
+        "pc": machine.pc,
+        "regs": list(machine.regs),
+        "data_base": machine.data_base,
+        "memory": _memory_runs(machine.mem),
+    }
+
+
+def take(name_or_dir, instructions: int, depth_log: int = iss.DEPTH_LOG) -> dict:
+    """Run a test on the golden model for `instructions` and checkpoint it."""
+    machine = iss.load_test(name_or_dir, depth_log)
+    if machine.run(instructions):
+        raise CheckpointError(
+            f"{name_or_dir}: program halts after {machine.instret} instructions, "
+            f"before the checkpoint at {instructions}"
+        )
+    return capture(machine)
+
+
+def memory_words(checkpoint: dict):
+    """Yield (word_index, value) for every non-zero data word."""
+    for start, words in checkpoint["memory"]:
+        for offset, word in enumerate(words):
+            yield start + offset, word
+
+
+def restore(checkpoint: dict, text, depth_log: int = iss.DEPTH_LOG) -> "iss.Machine":
+    """Golden-model machine resuming from a checkpoint (e.g. for cosim)."""
+    machine = iss.Machine(text, data_base=checkpoint["data_base"], depth_log=depth_log)
+    for index, word in memory_words(checkpoint):
+        if index >= len(machine.mem):
+            raise CheckpointError(f"checkpoint word {index} outside a {len(machine.mem)}-word memory")
+        machine.mem[index] = word
+    machine.regs[:] = checkpoint["regs"]
+    machine.regs[0] = 0
+    machine.pc = checkpoint["pc"]
+    machine.instret = checkpoint["instret"]
+    return machine
+
+
+def write_data_image(checkpoint: dict, path, depth_log: int = iss.DEPTH_LOG):
+    """Write the checkpoint memory as a dense `.data`-style hex image."""
+    end = 0
+    for start, words in checkpoint["memory"]:
+        end = max(end, start + len(words))
+    if end > 1 << depth_log:
+        raise CheckpointError(f"checkpoint memory needs {end} words, dcache holds {1 << depth_log}")
+    image = [0] * end
+    for index, word in memory_words(checkpoint):
+        image[index] = word
+    with open(path, "w") as f:
+        for word in image:
+            f.write(f"{word:08x}\n")
+
+
+def initial_state(checkpoint: dict) -> dict:
+    """The part of a checkpoint that is baked into the design at elaboration."""
+    return {"pc": checkpoint["pc"], "regs": [r & iss.M32 for r in checkpoint["regs"]]}
+
+
+def save(checkpoint: dict, path):
+    Path(path).write_text(json.dumps(checkpoint))
+
+
+def load(path) -> dict:
+    checkpoint = json.loads(Path(path).read_text())
+    version = checkpoint.get("version")
+    if version != CHECKPOINT_VERSION:
+        raise CheckpointError(f"{path}: unsupported checkpoint version {version}")
+    return checkpoint
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fast-forward a test on the golden model and checkpoint it")
+    parser.add_argument("test", nargs="?", help="test name under test/test_suite, or a test directory")
+    parser.add_argument("-n", "--instructions", type=int, help="instructions to fast-forward")
+    parser.add_argument("-o", "--output", help="checkpoint file (default: <test>.ckpt.json)")
+    parser.add_argument("--info", metavar="FILE", help="print a summary of an existing checkpoint")
+    args = parser.parse_args()
+
+    if args.info:
+        ckpt = load(args.info)
+        words = sum(len(words) for _, words in ckpt["memory"])
+        print(f"instret={ckpt['instret']} pc=0x{ckpt['pc']:08x} data_base=0x{ckpt['data_base']:x} "
+              f"memory={words} words in {len(ckpt['memory'])} runs")
+        return 0
+    if args.test is None or args.instructions is None:
+        parser.error("a test and -n/--instructions are required")
+
+    try:
+        ckpt = take(args.test, args.instructions)
+    except (CheckpointError, iss.ISSError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    output = args.output or f"{iss.resolve_test_dir(args.test).name}.ckpt.json"
+    save(ckpt, output)
+    print(f"checkpoint at instret={ckpt['instret']} pc=0x{ckpt['pc']:08x} written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Lockstep commit-stream co-simulation against the RV32I golden model.
+
+Every `commit: retire rob=.. pc=.. rd=.. is_store=.. value=..` line the
+Tomasulo `Commiter` prints is checked the moment it arrives: the golden
+model (scripts/iss.py) retires one instruction and the PC, destination
+register and written value must agree. The first mismatch is reported with
+the cycle, ROB slot, PC, the instruction text from the test's `.asm` file and
+expected versus actual values, and main.py kills the simulator right away
+instead of letting a broken design run to `sim_threshold`.
+
+Used by `Tomasulo/src/main.py --cosim` (and `Tomasulo/run_tests.py --cosim`);
+it can also check a log that was already written:
+
+Usage:
+    python scripts/cosim.py Tomasulo/src/workspace/log fib
+"""
+
+import json
+import re
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+from scripts import iss
+
+COSIM_REPORT_NAME = "cosim.json"
+# main.py exit status when the design diverged from the golden model
+COSIM_DIVERGED = 3
+
+RETIRE_MARK = "commit: retire"
+RETIRE_PATTERN = re.compile(
+    r"commit: retire rob=(\d+)\s+pc=0x([0-9a-fA-F]+)\s+rd=(\d+)\s+is_store=(\d+)\s+value=0x([0-9a-fA-F]+)"
+)
+CYCLE_PATTERN = re.compile(r"Cycle @(\d+(?:\.\d+)?)")
+# objdump -d line:  "  10:\tfd010113          \taddi\tsp,sp,-48 # 1ffd0 <main+0x1ffc0>"
+ASM_LINE_PATTERN = re.compile(r"^\s*([0-9a-fA-F]+):\s+([0-9a-fA-F]{8})\s+(.*?)\s*$")
+
+
+def read_disassembly(asm_file) -> dict:
+    """Map pc -> instruction text from an objdump `.asm` file (empty if missing)."""
+    disasm = {}
+    if asm_file is None or not Path(asm_file).exists():
+        return disasm
+    for line in Path(asm_file).read_text(errors="replace").splitlines():
+        m = ASM_LINE_PATTERN.match(line)
+        if m:
+            disasm[int(m.group(1), 16)] = " ".join(m.group(3).split())
+    return disasm
+
+
+class CommitChecker:
+    """Compare retire records against the golden model one at a time."""
+
+    def __init__(self, machine: "iss.Machine", disasm: dict = None):
+        self.machine = machine
+        self.disasm = disasm or {}
+        self.checked = 0
+        self.divergence = None
+
+    def feed(self, line: str) -> bool:
+        """Check one log line; return False once the streams have diverged."""
+        if self.divergence is not None:
+            return False
+        if RETIRE_MARK not in line:
+            return True
+        m = RETIRE_PATTERN.search(line)
+        if m is None:
+            return True
+        rob = int(m.group(1))
+        pc = int(m.group(2), 16)
+        is_store = m.group(4) != "0"
+        rd = 0 if is_store else int(m.group(3))
+        value = int(m.group(5), 16)
+        actual = {"pc": pc, "rd": rd, "value": value if rd else None}
+        cycle = CYCLE_PATTERN.search(line)
+        cycle = int(float(cycle.group(1))) if cycle else None
+
+        try:
+            ref_pc, ref_rd, ref_value = self.machine.step()
+        except StopIteration:
+            return self._diverge("design retired past the reference's ebreak", cycle, rob, pc, None, actual)
+        except iss.ISSError as e:
+            return self._diverge(f"reference model error: {e}", cycle, rob, pc, None, actual)
+        expected = {"pc": ref_pc, "rd": ref_rd, "value": ref_value if ref_rd else None}
+
+        if pc != ref_pc:
+            return self._diverge("pc mismatch", cycle, rob, ref_pc, expected, actual)
+        if rd != ref_rd:
+            return self._diverge("destination register mismatch", cycle, rob, pc, expected, actual)
+        if ref_rd and value != ref_value:
+            return self._diverge("value mismatch", cycle, rob, pc, expected, actual)
+        self.checked += 1
+        return True
+
+    def _diverge(self, reason, cycle, rob, pc, expected, actual) -> bool:
+        self.divergence = {
+            "reason": reason,
+            "commit": self.checked,
+            "cycle": cycle,
+            "rob": rob,
+            "pc": pc,
+            "instruction": self.disasm.get(pc, "?"),
+            "expected": expected,
+            "actual": actual,
+        }
+        return False
+
+    def finish(self) -> dict:
+        """Report once the stream has ended (or diverged)."""
+        return {
+            "ok": self.divergence is None and self.machine.halted,
+            "checked": self.checked,
+            "reference_halted": self.machine.halted,
+            "divergence": self.divergence,
+        }
+
+
+def _fmt(record) -> str:
+    if record is None:
+        return "-"
+    text = f"pc=0x{record['pc']:08x}"
+    if record["rd"]:
+        text += f" x{record['rd']}=0x{record['value']:08x}"
+    return text
+
+
+def describe(report: dict) -> str:
+    """One-line human readable summary of a cosim report."""
+    div = report.get("divergence")
+    if div is None:
+        if report.get("reference_halted"):
+            return f"cosim ok ({report['checked']} commits)"
+        return f"cosim: design stopped after {report['checked']} commits, reference not halted"
+    return (f"cosim diverged at commit #{div['commit']} (cycle {div['cycle']}, rob {div['rob']}) "
+            f"pc=0x{div['pc']:08x} `{div['instruction']}`: {div['reason']}; "
+            f"expected {_fmt(div['expected'])}, got {_fmt(div['actual'])}")
+
+
+def write_report(report: dict, path):
+    Path(path).write_text(json.dumps(report, indent=2))
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Check a Tomasulo log against the golden model")
+    parser.add_argument("log", help="simulator log with commit: retire lines")
+    parser.add_argument("test", help="test name under test/test_suite, or a test directory")
+    args = parser.parse_args()
+
+    test_dir = iss.resolve_test_dir(args.test)
+    checker = CommitChecker(iss.load_test(test_dir), read_disassembly(test_dir / f"{test_dir.name}.asm"))
+    with open(args.log, errors="replace") as f:
+        for line in f:
+            if not checker.feed(line):
+                break
+    report = checker.finish()
+    print(describe(report))
+    return 0 if report["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
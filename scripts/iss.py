@@ -0,0 +1,489 @@
+#!/usr/bin/env python3
+"""
+Functional RV32IM instruction-set simulator (golden model).
+
+Executes the same `.exe`/`.data` images the CPU designs load, with the same
+memory map: instructions are fetched from a separate instruction memory at
+`pc >> 2`, data lives in a word-addressed memory starting at `data_base`
+(taken from `<name>.config.json`, default 0x2000) with `1 << depth_log`
+words. Execution stops at `ebreak`/`ecall`.
+
+Speed comes from predecoding: every instruction word is turned once into a
+closure specialized on its opcode, registers and immediate, so the run loop
+is just `pc = ops[pc >> 2](pc)`. Data memory is a flat `array('I')`;
+`Machine.memory_view()` exposes it as a NumPy array when NumPy is installed.
+
+Usage:
+    python scripts/iss.py fib                      # test/test_suite/fib
+    python scripts/iss.py test/test_suite/fib      # same, by directory
+    python scripts/iss.py fib --json               # regs/instret as JSON
+    python scripts/iss.py fib --dump-mem mem.hex   # final data memory
+"""
+
+import json
+import sys
+from array import array
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+TEST_SUITE_DIR = REPO_ROOT / "test" / "test_suite"
+
+DATA_BASE = 0x2000
+DEPTH_LOG = 18
+MAX_INSTRUCTIONS = 100_000_000
+
+M32 = 0xFFFFFFFF
+SIGN32 = 0x80000000
+
+# array typecode holding exactly 32 bits
+WORD_TYPE = "I" if array("I").itemsize == 4 else "L"
+
+ABI_NAMES = [
+    "zero", "ra", "sp", "gp", "tp", "t0", "t1", "t2",
+    "s0", "s1", "a0", "a1", "a2", "a3", "a4", "a5",
+    "a6", "a7", "s2", "s3", "s4", "s5", "s6", "s7",
+    "s8", "s9", "s10", "s11", "t3", "t4", "t5", "t6",
+]
+
+
+class ISSError(Exception):
+    """Raised for illegal instructions and out-of-range fetches/accesses."""
+
+
+class _Halt(Exception):
+    pass
+
+
+def _sext(value: int, bits: int) -> int:
+    sign = 1 << (bits - 1)
+    return (value & (sign - 1)) - (value & sign)
+
+
+def read_hex_words(path) -> list:
+    """Read a one-word-per-line hex image (`.exe`, `.data`, `workload.exe`)."""
+    path = Path(path)
+    if not path.exists():
+        return []
+    words = []
+    for line in path.read_text().split():
+        words.append(int(line, 16) & M32)
+    return words
+
+
+class Machine:
+    """Architectural state plus the predecoded program."""
+
+    def __init__(self, text, data=(), data_base: int = DATA_BASE, depth_log: int = DEPTH_LOG):
+        self.regs = [0] * 32
+        self.pc = 0
+        self.instret = 0
+        self.halted = False
+        self.data_base = data_base
+        self.mem = array(WORD_TYPE, bytes(4 << depth_log))
+        data = list(data)
+        if len(data) > len(self.mem):
+            raise ISSError(f"data image has {len(data)} words, memory holds {len(self.mem)}")
+        self.mem[:len(data)] = array(WORD_TYPE, data)
+        self.text = list(text)
+        self.ops = []
+        self.dest = []
+        for word in self.text:
+            op, rd = self._predecode(word)
+            self.ops.append(op)
+            self.dest.append(rd)
+
+    # ------------------------------------------------------------------ #
+    # predecode
+    # ------------------------------------------------------------------ #
+    def _predecode(self, word: int):
+        """Return (closure, rd) for one instruction; rd is 0 if nothing is written."""
+        regs = self.regs
+        mem = self.mem
+        base = self.data_base
+        opcode = word & 0x7F
+        rd = (word >> 7) & 0x1F
+        funct3 = (word >> 12) & 0x7
+        rs1 = (word >> 15) & 0x1F
+        rs2 = (word >> 20) & 0x1F
+        funct7 = word >> 25
+        imm_i = _sext(word >> 20, 12)
+        imm_s = _sext(((word >> 25) << 5) | ((word >> 7) & 0x1F), 12)
+        imm_b = _sext(((word >> 31) << 12) | (((word >> 7) & 1) << 11)
+                      | (((word >> 25) & 0x3F) << 5) | (((word >> 8) & 0xF) << 1), 13)
+        imm_u = word & 0xFFFFF000
+        imm_j = _sext(((word >> 31) << 20) | (((word >> 12) & 0xFF) << 12)
+                      | (((word >> 20) & 1) << 11) | (((word >> 21) & 0x3FF) << 1), 21)
+
+        def illegal(pc):
+            raise ISSError(f"illegal instruction 0x{word:08x} at pc=0x{pc:08x}")
+
+        def nop(pc):
+            return pc + 4
+
+        if opcode == 0b0110111:  # lui
+            if rd == 0:
+                return nop, 0
+            def op(pc):
+                regs[rd] = imm_u
+                return pc + 4
+            return op, rd
+
+        if opcode == 0b0010111:  # auipc
+            if rd == 0:
+                return nop, 0
+            def op(pc):
+                regs[rd] = (pc + imm_u) & M32
+                return pc + 4
+            return op, rd
+
+        if opcode == 0b1101111:  # jal
+            if rd == 0:
+                def op(pc):
+                    return (pc + imm_j) & M32
+                return op, 0
+            def op(pc):
+                regs[rd] = (pc + 4) & M32
+                return (pc + imm_j) & M32
+            return op, rd
+
+        if opcode == 0b1100111 and funct3 == 0:  # jalr
+            def op(pc):
+                target = (regs[rs1] + imm_i) & 0xFFFFFFFE
+                if rd:
+                    regs[rd] = (pc + 4) & M32
+                return target
+            return op, rd
+
+        if opcode == 0b1100011:  # branches
+            cond = _BRANCHES.get(funct3)
+            if cond is None:
+                return illegal, 0
+            def op(pc):
+                if cond(regs[rs1], regs[rs2]):
+                    return (pc + imm_b) & M32
+                return pc + 4
+            return op, 0
+
+        if opcode == 0b0000011:  # loads
+            if funct3 == 0b010:  # lw
+                def op(pc):
+                    off = ((regs[rs1] + imm_i) & M32) - base
+                    if off < 0 or off & 3:
+                        raise ISSError(f"bad lw address 0x{(off + base) & M32:08x} at pc=0x{pc:08x}")
+                    value = mem[off >> 2]
+                    if rd:
+                        regs[rd] = value
+                    return pc + 4
+                return op, rd
+            width = {0b000: 8, 0b001: 16, 0b100: 8, 0b101: 16}.get(funct3)
+            if width is None:
+                return illegal, 0
+            signed = funct3 < 0b100
+            mask = (1 << width) - 1
+            align = width // 8 - 1
+            def op(pc):
+                off = ((regs[rs1] + imm_i) & M32) - base
+                if off < 0 or off & align:
+                    raise ISSError(f"bad load address 0x{(off + base) & M32:08x} at pc=0x{pc:08x}")
+                value = (mem[off >> 2] >> ((off & 3) * 8)) & mask
+                if rd:
+                    regs[rd] = (_sext(value, width) & M32) if signed else value
+                return pc + 4
+            return op, rd
+
+        if opcode == 0b0100011:  # stores
+            if funct3 == 0b010:  # sw
+                def op(pc):
+                    off = ((regs[rs1] + imm_s) & M32) - base
+                    if off < 0 or off & 3:
+                        raise ISSError(f"bad sw address 0x{(off + base) & M32:08x} at pc=0x{pc:08x}")
+                    mem[off >> 2] = regs[rs2]
+                    return pc + 4
+                return op, 0
+            width = {0b000: 8, 0b001: 16}.get(funct3)
+            if width is None:
+                return illegal, 0
+            mask = (1 << width) - 1
+            align = width // 8 - 1
+            def op(pc):
+                off = ((regs[rs1] + imm_s) & M32) - base
+                if off < 0 or off & align:
+                    raise ISSError(f"bad store address 0x{(off + base) & M32:08x} at pc=0x{pc:08x}")
+                shift = (off & 3) * 8
+                idx = off >> 2
+                mem[idx] = (mem[idx] & ~(mask << shift) & M32) | ((regs[rs2] & mask) << shift)
+                return pc + 4
+            return op, 0
+
+        if opcode == 0b0010011:  # OP-IMM
+            shamt = rs2
+            if funct3 == 0b001:
+                if funct7 != 0:
+                    return illegal, 0
+                fn = lambda a: (a << shamt) & M32
+            elif funct3 == 0b101:
+                if funct7 == 0:
+                    fn = lambda a: a >> shamt
+                elif funct7 == 0b0100000:
+                    fn = lambda a: ((a - ((a & SIGN32) << 1)) >> shamt) & M32
+                else:
+                    return illegal, 0
+            else:
+                imm = imm_i & M32
+                fn = {
+                    0b000: lambda a: (a + imm) & M32,
+                    0b010: lambda a: int((a ^ SIGN32) < (imm ^ SIGN32)),
+                    0b011: lambda a: int(a < imm),
+                    0b100: lambda a: a ^ imm,
+                    0b110: lambda a: a | imm,
+                    0b111: lambda a: a & imm,
+                }[funct3]
+            if rd == 0:
+                return nop, 0
+            if funct3 == 0b000:  # addi/li/mv are by far the most common
+                def op(pc):
+                    regs[rd] = (regs[rs1] + imm) & M32
+                    return pc + 4
+                return op, rd
+            def op(pc):
+                regs[rd] = fn(regs[rs1])
+                return pc + 4
+            return op, rd
+
+        if opcode == 0b0110011:  # OP
+            fn = _ALU_OPS.get((funct7, funct3))
+            if fn is None:
+                return illegal, 0
+            if rd == 0:
+                return nop, 0
+            def op(pc):
+                regs[rd] = fn(regs[rs1], regs[rs2])
+                return pc + 4
+            return op, rd
+
+        if opcode == 0b1110011 and funct3 == 0 and rs1 == 0 and rd == 0 and (word >> 20) in (0, 1):
+            def op(pc):  # ecall / ebreak
+                raise _Halt()
+            return op, 0
+
+        if opcode == 0b0001111:  # fence: no-op for a single in-order hart
+            return nop, 0
+
+        return illegal, 0
+
+    # ------------------------------------------------------------------ #
+    # execution
+    # ------------------------------------------------------------------ #
+    def run(self, max_instructions: int = MAX_INSTRUCTIONS) -> bool:
+        """Run until ebreak/ecall or `max_instructions`; return True if halted."""
+        ops = self.ops
+        pc = self.pc
+        n = -1
+        try:
+            for n in range(max_instructions):
+                pc = ops[pc >> 2](pc)
+            n = max_instructions
+        except _Halt:
+            n += 1
+            self.halted = True
+        except IndexError:
+            self.pc = pc
+            self.instret += max(n, 0)
+            if (pc >> 2) >= len(ops):
+                raise ISSError(f"instruction fetch out of range at pc=0x{pc:08x}") from None
+            raise ISSError(f"data access out of range at pc=0x{pc:08x}") from None
+        except ISSError:
+            self.pc = pc
+            self.instret += max(n, 0)
+            raise
+        self.pc = pc
+        self.instret += n
+        return self.halted
+
+    def step(self):
+        """
+        Execute one instruction and return `(pc, rd, value)` of what it
+        retired (rd is 0 for stores/branches). Raises StopIteration once the
+        machine has halted.
+        """
+        if self.halted:
+            raise StopIteration
+        pc = self.pc
+        idx = pc >> 2
+        if idx >= len(self.ops):
+            raise ISSError(f"instruction fetch out of range at pc=0x{pc:08x}")
+        try:
+            self.pc = self.ops[idx](pc)
+        except _Halt:
+            self.halted = True
+        except IndexError:
+            raise ISSError(f"data access out of range at pc=0x{pc:08x}") from None
+        self.instret += 1
+        rd = self.dest[idx]
+        return pc, rd, self.regs[rd]
+
+    # ------------------------------------------------------------------ #
+    # results
+    # ------------------------------------------------------------------ #
+    @property
+    def a0(self) -> int:
+        return self.regs[10]
+
+    def memory_view(self):
+        """Data memory as a NumPy uint32 array (zero-copy) if NumPy is available."""
+        try:
+            import numpy as np
+        except ImportError:
+            return self.mem
+        return np.frombuffer(self.mem, dtype=np.uint32)
+
+    def dump_memory(self, path, words: int = None):
+        """Write data memory in the `.data` hex format (trailing zeros trimmed)."""
+        mem = self.mem
+        end = len(mem) if words is None else min(words, len(mem))
+        while end and not mem[end - 1]:
+            end -= 1
+        with open(path, "w") as f:
+            for i in range(end):
+                f.write(f"{mem[i]:08x}\n")
+
+    def result(self) -> dict:
+        return {
+            "halted": self.halted,
+            "pc": self.pc,
+            "instret": self.instret,
+            "a0": self.a0,
+            "regs": list(self.regs),
+        }
+
+
+def _signed(value: int) -> int:
+    return value - ((value & SIGN32) << 1)
+
+
+def _div(a: int, b: int) -> int:
+    """RISC-V div: truncates toward zero; x/0 = -1; -2^31/-1 = -2^31."""
+    if b == 0:
+        return M32
+    a, b = _signed(a), _signed(b)
+    q = abs(a) // abs(b)
+    return (-q if (a < 0) != (b < 0) else q) & M32
+
+
+def _rem(a: int, b: int) -> int:
+    """RISC-V rem: takes the sign of the dividend; x%0 = x."""
+    if b == 0:
+        return a
+    a, b = _signed(a), _signed(b)
+    r = abs(a) % abs(b)
+    return (-r if a < 0 else r) & M32
+
+
+_BRANCHES = {
+    0b000: lambda a, b: a == b,
+    0b001: lambda a, b: a != b,
+    0b100: lambda a, b: (a ^ SIGN32) < (b ^ SIGN32),
+    0b101: lambda a, b: (a ^ SIGN32) >= (b ^ SIGN32),
+    0b110: lambda a, b: a < b,
+    0b111: lambda a, b: a >= b,
+}
+
+_ALU_OPS = {
+    (0b0000000, 0b000): lambda a, b: (a + b) & M32,
+    (0b0100000, 0b000): lambda a, b: (a - b) & M32,
+    (0b0000000, 0b001): lambda a, b: (a << (b & 31)) & M32,
+    (0b0000000, 0b010): lambda a, b: int((a ^ SIGN32) < (b ^ SIGN32)),
+    (0b0000000, 0b011): lambda a, b: int(a < b),
+    (0b0000000, 0b100): lambda a, b: a ^ b,
+    (0b0000000, 0b101): lambda a, b: a >> (b & 31),
+    (0b0100000, 0b101): lambda a, b: ((a - ((a & SIGN32) << 1)) >> (b & 31)) & M32,
+    (0b0000000, 0b110): lambda a, b: a | b,
+    (0b0000000, 0b111): lambda a, b: a & b,
+    # RV32M
+    (0b0000001, 0b000): lambda a, b: (a * b) & M32,
+    (0b0000001, 0b001): lambda a, b: ((_signed(a) * _signed(b)) >> 32) & M32,
+    (0b0000001, 0b010): lambda a, b: ((_signed(a) * b) >> 32) & M32,
+    (0b0000001, 0b011): lambda a, b: (a * b) >> 32,
+    (0b0000001, 0b100): lambda a, b: _div(a, b),
+    (0b0000001, 0b101): lambda a, b: a // b if b else M32,
+    (0b0000001, 0b110): lambda a, b: _rem(a, b),
+    (0b0000001, 0b111): lambda a, b: a % b if b else a,
+}
+
+
+def resolve_test_dir(name_or_dir) -> Path:
+    """Accept either a test name under test/test_suite or a test directory."""
+    path = Path(name_or_dir)
+    if path.is_dir():
+        return path
+    return TEST_SUITE_DIR / str(name_or_dir)
+
+
+def read_data_base(config_file, default: int = DATA_BASE) -> int:
+    config_file = Path(config_file)
+    if not config_file.exists():
+        return default
+    try:
+        config = json.loads(config_file.read_text())
+    except json.JSONDecodeError:
+        return default
+    return config.get("memory", {}).get("data_base", default)
+
+
+def load_images(exe, data=None, data_base: int = DATA_BASE, depth_log: int = DEPTH_LOG) -> Machine:
+    """Build a machine from instruction/data image files."""
+    return Machine(read_hex_words(exe), read_hex_words(data) if data else (), data_base, depth_log)
+
+
+def load_test(name_or_dir, depth_log: int = DEPTH_LOG) -> Machine:
+    """Build a machine for a test in the `.exe`/`.data`/`.config.json` layout."""
+    test_dir = resolve_test_dir(name_or_dir)
+    name = test_dir.name
+    data_base = read_data_base(test_dir / f"{name}.config.json")
+    return load_images(test_dir / f"{name}.exe", test_dir / f"{name}.data", data_base, depth_log)
+
+
+def golden_a0(name_or_dir, max_instructions: int = MAX_INSTRUCTIONS) -> int:
+    """Reference a0 for a test, or raise ISSError if it does not halt."""
+    machine = load_test(name_or_dir)
+    if not machine.run(max_instructions):
+        raise ISSError(f"{name_or_dir}: no ebreak within {max_instructions} instructions")
+    return machine.a0
+
+
+def main():
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Run a test image on the RV32IM golden model")
+    parser.add_argument("test", help="test name under test/test_suite, or a test directory")
+    parser.add_argument("--max-instructions", type=int, default=MAX_INSTRUCTIONS)
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    parser.add_argument("--dump-mem", metavar="FILE", help="write final data memory (hex words)")
+    args = parser.parse_args()
+
+    machine = load_test(args.test)
+    start = time.perf_counter()
+    try:
+        machine.run(args.max_instructions)
+    except ISSError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    elapsed = time.perf_counter() - start
+
+    if args.dump_mem:
+        machine.dump_memory(args.dump_mem)
+    if args.json:
+        print(json.dumps(machine.result(), indent=2))
+    else:
+        status = "halted" if machine.halted else f"stopped after {args.max_instructions} instructions"
+        rate = machine.instret / elapsed / 1e6 if elapsed > 0 else float("inf")
+        print(f"{status} at pc=0x{machine.pc:08x}: a0={machine.a0} instret={machine.instret} "
+              f"({rate:.2f} MIPS)")
+        for i in range(0, 32, 4):
+            print("  " + "  ".join(f"x{j:<2}({ABI_NAMES[j]:>4})=0x{machine.regs[j]:08x}" for j in range(i, i + 4)))
+    return 0 if machine.halted else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Single-pass, streaming analyzer for simulator / Verilator logs.
+
+The runners used to read the whole log into a string and scan it once per
+statistic. With per-cycle RS/LSQ/CDB logging a long workload produces logs of
+hundreds of MB, so instead `LogAnalyzer.feed()` consumes one line at a time
+and keeps only running counters, the architectural register file and a short
+tail for failure reports. main.py feeds it straight from the simulator's
+stdout pipe while teeing the lines to `workspace/log`, and stores the result
+next to the log as `summary.json`; the runners read that file back.
+
+Both log dialects are understood:
+- Tomasulo: `commit: retire rob=.. rd=.. ..`, `commit: writeback rd=X value=Y`,
+  `fetcherimpl: fetch_pc=..`, and the counters printed at ebreak:
+  `predictor: branches=N mispredicts=M` and
+  `cdb: deferred lsu=N mul=N alu0=N .. div=N` (cycles each requester lost CDB
+  arbitration) and
+  `fetchq: occupancy_sum=S cycles=N full=F` (fetch queue occupancy summed
+  per cycle, and cycles fetch was held because the queue was full) and
+  `ckpt: recoveries=R full=F` (mispredicts recovered from a branch checkpoint
+  when the branch resolved, and cycles a branch waited for a free checkpoint)
+- 5-stage / naive: `writeback stage: rd = X data = Y`, `executor input: pc=..`,
+  `fetch stage pc addr: ..`
+- Tomasulo and 5-stage: `icache: hits=H misses=M merged=G mshr_full=F` and
+  the same for `dcache:` (hits, misses that allocated an MSHR, misses merged
+  into an outstanding MSHR, and misses delayed because every MSHR was busy;
+  icache accesses are fetch groups, dcache accesses are loads)
+- Tomasulo: `prefetch: issued=I useful=U late=L` (stride prefetches that
+  allocated an MSHR, prefetched lines later hit by a load, and load misses
+  that merged into a prefetch still in flight); the summary derives
+  accuracy (U+L)/I, coverage U/(U+L+dcache misses) and timeliness U/(U+L)
+- silent log level (all designs): one `final: xN=0x..` line per register,
+  emitted right before the simulator finishes
+
+Usage:
+    python scripts/log_analyzer.py Tomasulo/src/workspace/log
+"""
+
+import json
+import re
+import sys
+from collections import deque
+from pathlib import Path
+
+SUMMARY_NAME = "summary.json"
+TAIL_LINES = 40
+
+CYCLE_PATTERN = re.compile(r"Cycle @(\d+(?:\.\d+)?)")
+# Tomasulo commit writeback (decimal) and 5-stage writeback stage
+COMMIT_WB_PATTERN = re.compile(r"commit: writeback rd=(\d+) value=(\d+)")
+STAGE_WB_PATTERN = re.compile(r"writeback stage: rd = ([0-9a-fA-Fx]+) data = ([0-9a-fA-Fx]+)")
+FINAL_REG_PATTERN = re.compile(r"final: x(\d+)=0x([0-9a-fA-F]+)")
+PREDICTOR_PATTERN = re.compile(r"predictor: branches=(\d+) mispredicts=(\d+)")
+CDB_DEFERRED_PATTERN = re.compile(r"(\w+)=(\d+)")
+FETCH_QUEUE_PATTERN = re.compile(r"fetchq: occupancy_sum=(\d+) cycles=(\d+) full=(\d+)")
+CHECKPOINT_PATTERN = re.compile(r"ckpt: recoveries=(\d+) full=(\d+)")
+CACHE_PATTERN = re.compile(r"\b([id]cache): (hits=.*)")
+CACHE_COUNTER_PATTERN = re.compile(r"(\w+)=(\d+)")
+PREFETCH_PATTERN = re.compile(r"prefetch: issued=(\d+) useful=(\d+) late=(\d+)")
+VERILATOR_TIMING_PATTERN = re.compile(
+    r"\*\*\s+tb\.test_tb\s+PASS\s+([0-9.]+)\s+([0-9.]+)\s+([0-9.]+)"
+)
+
+# Substring markers checked before any regex so that the bulk of the log
+# (RS/LSQ/CDB chatter) costs a few `in` tests per line.
+RETIRE_MARK = "commit: retire"
+COMMIT_WB_MARK = "commit: writeback"
+STAGE_WB_MARK = "writeback stage:"
+EXEC_MARK = "executor input: pc="
+FETCH_MARKS = ("fetcherimpl: fetch_pc=", "fetch stage pc addr:")
+TIMING_MARK = "tb.test_tb"
+FINAL_MARK = "final: x"
+PREDICTOR_MARK = "predictor: branches="
+CDB_DEFERRED_MARK = "cdb: deferred"
+FETCH_QUEUE_MARK = "fetchq: occupancy_sum="
+CHECKPOINT_MARK = "ckpt: recoveries="
+CACHE_MARK = "cache: hits="
+PREFETCH_MARK = "prefetch: issued="
+
+XLEN_MASK = 0xFFFFFFFF
+
+
+class LogAnalyzer:
+    """Accumulate statistics over log lines fed one at a time."""
+
+    def __init__(self, tail_lines: int = TAIL_LINES):
+        self.cycles = 0
+        self.commits = 0
+        self.instructions = 0
+        self.fetches = 0
+        self.lines = 0
+        self.a0 = None
+        self.regs = [0] * 32
+        self.branches = None
+        self.mispredicts = None
+        self.cdb_deferred = None
+        self.fetch_queue_occupancy = None
+        self.fetch_queue_full = None
+        self.checkpoint_recoveries = None
+        self.checkpoint_full = None
+        self.icache = None
+        self.dcache = None
+        self.prefetch = None
+        self.timing = {"sim_time_ns": None, "real_time_s": None, "ratio": None}
+        self.tail = deque(maxlen=tail_lines)
+
+    def _writeback(self, rd: int, value: int):
+        if rd == 0:
+            return
+        self.regs[rd] = value & XLEN_MASK
+        if rd == 10:
+            self.a0 = self.regs[rd]
+
+    def feed(self, line: str):
+        """Account for one log line."""
+        self.lines += 1
+        self.tail.append(line.rstrip("\n"))
+
+        if "Cycle @" in line:
+            m = CYCLE_PATTERN.search(line)
+            if m:
+                self.cycles = max(self.cycles, int(float(m.group(1))))
+
+        if RETIRE_MARK in line:
+            self.commits += 1
+        elif COMMIT_WB_MARK in line:
+            m = COMMIT_WB_PATTERN.search(line)
+            if m:
+                self._writeback(int(m.group(1)), int(m.group(2)))
+        elif STAGE_WB_MARK in line:
+            m = STAGE_WB_PATTERN.search(line)
+            if m:
+                try:
+                    self._writeback(int(m.group(1), 0), int(m.group(2), 0))
+                except ValueError:
+                    pass
+        elif EXEC_MARK in line:
+            self.instructions += 1
+        elif any(mark in line for mark in FETCH_MARKS):
+            self.fetches += 1
+        elif FINAL_MARK in line:
+            m = FINAL_REG_PATTERN.search(line)
+            if m:
+                self._writeback(int(m.group(1)), int(m.group(2), 16))
+        elif PREDICTOR_MARK in line:
+            m = PREDICTOR_PATTERN.search(line)
+            if m:
+                self.branches = int(m.group(1))
+                self.mispredicts = int(m.group(2))
+        elif CDB_DEFERRED_MARK in line:
+            counters = line.split(CDB_DEFERRED_MARK, 1)[1]
+            self.cdb_deferred = {name: int(n) for name, n in CDB_DEFERRED_PATTERN.findall(counters)}
+        elif FETCH_QUEUE_MARK in line:
+            m = FETCH_QUEUE_PATTERN.search(line)
+            if m:
+                occupancy_sum, cycles = int(m.group(1)), int(m.group(2))
+                # average number of queued instructions per cycle
+                self.fetch_queue_occupancy = occupancy_sum / cycles if cycles else 0.0
+                self.fetch_queue_full = int(m.group(3))
+        elif CHECKPOINT_MARK in line:
+            m = CHECKPOINT_PATTERN.search(line)
+            if m:
+                self.checkpoint_recoveries = int(m.group(1))
+                self.checkpoint_full = int(m.group(2))
+        elif CACHE_MARK in line:
+            m = CACHE_PATTERN.search(line)
+            if m:
+                counters = {name: int(n) for name, n in CACHE_COUNTER_PATTERN.findall(m.group(2))}
+                if m.group(1) == "icache":
+                    self.icache = counters
+                else:
+                    self.dcache = counters
+        elif PREFETCH_MARK in line:
+            m = PREFETCH_PATTERN.search(line)
+            if m:
+                self.prefetch = {"issued": int(m.group(1)), "useful": int(m.group(2)), "late": int(m.group(3))}
+        elif TIMING_MARK in line:
+            m = VERILATOR_TIMING_PATTERN.search(line)
+            if m:
+                self.timing = {
+                    "sim_time_ns": float(m.group(1)),
+                    "real_time_s": float(m.group(2)),
+                    "ratio": float(m.group(3)),
+                }
+
+    def feed_lines(self, lines):
+        """Feed every line of an iterable (file object, pipe, list)."""
+        for line in lines:
+            self.feed(line)
+        return self
+
+    def tee(self, lines, log_file, check=None):
+        """
+        Feed `lines` while copying them to an open text file. If `check` is
+        given it sees every line too, and a False result stops the stream.
+        """
+        for line in lines:
+            log_file.write(line)
+            self.feed(line)
+            if check is not None and not check(line):
+                break
+        return self
+
+    def summary(self) -> dict:
+        return {
+            "cycles": self.cycles,
+            "commits": self.commits,
+            "instructions": self.instructions,
+            "fetches": self.fetches,
+            "lines": self.lines,
+            "a0": self.a0,
+            "regs": list(self.regs),
+            "branches": self.branches,
+            "mispredicts": self.mispredicts,
+            "cdb_deferred": self.cdb_deferred,
+            "fetch_queue_occupancy": self.fetch_queue_occupancy,
+            "fetch_queue_full": self.fetch_queue_full,
+            "checkpoint_recoveries": self.checkpoint_recoveries,
+            "checkpoint_full": self.checkpoint_full,
+            "icache": self.icache,
+            "dcache": self.dcache,
+            "prefetch": self._prefetch_summary(),
+            "timing": dict(self.timing),
+            "tail": list(self.tail),
+        }
+
+    def _prefetch_summary(self):
+        if self.prefetch is None:
+            return None
+        issued, useful, late = self.prefetch["issued"], self.prefetch["useful"], self.prefetch["late"]
+        misses = self.dcache["misses"] if self.dcache else 0
+
+        def ratio(n, d):
+            return n / d if d else None
+
+        return {
+            **self.prefetch,
+            # prefetched lines a load actually used, on time or not
+            "accuracy": ratio(useful + late, issued),
+            # share of would-be misses the prefetcher fully hid
+            "coverage": ratio(useful, useful + late + misses),
+            "timeliness": ratio(useful, useful + late),
+        }
+
+    def write_summary(self, path):
+        Path(path).write_text(json.dumps(self.summary(), indent=2))
+
+    @classmethod
+    def from_file(cls, path, **kwargs) -> "LogAnalyzer":
+        """Analyze a log on disk without loading it into memory."""
+        with open(path, errors="replace") as f:
+            return cls(**kwargs).feed_lines(f)
+
+
+def load_summary(log_path, summary_name: str = SUMMARY_NAME) -> dict:
+    """
+    Return the summary for `log_path`: the one main.py stored next to the log
+    if it is at least as new as the log, otherwise a fresh streaming pass.
+    Without a log there is no run to summarize, so a leftover summary is ignored.
+    """
+    log_path = Path(log_path)
+    if not log_path.exists():
+        return None
+    summary_path = log_path.with_name(summary_name)
+    if summary_path.exists() and summary_path.stat().st_mtime >= log_path.stat().st_mtime:
+        try:
+            return json.loads(summary_path.read_text())
+        except json.JSONDecodeError:
+            pass
+    return LogAnalyzer.from_file(log_path).summary()
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Summarize a simulator log in one pass")
+    parser.add_argument("log", help="log file, or - for stdin")
+    args = parser.parse_args()
+
+    if args.log == "-":
+        summary = LogAnalyzer().feed_lines(sys.stdin).summary()
+    else:
+        summary = LogAnalyzer.from_file(args.log).summary()
+    summary.pop("tail")
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
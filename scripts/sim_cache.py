@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache of elaborated simulators.
+
+Elaborating a design and compiling the generated Rust simulator dominates the
+runtime of every test, although only the memory images change between
+workloads. The cache key is a hash of the design sources plus the build
+parameters (depth_log, data_base, thresholds, ROB/RS sizes, ...); the entry
+directory holds the elaborated simulator (and its cargo target dir) so a warm
+run only has to start the binary.
+
+Memory images are not part of the key: designs reference them through
+relative `init_file` names, which the simulator resolves against its working
+directory when it starts. `run_simulator_in` therefore runs the simulator
+with the test workspace as cwd.
+
+The Verilator model generated next to the simulator is cached the same way:
+`run_verilator_cached` does the full generate-and-build run once per entry
+and afterwards only reruns the testbench, with the workspace's memory
+images copied next to it.
+
+Usage:
+    python scripts/sim_cache.py --list     # list cached simulators
+    python scripts/sim_cache.py --clear    # drop every cached simulator
+"""
+
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+CACHE_DIR = Path(os.environ.get("SIM_CACHE_DIR", REPO_ROOT / ".sim_cache"))
+MANIFEST_NAME = "manifest.json"
+
+# Directories inside a design tree that never affect the elaborated result
+IGNORED_PARTS = {"workspace", "__pycache__"}
+
+CARGO_NAME_PATTERN = re.compile(r'^\s*name\s*=\s*"([^"]+)"', re.MULTILINE)
+
+# Layout of assassyn's Verilog output: design.py generates the SystemVerilog
+# under sv/hw and tb.py there builds (incrementally) and runs the Verilated model
+VERILATOR_TB_DIR = Path("sv") / "hw"
+VERILATOR_TB_SCRIPT = "tb.py"
+VERILATOR_STAMP = ".verilator_built"
+
+
+def design_digest(design_dir) -> str:
+    """Hash every Python source of a design directory (path + content)."""
+    design_dir = Path(design_dir)
+    digest = hashlib.sha256()
+    for path in sorted(design_dir.rglob("*.py")):
+        rel = path.relative_to(design_dir)
+        if IGNORED_PARTS.intersection(rel.parts):
+            continue
+        digest.update(str(rel).encode())
+        digest.update(b"\0")
+        digest.update(path.read_bytes())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def file_digest(*paths) -> str:
+    """
+    Hash source files a design imports from outside its own directory, so
+    that they can be folded into the build parameters.
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(Path(path).read_bytes())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def imported_digest(package: str) -> str:
+    """
+    Hash every module of `package` imported so far, directly or through
+    another shared module, for designs that borrow sources from `package`.
+    """
+    paths = sorted(
+        module.__file__
+        for name, module in list(sys.modules.items())
+        if (name == package or name.startswith(package + ".")) and getattr(module, "__file__", None)
+    )
+    return file_digest(*paths)
+
+
+def _assassyn_version() -> str:
+    try:
+        from importlib.metadata import version
+        return version("assassyn")
+    except Exception:
+        return "unknown"
+
+
+def cache_key(design_dir, params: dict) -> str:
+    """Return the cache key for a design directory and its build parameters."""
+    digest = hashlib.sha256()
+    digest.update(design_digest(design_dir).encode())
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+    digest.update(_assassyn_version().encode())
+    return digest.hexdigest()[:20]
+
+
+def lookup(key: str, cache_dir=None):
+    """Return the manifest of a cached entry, or None on a miss."""
+    manifest = Path(cache_dir or CACHE_DIR) / key / MANIFEST_NAME
+    if not manifest.exists():
+        return None
+    try:
+        return json.loads(manifest.read_text())
+    except json.JSONDecodeError:
+        return None
+
+
+@contextlib.contextmanager
+def locked(lock_path):
+    """
+    Hold an exclusive advisory lock on `lock_path` (created if needed).
+
+    Parallel test runs share cache entries, so building an entry (or a
+    binary inside it) must happen in exactly one process at a time.
+    """
+    lock_path = Path(lock_path)
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def get_or_build(design_dir, params: dict, build, cache_dir=None, rebuild: bool = False) -> dict:
+    """
+    Return the manifest of the simulator for (design_dir, params).
+
+    On a miss, `build(path)` is called with the entry directory and must
+    elaborate the design there, returning `(simulator_path, verilator_path)`
+    like `assassyn.backend.elaborate`. Concurrent callers with the same key
+    wait for the first one instead of elaborating twice.
+    """
+    cache_dir = Path(cache_dir or CACHE_DIR)
+    key = cache_key(design_dir, params)
+    entry_dir = cache_dir / key
+    with locked(cache_dir / f"{key}.lock"):
+        if not rebuild:
+            cached = lookup(key, cache_dir)
+            if cached is not None:
+                cached["hit"] = True
+                return cached
+
+        if entry_dir.exists():
+            shutil.rmtree(entry_dir)
+        entry_dir.mkdir(parents=True)
+        sim, vcd = build(str(entry_dir))
+        manifest = {
+            "key": key,
+            "design": str(Path(design_dir).resolve()),
+            "params": params,
+            "simulator": str(sim) if sim else None,
+            "verilator": str(vcd) if vcd else None,
+        }
+        # Write-then-rename so an interrupted build never looks like a hit
+        tmp = entry_dir / (MANIFEST_NAME + ".tmp")
+        tmp.write_text(json.dumps(manifest, indent=2, default=str))
+        os.replace(tmp, entry_dir / MANIFEST_NAME)
+    manifest["hit"] = False
+    return manifest
+
+
+@contextlib.contextmanager
+def working_directory(path):
+    """Temporarily switch the process cwd (relative init files resolve here)."""
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def simulator_binary(sim_path, release: bool = True) -> Path:
+    """
+    Build (if needed) the elaborated simulator and return its executable.
+
+    cargo is only invoked when the binary is missing, so warm runs skip the
+    dependency check entirely.
+    """
+    sim_path = Path(sim_path)
+    manifest = sim_path / "Cargo.toml"
+    match = CARGO_NAME_PATTERN.search(manifest.read_text())
+    if match is None:
+        raise RuntimeError(f"cannot find package name in {manifest}")
+    profile = "release" if release else "debug"
+    binary = sim_path / "target" / profile / match.group(1)
+    if binary.exists():
+        return binary
+    with locked(sim_path / ".build.lock"):
+        if not binary.exists():
+            cmd = ["cargo", "build", "--manifest-path", str(manifest)]
+            if release:
+                cmd.append("--release")
+            subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+    return binary
+
+
+def stream_simulator_in(sim_path, cwd):
+    """
+    Run a (cached) simulator with `cwd` as its working directory, yielding its
+    stdout line by line instead of buffering the whole log. Closing the
+    generator early kills the simulator.
+    """
+    binary = simulator_binary(sim_path)
+    with subprocess.Popen([str(binary)], cwd=str(cwd), stdout=subprocess.PIPE, text=True) as proc:
+        try:
+            yield from proc.stdout
+        except GeneratorExit:
+            # The consumer stopped early (e.g. cosim divergence): stop the simulator too
+            proc.kill()
+            raise
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, [str(binary)])
+
+
+def run_simulator_in(sim_path, cwd) -> str:
+    """Run a (cached) simulator with `cwd` as its working directory."""
+    return "".join(stream_simulator_in(sim_path, cwd))
+
+
+def run_verilator_cached(verilog_path, cwd, full_run, images=()) -> str:
+    """
+    Run the Verilator model of a cache entry on the images in `cwd`.
+
+    The first call does `full_run(verilog_path)` (assassyn's `run_verilator`:
+    generate the SystemVerilog, verilate, compile, run) and leaves a stamp.
+    Later calls copy `images` from `cwd` into the testbench directory, where
+    the relative `$readmemh` names resolve, and only run the testbench, whose
+    build step is a no-op while the generated RTL is unchanged. Runs of the
+    same entry are serialized because they share that directory.
+    """
+    verilog_path = Path(verilog_path)
+    tb_dir = verilog_path / VERILATOR_TB_DIR
+    stamp = verilog_path / VERILATOR_STAMP
+    with locked(f"{verilog_path}.lock"):
+        if tb_dir.is_dir():
+            for image in images:
+                if (Path(cwd) / image).exists():
+                    shutil.copyfile(Path(cwd) / image, tb_dir / image)
+        if stamp.exists() and (tb_dir / VERILATOR_TB_SCRIPT).exists():
+            return subprocess.run(
+                [sys.executable, VERILATOR_TB_SCRIPT], cwd=str(tb_dir),
+                check=True, capture_output=True, text=True,
+            ).stdout
+        with working_directory(cwd):
+            output = full_run(str(verilog_path))
+        stamp.touch()
+        return output
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Manage the elaborated simulator cache")
+    parser.add_argument("--list", action="store_true", help="list cached simulators")
+    parser.add_argument("--clear", action="store_true", help="remove all cached simulators")
+    args = parser.parse_args()
+
+    if args.clear:
+        if CACHE_DIR.exists():
+            shutil.rmtree(CACHE_DIR)
+        print(f"Cleared {CACHE_DIR}")
+        return
+
+    if not CACHE_DIR.exists():
+        print(f"No cache at {CACHE_DIR}")
+        return
+    for entry in sorted(CACHE_DIR.iterdir()):
+        if not entry.is_dir():
+            continue
+        manifest = lookup(entry.name)
+        if manifest is None:
+            print(f"  {entry.name}  (incomplete)")
+            continue
+        params = ", ".join(f"{k}={v}" for k, v in sorted(manifest.get("params", {}).items()))
+        print(f"  {entry.name}  {params}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+SimPoint-style sampled simulation for workloads too long to simulate in full.
+
+Pipeline:
+1. `collect_intervals`: run the test on the golden model (scripts/iss.py) and
+   cut the dynamic instruction stream into fixed-size intervals, recording a
+   basic-block vector (BBV) for each: instructions executed per basic block,
+   keyed by the block's leader PC.
+2. `choose_simpoints`: normalize the BBVs, randomly project them to a few
+   dimensions and cluster them with k-means. k is the smallest value whose BIC
+   reaches 90% of the best score seen (the SimPoint rule). Each cluster is
+   represented by the interval(s) closest to its centroid and weighted by
+   the share of instructions it covers.
+3. `simulate`: each representative is simulated in detail on the Tomasulo core
+   from a checkpoint (scripts/checkpoint.py) taken `warmup` instructions
+   before the interval, stopping after warmup + interval commits. Its CPI is
+   measured from the cycle stamps of the retire lines.
+4. `estimate`: the weighted CPI is sum(weight * CPI). A 95% confidence
+   interval comes from stratified sampling. It needs at least two samples in
+   clusters with more than one interval (`--per-cluster`, default 2).
+
+Tests use the usual `.exe`/`.data`/`.config.json` layout. Every checkpoint
+bakes its pc/registers into the design, so each sample elaborates (and then
+caches) its own simulator.
+
+Usage:
+    python scripts/simpoint.py vector_mul_100                 # pick simpoints only
+    python scripts/simpoint.py vector_mul_100 --simulate -j 4 # weighted CPI
+    python scripts/simpoint.py path/to/test_dir --interval 5000 --max-k 10 --json
+"""
+
+import json
+import math
+import random
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+from scripts import checkpoint, iss
+from scripts.log_analyzer import CYCLE_PATTERN, RETIRE_MARK
+from scripts.workspaces import LOG_NAME, private_workspace, run_pool, stage_images
+
+TOMASULO_ENTRY = REPO_ROOT / "Tomasulo" / "src" / "main.py"
+TOMASULO_WORKSPACE = REPO_ROOT / "Tomasulo" / "src" / "workspace"
+
+INTERVAL = 1000
+WARMUP = 200
+MAX_K = 8
+PROJECTED_DIMS = 15
+BIC_THRESHOLD = 0.9
+KMEANS_RESTARTS = 5
+KMEANS_ITERATIONS = 100
+PER_CLUSTER = 2
+SEED = 42
+# cycle budget for a detailed sample; the run stops at the commit limit long before this
+MAX_CPI = 20
+IDLE_THRESHOLD = 5000
+
+# branch, jal, jalr: the next instruction starts a new basic block
+CONTROL_OPCODES = (0b1100011, 0b1101111, 0b1100111)
+
+
+class SimPointError(Exception):
+    pass
+
+
+# ---------------------------------------------------------------------- #
+# 1. basic-block vectors
+# ---------------------------------------------------------------------- #
+def collect_intervals(machine: "iss.Machine", interval: int = INTERVAL,
+                      max_instructions: int = iss.MAX_INSTRUCTIONS) -> list:
+    """
+    Run `machine` to ebreak and return one dict per interval:
+    `{"start": instret, "length": n, "bbv": {leader_pc: instructions}}`.
+    The last interval may be shorter than `interval`.
+    """
+    ends_block = [(word & 0x7F) in CONTROL_OPCODES for word in machine.text]
+    limit = machine.instret + max_instructions
+    intervals = []
+    bbv = {}
+    start = machine.instret
+    leader = machine.pc
+    block_len = 0
+    while not machine.halted and machine.instret < limit:
+        pc = machine.step()[0]
+        block_len += 1
+        if ends_block[pc >> 2] or machine.halted:
+            bbv[leader] = bbv.get(leader, 0) + block_len
+            block_len = 0
+            leader = machine.pc
+        if machine.instret - start == interval or machine.halted:
+            if block_len:
+                # the block continues into the next interval under the same leader
+                bbv[leader] = bbv.get(leader, 0) + block_len
+                block_len = 0
+            intervals.append({"start": start, "length": machine.instret - start, "bbv": bbv})
+            bbv = {}
+            start = machine.instret
+    if not machine.halted:
+        raise SimPointError(f"no ebreak within {max_instructions} instructions")
+    return intervals
+
+
+def _project(intervals: list, dims: int, rng: random.Random) -> list:
+    """Normalize each BBV to sum 1 and randomly project it to `dims` dimensions."""
+    leaders = sorted({pc for iv in intervals for pc in iv["bbv"]})
+    column = {pc: i for i, pc in enumerate(leaders)}
+    if len(leaders) <= dims:
+        matrix = None
+        dims = len(leaders)
+    else:
+        matrix = [[rng.uniform(-1.0, 1.0) for _ in range(dims)] for _ in leaders]
+    points = []
+    for iv in intervals:
+        total = sum(iv["bbv"].values())
+        point = [0.0] * dims
+        for pc, count in iv["bbv"].items():
+            share = count / total
+            if matrix is None:
+                point[column[pc]] += share
+            else:
+                row = matrix[column[pc]]
+                for d in range(dims):
+                    point[d] += share * row[d]
+        points.append(point)
+    return points
+
+
+# ---------------------------------------------------------------------- #
+# 2. clustering
+# ---------------------------------------------------------------------- #
+def _dist2(a, b) -> float:
+    return sum((x - y) * (x - y) for x, y in zip(a, b))
+
+
+def _kmeans_once(points: list, k: int, rng: random.Random):
+    # k-means++ seeding
+    centers = [list(rng.choice(points))]
+    while len(centers) < k:
+        d2 = [min(_dist2(p, c) for c in centers) for p in points]
+        total = sum(d2)
+        if total == 0:
+            centers.append(list(rng.choice(points)))
+            continue
+        pick = rng.uniform(0, total)
+        acc = 0.0
+        for p, d in zip(points, d2):
+            acc += d
+            if acc >= pick:
+                centers.append(list(p))
+                break
+        else:
+            centers.append(list(points[-1]))
+
+    labels = None
+    for _ in range(KMEANS_ITERATIONS):
+        new_labels = [min(range(k), key=lambda c: _dist2(p, centers[c])) for p in points]
+        if new_labels == labels:
+            break
+        labels = new_labels
+        for c in range(k):
+            members = [p for p, label in zip(points, labels) if label == c]
+            if members:
+                centers[c] = [sum(xs) / len(members) for xs in zip(*members)]
+    sse = sum(_dist2(p, centers[label]) for p, label in zip(points, labels))
+    return labels, centers, sse
+
+
+def kmeans(points: list, k: int, rng: random.Random):
+    """Best of KMEANS_RESTARTS k-means++ runs: (labels, centers, sse)."""
+    return min((_kmeans_once(points, k, rng) for _ in range(KMEANS_RESTARTS)), key=lambda r: r[2])
+
+
+def bic(points: list, labels: list, k: int, sse: float) -> float:
+    """Bayesian information criterion of a spherical-Gaussian clustering (X-means)."""
+    r = len(points)
+    m = len(points[0])
+    variance = sse / max(r - k, 1) / m or 1e-12
+    likelihood = 0.0
+    for c in range(k):
+        rn = labels.count(c)
+        if rn == 0:
+            continue
+        likelihood += (rn * math.log(rn) - rn * math.log(r)
+                       - rn * m / 2 * math.log(2 * math.pi * variance) - (rn - k) / 2)
+    params = (k - 1) + m * k + 1
+    return likelihood - params / 2 * math.log(r)
+
+
+def choose_simpoints(intervals: list, max_k: int = MAX_K, per_cluster: int = PER_CLUSTER,
+                     dims: int = PROJECTED_DIMS, seed: int = SEED) -> dict:
+    """Cluster the intervals and pick representatives; see the module docstring."""
+    if not intervals:
+        raise SimPointError("no intervals to cluster")
+    rng = random.Random(seed)
+    points = _project(intervals, dims, rng)
+
+    runs = {}
+    for k in range(1, min(max_k, len(points)) + 1):
+        labels, centers, sse = kmeans(points, k, rng)
+        runs[k] = (labels, centers, bic(points, labels, k, sse))
+    scores = [score for _, _, score in runs.values()]
+    low, high = min(scores), max(scores)
+    k = min(k for k, (_, _, score) in runs.items() if score >= low + BIC_THRESHOLD * (high - low))
+    labels, centers, _ = runs[k]
+
+    total = sum(iv["length"] for iv in intervals)
+    clusters = []
+    for c in range(k):
+        members = [i for i, label in enumerate(labels) if label == c]
+        if not members:
+            continue
+        members.sort(key=lambda i: _dist2(points[i], centers[c]))
+        clusters.append({
+            "weight": sum(intervals[i]["length"] for i in members) / total,
+            "size": len(members),
+            "samples": [
+                {"interval": i, "start": intervals[i]["start"], "length": intervals[i]["length"]}
+                for i in members[:per_cluster]
+            ],
+        })
+    return {"k": len(clusters), "intervals": len(intervals), "instructions": total, "clusters": clusters}
+
+
+# ---------------------------------------------------------------------- #
+# 3. detailed simulation of the samples
+# ---------------------------------------------------------------------- #
+def retire_cycles(log_path) -> list:
+    """Cycle stamp of every retire line in a simulator log, in order."""
+    cycles = []
+    with open(log_path, errors="replace") as f:
+        for line in f:
+            if RETIRE_MARK in line:
+                m = CYCLE_PATTERN.search(line)
+                cycles.append(int(float(m.group(1))) if m else cycles[-1] if cycles else 0)
+    return cycles
+
+
+def simulate_sample(test_dir: Path, sample: dict, warmup: int = WARMUP, data_base: int = iss.DATA_BASE) -> float:
+    """Detailed Tomasulo run of one interval from a checkpoint; returns its CPI."""
+    name = test_dir.name
+    begin = max(0, sample["start"] - warmup)
+    warm = sample["start"] - begin
+    workspace = private_workspace(TOMASULO_WORKSPACE, f"simpoint-{name}-{sample['interval']}")
+    stage_images(workspace, test_dir / f"{name}.exe", test_dir / f"{name}.data")
+    checkpoint_file = workspace / checkpoint.CHECKPOINT_NAME
+    checkpoint.save(checkpoint.take(test_dir, begin), checkpoint_file)
+
+    commits = warm + sample["length"]
+    cmd = [
+        sys.executable, str(TOMASULO_ENTRY),
+        "--workspace", str(workspace),
+        "--data-base", hex(data_base),
+        "--checkpoint", str(checkpoint_file),
+        "--max-commits", str(commits),
+        "--sim-threshold", str(commits * MAX_CPI + IDLE_THRESHOLD),
+        "--idle-threshold", str(IDLE_THRESHOLD),
+        "--log-level", "commit",
+    ]
+    proc = subprocess.run(cmd, capture_output=True, text=True, cwd=str(REPO_ROOT))
+    if proc.returncode != 0:
+        raise SimPointError(f"interval {sample['interval']}: simulator exited with {proc.returncode}\n"
+                            f"{proc.stderr[-800:]}")
+    cycles = retire_cycles(workspace / LOG_NAME)
+    if len(cycles) < commits:
+        raise SimPointError(f"interval {sample['interval']}: only {len(cycles)} of {commits} instructions retired")
+    start_cycle = cycles[warm - 1] if warm else 0
+    return (cycles[commits - 1] - start_cycle) / sample["length"]
+
+
+def estimate(clusters: list) -> dict:
+    """Weighted CPI and a 95% confidence half-width from stratified sampling."""
+    cpi = 0.0
+    variance = 0.0
+    exact = True
+    for cluster in clusters:
+        values = [s["cpi"] for s in cluster["samples"]]
+        mean = sum(values) / len(values)
+        cpi += cluster["weight"] * mean
+        n, size = len(values), cluster["size"]
+        if n >= size:
+            continue  # the whole cluster was simulated
+        if n < 2:
+            exact = False
+            continue
+        s2 = sum((v - mean) ** 2 for v in values) / (n - 1)
+        variance += cluster["weight"] ** 2 * s2 / n * (1 - n / size)
+    return {"cpi": cpi, "ci95": 1.96 * math.sqrt(variance) if exact else None}
+
+
+def simulate(test_dir: Path, simpoints: dict, warmup: int = WARMUP, jobs: int = 1) -> dict:
+    """Simulate every sample (in parallel with `jobs`) and fill in the estimate."""
+    data_base = iss.read_data_base(test_dir / f"{test_dir.name}.config.json")
+    samples = [s for cluster in simpoints["clusters"] for s in cluster["samples"]]
+    for sample, cpi in zip(samples, run_pool(lambda s: simulate_sample(test_dir, s, warmup, data_base),
+                                             samples, jobs=jobs)):
+        sample["cpi"] = cpi
+    simpoints["estimate"] = estimate(simpoints["clusters"])
+    return simpoints
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="SimPoint-style sampled simulation of a test")
+    parser.add_argument("test", help="test name under test/test_suite, or a test directory")
+    parser.add_argument("--interval", type=int, default=INTERVAL, help=f"instructions per interval (default {INTERVAL})")
+    parser.add_argument("--max-k", type=int, default=MAX_K, help=f"largest number of clusters tried (default {MAX_K})")
+    parser.add_argument("--per-cluster", type=int, default=PER_CLUSTER,
+                        help=f"representatives simulated per cluster (default {PER_CLUSTER})")
+    parser.add_argument("--warmup", type=int, default=WARMUP,
+                        help=f"instructions simulated before each interval (default {WARMUP})")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--simulate", action="store_true", help="run the samples on the Tomasulo core")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="simulate N samples concurrently")
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    args = parser.parse_args()
+
+    test_dir = iss.resolve_test_dir(args.test)
+    try:
+        intervals = collect_intervals(iss.load_test(test_dir), args.interval)
+        simpoints = choose_simpoints(intervals, args.max_k, args.per_cluster, seed=args.seed)
+        if args.simulate:
+            simulate(test_dir, simpoints, args.warmup, args.jobs)
+    except (SimPointError, checkpoint.CheckpointError, iss.ISSError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+
+    if args.json:
+        print(json.dumps(simpoints, indent=2))
+        return 0
+    print(f"{test_dir.name}: {simpoints['instructions']} instructions, {simpoints['intervals']} intervals "
+          f"of {args.interval}, k={simpoints['k']}")
+    for c, cluster in enumerate(simpoints["clusters"]):
+        samples = ", ".join(
+            f"#{s['interval']}@{s['start']}" + (f" cpi={s['cpi']:.3f}" if "cpi" in s else "")
+            for s in cluster["samples"]
+        )
+        print(f"  cluster {c}: weight={cluster['weight']:.3f} size={cluster['size']} samples: {samples}")
+    if "estimate" in simpoints:
+        est = simpoints["estimate"]
+        ci = f" ± {est['ci95']:.3f} (95%)" if est["ci95"] is not None else " (no confidence interval: single samples)"
+        print(f"weighted CPI = {est['cpi']:.3f}{ci}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
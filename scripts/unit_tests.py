@@ -1,10 +1,9 @@
 import sys
 import os
-import re
+import argparse
 import importlib
-import io
+import collections
 import contextlib
-import functools
 
 # ================= 路径配置 =================
 # 脚本位于 scripts/，我们需要向上找到根目录，再找到 src 和 unit_tests
@@ -23,11 +22,20 @@ if CPU_IMPL == "tomasulo":
 else:
     SRC_DIR = os.path.join(PROJECT_ROOT, "src")
     MAIN_IMPORT = "main"
+    # 5 级流水线的 main.py 用的是 src 目录下的绝对 import
+    sys.path.insert(0, SRC_DIR)
 
 # 将项目根目录与 unit_tests 加入 python 路径，以便 import 包
 sys.path.insert(0, PROJECT_ROOT)
 sys.path.insert(0, TEST_DIR)
 
+# 所有 case 共用一个仿真器，这些参数在 elaborate 时固定
+DEPTH_LOG = 18
+DATA_BASE = 0x2000
+SIM_THRESHOLD = 1000   # 最大步数 (给大一点，防止复杂程序跑不完)
+IDLE_THRESHOLD = 20    # 空闲停止
+LOG_LEVEL = "commit"   # 只需要提交/写回行来还原寄存器堆
+
 # ================= 导入模块 =================
 # 将 unit_tests 目录加入路径并导入测试用例与仿真工具
 try:
@@ -36,7 +44,9 @@ try:
     build_CPU = main_mod.build_CPU
     WORKSPACE_PATH = getattr(main_mod, "workspace", os.path.join(SRC_DIR, "src", "workspace"))
     from assassyn import backend
-    from assassyn.utils import run_simulator
+    from scripts import sim_cache
+    from scripts.log_analyzer import LogAnalyzer, XLEN_MASK
+    from scripts.workspaces import DATA_NAME, WORKLOAD_NAME, private_workspace, run_pool
 except ImportError as e:
     print(f"❌ 环境配置错误: {e}")
     print(f"请确保 assassyn 框架已安装，且 {SRC_DIR} 下有 main.py")
@@ -44,151 +54,151 @@ except ImportError as e:
 
 # ================= 工具函数 =================
 
-def write_workload(instructions):
+def write_workload(instructions, workspace=WORKSPACE_PATH):
     """
-    将指令列表写入 src/workspace/workload.exe
+    将指令列表写入 workspace/workload.exe（数据镜像置空）
     格式：每行一个 8 字符宽的 16 进制字符串
     """
     # 确保目录存在
-    os.makedirs(WORKSPACE_PATH, exist_ok=True)
-    file_path = os.path.join(WORKSPACE_PATH, "workload.exe")
+    os.makedirs(workspace, exist_ok=True)
+    file_path = os.path.join(workspace, WORKLOAD_NAME)
     
     with open(file_path, "w") as f:
         for instr in instructions:
             # 这里的 instr 是 int，转成 00000013 这种格式
             f.write(f"{instr:08x}\n")
+    with open(os.path.join(workspace, DATA_NAME), "w"):
+        pass
     return file_path
 
-def parse_log_and_get_regs(log_output):
+# elaborate 过程中会产生大量编译/构建输出，很多是由子进程直接写到 fd，
+# 所以需要重定向底层文件描述符以彻底屏蔽
+@contextlib.contextmanager
+def _suppress_subprocess_output():
+    devnull_fd = os.open(os.devnull, os.O_RDWR)
+    try:
+        saved_stdout = os.dup(1)
+        saved_stderr = os.dup(2)
+        os.dup2(devnull_fd, 1)
+        os.dup2(devnull_fd, 2)
+        yield
+    finally:
+        os.dup2(saved_stdout, 1)
+        os.dup2(saved_stderr, 2)
+        os.close(saved_stdout)
+        os.close(saved_stderr)
+        os.close(devnull_fd)
+
+def build_simulator(rebuild=False):
     """
-    解析仿真日志，模拟寄存器的最终状态。
-    Tomasulo 日志中使用 commit 行： 'commit: can_commit=1 ... rd=1 value=0x00000005'
+    每种 CPU 实现只 elaborate 一次：镜像是运行时从工作目录读的，
+    所有 case 都复用同一个编译好的仿真器（并且缓存在 .sim_cache/ 里）。
     """
-    # 模拟一个寄存器堆
-    regs = {i: 0 for i in range(32)}
-    
-    # 兼容旧的 writeback 行和 Tomasulo 的 commit 行
-    wb_pattern = re.compile(r"writeback stage: rd = ([0-9a-fA-Fx]+) data = ([0-9a-fA-Fx]+)")
-    commit_pattern = re.compile(r"commit:.*rd=([0-9a-fA-Fx]+).*value=0x([0-9a-fA-Fa-f]+)")
-    
-    for line in log_output.splitlines():
-        # 去除颜色代码（如果有）和空白
-        clean_line = line.strip()
-        
-        match = wb_pattern.search(clean_line) or commit_pattern.search(clean_line)
-        if match:
-            rd = int(match.group(1), 0)
-            data = int(match.group(2), 0)
-            
-            # x0 永远是 0，不写入
-            if rd != 0:
-                regs[rd] = data
-                
-    return regs
-
-def run_single_test(case_name, case_func):
-    print(f"Testing [{case_name}]...", end=" ", flush=True)
-    
-    # 1. 准备数据
-    instrs, expected_regs = case_func()
-    
-    # 2. 写入 workload.exe
-    write_workload(instrs)
-    
-    # 3. 构建并运行仿真
-    # 注意：这里我们调用 build_CPU 重新构建系统以加载新的 workload
-    try:
-        # 使用 stdout=False 防止仿真日志直接打印到终端干扰测试结果
-        # 需要确保你的 run_simulator 支持捕获输出返回
-        sys_design = build_CPU(depth_log=18)
-        
-        # 配置仿真参数 (步数可以给大一点，防止复杂程序跑不完)
+    def build(path):
+        sys_design = build_CPU(depth_log=DEPTH_LOG, log_level=LOG_LEVEL)
         cfg = backend.config(
-            resource_base=SRC_DIR, # 资源根目录设为 src
+            path=path,
+            resource_base='.',     # 镜像用相对路径，运行时在 workspace 下读取
             verilog=False,         # 单元测试不需要生成 Verilog，跑仿真即可
             verbose=True,          # 必须开启 verbose 才能看到 log
-            sim_threshold=1000,    # 最大步数
-            idle_threshold=20      # 空闲停止
+            sim_threshold=SIM_THRESHOLD,
+            idle_threshold=IDLE_THRESHOLD,
         )
-        
-        # 你的 main.py 里 run_simulator 返回了 output 字符串
-        # elaborate 过程中会产生大量编译/构建输出，很多是由子进程直接写到 fd，
-        # 所以需要重定向底层文件描述符以彻底屏蔽
-        @contextlib.contextmanager
-        def _suppress_subprocess_output():
-            devnull_fd = os.open(os.devnull, os.O_RDWR)
-            try:
-                saved_stdout = os.dup(1)
-                saved_stderr = os.dup(2)
-                os.dup2(devnull_fd, 1)
-                os.dup2(devnull_fd, 2)
-                yield
-            finally:
-                os.dup2(saved_stdout, 1)
-                os.dup2(saved_stderr, 2)
-                os.close(saved_stdout)
-                os.close(saved_stderr)
-                os.close(devnull_fd)
-
         # 临时静默 Rust 编译器的警告信息
         old_rustflags = os.environ.get('RUSTFLAGS')
         os.environ['RUSTFLAGS'] = (old_rustflags + ' -Awarnings') if old_rustflags else '-Awarnings'
         try:
             with _suppress_subprocess_output():
-                sim, _ = backend.elaborate(sys=sys_design, **cfg)
-                log_output = run_simulator(sim)
+                return backend.elaborate(sys=sys_design, **cfg)
         finally:
             if old_rustflags is None:
                 os.environ.pop('RUSTFLAGS', None)
             else:
                 os.environ['RUSTFLAGS'] = old_rustflags
-        
+
+    params = main_mod.build_params(DEPTH_LOG, DATA_BASE, SIM_THRESHOLD, IDLE_THRESHOLD, LOG_LEVEL)
+    params.update(verilog=False, driver="unit_tests")
+    # elaborate 时的工作目录里要有镜像文件，放一个只有 ebreak 的占位程序
+    build_dir = private_workspace(WORKSPACE_PATH, f"unit-{CPU_IMPL}-build")
+    write_workload([0x00100073], build_dir)
+    with sim_cache.working_directory(build_dir):
+        entry = sim_cache.get_or_build(os.path.dirname(main_mod.__file__), params, build, rebuild=rebuild)
+    return entry["simulator"]
+
+def run_single_test(sim, case_name, case_func):
+    """
+    在私有 workspace 里用已编译的仿真器跑一个 case。
+    返回 (passed, error_msgs, recent_wb)，输出由调用方按 case 顺序打印。
+    """
+    # 1. 准备数据
+    instrs, expected_regs = case_func()
+    
+    # 2. 写入该 case 自己的 workload.exe
+    workspace = private_workspace(WORKSPACE_PATH, f"unit-{case_name}")
+    write_workload(instrs, workspace)
+    
+    # 3. 运行仿真：仿真器 stdout 通过管道逐行读取，不会直接打印到终端干扰测试结果
+    analyzer = LogAnalyzer()
+    recent_wb = collections.deque(maxlen=5)
+    try:
+        # 边读仿真器输出边统计，只保留最近几条写回用于报错
+        for line in sim_cache.stream_simulator_in(sim, workspace):
+            analyzer.feed(line)
+            if "writeback" in line:
+                recent_wb.append(line.rstrip("\n"))
     except Exception as e:
-        print(f"\n❌ Simulation Crash: {e}")
-        return False
+        return False, [f"Simulation Crash: {e}"], list(recent_wb)
 
     # 4. 验证结果
-    final_regs = parse_log_and_get_regs(log_output)
-    
-    all_passed = True
+    final_regs = dict(enumerate(analyzer.regs))
     error_msgs = []
-    
     for reg_idx, expected_val in expected_regs.items():
         actual_val = final_regs.get(reg_idx, 0)
-        # 将无符号整数处理一下，防止负数补码差异 (假设是32位无符号对比)
+        # 寄存器堆按 32 位无符号保存，负数期望值按补码比较
+        expected_val &= XLEN_MASK
         if actual_val != expected_val:
-            all_passed = False
             error_msgs.append(f"x{reg_idx}: expected {expected_val}, got {actual_val}")
-
-    if all_passed:
-        print("✅ PASS")
-        return True
-    else:
-        print("❌ FAIL")
-        for msg in error_msgs:
-            print(f"   -> {msg}")
-        # 如果失败，把关键的 writeback 日志打出来方便调试
-        print("   -> Recent Writebacks:")
-        wb_lines = [l for l in log_output.splitlines() if "writeback" in l][-5:]
-        for l in wb_lines:
-            print(f"      {l}")
-        return False
+    return not error_msgs, error_msgs, list(recent_wb)
 
 # ================= 主程序 =================
 
 if __name__ == "__main__":
-    print("================ RISC-V CPU Simulation Tests ================")
+    parser = argparse.ArgumentParser(description="Run unit_tests/test_cases.py on one compiled simulator")
+    parser.add_argument("cases", nargs="*", help="case_* names to run (default: all)")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="number of cases run concurrently (default: CPU count)")
+    parser.add_argument("--no-cache", action="store_true", help="re-elaborate even if a cached simulator exists")
+    args = parser.parse_args()
+
+    print(f"================ RISC-V CPU Simulation Tests ({CPU_IMPL}) ================")
     
     tests = [
         (name, func) 
         for name, func in vars(test_cases).items() 
-        if name.startswith('case_') and callable(func)
+        if name.startswith('case_') and callable(func) and (not args.cases or name in args.cases)
     ]
-    
+
+    try:
+        sim = build_simulator(rebuild=args.no_cache)
+    except Exception as e:
+        print(f"❌ Elaboration failed: {e}")
+        sys.exit(1)
+
+    results = run_pool(lambda test: run_single_test(sim, *test), tests, jobs=args.jobs)
     passed = 0
-    for name, func in tests:
-        if run_single_test(name, func):
+    for (name, _), (ok, error_msgs, recent_wb) in zip(tests, results):
+        print(f"Testing [{name}]...", end=" ")
+        if ok:
+            print("✅ PASS")
             passed += 1
+            continue
+        print("❌ FAIL")
+        for msg in error_msgs:
+            print(f"   -> {msg}")
+        # 如果失败，把关键的 writeback 日志打出来方便调试
+        print("   -> Recent Writebacks:")
+        for l in recent_wb:
+            print(f"      {l}")
             
     print("=============================================================")
     print(f"Summary: {passed}/{len(tests)} passed.")
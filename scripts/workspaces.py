@@ -0,0 +1,61 @@
+"""
+Per-test workspaces and a small worker pool shared by the test runners.
+
+Every runner used to stage images into one shared `workspace/` directory and
+read back `workspace/log`, which forces tests to run one after another. With
+`--jobs N` each test gets a private directory `<workspace>/jobs/<test>/`
+(main.py is pointed at it via `--workspace`) and up to N tests run at once.
+
+The heavy lifting happens in the simulator subprocesses, so the pool only
+needs threads to keep N of them busy; results are yielded in submission
+order so the report table looks the same as a serial run.
+"""
+
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from scripts.log_analyzer import SUMMARY_NAME
+
+JOBS_DIRNAME = "jobs"
+
+WORKLOAD_NAME = "workload.exe"
+DATA_NAME = "data.mem"
+LOG_NAME = "log"
+VERILATOR_LOG_NAME = "verilator_log"
+# everything a previous run leaves behind that load_summary() could pick up
+STALE_OUTPUTS = (LOG_NAME, SUMMARY_NAME, VERILATOR_LOG_NAME, f"verilator_{SUMMARY_NAME}")
+
+
+def stage_images(workspace, exe, data=None) -> Path:
+    """Copy the instruction/data images into `workspace` and drop any stale log or summary."""
+    workspace = Path(workspace)
+    workspace.mkdir(parents=True, exist_ok=True)
+    shutil.copyfile(exe, workspace / WORKLOAD_NAME)
+    if data is not None and Path(data).exists() and Path(data).stat().st_size > 0:
+        shutil.copyfile(data, workspace / DATA_NAME)
+    else:
+        (workspace / DATA_NAME).write_text("")
+    for name in STALE_OUTPUTS:
+        (workspace / name).unlink(missing_ok=True)
+    return workspace
+
+
+def private_workspace(base_dir, name: str) -> Path:
+    """Return a fresh, empty workspace reserved for test `name`."""
+    workspace = Path(base_dir) / JOBS_DIRNAME / name
+    if workspace.exists():
+        shutil.rmtree(workspace)
+    workspace.mkdir(parents=True)
+    return workspace
+
+
+def run_pool(func, items, jobs: int = 1):
+    """Apply `func` to every item with up to `jobs` workers, yielding in input order."""
+    items = list(items)
+    if jobs <= 1 or len(items) <= 1:
+        for item in items:
+            yield func(item)
+        return
+    with ThreadPoolExecutor(max_workers=min(jobs, len(items))) as pool:
+        yield from pool.map(func, items)
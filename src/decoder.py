@@ -1,4 +1,5 @@
 from assassyn.frontend import *
+from Tomasulo.src.verbosity import log_debug
 from instruction import *
 
 
@@ -14,30 +15,34 @@ def decoder_logic(inst, reg_to_write : RegArray, regs: RegArray,
     [is_B, B_rs1, B_rs2, B_imm, B_alu] = decoder_B_type(inst=inst, is_eq=is_eq)
     [is_U, U_imm, U_rd] = decoder_U_type(inst=inst, is_eq=is_eq)
     [is_J, J_imm, J_rd] = decoder_J_type(inst=inst, is_eq=is_eq)
+    [is_M, is_div, M_rs1, M_rs2, M_rd, mdu_type] = decoder_M_type(inst=inst, is_eq=is_eq)
 
     # 接下来信息整合
     ecall = is_eq.get("ecall", Bits(1)(0))
     ebreak = is_eq.get("ebreak", Bits(1)(0))
 
-    rs1_used = is_R | is_I | is_I_star | is_S | is_B
+    rs1_used = is_R | is_I | is_I_star | is_S | is_B | is_M
     rs1 = is_R.select(R_rs1,
             is_I.select(I_rs1,
             is_I_star.select(I_star_rs1,
             is_S.select(S_rs1,
-            is_B.select(B_rs1, Bits(5)(0))))))
+            is_B.select(B_rs1,
+            is_M.select(M_rs1, Bits(5)(0)))))))
 
-    rs2_used = is_R | is_S | is_B
+    rs2_used = is_R | is_S | is_B | is_M
     rs2 = is_R.select(R_rs2,
             is_S.select(S_rs2,
-            is_B.select(B_rs2, Bits(5)(0))))
+            is_B.select(B_rs2,
+            is_M.select(M_rs2, Bits(5)(0)))))
 
     is_I_writes = is_I & ~(ecall | ebreak)
-    rd_used = is_R | is_I_writes | is_I_star | is_U | is_J
+    rd_used = is_R | is_I_writes | is_I_star | is_U | is_J | is_M
     rd = is_R.select(R_rd,
          is_I_writes.select(I_rd,
          is_I_star.select(I_star_rd,
          is_U.select(U_rd,
-         is_J.select(J_rd, Bits(5)(0))))))
+         is_J.select(J_rd,
+         is_M.select(M_rd, Bits(5)(0)))))))
 
     imm_used = is_I | is_I_star | is_S | is_B | is_U | is_J
     imm_zero = Bits(32)(0)
@@ -110,19 +115,19 @@ def decoder_logic(inst, reg_to_write : RegArray, regs: RegArray,
     rs1_value = (rs1_used & (rs1 == MEM_rd)).select(MEM_result, rs1_value)
     rs2_value = (rs2_used & (rs2 == MEM_rd)).select(MEM_result, rs2_value)
 
-    log("rs1_value after forwarding: {:08x}", rs1_value)
+    log_debug("rs1_value after forwarding: {:08x}", rs1_value)
     
     is_valid = rs1_valid & rs2_valid
 
     with Condition(is_valid & rd_used & (rd != Bits(5)(0))):
         reg_to_write[rd] <= reg_to_write[rd] + UInt(32)(1)
 
-    log("decoder: rs1_used = {} , rs1 = {}", rs1_used, rs1)
-    log("decoder: rs2_used = {} , rs2 = {}", rs2_used, rs2)
-    log("decoder: rd_used = {} , rd = {}", rd_used, rd)
-    log("decoder: imm_used = {} , imm = {}", imm_used, imm)
-    log("decoder: mem_read = {} , mem_write = {} , is_branch = {} , branch_type = {}", mem_read, mem_write, is_branch, branch_type)
-    log("decoder: alu_type(onehot)={:014b}", alu_type)
+    log_debug("decoder: rs1_used = {} , rs1 = {}", rs1_used, rs1)
+    log_debug("decoder: rs2_used = {} , rs2 = {}", rs2_used, rs2)
+    log_debug("decoder: rd_used = {} , rd = {}", rd_used, rd)
+    log_debug("decoder: imm_used = {} , imm = {}", imm_used, imm)
+    log_debug("decoder: mem_read = {} , mem_write = {} , is_branch = {} , branch_type = {}", mem_read, mem_write, is_branch, branch_type)
+    log_debug("decoder: alu_type(onehot)={:014b}", alu_type)
 
     return deocder_signals.bundle(
         rs1=rs1,
@@ -136,6 +141,9 @@ def decoder_logic(inst, reg_to_write : RegArray, regs: RegArray,
         imm=imm,
         imm_used=imm_used,
         alu_type=alu_type,
+        is_mul=is_M & ~is_div,
+        is_div=is_div,
+        mdu_type=mdu_type,
         mem_read=mem_read,
         mem_write=mem_write,
         is_branch=is_branch,
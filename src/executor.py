@@ -1,5 +1,8 @@
 from assassyn.frontend import *
+from Tomasulo.src.verbosity import log_commit, log_info, log_debug, log_final_state
 from instruction import *
+# RV32M 的乘除法组合逻辑与 Tomasulo 的乘除法单元共用
+from Tomasulo.src.mdu import mul_result, divide
 
 # 全局配置 - 数据段基地址（默认 0x2000）
 # 可通过 executor.DATA_BASE_OFFSET = xxx 在外部设置
@@ -8,14 +11,15 @@ DATA_BASE_OFFSET = 0x2000
 
 @rewrite_assign
 def executor_logic(signals, pc_addr: Value, dcache: SRAM,
+                   regs: RegArray,
                    EX_rd : Value,
                    EX_result : Value,
                    MEM_rd : Value,
                    MEM_result : Value,):
 
-    log("bypass: EX_rd={} EX_result={} MEM_rd={} MEM_result={}", EX_rd, EX_result, MEM_rd, MEM_result)
+    log_debug("bypass: EX_rd={} EX_result={} MEM_rd={} MEM_result={}", EX_rd, EX_result, MEM_rd, MEM_result)
 
-    log("rs1: {}, rs2: {}", signals.rs1, signals.rs2)
+    log_debug("rs1: {}, rs2: {}", signals.rs1, signals.rs2)
 
     # 避免对 x0 的错误旁路：仅在 rd != 0 时才进行前递
     ex_rs1_fwd = (signals.rs1 == EX_rd) & (EX_rd != Bits(5)(0))
@@ -32,7 +36,7 @@ def executor_logic(signals, pc_addr: Value, dcache: SRAM,
 
     imm_val = signals.imm.bitcast(UInt(32))
 
-    log("executor input: pc={} rs1_used={} rs2_used={} rd_used={} alu_type={:014b} imm={} branch_type={} jal={} jalr={} ecall={} ebreak={}",
+    log_info("executor input: pc={} rs1_used={} rs2_used={} rd_used={} alu_type={:014b} imm={} branch_type={} jal={} jalr={} ecall={} ebreak={}",
         pc_addr, signals.rs1_used, signals.rs2_used, signals.rd_used, signals.alu_type, imm_val,
         signals.branch_type, signals.is_jal, signals.is_jalr, signals.is_ecall, signals.is_ebreak)
 
@@ -60,7 +64,7 @@ def executor_logic(signals, pc_addr: Value, dcache: SRAM,
     alu_candidates[RV32I_ALU.ALU_CMP_NE]  = (rs1_val != op2).zext(UInt(32))
     # 其余保持 0（ALU_NONE 等）
 
-    log("executor operands: rs1_val={} rs2_val={} op2={} shamt={}", rs1_val, rs2_val, op2, shamt)
+    log_debug("executor operands: rs1_val={} rs2_val={} op2={} shamt={}", rs1_val, rs2_val, op2, shamt)
 
     # one-hot 选择 ALU 结果
     # alu_res_basic = signals.alu_type.select1hot(*alu_candidates)
@@ -72,15 +76,21 @@ def executor_logic(signals, pc_addr: Value, dcache: SRAM,
     # AUIPC: rd = PC + imm
     lui_res = imm_val
     auipc_res = (pc_addr + imm_val).bitcast(UInt(32))
+    # RV32M：5 级流水线没有多周期的执行单元，乘法和（32 步展开的）除法都在 EX 内一个周期完成
+    mdu_res = signals.is_mul.select(mul_result(rs1_val, rs2_val, signals.mdu_type),
+                                    divide(rs1_val, rs2_val, signals.mdu_type))
     alu_res = signals.is_lui.select(lui_res,
-              signals.is_auipc.select(auipc_res, alu_res_basic))
+              signals.is_auipc.select(auipc_res,
+              (signals.is_mul | signals.is_div).select(mdu_res, alu_res_basic)))
 
-    log("executor mem flags: mem_read={}, mem_write={}, branch={}", signals.mem_read, signals.mem_write, signals.is_branch)
+    log_debug("executor mem flags: mem_read={}, mem_write={}, branch={}", signals.mem_read, signals.mem_write, signals.is_branch)
 
     # ecall/ebreak：直接结束仿真
     sys_trap = signals.is_ecall | signals.is_ebreak
     with Condition(sys_trap):
-        log("executor: system trap ecall={} ebreak={} at pc={}", signals.is_ecall, signals.is_ebreak, pc_addr)
+        log_commit("executor: system trap ecall={} ebreak={} at pc={}", signals.is_ecall, signals.is_ebreak, pc_addr)
+        # 前面两条指令还在 MEM/WB，用旁路寄存器补上它们的结果（MEM 较旧，EX 较新）
+        log_final_state(regs, overrides=[(MEM_rd, MEM_result), (EX_rd, EX_result)])
         finish()
 
     # 访存地址与对齐
@@ -95,7 +105,7 @@ def executor_logic(signals, pc_addr: Value, dcache: SRAM,
     word_addr = (dcache_addr  >> UInt(32)(2)).bitcast(UInt(32))
     addr_oob = (word_addr >= UInt(32)(dcache.depth)) & ( mem_re | mem_we )
     with Condition(addr_oob):
-        log("dcache addr out of range: eff_addr={} word_addr={} depth={}", eff_addr, word_addr, UInt(32)(dcache.depth))
+        log_commit("dcache addr out of range: eff_addr={} word_addr={} depth={}", eff_addr, word_addr, UInt(32)(dcache.depth))
         finish()
     # 触发 dcache 访问（异步 dout）
     dcache.build(
@@ -105,7 +115,7 @@ def executor_logic(signals, pc_addr: Value, dcache: SRAM,
         wdata=rs2_val.bitcast(Bits(32)),
     )
     with Condition(signals.mem_read | signals.mem_write):
-        log("executor mem access: addr={} re={} we={} misaligned={}", eff_addr, mem_re, mem_we, misaligned)
+        log_debug("executor mem access: addr={} re={} we={} misaligned={}", eff_addr, mem_re, mem_we, misaligned)
 
     # 分支/跳转逻辑
     link_addr = pc_addr + UInt(32)(4)
@@ -125,11 +135,11 @@ def executor_logic(signals, pc_addr: Value, dcache: SRAM,
     pc_misaligned = ((pc_target_raw & UInt(32)(0b11)).bitcast(UInt(32))) != UInt(32)(0)
     pc_target_aligned = signals.is_jalr.select(jalr_target, pc_target_masked)
     with Condition(signals.is_branch & branch_taken & pc_misaligned):
-        log("branch target misaligned: target={}", pc_target_raw)
+        log_commit("branch target misaligned: target={}", pc_target_raw)
 
     pc_default = link_addr  # 默认下一条
     pc_next = branch_taken.select(pc_target_aligned, pc_default)
-    log("executor pc flow: default_next={} target={} taken={} jal_like={}", pc_default, pc_target_aligned, branch_taken, is_jal_like)
+    log_debug("executor pc flow: default_next={} target={} taken={} jal_like={}", pc_default, pc_target_aligned, branch_taken, is_jal_like)
     # 现在不在 ex 阶段更新 pc_reg，会把这个 pc_next 传给 Fetchimpl 直接让他去 fetch 这个
     # pc_reg[0] <= pc_next
 
@@ -138,5 +148,5 @@ def executor_logic(signals, pc_addr: Value, dcache: SRAM,
     # 若系统调用，忽略写回内容
     rd_data = sys_trap.select(UInt(32)(0), rd_data)
 
-    log("executor: rs1={} rs2={} op2={} alu_res={} pc_next={}", rs1_val, rs2_val, op2, alu_res, pc_next)
-    return rd_data.bitcast(Bits(32)), signals.is_branch, pc_next, mem_re, mem_we
+    log_debug("executor: rs1={} rs2={} op2={} alu_res={} pc_next={}", rs1_val, rs2_val, op2, alu_res, pc_next)
+    return rd_data.bitcast(Bits(32)), signals.is_branch, pc_next, mem_re, mem_we, eff_addr
@@ -1,4 +1,5 @@
 from assassyn.frontend import *
+from Tomasulo.src.verbosity import log_info
 
 @rewrite_assign
 def decoder_R_type(inst, is_eq):
@@ -33,9 +34,42 @@ def decoder_R_type(inst, is_eq):
         alu_onehot = Bits(RV32I_ALU.CNT)(1 << alu)
         alu_type = eq.select(alu_onehot, alu_type)
         with Condition(eq):
-            log(f"Decoded R-type instruction: {name}")
+            log_info(f"Decoded R-type instruction: {name}")
     return is_R, rs1, rs2, rd, alu_type
 
+@rewrite_assign
+def decoder_M_type(inst, is_eq):
+    opcode = inst[0:6]
+    funct3 = inst[12:14]
+    funct7 = inst[25:31]
+    rd = inst[7:11]
+    rs1 = inst[15:19]
+    rs2 = inst[20:24]
+    # RV32M 与 R 型同 opcode，funct7 = 0000001，funct3 区分 8 条指令
+    M_type_op = [
+        # name     opcode   funct3  funct7    MDU
+        ["mul",    0b0110011, 0b000, 0b0000001, RV32M.MUL],
+        ["mulh",   0b0110011, 0b001, 0b0000001, RV32M.MULH],
+        ["mulhsu", 0b0110011, 0b010, 0b0000001, RV32M.MULHSU],
+        ["mulhu",  0b0110011, 0b011, 0b0000001, RV32M.MULHU],
+        ["div",    0b0110011, 0b100, 0b0000001, RV32M.DIV],
+        ["divu",   0b0110011, 0b101, 0b0000001, RV32M.DIVU],
+        ["rem",    0b0110011, 0b110, 0b0000001, RV32M.REM],
+        ["remu",   0b0110011, 0b111, 0b0000001, RV32M.REMU],
+    ]
+    is_M = Bits(1)(0)
+    mdu_type = Bits(RV32M.CNT)(0)
+    for [name, op, f3, f7, mdu] in M_type_op:
+        eq = (opcode == Bits(7)(op)) & (funct3 == Bits(3)(f3)) & (funct7 == Bits(7)(f7))
+        is_eq[name] = eq
+        is_M = is_M | eq
+        mdu_type = eq.select(Bits(RV32M.CNT)(1 << mdu), mdu_type)
+        with Condition(eq):
+            log_info(f"Decoded M-type instruction: {name}")
+    # funct3 最高位区分乘法（mul*）与除法（div*/rem*）
+    is_div = is_M & funct3[2:2]
+    return is_M, is_div, rs1, rs2, rd, mdu_type
+
 @rewrite_assign
 def decoder_I_type(inst, is_eq):
     imm = inst[20:31]
@@ -76,7 +110,7 @@ def decoder_I_type(inst, is_eq):
         alu_onehot = Bits(RV32I_ALU.CNT)(1 << alu)
         alu_type = eq.select(alu_onehot, alu_type)
         with Condition(eq):
-            log(f"Decoded I-type instruction: {name}")
+            log_info(f"Decoded I-type instruction: {name}")
     return is_I, rs1, imm, rd, alu_type
 
 @rewrite_assign
@@ -107,7 +141,7 @@ def decoder_I_star(inst, is_eq):
         alu_onehot = Bits(RV32I_ALU.CNT)(1 << alu)
         alu_type = eq.select(alu_onehot, alu_type)
         with Condition(eq):
-            log(f"Decoded I*-type instruction: {name}")
+            log_info(f"Decoded I*-type instruction: {name}")
 
     return is_I_star, rs1, imm, rd, alu_type
 
@@ -132,7 +166,7 @@ def decoder_S_type(inst, is_eq):
         is_eq[name] = eq
         is_S = is_S | eq
         with Condition(eq):
-            log(f"Decoded S-type instruction: {name}")
+            log_info(f"Decoded S-type instruction: {name}")
     return is_S, rs1, rs2, imm
 
 @rewrite_assign
@@ -164,7 +198,7 @@ def decoder_B_type(inst, is_eq):
         alu_onehot = Bits(RV32I_ALU.CNT)(1 << alu)
         alu_type = eq.select(alu_onehot, alu_type)
         with Condition(eq):
-            log(f"Decoded B-type instruction: {name}")
+            log_info(f"Decoded B-type instruction: {name}")
     return is_B, rs1, rs2, imm, alu_type
 
 @rewrite_assign
@@ -183,7 +217,7 @@ def decoder_U_type(inst, is_eq):
         is_eq[name] = eq
         is_U = is_U | eq
         with Condition(eq):
-            log(f"Decoded U-type instruction: {name}")
+            log_info(f"Decoded U-type instruction: {name}")
     return is_U, imm, rd
 
 @rewrite_assign
@@ -205,7 +239,7 @@ def decoder_J_type(inst, is_eq):
         is_eq[name] = eq
         is_J = is_J | eq
         with Condition(eq):
-            log(f"Decoded J-type instruction: {name}")
+            log_info(f"Decoded J-type instruction: {name}")
     return is_J, imm, rd
 
 class RV32I_ALU:
@@ -226,6 +260,18 @@ class RV32I_ALU:
     ALU_CMP_NE = 13
     ALU_NONE = 14
 
+# RV32M 乘除法单元（MDU）的 one-hot 操作类型，不经过 ALU
+class RV32M:
+    CNT = 8
+    MUL = 0
+    MULH = 1
+    MULHSU = 2
+    MULHU = 3
+    DIV = 4
+    DIVU = 5
+    REM = 6
+    REMU = 7
+
 deocder_signals = Record(
     rs1 = Bits(5),
     rs1_used = Bits(1),
@@ -238,6 +284,9 @@ deocder_signals = Record(
     imm = Bits(32),
     imm_used = Bits(1),
     alu_type = Bits(RV32I_ALU.CNT),
+    is_mul = Bits(1),
+    is_div = Bits(1),
+    mdu_type = Bits(RV32M.CNT),
     mem_read = Bits(1),
     mem_write = Bits(1),
     is_branch = Bits(1),
@@ -1,9 +1,21 @@
+import os
+import sys
+
+# 仿真器缓存工具在仓库根目录的 scripts/ 下
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
 from assassyn.frontend import *
 from assassyn.backend import *
 from assassyn import utils, backend
 from assassyn.utils import run_simulator, run_verilator
 from decoder import *
 from executor import executor_logic
+from Tomasulo.src import verbosity
+from Tomasulo.src.verbosity import log_commit, log_info, log_debug
+from scripts import sim_cache
+from Tomasulo.src.cache import CacheModel
+from Tomasulo.src.config import CacheConfig
+from scripts.log_analyzer import LogAnalyzer, SUMMARY_NAME
 
 class WriteBack(Module):
     def __init__(self):
@@ -18,7 +30,7 @@ class WriteBack(Module):
         rd, data = self.pop_all_ports(True)
         with Condition(rd != Bits(5)(0)):
             regs[rd] <= data.bitcast(UInt(32))
-            log("writeback stage: rd = {} data = {}", rd, data)
+            log_commit("writeback stage: rd = {} data = {}", rd, data)
             # 写回后，目标寄存器待写入数减一
             reg_to_write[rd] <= reg_to_write[rd] - UInt(32)(1)
         fetcher.async_called()
@@ -49,16 +61,16 @@ class MemoryAccess(Module):
         mem_rdata = dcache.dout[0]
 
         with Condition(signals.mem_read | signals.mem_write):
-            log("memory stage: read={} write={} addr={} rs1_val={} imm={} rs2_val={} misaligned={}",
+            log_debug("memory stage: read={} write={} addr={} rs1_val={} imm={} rs2_val={} misaligned={}",
                 mem_re, mem_we, eff_addr, rs1_val, signals.imm, rs2_val, misaligned)
 
         # store 访存已在 EX 阶段触发，这里仅记录
         with Condition(mem_we):
-            log("memory store: addr={} data={}", eff_addr, rs2_val)
+            log_info("memory store: addr={} data={}", eff_addr, rs2_val)
 
         # load写回
         with Condition(mem_re & signals.rd_used & (signals.rd != Bits(5)(0))):
-            log("memory load writeback: rd={} data={}", signals.rd, mem_rdata)
+            log_info("memory load writeback: rd={} data={}", signals.rd, mem_rdata)
         
         wb_data = mem_re.select(
             mem_rdata,
@@ -92,22 +104,48 @@ class Executor(Module):
 
     @module.combinational
     def build(self, memoryaccess: MemoryAccess, dcache: SRAM,
+              dc: CacheModel,
+              ic: CacheModel,
+              regs: RegArray,
               EX_rd : RegArray,
               EX_result : RegArray,
               MEM_rd : RegArray,
               MEM_result : RegArray):
         decoder_result, pc_addr = self.pop_all_ports(True)
-        rd_data, ex_branch_taken, ex_pc_next, mem_re, mem_we = executor_logic(
+        rd_data, ex_branch_taken, ex_pc_next, mem_re, mem_we, eff_addr = executor_logic(
             signals = decoder_result,
             pc_addr= pc_addr,
             dcache = dcache,
+            regs = regs,
             EX_rd = EX_rd[0],
             EX_result = EX_result[0],
             MEM_rd = MEM_rd[0],
             MEM_result = MEM_result[0]
         )
+        # ecall/ebreak 在 executor_logic 里结束仿真，同一周期打印 cache 统计
+        with Condition(decoder_result.is_ecall | decoder_result.is_ebreak):
+            ic.report(log_commit)
+            dc.report(log_commit)
         memoryaccess.async_called(decoder_result=decoder_result, wdata=rd_data)
-        return ex_branch_taken, ex_pc_next, decoder_result.rd, rd_data, mem_re, mem_we
+        return ex_branch_taken, ex_pc_next, decoder_result.rd, rd_data, mem_re, mem_we, eff_addr
+
+# dcache 时序模型：MEM 阶段固定一个周期、没有反压，缺失不会让流水线停顿，
+# 这里只按 EX 发出的 load 地址统计命中/缺失；依赖 Driver 的 heartbeat 保证 MSHR 每周期倒计时
+class DCache_downstream(Downstream):
+    def __init__(self):
+        super().__init__()
+    @downstream.combinational
+    def build(self,
+              dc : CacheModel,
+              mem_re : Value,
+              mem_addr : Value,
+              metadata : Value):
+        mem_re = mem_re.optional(Bits(1)(0))
+        mem_addr = mem_addr.optional(UInt(32)(0))
+        metadata = metadata.optional(Bits(8)(0))
+        _ = metadata == metadata
+        dc.access(mem_re, mem_addr)
+        dc.tick()
 
 # 把 ex 的结果传进寄存器，如果没有调用 EX 那就是 rd = 0
 class EX_downstream(Downstream):
@@ -148,7 +186,7 @@ class Decoder(Module):
         opcode = instr[0:6]
         funct3 = instr[12:14]
         funct7 = instr[25:31]
-        log("decoder fetch pc={} instr=0x{:08x} opcode={:07b} funct3={:03b} funct7={:07b}",
+        log_debug("decoder fetch pc={} instr=0x{:08x} opcode={:07b} funct3={:03b} funct7={:07b}",
             pc_addr, instr, opcode, funct3, funct7)
 
         decoder_result = decoder_logic(
@@ -159,7 +197,7 @@ class Decoder(Module):
         with Condition(decoder_result.is_valid):
             executor.async_called(decoder_result=decoder_result, pc_addr=pc_addr)
         with Condition(~decoder_result.is_valid):
-            log("decoder invalid instruction at pc={}: instr=0x{:08x}", pc_addr, instr)
+            log_commit("decoder invalid instruction at pc={}: instr=0x{:08x}", pc_addr, instr)
         ID_rd_in = decoder_result.is_valid.select(
             decoder_result.rd,
             Bits(5)(0)
@@ -211,6 +249,7 @@ class FetcherImpl(Downstream):
     # 如果数据 invalid，这个时候应该重新 fetch 同一条指令（decoder 用过的的指令）
     # invalid 的优先级高，也就是说，如果 invalid，那么一定是要取 decoder_pc_addr 的地址
     # 否则就继续取指
+    # icache 时序模型缺失时不取指，pc 保持在要取的地址，等行回填后再取
     @downstream.combinational
     def build(self,
               is_branch : Value,
@@ -221,6 +260,7 @@ class FetcherImpl(Downstream):
               ex_is_branch : Value,
               ex_pc_bypass : Value,
               icache : SRAM,
+              ic : CacheModel,
               decoder : Decoder):
         is_branch = is_branch.optional(Bits(1)(0))
         is_valid = is_valid.optional(Bits(1)(1))
@@ -231,27 +271,36 @@ class FetcherImpl(Downstream):
         # 如果 上一条不是分支，或者数据 invalid，那么都需要 fetch
         need_fetch = (~is_branch) | (~is_valid) 
 
-        log("fetcher: is_branch={} is_valid={} ex_is_branch={} pc_addr={} decoder_pc_addr={}",
+        log_debug("fetcher: is_branch={} is_valid={} ex_is_branch={} pc_addr={} decoder_pc_addr={}",
             is_branch, is_valid, ex_is_branch, pc_addr, decoder_pc_addr)
 
         fetch_pc_addr = is_valid.select(
             ex_is_branch.select(ex_pc_bypass, pc_addr),
             decoder_pc_addr)
 
+        # 已有 MSHR 在取的行不再重复访问、不计数
+        waiting = ic.pending(fetch_pc_addr)
+        icache_hit, _ = ic.access(need_fetch & ~waiting, fetch_pc_addr)
+        ic.tick()
+        fetch = need_fetch & ~waiting & icache_hit
+
         word_addr = (fetch_pc_addr >> UInt(32)(2)).bitcast(UInt(32))
         icache.build(we=Bits(1)(0),
-                     re=need_fetch,
+                     re=fetch,
                      addr=word_addr.bitcast(Int(icache.addr_width)),
                      wdata=Bits(32)(0))
         
-        with Condition(need_fetch):
+        with Condition(fetch):
             pc_reg[0] <= fetch_pc_addr + UInt(32)(4)
             decoder.async_called(pc_addr=fetch_pc_addr)
-            log("fetch stage pc addr: {}", fetch_pc_addr)
+            log_info("fetch stage pc addr: {}", fetch_pc_addr)
+        with Condition(need_fetch & ~fetch):
+            pc_reg[0] <= fetch_pc_addr
+            log_debug("fetch stage icache miss, hold pc addr: {} waiting={}", fetch_pc_addr, waiting)
         with Condition(~need_fetch):
             # 保持为这个 decoder 出来的地址，这样之后修改就不会错
             pc_reg[0] <= decoder_pc_addr  
-            log("fetch stage hold pc addr: {}", decoder_pc_addr)
+            log_debug("fetch stage hold pc addr: {}", decoder_pc_addr)
 
 class Driver(Module):
     def __init__(self):
@@ -261,29 +310,41 @@ class Driver(Module):
     @module.combinational
     def build(self, fecher : Fetcher):
         is_init = RegArray(UInt(1), 1, initializer=[1])
+        tick_reg = RegArray(Bits(8), 1, initializer=[0])
 
         with Condition(is_init[0] == UInt(1)(1)):
             is_init[0] <= UInt(1)(0)
             fecher.async_called()
-            log("CPU Simulation Started")
+            log_commit("CPU Simulation Started")
         with Condition(is_init[0] == UInt(1)(0)):
             fecher.async_called()
+        # heartbeat，驱动 dcache 时序模型每周期触发
+        tick_reg[0] <= tick_reg[0] + Bits(8)(1)
+        return tick_reg[0]
 
 
 current_path = os.path.dirname(os.path.abspath(__file__))
 workspace = f'{current_path}/workspace/'
-
-def build_CPU(depth_log=18):
+# 内存镜像用相对路径：仿真器启动时在其工作目录（workspace）下读取，
+# 因此换 workload 不需要重新 elaborate，编译好的仿真器可以缓存复用
+WORKLOAD_IMAGE = "workload.exe"
+DATA_IMAGE = "data.mem"
+
+def build_CPU(depth_log=18, log_level="debug", dcache_config=None, icache_config=None):
+    # 日志等级在 elaborate 时生效，低于该等级的 log 不会生成到仿真器里
+    verbosity.set_log_level(log_level)
     sys = SysBuilder("CPU")
     with sys:
         icache = SRAM(width= 32,
                       depth= 1 << depth_log,
-                      init_file= f"{workspace}/workload.exe")
+                      init_file= WORKLOAD_IMAGE)
         icache.name = "icache"
         dcache = SRAM(width= 32,
                       depth= 1 << depth_log,
-                      init_file= f"{workspace}/data.mem")
+                      init_file= DATA_IMAGE)
         dcache.name = "dcache"
+        dc = CacheModel(dcache_config if dcache_config is not None else CacheConfig("dcache"))
+        ic = CacheModel(icache_config if icache_config is not None else CacheConfig("icache"))
         regs = RegArray(UInt(32), 32, initializer=[0]*32)
         pc_reg = RegArray(UInt(32), 1, initializer=[0])
         # 每个寄存器有多少个指令要写入但是还没有写入
@@ -298,6 +359,7 @@ def build_CPU(depth_log=18):
         fetcherimpl = FetcherImpl()
         ex_downstream = EX_downstream()
         mem_downstream = Mem_downstream()
+        dcache_downstream = DCache_downstream()
         id_downstream = ID_downstream()
 
         # ID 阶段得到的 rd，以及是否是 load 指令
@@ -326,16 +388,17 @@ def build_CPU(depth_log=18):
 
         pc_reg, pc_addr = fetcher.build(icache=icache, decoder=decoder, pc_reg=pc_reg)
 
-        driver.build(fecher=fetcher)
+        metadata = driver.build(fecher=fetcher)
 
-        ex_branch_taken, ex_pc_next, EX_rd_in, EX_result_in, mem_re, mem_we = executor.build(
-            memoryaccess=memoryaccess, dcache=dcache,
+        ex_branch_taken, ex_pc_next, EX_rd_in, EX_result_in, mem_re, mem_we, mem_addr = executor.build(
+            memoryaccess=memoryaccess, dcache=dcache, dc=dc, ic=ic, regs=regs,
             EX_rd=EX_rd, EX_result=EX_result,
             MEM_rd=MEM_rd, MEM_result=MEM_result
         )
         ex_downstream.build(
             EX_rd=EX_rd, EX_result=EX_result, EX_rd_in=EX_rd_in, EX_result_in=EX_result_in,
             mem_re=mem_re, mem_we=mem_we)
+        dcache_downstream.build(dc=dc, mem_re=mem_re, mem_addr=mem_addr, metadata=metadata)
 
         fetcherimpl.build(is_branch=is_branch,
                           is_valid=is_valid,
@@ -345,10 +408,31 @@ def build_CPU(depth_log=18):
                           ex_is_branch=ex_branch_taken,
                           ex_pc_bypass=ex_pc_next,
                           icache=icache,
+                          ic=ic,
                           decoder=decoder
         )
     return sys
 
+def build_params(depth_log, data_base, sim_threshold, idle_threshold, log_level="debug", dcache_config=None,
+                 icache_config=None):
+    """影响 elaborate 结果的全部参数，用作仿真器缓存的 key。"""
+    dcache_config = dcache_config if dcache_config is not None else CacheConfig("dcache")
+    icache_config = icache_config if icache_config is not None else CacheConfig("icache")
+    return {
+        "design": "5-stage",
+        "depth_log": depth_log,
+        "data_base": data_base,
+        "sim_threshold": sim_threshold,
+        "idle_threshold": idle_threshold,
+        "log_level": log_level,
+        "verilog": True,
+        **dcache_config.params(),
+        **icache_config.params(),
+        # cache 模型、乘除法逻辑及其依赖的 config/instruction 等在 Tomasulo/src 下，
+        # 不在本设计目录的源码哈希里，按实际导入的模块逐个计入
+        "tomasulo_modules": sim_cache.imported_digest("Tomasulo.src"),
+    }
+
 def main():
     import argparse
     import executor
@@ -359,29 +443,66 @@ def main():
     parser.add_argument("--idle-threshold", type=int, default=100, help="idle cycles before stop")
     parser.add_argument("--data-base", type=lambda x: int(x, 0), default=0x2000, 
                         help="data segment base address (default: 0x2000)")
+    parser.add_argument("--log-level", choices=list(verbosity.LOG_LEVELS), default="debug",
+                        help="drop logs below this level at elaboration; silent only dumps final registers")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="re-elaborate even if a cached simulator exists")
+    parser.add_argument("--workspace", default=workspace,
+                        help="directory holding workload.exe/data.mem, receives the log (default: src/workspace)")
+    parser.add_argument("--run", choices=["both", "sim", "verilator"], default="both",
+                        help="run the Python simulator, the Verilator model, or both (default)")
+    CacheConfig.add_arguments(parser, "icache")
+    CacheConfig.add_arguments(parser, "dcache")
     args = parser.parse_args()
+    try:
+        icache_config = CacheConfig.from_args(args, "icache")
+        dcache_config = CacheConfig.from_args(args, "dcache")
+    except ValueError as e:
+        parser.error(str(e))
+    run_dir = os.path.abspath(args.workspace)
 
     # 设置数据段基地址
     executor.DATA_BASE_OFFSET = args.data_base
     print(f"Config: data_base=0x{args.data_base:x}, sim_threshold={args.sim_threshold}, idle_threshold={args.idle_threshold}")
 
-    sys = build_CPU(depth_log = 18)
-    cfg = backend.config(
-        resource_base='.',
-        verilog=True,
-        verbose=True,
-        sim_threshold=args.sim_threshold,
-        idle_threshold=args.idle_threshold,
-    )
-    sim,vcd = elaborate(sys=sys, **cfg)
-    output = run_simulator(sim)
-    print("simulate output is written in /workspace/log")
-    with open(f"{workspace}/log", "w") as f:
-        print(output, file = f)
-    ver_output = run_verilator(vcd)
-    print("verilator output is written in /workspace/verilator_log")
-    with open(f"{workspace}/verilator_log", "w") as f:
+    depth_log = 18
+    def build(path):
+        sys = build_CPU(depth_log = depth_log, log_level=args.log_level, dcache_config=dcache_config,
+                        icache_config=icache_config)
+        cfg = backend.config(
+            path=path,
+            resource_base='.',
+            verilog=True,
+            verbose=True,
+            sim_threshold=args.sim_threshold,
+            idle_threshold=args.idle_threshold,
+        )
+        return elaborate(sys=sys, **cfg)
+
+    params = build_params(depth_log, args.data_base, args.sim_threshold, args.idle_threshold, args.log_level,
+                          dcache_config, icache_config)
+    os.makedirs(run_dir, exist_ok=True)
+    # elaborate 时也切到 workspace，保证相对路径的镜像文件可见
+    with sim_cache.working_directory(run_dir):
+        entry = sim_cache.get_or_build(current_path, params, build, rebuild=args.no_cache)
+    print(f"simulator cache {'hit' if entry['hit'] else 'miss'}: {entry['key']}")
+    if args.run != "verilator":
+        # 边运行边写 log，同时单遍统计周期/提交/寄存器，结果存到 summary.json
+        analyzer = LogAnalyzer()
+        with open(f"{run_dir}/log", "w") as f:
+            analyzer.tee(sim_cache.stream_simulator_in(entry["simulator"], run_dir), f)
+        analyzer.write_summary(f"{run_dir}/{SUMMARY_NAME}")
+        print(f"simulate output is written in {run_dir}/log")
+    if args.run == "sim":
+        return
+    # Verilator 模型只在第一次完整生成+编译，之后换 workload 只把镜像拷过去重跑 testbench；
+    # 多个测试并行时共用同一个缓存的 Verilator 目录，内部会串行化
+    ver_output = sim_cache.run_verilator_cached(entry["verilator"], run_dir, run_verilator,
+                                                images=(WORKLOAD_IMAGE, DATA_IMAGE))
+    print(f"verilator output is written in {run_dir}/verilator_log")
+    with open(f"{run_dir}/verilator_log", "w") as f:
         print(ver_output, file = f)
+    LogAnalyzer().feed_lines(ver_output.splitlines()).write_summary(f"{run_dir}/verilator_{SUMMARY_NAME}")
 
 if __name__ == "__main__":
     main()
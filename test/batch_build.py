@@ -4,14 +4,20 @@ import shutil
 import sys
 import json
 
+# 标准答案由仓库里的 RV32IM 功能模型（scripts/iss.py）直接执行 .exe/.data 得到
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from scripts import iss
+
 # ================= 配置区域 =================
 SOURCE_DIR = "src"          # 存放 C 代码的文件夹
 OUTPUT_DIR = "test_suite"   # 输出结果的文件夹
 
 # RISC-V 工具链前缀
 RV_PREFIX = "riscv64-unknown-elf-"
-# 你的电脑自带的 GCC (用于生成标准答案)
-HOST_GCC  = "gcc"
+# 目标指令集：rv32i 时乘除法由 libgcc 的软件循环完成；rv32im 直接生成 mul/div/rem，
+# 两个 CPU 设计和功能模型都支持 M 扩展
+MARCH_CHOICES = ("rv32i", "rv32im")
+DEFAULT_MARCH = "rv32i"
 
 # 内存布局 (根据你的 CPU 设计调整)
 TEXT_ADDR = "0x00000000"
@@ -66,37 +72,25 @@ SECTIONS
 }}
 """)
 
-def generate_ans(c_path, case_dir, case_name):
-    """【关键】用本机 GCC 运行代码，生成标准答案 .ans"""
-    host_exe = os.path.join(case_dir, "host_runner")
-    
-    # 1. 编译 (x86/host)
-    run_cmd(f"{HOST_GCC} {c_path} -o {host_exe} -O0")
-    
-    # 2. 运行并获取 exit code
-    try:
-        # 运行编译出的程序
-        ret_code = subprocess.call(host_exe)
-        # 注意：Linux/Unix 的 exit code 通常是 8-bit (0-255)。
-        # 如果你的测试结果超过 255，这种方法需要修改（改用打印到 stdout）。
-        
-        ans_file = os.path.join(case_dir, f"{case_name}.ans")
-        with open(ans_file, "w") as f:
-            # 将结果写入 .ans 文件，比如 "5050"
-            f.write(str(ret_code))
-            
-    finally:
-        if os.path.exists(host_exe):
-            os.remove(host_exe)
-
-def generate_riscv_files(c_path, case_dir, case_name):
+def generate_ans(case_dir, case_name):
+    """【关键】用功能模型执行 RISC-V 镜像，生成标准答案 .ans（完整 32 位 a0）"""
+    machine = iss.load_test(case_dir)
+    if not machine.run():
+        raise RuntimeError(f"golden model did not reach ebreak within {iss.MAX_INSTRUCTIONS} instructions")
+    ans_file = os.path.join(case_dir, f"{case_name}.ans")
+    with open(ans_file, "w") as f:
+        # 将结果写入 .ans 文件，比如 "5050"
+        f.write(str(machine.a0))
+    return machine.instret
+
+def generate_riscv_files(c_path, case_dir, case_name, march=DEFAULT_MARCH):
     """生成 RISC-V 的 .exe (指令) 和 .data (数据)"""
     elf_file = os.path.join(case_dir, f"{case_name}.elf")
     linker = os.path.abspath("common/linker.ld")
     start_s = os.path.abspath("common/start.s")
     
     # 1. 编译 RISC-V ELF
-    run_cmd(f"{RV_PREFIX}gcc -march=rv32i -mabi=ilp32 -O0 -nostdlib -T {linker} {start_s} {c_path} -o {elf_file}")
+    run_cmd(f"{RV_PREFIX}gcc -march={march} -mabi=ilp32 -O0 -nostdlib -T {linker} {start_s} {c_path} -o {elf_file}")
     
     # 2. 反汇编 (可选，用于调试)
     run_cmd(f"{RV_PREFIX}objdump -d {elf_file} > {os.path.join(case_dir, case_name + '.asm')}")
@@ -121,10 +115,11 @@ def generate_riscv_files(c_path, case_dir, case_name):
     for f in [elf_file, bin_inst, bin_data]:
         if os.path.exists(f): os.remove(f)
 
-def generate_config(case_dir, case_name):
+def generate_config(case_dir, case_name, march=DEFAULT_MARCH):
     """生成测试配置文件 .config.json"""
     config = {
         "name": case_name,
+        "march": march,
         "memory": {
             "text_base": int(TEXT_ADDR, 16),
             "data_base": int(DATA_ADDR, 16),
@@ -139,6 +134,13 @@ def generate_config(case_dir, case_name):
         json.dump(config, f, indent=2)
 
 def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Cross-compile src/*.c into test_suite/")
+    parser.add_argument("--march", choices=MARCH_CHOICES, default=DEFAULT_MARCH,
+                        help=f"target ISA passed to gcc -march (default: {DEFAULT_MARCH})")
+    args = parser.parse_args()
+
     if not os.path.exists(SOURCE_DIR):
         print(f"Error: Source directory '{SOURCE_DIR}' not found.")
         return
@@ -152,7 +154,7 @@ def main():
     
     # 扫描所有 .c 文件
     files = [f for f in os.listdir(SOURCE_DIR) if f.endswith(".c")]
-    print(f"Found {len(files)} test cases in '{SOURCE_DIR}'...")
+    print(f"Found {len(files)} test cases in '{SOURCE_DIR}' (-march={args.march})...")
     
     for f in files:
         case_name = os.path.splitext(f)[0]
@@ -163,13 +165,13 @@ def main():
         
         print(f"Processing: {case_name} ...", end="", flush=True)
         try:
-            # 1. 生成 .ans (运行在本机)
-            generate_ans(c_path, case_dir, case_name)
-            # 2. 生成 .exe/.data (交叉编译)
-            generate_riscv_files(c_path, case_dir, case_name)
-            # 3. 生成 .config.json (模拟器配置)
-            generate_config(case_dir, case_name)
-            print(" Done.")
+            # 1. 生成 .exe/.data (交叉编译)
+            generate_riscv_files(c_path, case_dir, case_name, args.march)
+            # 2. 生成 .config.json (模拟器配置，data_base 供功能模型使用)
+            generate_config(case_dir, case_name, args.march)
+            # 3. 生成 .ans (功能模型执行同一份程序)
+            instret = generate_ans(case_dir, case_name)
+            print(f" Done. ({instret} instructions)")
         except Exception as e:
             print(f" Failed! {e}")
 
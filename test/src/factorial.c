@@ -1,7 +1,11 @@
 // 阶乘 5! = 120
-// 使用快速乘（RV32I 无 MUL 指令）
+// 使用快速乘（RV32I 无 MUL 指令；batch_build.py --march rv32im 时用 mul）
 
 int multiply(int a, int b) {
+#ifdef __riscv_mul
+    // -march=rv32im：直接用 mul 指令
+    return a * b;
+#else
     int result = 0;
     int neg = 0;
     
@@ -16,6 +20,7 @@ int multiply(int a, int b) {
     }
     
     return neg ? -result : result;
+#endif
 }
 
 int main() {
@@ -3,6 +3,10 @@
 
 // 快速乘: O(log b)
 int multiply(int a, int b) {
+#ifdef __riscv_mul
+    // -march=rv32im：直接用 mul 指令
+    return a * b;
+#else
     int result = 0;
     int neg = 0;
     
@@ -16,6 +20,7 @@ int multiply(int a, int b) {
     }
     
     return neg ? -result : result;
+#endif
 }
 
 int main() {
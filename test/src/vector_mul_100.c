@@ -1,8 +1,12 @@
 // 100元素向量逐元素乘法: C[i] = A[i] * B[i]
-// 使用快速乘（RV32I 无 MUL 指令）
+// 使用快速乘（RV32I 无 MUL 指令；batch_build.py --march rv32im 时用 mul）
 
 // 快速乘: O(log b)
 int multiply(int a, int b) {
+#ifdef __riscv_mul
+    // -march=rv32im：直接用 mul 指令
+    return a * b;
+#else
     int result = 0;
     int neg = 0;
     
@@ -16,6 +20,7 @@ int multiply(int a, int b) {
     }
     
     return neg ? -result : result;
+#endif
 }
 
 // 全局数组 (10-99 范围，乘积最大约 9801，不会溢出)
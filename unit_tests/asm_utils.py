@@ -90,6 +90,39 @@ class ASM:
     def sltu(cls, rd, rs1, rs2):
         return cls._encode_r(0b0110011, 0b011, 0b0000000, rd, rs1, rs2)
         
+    # RV32M: funct7=0000001
+    @classmethod
+    def mul(cls, rd, rs1, rs2):
+        return cls._encode_r(0b0110011, 0b000, 0b0000001, rd, rs1, rs2)
+
+    @classmethod
+    def mulh(cls, rd, rs1, rs2):
+        return cls._encode_r(0b0110011, 0b001, 0b0000001, rd, rs1, rs2)
+
+    @classmethod
+    def mulhsu(cls, rd, rs1, rs2):
+        return cls._encode_r(0b0110011, 0b010, 0b0000001, rd, rs1, rs2)
+
+    @classmethod
+    def mulhu(cls, rd, rs1, rs2):
+        return cls._encode_r(0b0110011, 0b011, 0b0000001, rd, rs1, rs2)
+
+    @classmethod
+    def div(cls, rd, rs1, rs2):
+        return cls._encode_r(0b0110011, 0b100, 0b0000001, rd, rs1, rs2)
+
+    @classmethod
+    def divu(cls, rd, rs1, rs2):
+        return cls._encode_r(0b0110011, 0b101, 0b0000001, rd, rs1, rs2)
+
+    @classmethod
+    def rem(cls, rd, rs1, rs2):
+        return cls._encode_r(0b0110011, 0b110, 0b0000001, rd, rs1, rs2)
+
+    @classmethod
+    def remu(cls, rd, rs1, rs2):
+        return cls._encode_r(0b0110011, 0b111, 0b0000001, rd, rs1, rs2)
+
     @classmethod
     def sw(cls, rs1, rs2, imm):
         return cls._encode_s(0b0100011, 0b010, rs1, rs2, imm)
@@ -51,6 +51,32 @@ def case_alu_ops():
     return instrs, expected
 
 
+def case_mul_div():
+    """RV32M coverage: mul/mulh*/div*/rem* incl. divide by zero and overflow"""
+    instrs = [
+        ASM.addi(1, 0, -7),    # x1 = -7
+        ASM.addi(2, 0, 3),     # x2 = 3
+        ASM.mul(3, 1, 2),      # x3 = -21
+        ASM.mulh(4, 1, 2),     # x4 = -1 (high word of -21)
+        ASM.mulhu(5, 1, 2),    # x5 = 2 (0xfffffff9 * 3 >> 32)
+        ASM.mulhsu(6, 1, 2),   # x6 = -1
+        ASM.div(7, 1, 2),      # x7 = -2 (truncates toward zero)
+        ASM.rem(8, 1, 2),      # x8 = -1 (sign of dividend)
+        ASM.divu(9, 1, 2),     # x9 = 0xfffffff9 / 3 = 0x55555553
+        ASM.remu(10, 1, 2),    # x10 = 0
+        ASM.div(11, 1, 0),     # x11 = -1 (divide by zero)
+        ASM.rem(12, 1, 0),     # x12 = -7
+        ASM.lui(13, 0x80000000),  # x13 = -2^31
+        ASM.addi(14, 0, -1),   # x14 = -1
+        ASM.div(15, 13, 14),   # x15 = -2^31 (overflow)
+        ASM.rem(16, 13, 14),   # x16 = 0
+        ASM.nop()
+    ]
+    expected = {3: -21, 4: -1, 5: 2, 6: -1, 7: -2, 8: -1, 9: 0x55555553, 10: 0,
+                11: -1, 12: -7, 15: -2**31, 16: 0}
+    return instrs, expected
+
+
 def case_mem_rw():
     """Memory write then read back via lw/sw"""
     instrs = [
@@ -109,4 +135,26 @@ def case_branches_and_jumps():
         11: 7,
         14: 9
     }
-    return instrs, expected
\ No newline at end of file
+    return instrs, expected
+
+def case_branch_recovery():
+    """Mispredicted branch with dependent ALU/load/store ops on the wrong path"""
+    instrs = [
+        ASM.lui(1, 0x2000),   # x1 = DATA_BASE_OFFSET (0x2000)
+        ASM.addi(2, 0, 7),    # x2 = 7
+        ASM.sw(1, 2, 0),      # [x1] = 7
+        ASM.div(10, 2, 2),    # x10 = 1, slow: keeps the branch from committing before it resolves
+        ASM.mul(3, 2, 2),     # x3 = 49
+        ASM.bne(3, 0, 24),    # taken, but predicted not taken (BTB miss) -> skip to add x7
+        ASM.addi(2, 0, 99),   # wrong path: renames x2
+        ASM.sw(1, 2, 0),      # wrong path: [x1] = 99
+        ASM.lw(4, 1, 0),      # wrong path: x4 = 99
+        ASM.add(5, 4, 2),     # wrong path: x5 = 198
+        ASM.addi(6, 0, 1),    # wrong path: x6 = 1
+        ASM.add(7, 2, 2),     # x7 = 14 (x2 mapping restored to 7)
+        ASM.lw(8, 1, 0),      # x8 = 7 (wrong-path store squashed)
+        ASM.add(9, 8, 10),    # x9 = 8
+        ASM.nop()
+    ]
+    expected = {2: 7, 3: 49, 7: 14, 8: 7, 9: 8, 10: 1}
+    return instrs, expected
@@ -0,0 +1,43 @@
+import pathlib
+import sys
+
+import pytest
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from asm_utils import ASM
+from scripts import checkpoint, iss
+
+
+def test_resume_from_checkpoint_matches_full_run(tmp_path):
+    full = iss.load_test("vector_mul_100")
+    assert full.run()
+
+    ckpt = checkpoint.take("vector_mul_100", 10_000)
+    path = tmp_path / "vm.ckpt.json"
+    checkpoint.save(ckpt, path)
+    loaded = checkpoint.load(path)
+    assert loaded["instret"] == 10_000
+
+    resumed = checkpoint.restore(loaded, full.text)
+    assert resumed.run()
+    assert resumed.result() == full.result()
+    assert resumed.mem == full.mem
+
+
+def test_data_image_is_dense_and_sparse_format_round_trips(tmp_path):
+    machine = iss.Machine([ASM.ebreak()], data=[0, 5, 6, 0, 0, 7])
+    ckpt = checkpoint.capture(machine)
+    assert ckpt["memory"] == [[1, [5, 6]], [5, [7]]]
+
+    image = tmp_path / checkpoint.CHECKPOINT_IMAGE
+    checkpoint.write_data_image(ckpt, image)
+    assert iss.read_hex_words(image) == [0, 5, 6, 0, 0, 7]
+    assert checkpoint.initial_state(ckpt) == {"pc": 0, "regs": [0] * 32}
+
+
+def test_checkpoint_past_halt_is_rejected():
+    with pytest.raises(checkpoint.CheckpointError):
+        checkpoint.take("simple_add", 1_000_000)
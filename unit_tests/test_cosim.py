@@ -0,0 +1,50 @@
+import pathlib
+import sys
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from asm_utils import ASM
+from scripts import cosim, iss
+
+PROGRAM = [
+    ASM.addi(1, 0, 5),
+    ASM.addi(2, 1, 3),
+    ASM.sw(0, 2, 0),
+    ASM.add(10, 1, 2),
+    ASM.ebreak(),
+]
+
+
+def retire_lines(program, tamper=None):
+    """用参考模型生成一串 Commiter 风格的 retire 日志，可选地改掉其中一条。"""
+    machine = iss.Machine(program, data_base=0)
+    lines = []
+    while not machine.halted:
+        pc, rd, value = machine.step()
+        is_store = int(program[pc >> 2] & 0x7F == 0b0100011)
+        if tamper is not None and len(lines) == tamper:
+            value += 1
+        lines.append(f"Cycle @{len(lines) + 10}.00: [Commiter] commit: retire rob={len(lines) % 8} "
+                     f"pc=0x{pc:08x} rd={rd} is_store={is_store} value=0x{value & 0xFFFFFFFF:08x}\n")
+    return lines
+
+
+def test_matching_stream_passes():
+    checker = cosim.CommitChecker(iss.Machine(PROGRAM, data_base=0))
+    assert all(checker.feed(line) for line in ["Cycle @1.00: [RS] noise\n"] + retire_lines(PROGRAM))
+    report = checker.finish()
+    assert report["ok"] and report["checked"] == len(PROGRAM)
+
+
+def test_first_mismatch_is_reported():
+    checker = cosim.CommitChecker(iss.Machine(PROGRAM, data_base=0), {12: "add a0,ra,sp"})
+    results = [checker.feed(line) for line in retire_lines(PROGRAM, tamper=3)]
+    assert results == [True, True, True, False, False]
+
+    div = checker.finish()["divergence"]
+    assert (div["commit"], div["cycle"], div["rob"], div["pc"]) == (3, 13, 3, 12)
+    assert div["reason"] == "value mismatch"
+    assert (div["expected"]["value"], div["actual"]["value"]) == (13, 14)
+    assert "add a0,ra,sp" in cosim.describe(checker.finish())
@@ -0,0 +1,103 @@
+import pathlib
+import sys
+
+import pytest
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from Tomasulo.src.config import CacheConfig, CPUConfig
+
+
+@pytest.mark.parametrize("rob_size, idx_width, tag_width", [
+    (8, 3, 4),
+    (16, 4, 5),
+    (32, 5, 6),
+    (64, 6, 7),
+])
+def test_tag_width_follows_rob_size(rob_size, idx_width, tag_width):
+    config = CPUConfig(rob_size=rob_size)
+    assert config.rob_idx_width == idx_width
+    # reg_pending 存 rob_idx+1，最大值 rob_size 必须放得下
+    assert config.tag_width == tag_width
+    assert rob_size < (1 << config.tag_width)
+
+
+def test_rejects_bad_sizes():
+    with pytest.raises(ValueError):
+        CPUConfig(rob_size=12)
+    with pytest.raises(ValueError):
+        CPUConfig(rob_size=4, issue_width=4)
+    # 取指队列要放得下在路上的一组和本周期的一组
+    with pytest.raises(ValueError):
+        CPUConfig(issue_width=4, fetch_queue_size=4)
+    with pytest.raises(ValueError):
+        CPUConfig(cdb_lanes=0)
+    with pytest.raises(ValueError):
+        CPUConfig(branch_checkpoints=0)
+    with pytest.raises(ValueError):
+        CPUConfig(prefetch_distance=3)
+
+
+def test_params_distinguish_rob_sizes():
+    assert CPUConfig(rob_size=16).params() != CPUConfig(rob_size=32).params()
+
+
+def test_lsq_size():
+    config = CPUConfig(lsq_size=16)
+    assert (config.lsq_idx_width, config.params()["lsq_size"]) == (4, 16)
+    with pytest.raises(ValueError):
+        CPUConfig(lsq_size=6)
+    # 一个发射组的访存要能同时分到表项
+    with pytest.raises(ValueError):
+        CPUConfig(rob_size=16, issue_width=4, fetch_queue_size=8, lsq_size=2)
+
+
+def test_store_buffer_size():
+    assert CPUConfig(store_buffer_size=8).params()["store_buffer_size"] == 8
+    with pytest.raises(ValueError):
+        CPUConfig(store_buffer_size=1)
+    with pytest.raises(ValueError):
+        CPUConfig(store_buffer_size=6)
+
+
+def test_rs_entries_independent_of_alu_count():
+    config = CPUConfig(rs_entries=16, alu_count=3)
+    assert config.params()["rs_entries"] == 16
+    assert config.params()["alu_count"] == 3
+    with pytest.raises(ValueError):
+        CPUConfig(alu_count=0)
+    with pytest.raises(ValueError):
+        CPUConfig(rs_entries=0)
+
+
+def test_mdu_config():
+    config = CPUConfig(mul_latency=5, mdu_rs_entries=4)
+    assert (config.params()["mul_latency"], config.params()["mdu_rs_entries"]) == (5, 4)
+    with pytest.raises(ValueError):
+        CPUConfig(mul_latency=0)
+    with pytest.raises(ValueError):
+        CPUConfig(mdu_rs_entries=0)
+
+
+def test_dcache_config():
+    dcache = CacheConfig(sets=32, ways=4, line_words=8)
+    assert (dcache.set_bits, dcache.line_bits) == (5, 3)
+    assert CPUConfig(dcache=dcache).params()["dcache_ways"] == 4
+    assert CPUConfig().params() != CPUConfig(dcache=CacheConfig(miss_latency=50)).params()
+    with pytest.raises(ValueError):
+        CacheConfig(sets=12)
+    with pytest.raises(ValueError):
+        CacheConfig(line_words=3)
+    with pytest.raises(ValueError):
+        CacheConfig(mshrs=0)
+
+
+def test_icache_config():
+    config = CPUConfig()
+    assert config.icache.name == "icache"
+    assert "icache_sets" in config.params() and "dcache_sets" in config.params()
+    # 取指组最多跨两行
+    with pytest.raises(ValueError):
+        CPUConfig(issue_width=4, fetch_queue_size=8, icache=CacheConfig("icache", line_words=2))
@@ -0,0 +1,82 @@
+import pathlib
+import sys
+
+import pytest
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+import test_cases
+from asm_utils import ASM
+from scripts import iss
+
+CASES = [name for name in vars(test_cases) if name.startswith("case_")]
+
+
+@pytest.mark.parametrize("case", CASES)
+def test_iss_matches_hand_written_cases(case):
+    instrs, expected = getattr(test_cases, case)()
+    machine = iss.Machine(instrs + [ASM.ebreak()])
+    assert machine.run(10_000)
+    for reg, value in expected.items():
+        assert machine.regs[reg] == value & 0xFFFFFFFF, f"x{reg}"
+
+
+def test_iss_signed_ops_and_memory():
+    instrs = [
+        ASM.lui(1, 0x2000),      # x1 = data_base
+        ASM.lw(2, 1, 4),         # x2 = 0xfffffff0 (预置数据)
+        ASM.srai(3, 2, 2),       # x3 = -4
+        ASM.slti(4, 2, 0),       # x4 = 1
+        ASM.sltiu(5, 2, 0),      # x5 = 0
+        ASM.sw(1, 3, 8),         # [base+8] = -4
+        ASM.lw(6, 1, 8),
+        ASM.ebreak(),
+        ASM.addi(7, 0, 1),       # ebreak 之后不应执行
+    ]
+    machine = iss.Machine(instrs, data=[0, 0xFFFFFFF0])
+    assert machine.run()
+    assert machine.regs[3] == 0xFFFFFFFC
+    assert (machine.regs[4], machine.regs[5]) == (1, 0)
+    assert machine.regs[6] == 0xFFFFFFFC
+    assert machine.regs[7] == 0
+    assert machine.instret == 8
+    assert machine.mem[2] == 0xFFFFFFFC
+
+
+def test_iss_step_reports_retired_writes():
+    machine = iss.Machine([ASM.addi(10, 0, 7), ASM.sw(0, 10, 0), ASM.ebreak()], data_base=0)
+    assert machine.step() == (0, 10, 7)
+    assert machine.step()[1] == 0
+    machine.step()
+    assert machine.halted
+    with pytest.raises(StopIteration):
+        machine.step()
+
+
+def test_iss_rejects_out_of_range_access():
+    machine = iss.Machine([ASM.lw(1, 0, 0), ASM.ebreak()])  # 地址 0 在 data_base 之下
+    with pytest.raises(iss.ISSError):
+        machine.run()
+
+
+@pytest.mark.parametrize("name", ["fib", "vector_mul_100"])
+def test_iss_reproduces_suite_answers(name):
+    suite = REPO_ROOT / "test" / "test_suite" / name
+    expected = int((suite / f"{name}.ans").read_text())
+    assert iss.golden_a0(suite) == expected
+
+
+def test_iss_mulh_extremes():
+    # -2^31 * -2^31 = 2^62：mulh 为 0x40000000，mulhsu 把第二个操作数当无符号数
+    machine = iss.Machine([
+        ASM.lui(1, 0x80000000),
+        ASM.mulh(2, 1, 1),
+        ASM.mulhsu(3, 1, 1),
+        ASM.mulhu(4, 1, 1),
+        ASM.mul(5, 1, 1),
+        ASM.ebreak(),
+    ])
+    assert machine.run()
+    assert machine.regs[2:6] == [0x40000000, 0xC0000000, 0x40000000, 0]
@@ -0,0 +1,98 @@
+import pathlib
+import sys
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from scripts.log_analyzer import LogAnalyzer, load_summary
+
+TOMASULO_LOG = """\
+@line:1 Cycle @1.00: [FetcherImpl] fetcherimpl: fetch_pc=0x00000000
+@line:2 Cycle @3.00: [Commiter] commit: retire rob=0 pc=0x00000000 rd=10 is_store=0 value=0x0000000f
+@line:3 Cycle @3.00: [Commiter] commit: writeback rd=10 value=15
+@line:4 Cycle @4.00: [Commiter] commit: retire rob=1 pc=0x00000004 rd=10 is_store=1 value=0x00000001
+@line:5 Cycle @5.00: [Commiter] commit: retire rob=2 pc=0x00000008 rd=3 is_store=0 value=0x0000007b
+@line:6 Cycle @5.00: [Commiter] commit: writeback rd=3 value=123
+@line:7 Cycle @5.00: [Commiter] predictor: branches=20 mispredicts=3
+@line:8 Cycle @5.00: [Commiter] cdb: deferred lsu=0 mul=0 alu0=4 alu1=7 div=2
+@line:9 Cycle @5.00: [Commiter] fetchq: occupancy_sum=10 cycles=4 full=1
+@line:10 Cycle @5.00: [Commiter] ckpt: recoveries=2 full=5
+@line:11 Cycle @5.00: [Commiter] icache: hits=90 misses=4 merged=0 mshr_full=0
+@line:12 Cycle @5.00: [Commiter] dcache: hits=30 misses=6 merged=2 mshr_full=1
+@line:13 Cycle @5.00: [Commiter] prefetch: issued=10 useful=6 late=2
+"""
+
+FIVE_STAGE_LOG = """\
+@line:1 Cycle @2.00: [Fetcher] fetch stage pc addr: 0
+@line:2 Cycle @4.00: [Executor] executor input: pc=0 rs1_used=1
+@line:3 Cycle @6.00: [WriteBack] writeback stage: rd = 10 data = 55
+@line:4 Cycle @7.00: [WriteBack] writeback stage: rd = 0 data = 9
+@line:5 Cycle @7.00: [Executor] dcache: hits=3 misses=1 merged=0 mshr_full=0
+** tb.test_tb PASS 120.0 0.5 240.0
+"""
+
+
+def test_tomasulo_commits_and_registers():
+    analyzer = LogAnalyzer().feed_lines(TOMASULO_LOG.splitlines(keepends=True))
+    summary = analyzer.summary()
+
+    assert summary["cycles"] == 5
+    assert summary["commits"] == 3
+    assert summary["fetches"] == 1
+    # store 的 rd 字段不应改写 a0
+    assert summary["a0"] == 15
+    assert summary["regs"][3] == 123
+    assert (summary["branches"], summary["mispredicts"]) == (20, 3)
+    assert summary["cdb_deferred"] == {"lsu": 0, "mul": 0, "alu0": 4, "alu1": 7, "div": 2}
+    assert summary["fetch_queue_occupancy"] == 2.5
+    assert summary["fetch_queue_full"] == 1
+    assert (summary["checkpoint_recoveries"], summary["checkpoint_full"]) == (2, 5)
+    assert summary["icache"] == {"hits": 90, "misses": 4, "merged": 0, "mshr_full": 0}
+    assert summary["dcache"] == {"hits": 30, "misses": 6, "merged": 2, "mshr_full": 1}
+    prefetch = summary["prefetch"]
+    assert (prefetch["issued"], prefetch["useful"], prefetch["late"]) == (10, 6, 2)
+    assert (prefetch["accuracy"], prefetch["coverage"], prefetch["timeliness"]) == (0.8, 6 / 14, 0.75)
+
+
+def test_five_stage_writeback_and_timing():
+    summary = LogAnalyzer().feed_lines(FIVE_STAGE_LOG.splitlines()).summary()
+
+    assert summary["cycles"] == 7
+    assert summary["instructions"] == 1
+    assert summary["a0"] == 55
+    assert summary["regs"][0] == 0
+    assert summary["timing"]["ratio"] == 240.0
+    assert summary["dcache"]["misses"] == 1
+
+
+def test_tee_writes_log_and_summary(tmp_path):
+    log_path = tmp_path / "log"
+    analyzer = LogAnalyzer(tail_lines=2)
+    with open(log_path, "w") as f:
+        analyzer.tee(TOMASULO_LOG.splitlines(keepends=True), f)
+    analyzer.write_summary(tmp_path / "summary.json")
+
+    assert log_path.read_text() == TOMASULO_LOG
+    summary = load_summary(log_path)
+    assert summary["a0"] == 15
+    assert len(summary["tail"]) == 2
+
+    # 没有 summary 时回退到对 log 做一遍流式统计
+    (tmp_path / "summary.json").unlink()
+    assert load_summary(log_path)["commits"] == 3
+
+    # 没有 log 时不拿上一次留下的 summary 充数
+    analyzer.write_summary(tmp_path / "summary.json")
+    log_path.unlink()
+    assert load_summary(log_path) is None
+
+
+def test_silent_final_state_dump():
+    lines = [f"@line:9 Cycle @42.00: [Commiter] final: x{i}=0x{i * 3:08x}" for i in range(1, 32)]
+    summary = LogAnalyzer().feed_lines(lines).summary()
+
+    assert summary["cycles"] == 42
+    assert summary["commits"] == 0
+    assert summary["a0"] == 30
+    assert summary["regs"][31] == 93
@@ -0,0 +1,98 @@
+import pathlib
+import sys
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from scripts import sim_cache
+
+
+def _make_design(root: pathlib.Path):
+    design = root / "design"
+    (design / "workspace").mkdir(parents=True)
+    (design / "main.py").write_text("FIFO_SIZE = 8\n")
+    (design / "workspace" / "workload.exe").write_text("00000013\n")
+    return design
+
+
+def test_cache_key_tracks_sources_and_params(tmp_path):
+    design = _make_design(tmp_path)
+    params = {"depth_log": 18, "data_base": 0x2000}
+    key = sim_cache.cache_key(design, params)
+
+    # 工作区里的内存镜像不影响 key
+    (design / "workspace" / "workload.exe").write_text("00100073\n")
+    assert sim_cache.cache_key(design, params) == key
+
+    assert sim_cache.cache_key(design, {**params, "data_base": 0x4000}) != key
+    (design / "main.py").write_text("FIFO_SIZE = 16\n")
+    assert sim_cache.cache_key(design, params) != key
+
+
+def test_file_digest_tracks_shared_sources(tmp_path):
+    shared = tmp_path / "cache.py"
+    shared.write_text("SETS = 16\n")
+    digest = sim_cache.file_digest(shared)
+    assert sim_cache.file_digest(shared) == digest
+    shared.write_text("SETS = 32\n")
+    assert sim_cache.file_digest(shared) != digest
+
+
+def test_imported_digest_follows_transitive_imports(tmp_path, monkeypatch):
+    package = tmp_path / "shared_design"
+    package.mkdir()
+    (package / "__init__.py").write_text("")
+    (package / "mdu.py").write_text("from .config import LATENCY\n")
+    (package / "config.py").write_text("LATENCY = 3\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    for name in ("shared_design", "shared_design.mdu", "shared_design.config"):
+        monkeypatch.delitem(sys.modules, name, raising=False)
+
+    __import__("shared_design.mdu")
+    digest = sim_cache.imported_digest("shared_design")
+    # mdu.py 没变，只改了它导入的 config.py
+    (package / "config.py").write_text("LATENCY = 4\n")
+    assert sim_cache.imported_digest("shared_design") != digest
+
+
+def test_get_or_build_reuses_entry(tmp_path):
+    design = _make_design(tmp_path)
+    calls = []
+
+    def build(path):
+        calls.append(path)
+        return f"{path}/CPU_simulator", f"{path}/CPU_verilog"
+
+    params = {"depth_log": 18}
+    first = sim_cache.get_or_build(design, params, build, cache_dir=tmp_path / "cache")
+    second = sim_cache.get_or_build(design, params, build, cache_dir=tmp_path / "cache")
+
+    assert len(calls) == 1
+    assert first["hit"] is False and second["hit"] is True
+    assert second["simulator"] == first["simulator"]
+
+    sim_cache.get_or_build(design, params, build, cache_dir=tmp_path / "cache", rebuild=True)
+    assert len(calls) == 2
+
+
+def test_verilator_model_is_built_once(tmp_path):
+    verilog = tmp_path / "verilog"
+    tb_dir = verilog / sim_cache.VERILATOR_TB_DIR
+    workspace = tmp_path / "ws"
+    workspace.mkdir()
+    (workspace / "workload.exe").write_text("00000013\n")
+    full_runs = []
+
+    def full_run(path):
+        # 模拟 design.py 生成 testbench
+        full_runs.append(path)
+        tb_dir.mkdir(parents=True)
+        (tb_dir / sim_cache.VERILATOR_TB_SCRIPT).write_text(
+            "print(open('workload.exe').read().strip())\n")
+        return "full\n"
+
+    assert sim_cache.run_verilator_cached(verilog, workspace, full_run, ["workload.exe"]) == "full\n"
+    (workspace / "workload.exe").write_text("00100073\n")
+    assert sim_cache.run_verilator_cached(verilog, workspace, full_run, ["workload.exe"]) == "00100073\n"
+    assert len(full_runs) == 1
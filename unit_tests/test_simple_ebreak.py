@@ -9,7 +9,7 @@ def write_workload(instrs, workload_path):
     workload_path.write_text("\n".join(lines) + "\n")
 
 
-def run_sim_and_collect_log(instrs, sim_threshold=50, idle_threshold=20, data_words=None):
+def run_sim_and_collect_log(instrs, sim_threshold=50, idle_threshold=20, data_words=None, extra_args=()):
     repo = pathlib.Path(__file__).resolve().parents[1]
     workload = repo / "Tomasulo" / "src" / "workspace" / "workload.exe"
     data_mem = repo / "Tomasulo" / "src" / "workspace" / "data.mem"
@@ -31,6 +31,7 @@ def run_sim_and_collect_log(instrs, sim_threshold=50, idle_threshold=20, data_wo
         str(sim_threshold),
         "--idle-threshold",
         str(idle_threshold),
+        *extra_args,
     ]
     result = subprocess.run(cmd, cwd=repo, capture_output=True, text=True)
     assert result.returncode == 0, f"sim exit={result.returncode}, stdout={result.stdout}, stderr={result.stderr}"
@@ -0,0 +1,46 @@
+import pathlib
+import sys
+
+import pytest
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from scripts import iss, simpoint
+
+
+def test_intervals_cover_the_whole_run():
+    intervals = simpoint.collect_intervals(iss.load_test("vector_mul_100"), interval=500)
+    full = iss.load_test("vector_mul_100")
+    full.run()
+
+    assert sum(iv["length"] for iv in intervals) == full.instret
+    assert all(sum(iv["bbv"].values()) == iv["length"] for iv in intervals)
+    assert [iv["start"] for iv in intervals] == list(range(0, full.instret, 500))
+
+
+def test_clusters_weights_and_samples():
+    intervals = simpoint.collect_intervals(iss.load_test("vector_mul_100"), interval=500)
+    simpoints = simpoint.choose_simpoints(intervals, max_k=6, per_cluster=2)
+
+    assert 1 < simpoints["k"] <= 6
+    assert sum(c["weight"] for c in simpoints["clusters"]) == pytest.approx(1.0)
+    assert sum(c["size"] for c in simpoints["clusters"]) == len(intervals)
+    assert all(1 <= len(c["samples"]) <= min(2, c["size"]) for c in simpoints["clusters"])
+    # 同样的种子给出同样的选择
+    assert simpoint.choose_simpoints(intervals, max_k=6, per_cluster=2) == simpoints
+
+
+def test_weighted_cpi_and_confidence():
+    clusters = [
+        {"weight": 0.75, "size": 10, "samples": [{"cpi": 1.0}, {"cpi": 2.0}]},
+        {"weight": 0.25, "size": 1, "samples": [{"cpi": 4.0}]},
+    ]
+    est = simpoint.estimate(clusters)
+    assert est["cpi"] == pytest.approx(0.75 * 1.5 + 0.25 * 4.0)
+    # s^2 = 0.5, n = 2, 有限总体修正 (1 - 2/10)
+    assert est["ci95"] == pytest.approx(1.96 * (0.75 ** 2 * 0.5 / 2 * 0.8) ** 0.5)
+
+    clusters[0]["samples"].pop()
+    assert simpoint.estimate(clusters)["ci95"] is None
@@ -0,0 +1,46 @@
+import pathlib
+import sys
+import time
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from scripts import workspaces
+
+
+def test_private_workspaces_are_isolated(tmp_path):
+    exe = tmp_path / "a.exe"
+    exe.write_text("00000013\n")
+
+    first = workspaces.stage_images(workspaces.private_workspace(tmp_path, "a"), exe)
+    second = workspaces.stage_images(workspaces.private_workspace(tmp_path, "b"), exe, tmp_path / "missing.data")
+    (first / workspaces.LOG_NAME).write_text("stale\n")
+
+    assert first != second
+    assert (second / workspaces.DATA_NAME).read_text() == ""
+    # 重新分配会清空旧的 log
+    again = workspaces.private_workspace(tmp_path, "a")
+    assert not (again / workspaces.LOG_NAME).exists()
+
+
+def test_stage_images_drops_stale_outputs(tmp_path):
+    exe = tmp_path / "a.exe"
+    exe.write_text("00000013\n")
+    workspace = tmp_path / "ws"
+    workspace.mkdir()
+    for name in workspaces.STALE_OUTPUTS:
+        (workspace / name).write_text("stale\n")
+
+    workspaces.stage_images(workspace, exe)
+    for name in workspaces.STALE_OUTPUTS:
+        assert not (workspace / name).exists()
+
+
+def test_run_pool_keeps_input_order():
+    def slow_square(x):
+        time.sleep(0.01 * (5 - x))
+        return x * x
+
+    assert list(workspaces.run_pool(slow_square, range(5), jobs=4)) == [0, 1, 4, 9, 16]
+    assert list(workspaces.run_pool(slow_square, range(5), jobs=1)) == [0, 1, 4, 9, 16]